@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: recall and latency of the sharded int8 vector store against ChromaDB
+
+Indexes the same chunks in both stores and compares recall@k (against an
+exact float32 search), query latency (p50/p95) and vector storage, for
+unfiltered queries and for queries filtered to one document type (which
+the sharded store answers from a single shard). ChromaDB is skipped when
+it is not installed.
+
+Chunks are synthetic clustered 384-dimension embeddings spread over
+COBOL, copybook, SMED and manual sources, or the chunks of an existing
+ChromaDB store.
+
+Usage:
+    python bench_rag_vector_store.py [--chunks 50000] [--queries 200] [--k 10]
+    python bench_rag_vector_store.py --from-chroma ./chromadb
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from rag_vector_shards import ShardedVectorStore
+
+try:
+    import chromadb
+    from chromadb.config import Settings
+    CHROMA_AVAILABLE = True
+except ImportError:
+    CHROMA_AVAILABLE = False
+
+SOURCE_KINDS = ('PGM{}.cbl', 'CPY{}.cpy', 'SMED_FILES/MENU{}', 'manual/CMD{}.md')
+COPYBOOK_FILTER = {'source': {'$contains': '.cpy'}}
+BATCH = 2000
+
+
+def synthetic_chunks(count, dim, seed=0):
+    """Clustered unit vectors (topics) with sources spread over document types"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(16, count // 200), dim)).astype(np.float32)
+    vectors = centers[rng.integers(len(centers), size=count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    ids = [f'chunk-{i}' for i in range(count)]
+    metadatas = [{'source': SOURCE_KINDS[i % len(SOURCE_KINDS)].format(i // 20), 'added_at': float(i)}
+                 for i in range(count)]
+    documents = [f'chunk {i}' for i in range(count)]
+    return ids, vectors, documents, metadatas
+
+
+def chroma_chunks(persist_dir):
+    """Every chunk of the documents collection of a ChromaDB store"""
+    collection = chromadb.PersistentClient(path=persist_dir).get_collection('documents')
+    ids, vectors, documents, metadatas = [], [], [], []
+    offset = 0
+    while True:
+        page = collection.get(include=['documents', 'metadatas', 'embeddings'], limit=BATCH, offset=offset)
+        if not page['ids']:
+            break
+        ids += page['ids']
+        vectors += [list(vector) for vector in page['embeddings']]
+        documents += page['documents']
+        metadatas += page['metadatas']
+        offset += len(page['ids'])
+    return ids, np.asarray(vectors, dtype=np.float32), documents, metadatas
+
+
+def make_queries(vectors, count, seed=1):
+    """Perturbed copies of stored vectors (queries near real content)"""
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.integers(len(vectors), size=count)]
+    return picks + 0.3 * picks.std() * rng.standard_normal(picks.shape).astype(np.float32)
+
+
+def exact_top_k(vectors, queries, k, mask=None):
+    """Ground truth: float32 cosine top-k (restricted to mask)"""
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normalized.T
+    if mask is not None:
+        scores[:, ~mask] = -np.inf
+    return [set(np.argsort(-row)[:k]) for row in scores]
+
+
+def load(store, ids, vectors, documents, metadatas):
+    started = time.perf_counter()
+    for start in range(0, len(ids), BATCH):
+        end = start + BATCH
+        store.upsert(ids=ids[start:end], embeddings=vectors[start:end].tolist(),
+                     documents=documents[start:end], metadatas=metadatas[start:end])
+    return time.perf_counter() - started
+
+
+def run_queries(label, store, queries, truth, positions, k, where=None):
+    """Recall@k and latency percentiles of one store"""
+    latencies, recall = [], 0.0
+    store.query(query_embeddings=[queries[0].tolist()], n_results=k, where=where)  # warm up
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        result = store.query(query_embeddings=[query.tolist()], n_results=k, where=where)
+        latencies.append(time.perf_counter() - started)
+        found = {positions[chunk_id] for chunk_id in result['ids'][0]}
+        recall += len(found & expected) / k
+    p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+    print(f"{label:<34} recall@{k} {recall / len(queries):6.3f}   p50 {p50:7.2f} ms   p95 {p95:7.2f} ms")
+
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _dirs, names in os.walk(path) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the sharded int8 vector store against ChromaDB')
+    parser.add_argument('--chunks', type=int, default=50000, help='Synthetic chunks to index')
+    parser.add_argument('--dim', type=int, default=384, help='Synthetic embedding dimension')
+    parser.add_argument('--queries', type=int, default=200, help='Queries per case')
+    parser.add_argument('--k', type=int, default=10, help='Results per query')
+    parser.add_argument('--from-chroma', metavar='PERSIST_DIR', help='Use the chunks of an existing ChromaDB store')
+    args = parser.parse_args()
+
+    if args.from_chroma:
+        if not CHROMA_AVAILABLE:
+            sys.exit('[ERROR] chromadb is required for --from-chroma')
+        ids, vectors, documents, metadatas = chroma_chunks(args.from_chroma)
+    else:
+        ids, vectors, documents, metadatas = synthetic_chunks(args.chunks, args.dim)
+    positions = {chunk_id: i for i, chunk_id in enumerate(ids)}
+    queries = make_queries(vectors, args.queries)
+    copybooks = np.array(['.cpy' in (metadata or {}).get('source', '') for metadata in metadatas])
+    truth = exact_top_k(vectors, queries, args.k)
+    filtered_truth = exact_top_k(vectors, queries, args.k, mask=copybooks)
+    print(f"[INFO] {len(ids)} chunks x {vectors.shape[1]} dims ({copybooks.sum()} copybook chunks), "
+          f"{len(queries)} queries, k={args.k}")
+    print(f"[INFO] float32 vectors: {vectors.nbytes / 2**20:.1f} MiB")
+
+    workdir = tempfile.mkdtemp(prefix='bench-vectors-')
+    try:
+        stores = []
+        sharded = ShardedVectorStore(os.path.join(workdir, 'sharded'))
+        stores.append(('sharded', sharded, load(sharded, ids, vectors, documents, metadatas)))
+        if CHROMA_AVAILABLE:
+            client = chromadb.PersistentClient(path=os.path.join(workdir, 'chroma'),
+                                               settings=Settings(anonymized_telemetry=False))
+            chroma = client.get_or_create_collection('documents', metadata={'hnsw:space': 'cosine'})
+            stores.append(('chroma', chroma, load(chroma, ids, vectors, documents, metadatas)))
+        else:
+            print("[WARN] chromadb not installed, benchmarking the sharded store only")
+
+        for name, store, load_time in stores:
+            print(f"[INFO] {name}: loaded in {load_time:.1f}s")
+            run_queries(f'{name} (all shards)', store, queries, truth, positions, args.k)
+            run_queries(f'{name} (file_types=.cpy)', store, queries, filtered_truth, positions, args.k,
+                        where=COPYBOOK_FILTER)
+        print(f"[INFO] sharded store routes file_types=.cpy to: {sharded.route(COPYBOOK_FILTER)}")
+        print(f"[INFO] sharded vector files: {sharded.stats()['vector_bytes'] / 2**20:.1f} MiB, "
+              f"directory {directory_bytes(os.path.join(workdir, 'sharded')) / 2**20:.1f} MiB")
+        if CHROMA_AVAILABLE:
+            print(f"[INFO] chroma directory: {directory_bytes(os.path.join(workdir, 'chroma')) / 2**20:.1f} MiB")
+        sharded.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
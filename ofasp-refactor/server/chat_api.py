@@ -10,7 +10,7 @@ import base64
 import requests
 import time
 from pathlib import Path
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import mimetypes
 import logging
@@ -38,6 +38,17 @@ except ImportError as e:
     RAG_AVAILABLE = False
     logger.warning(f"RAG service not available: {e}")
 
+# Import lexical index (keyword fallback when vector search is unavailable)
+try:
+    from rag_lexical_index import LexicalIndex, LEXICAL_INDEX_AVAILABLE
+    from rag_vector_shards import index_directory
+except ImportError as e:
+    LEXICAL_INDEX_AVAILABLE = False
+    logger.warning(f"Lexical index not available: {e}")
+
+from chat_streaming import ollama_stream_events, stream_events
+from model_gateway import GatewayError, ModelGateway, parse_model_limits
+
 # Import Smart Search Service
 try:
     from smart_search_service import get_smart_search_service
@@ -63,6 +74,18 @@ CORS(app, origins=['http://localhost:3005'], supports_credentials=True, allow_he
 OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:3014')
 RAG_DIR = os.getenv('RAG_DIR', '/home/aspuser/app/ofasp-refactor/public/RAG')
 UPLOAD_DIR = os.path.join(RAG_DIR, 'uploads')
+OLLAMA_STREAM_IDLE_TIMEOUT = float(os.getenv('OLLAMA_STREAM_IDLE_TIMEOUT', '120'))  # seconds between streamed chunks
+BITNET_MODEL = 'bitnet-b1.58:2b'
+
+# Admission control for the local models: concurrent generations per model
+# (CHAT_MODEL_LIMITS='gpt-oss:20b=1,gemma3:270m=4'), queued requests per model
+# and the seconds a request may take, queueing included
+model_gateway = ModelGateway(
+    default_max_in_flight=int(os.getenv('CHAT_MODEL_CONCURRENCY', '2')),
+    limits={BITNET_MODEL: 1, **parse_model_limits(os.getenv('CHAT_MODEL_LIMITS'))},
+    max_queue=int(os.getenv('CHAT_MODEL_QUEUE', '8')),
+    default_deadline=float(os.getenv('CHAT_REQUEST_DEADLINE', '120'))
+)
 
 # Create directories if they don't exist
 os.makedirs(RAG_DIR, exist_ok=True)
@@ -118,44 +141,61 @@ class ChatService:
         self.ollama_url = OLLAMA_URL
         self.rag_dir = Path(RAG_DIR)
         self.upload_dir = Path(UPLOAD_DIR)
+        self.lexical_index = None
+        self.gateway = model_gateway
     
-    def call_ollama(self, prompt, model='gemma3:270m', context=None, images=None):
-        """Call Ollama API with multimodal support"""
+    def _ollama_payload(self, prompt, model, context=None, images=None, stream=False):
+        """Request body of an Ollama /api/generate call"""
+        payload = {
+            'model': model,
+            'prompt': prompt,
+            'stream': stream,
+            'options': {
+                'temperature': 0.7,
+                'top_p': 0.9,
+                'num_predict': 500
+            }
+        }
+        
+        # Add context if provided
+        if context:
+            payload['context'] = context
+        
+        # Add images if provided (base64 encoded)
+        if images:
+            payload['images'] = images
+        
+        return payload
+    
+    def call_ollama(self, prompt, model='gemma3:270m', context=None, images=None, conversation_id=None):
+        """Call Ollama API with multimodal support (admitted through the model gateway)"""
         try:
-            payload = {
-                'model': model,
-                'prompt': prompt,
-                'stream': False,
-                'options': {
-                    'temperature': 0.7,
-                    'top_p': 0.9,
-                    'num_predict': 500
+            with self.gateway.submit(model) as ticket:
+                # Continue from the cached conversation state when there is one
+                if conversation_id and not context:
+                    context = self.gateway.contexts.get(model, conversation_id)
+                payload = self._ollama_payload(prompt, model, context, images)
+                
+                response = requests.post(
+                    f'{self.ollama_url}/api/generate',
+                    json=payload,
+                    timeout=min(120, max(1.0, ticket.remaining()))
+                )
+                response.raise_for_status()
+                
+                data = response.json()
+                if conversation_id and data.get('context'):
+                    self.gateway.contexts.put(model, conversation_id, data['context'])
+                return {
+                    'success': True,
+                    'response': data.get('response', ''),
+                    'context': data.get('context'),
+                    'done': data.get('done', True)
                 }
-            }
-            
-            # Add context if provided
-            if context:
-                payload['context'] = context
-            
-            # Add images if provided (base64 encoded)
-            if images:
-                payload['images'] = images
-            
-            response = requests.post(
-                f'{self.ollama_url}/api/generate',
-                json=payload,
-                timeout=120
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            return {
-                'success': True,
-                'response': data.get('response', ''),
-                'context': data.get('context'),
-                'done': data.get('done', True)
-            }
             
+        except GatewayError as e:
+            logger.warning(f"Ollama request not admitted: {e}")
+            return self._busy_result(e)
         except requests.exceptions.RequestException as e:
             logger.error(f"Ollama API error: {e}")
             return {
@@ -169,6 +209,40 @@ class ChatService:
                 'error': f'Unexpected error: {str(e)}'
             }
     
+    def stream_ollama(self, prompt, model='gemma3:270m', context=None, images=None, conversation_id=None):
+        """
+        Streamed Ollama generation as ('token' | 'done', data) events
+        
+        The caller holds the gateway ticket. Closing the generator closes the
+        HTTP response, which makes Ollama stop generating.
+        """
+        if conversation_id and not context:
+            context = self.gateway.contexts.get(model, conversation_id)
+        response = requests.post(
+            f'{self.ollama_url}/api/generate',
+            json=self._ollama_payload(prompt, model, context, images, stream=True),
+            stream=True,
+            timeout=(10, OLLAMA_STREAM_IDLE_TIMEOUT)
+        )
+        try:
+            response.raise_for_status()
+            for event, data in ollama_stream_events(response.iter_lines()):
+                if event == 'done' and conversation_id and data.get('context'):
+                    self.gateway.contexts.put(model, conversation_id, data['context'])
+                yield event, data
+        finally:
+            response.close()
+    
+    @staticmethod
+    def _busy_result(error):
+        """Result of a request the model gateway did not run"""
+        return {
+            'success': False,
+            'error': str(error),
+            'error_code': 'MODEL_BUSY',
+            'retry_after': error.retry_after
+        }
+    
     def call_bitnet(self, prompt, options=None):
         """Call BitNet B1.58 model"""
         try:
@@ -186,7 +260,9 @@ class ChatService:
                     'conversational': True
                 }
             
-            result = bitnet_service.generate_response(prompt, options)
+            with self.gateway.submit(BITNET_MODEL) as ticket:
+                options = {**options, 'timeout': min(options.get('timeout', 120), max(1, int(ticket.remaining())))}
+                result = bitnet_service.generate_response(prompt, options)
             
             return {
                 'success': result.get('success', True),
@@ -198,6 +274,9 @@ class ChatService:
                 'error': result.get('error')
             }
             
+        except GatewayError as e:
+            logger.warning(f"BitNet request not admitted: {e}")
+            return self._busy_result(e)
         except Exception as e:
             logger.error(f"BitNet call error: {e}")
             return {
@@ -295,42 +374,42 @@ class ChatService:
             # Fallback to simple text search
             return self._simple_text_search(query)
     
-    def _simple_text_search(self, query):
-        """Fallback simple text search in RAG directory"""
-        try:
-            results = []
-            
-            # Simple text search in RAG directory
-            for file_path in self.rag_dir.rglob('*.txt'):
+    def _get_lexical_index(self):
+        """BM25 index written by the RAG ingestion pipeline, or None"""
+        if self.lexical_index is None and LEXICAL_INDEX_AVAILABLE:
+            if RAG_AVAILABLE:
                 try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                        if query.lower() in content.lower():
-                            results.append({
-                                'file': file_path.name,
-                                'path': str(file_path),
-                                'snippet': content[:500] + '...' if len(content) > 500 else content,
-                                'similarity': 0.5  # Default similarity for text search
-                            })
+                    self.lexical_index = get_rag_service().lexical_index
                 except Exception as e:
-                    logger.warning(f"Error reading file {file_path}: {e}")
+                    logger.warning(f"RAG service unavailable for lexical search: {e}")
+            if self.lexical_index is None:
+                # Same directory the RAG service writes for the configured backend
+                index_file = index_directory(os.getenv('RAG_PERSIST_DIR', './chromadb'),
+                                             os.getenv('RAG_VECTOR_BACKEND', 'chroma').lower()) / 'lexical_index.sqlite3'
+                if index_file.exists():
+                    self.lexical_index = LexicalIndex(index_file)
+        return self.lexical_index
+    
+    def _simple_text_search(self, query):
+        """Fallback keyword search (BM25 index, no file scanning)"""
+        try:
+            lexical_index = self._get_lexical_index()
+            if lexical_index is None:
+                logger.warning("No lexical index available for fallback search")
+                return []
             
-            # Search markdown files
-            for file_path in self.rag_dir.rglob('*.md'):
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                        if query.lower() in content.lower():
-                            results.append({
-                                'file': file_path.name,
-                                'path': str(file_path),
-                                'snippet': content[:500] + '...' if len(content) > 500 else content,
-                                'similarity': 0.5  # Default similarity for text search
-                            })
-                except Exception as e:
-                    logger.warning(f"Error reading file {file_path}: {e}")
+            results = []
+            for hit in lexical_index.search(query, limit=5):
+                content = hit['content']
+                results.append({
+                    'file': hit['source'].split('/')[-1],
+                    'path': hit['source'],
+                    'snippet': content[:500] + '...' if len(content) > 500 else content,
+                    'similarity': 0.5,  # Default similarity for text search
+                    'bm25_score': hit['bm25_score']
+                })
             
-            return results[:5]  # Return top 5 results
+            return results
             
         except Exception as e:
             logger.error(f"Simple text search error: {e}")
@@ -409,6 +488,165 @@ def get_available_models():
         logger.error(f"Models endpoint error: {e}")
         return jsonify({'error': f'Models error: {str(e)}'}), 500
 
+def prepare_chat_prompt(data):
+    """
+    Build the model prompt of a chat request (attached files, RAG or Smart Search context)
+
+    Shared by /api/chat and /api/chat/stream.
+
+    Raises:
+        ValueError: Neither a message nor files were sent
+    """
+    message = data.get('message', '').strip()
+    files = data.get('files', [])
+    use_rag = data.get('use_rag', True)
+    use_smart_search = data.get('use_smart_search', False)  # New smart search option
+    model = data.get('model', 'gemma3:270m')
+    tavily_api_key = data.get('tavily_api_key')  # Optional Tavily API key
+    
+    # Validate and normalize UTF-8 encoding for the message
+    if message:
+        utf8_validation = validate_utf8_text(message)
+        if not utf8_validation['valid']:
+            logger.warning(f"UTF-8 validation issues: {utf8_validation['issues']}")
+        else:
+            logger.info(f"UTF-8 validation passed, Korean chars: {utf8_validation['korean_char_count']}")
+        
+        # Use normalized text to ensure proper encoding
+        message = utf8_validation['normalized']
+    
+    # Map frontend model names to backend models
+    model_mapping = {
+        'Gemma 2B': 'gemma:2b',
+        'Gemma3 270M': 'gemma3:270m',
+        'gemma3:270m': 'gemma3:270m',
+        'GPT-OSS 20B': 'gpt-oss:20b',
+        'Qwen2.5 Coder 1.5B': 'qwen2.5-coder:1.5b',
+        'BitNet B1.58 2B': 'bitnet-b1.58:2b',
+        'bitnet_b1_58_2b': 'bitnet-b1.58:2b'
+    }
+    backend_model = model_mapping.get(model, model)
+    
+    logger.info(f"Message: '{message}', Files count: {len(files)}, Use RAG: {use_rag}, Model: {model} -> {backend_model}")
+    
+    if not message and not files:
+        logger.error("Neither message nor files provided")
+        raise ValueError('Message or files required')
+    
+    # Process uploaded files
+    processed_files = []
+    images = []
+    
+    for file_info in files:
+        if 'data' in file_info and 'name' in file_info:
+            processed = chat_service.process_file(
+                file_info['data'], 
+                file_info['name']
+            )
+            processed_files.append(processed)
+            
+            # If it's an image, add to images array for Ollama
+            if processed['type'] == 'image':
+                images.append(processed['base64'])
+    
+    # Build context from RAG documents or Smart Search
+    rag_context = ""
+    rag_results = []
+    search_info = {}
+    
+    if use_smart_search and message and SMART_SEARCH_AVAILABLE:
+        # Use Smart Search (LangChain + Tavily)
+        logger.info("Using Smart Search for context")
+        try:
+            smart_search_service = get_smart_search_service(tavily_api_key)
+            smart_result = smart_search_service.smart_search(message, max_results=5)
+            
+            search_info = {
+                'type': 'smart_search',
+                'route_used': smart_result['route_used'],
+                'search_time': smart_result['search_time'],
+                'total_results': smart_result['total_results']
+            }
+            
+            if smart_result['results']:
+                rag_context = f"\n\n=== Related Information (via {smart_result['route_used']}) ===\n"
+                for i, result in enumerate(smart_result['results'][:3], 1):
+                    source_type = result.source_type
+                    score_info = f" (Score: {result.score:.3f}, Source: {source_type})"
+                    rag_context += f"\n[Info {i}] {result.source}{score_info}\n"
+                    rag_context += f"Content: {result.content[:300]}{'...' if len(result.content) > 300 else ''}\n"
+                
+                rag_context += "\n=== Response Instructions ===\n"
+                rag_context += "Based on the above information, provide an accurate and detailed response. If information is not available in the sources, clearly state 'Not mentioned in available sources'.\n"
+                
+                # Convert to standard rag_results format for compatibility
+                rag_results = []
+                for result in smart_result['results']:
+                    rag_results.append({
+                        'content': result.content,
+                        'source': result.source,
+                        'similarity': result.score,
+                        'source_type': result.source_type,
+                        'metadata': result.metadata
+                    })
+                    
+        except Exception as e:
+            logger.error(f"Smart search error: {e}")
+            # Fallback to regular RAG
+            use_rag = True
+            use_smart_search = False
+            
+    if use_rag and message and not use_smart_search:
+        # Use traditional RAG
+        logger.info("Using traditional RAG for context")
+        search_info = {'type': 'traditional_rag'}
+        rag_results = chat_service.search_rag_documents(message)
+        if rag_results:
+            # Build more structured RAG context with better formatting
+            rag_context = "\n\n=== 関連する参考資料 ===\n"
+            for i, result in enumerate(rag_results[:3], 1):  # Limit to top 3 for context window
+                similarity_score = f" (関連度: {result.get('similarity', 0):.1%})" if result.get('similarity') else ""
+                rag_context += f"\n[資料{i}] {result['file']}{similarity_score}\n"
+                rag_context += f"内容: {result['snippet'][:300]}{'...' if len(result['snippet']) > 300 else ''}\n"
+            
+            rag_context += "\n=== 回答指示 ===\n"
+            rag_context += "上記の参考資料を基に、正確で詳細な回答を提供してください。参考資料にない情報は推測せず、「参考資料には記載がありません」と明記してください。\n"
+    
+    # Build enhanced prompt with better structure
+    enhanced_prompt = message
+    
+    if rag_context:
+        enhanced_prompt = f"{rag_context}\n\n=== ユーザーの質問 ===\n{message}\n\n=== 回答 ==="
+    
+    if processed_files:
+        files_info = "\n\n添付ファイル:\n"
+        for file_info in processed_files:
+            files_info += f"- {file_info['description']}\n"
+            if file_info['type'] in ['text', 'markdown'] and 'content' in file_info:
+                files_info += f"  内容: {file_info['content'][:200]}...\n"
+        enhanced_prompt += files_info
+    
+    return {
+        'message': message,
+        'backend_model': backend_model,
+        'enhanced_prompt': enhanced_prompt,
+        'images': images,
+        'processed_files': processed_files,
+        'rag_results': rag_results if (use_rag or use_smart_search) else [],
+        'search_info': search_info if use_smart_search else {}
+    }
+
+def model_busy_response(error, retry_after):
+    """429 for a request the model gateway rejected or dropped"""
+    response = jsonify({
+        'error': error,
+        'error_code': 'MODEL_BUSY',
+        'retry_after': retry_after,
+        'suggestion': 'The model is busy, please retry shortly.'
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Main chat endpoint with multimodal support"""
@@ -439,137 +677,17 @@ def chat():
         logger.info(f"Received data keys: {list(data.keys())}")
         logger.info(f"Full data: {data}")
         
-        message = data.get('message', '').strip()
-        files = data.get('files', [])
-        use_rag = data.get('use_rag', True)
-        use_smart_search = data.get('use_smart_search', False)  # New smart search option
-        model = data.get('model', 'gemma3:270m')
-        tavily_api_key = data.get('tavily_api_key')  # Optional Tavily API key
-        
-        # Validate and normalize UTF-8 encoding for the message
-        if message:
-            utf8_validation = validate_utf8_text(message)
-            if not utf8_validation['valid']:
-                logger.warning(f"UTF-8 validation issues: {utf8_validation['issues']}")
-            else:
-                logger.info(f"UTF-8 validation passed, Korean chars: {utf8_validation['korean_char_count']}")
-            
-            # Use normalized text to ensure proper encoding
-            message = utf8_validation['normalized']
-        
-        # Map frontend model names to backend models
-        model_mapping = {
-            'Gemma 2B': 'gemma:2b',
-            'Gemma3 270M': 'gemma3:270m',
-            'gemma3:270m': 'gemma3:270m',
-            'GPT-OSS 20B': 'gpt-oss:20b',
-            'Qwen2.5 Coder 1.5B': 'qwen2.5-coder:1.5b',
-            'BitNet B1.58 2B': 'bitnet-b1.58:2b',
-            'bitnet_b1_58_2b': 'bitnet-b1.58:2b'
-        }
-        backend_model = model_mapping.get(model, model)
-        
-        logger.info(f"Message: '{message}', Files count: {len(files)}, Use RAG: {use_rag}, Model: {model} -> {backend_model}")
-        
-        if not message and not files:
-            logger.error("Neither message nor files provided")
-            return jsonify({'error': 'Message or files required'}), 400
-        
-        # Process uploaded files
-        processed_files = []
-        images = []
-        
-        for file_info in files:
-            if 'data' in file_info and 'name' in file_info:
-                processed = chat_service.process_file(
-                    file_info['data'], 
-                    file_info['name']
-                )
-                processed_files.append(processed)
-                
-                # If it's an image, add to images array for Ollama
-                if processed['type'] == 'image':
-                    images.append(processed['base64'])
-        
-        # Build context from RAG documents or Smart Search
-        rag_context = ""
-        rag_results = []
-        search_info = {}
-        
-        if use_smart_search and message and SMART_SEARCH_AVAILABLE:
-            # Use Smart Search (LangChain + Tavily)
-            logger.info("Using Smart Search for context")
-            try:
-                smart_search_service = get_smart_search_service(tavily_api_key)
-                smart_result = smart_search_service.smart_search(message, max_results=5)
-                
-                search_info = {
-                    'type': 'smart_search',
-                    'route_used': smart_result['route_used'],
-                    'search_time': smart_result['search_time'],
-                    'total_results': smart_result['total_results']
-                }
-                
-                if smart_result['results']:
-                    rag_context = f"\n\n=== Related Information (via {smart_result['route_used']}) ===\n"
-                    for i, result in enumerate(smart_result['results'][:3], 1):
-                        source_type = result.source_type
-                        score_info = f" (Score: {result.score:.3f}, Source: {source_type})"
-                        rag_context += f"\n[Info {i}] {result.source}{score_info}\n"
-                        rag_context += f"Content: {result.content[:300]}{'...' if len(result.content) > 300 else ''}\n"
-                    
-                    rag_context += "\n=== Response Instructions ===\n"
-                    rag_context += "Based on the above information, provide an accurate and detailed response. If information is not available in the sources, clearly state 'Not mentioned in available sources'.\n"
-                    
-                    # Convert to standard rag_results format for compatibility
-                    rag_results = []
-                    for result in smart_result['results']:
-                        rag_results.append({
-                            'content': result.content,
-                            'source': result.source,
-                            'similarity': result.score,
-                            'source_type': result.source_type,
-                            'metadata': result.metadata
-                        })
-                        
-            except Exception as e:
-                logger.error(f"Smart search error: {e}")
-                # Fallback to regular RAG
-                use_rag = True
-                use_smart_search = False
-                
-        if use_rag and message and not use_smart_search:
-            # Use traditional RAG
-            logger.info("Using traditional RAG for context")
-            search_info = {'type': 'traditional_rag'}
-            rag_results = chat_service.search_rag_documents(message)
-            if rag_results:
-                # Build more structured RAG context with better formatting
-                rag_context = "\n\n=== 関連する参考資料 ===\n"
-                for i, result in enumerate(rag_results[:3], 1):  # Limit to top 3 for context window
-                    similarity_score = f" (関連度: {result.get('similarity', 0):.1%})" if result.get('similarity') else ""
-                    rag_context += f"\n[資料{i}] {result['file']}{similarity_score}\n"
-                    rag_context += f"内容: {result['snippet'][:300]}{'...' if len(result['snippet']) > 300 else ''}\n"
-                
-                rag_context += "\n=== 回答指示 ===\n"
-                rag_context += "上記の参考資料を基に、正確で詳細な回答を提供してください。参考資料にない情報は推測せず、「参考資料には記載がありません」と明記してください。\n"
-        
-        # Build enhanced prompt with better structure
-        enhanced_prompt = message
-        
-        if rag_context:
-            enhanced_prompt = f"{rag_context}\n\n=== ユーザーの質問 ===\n{message}\n\n=== 回答 ==="
-        
-        if processed_files:
-            files_info = "\n\n添付ファイル:\n"
-            for file_info in processed_files:
-                files_info += f"- {file_info['description']}\n"
-                if file_info['type'] in ['text', 'markdown'] and 'content' in file_info:
-                    files_info += f"  内容: {file_info['content'][:200]}...\n"
-            enhanced_prompt += files_info
+        try:
+            prepared = prepare_chat_prompt(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        backend_model = prepared['backend_model']
+        enhanced_prompt = prepared['enhanced_prompt']
+        images = prepared['images']
+        processed_files = prepared['processed_files']
         
         # Route to appropriate model service
-        if backend_model == 'bitnet-b1.58:2b':
+        if backend_model == BITNET_MODEL:
             # Use BitNet service with increased timeout for complex inference
             options = {
                 'temperature': 0.7,
@@ -581,7 +699,8 @@ def chat():
             result = chat_service.call_bitnet(enhanced_prompt, options)
             
             # Enhanced timeout error handling
-            if not result['success'] and 'timeout' in result.get('error', '').lower():
+            if (not result['success'] and result.get('error_code') != 'MODEL_BUSY'
+                    and 'timeout' in (result.get('error') or '').lower()):
                 logger.error(f"BitNet inference timeout after {options['timeout']} seconds")
                 return jsonify({
                     'error': f'BitNet 모델 추론이 시간 초과되었습니다 ({options["timeout"]}초). 더 짧은 질문을 시도하거나 잠시 후 다시 시도해주세요.',
@@ -593,14 +712,18 @@ def chat():
             result = chat_service.call_ollama(
                 prompt=enhanced_prompt,
                 model=backend_model,
-                images=images if images else None
+                images=images if images else None,
+                conversation_id=data.get('conversation_id')
             )
         
+        if result.get('error_code') == 'MODEL_BUSY':
+            return model_busy_response(result['error'], result['retry_after'])
+        
         if result['success']:
             response_data = {
                 'response': result['response'],
                 'processed_files': processed_files,
-                'rag_results': rag_results if (use_rag or use_smart_search) else [],
+                'rag_results': prepared['rag_results'],
                 'context': result.get('context'),
                 'model_info': result.get('model_info'),
                 'inference_time': result.get('inference_time'),
@@ -608,8 +731,8 @@ def chat():
             }
             
             # Add Smart Search specific information
-            if use_smart_search and search_info:
-                response_data['search_info'] = search_info
+            if prepared['search_info']:
+                response_data['search_info'] = prepared['search_info']
                 
             return jsonify(response_data)
         else:
@@ -631,6 +754,83 @@ def chat():
         logger.error(f"Full traceback: {traceback.format_exc()}")
         return jsonify({'error': f'Server error: {str(e)}', 'traceback': traceback.format_exc()}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Chat endpoint streaming the response as server-sent events"""
+    try:
+        data = request.get_json(force=True, silent=False)
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        
+        try:
+            prepared = prepare_chat_prompt(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        backend_model = prepared['backend_model']
+        if backend_model == BITNET_MODEL and not BITNET_AVAILABLE:
+            return jsonify({'error': 'BitNet service not available'}), 503
+        
+        # Reject early (429) when the model is saturated; otherwise the
+        # request waits in the gateway queue inside the stream
+        try:
+            ticket = model_gateway.submit(backend_model)
+        except GatewayError as e:
+            logger.warning(f"Chat stream not admitted: {e}")
+            return model_busy_response(str(e), e.retry_after)
+        
+        def wait_for_model():
+            if ticket.state == ticket.QUEUED:
+                yield 'queued', {'queue_depth': model_gateway.queue_depth(backend_model)}
+            ticket.wait()
+        
+        if backend_model == BITNET_MODEL:
+            # BitNet runs llama-cli to completion; the answer is sent as one token
+            def generate():
+                yield from wait_for_model()
+                result = bitnet_service.generate_response(prepared['enhanced_prompt'], {
+                    'temperature': 0.7,
+                    'threads': 4,
+                    'timeout': min(120, max(1, int(ticket.remaining()))),
+                    'conversational': True
+                })
+                if not result.get('success', True):
+                    raise RuntimeError(result.get('error') or 'BitNet inference failed')
+                yield 'token', {'text': result.get('response', '')}
+                yield 'done', {
+                    'model_info': result.get('model', 'BitNet B1.58 2B'),
+                    'inference_time': result.get('inference_time'),
+                    'tokens_per_second': result.get('tokens_per_second')
+                }
+        else:
+            def generate():
+                yield from wait_for_model()
+                yield from chat_service.stream_ollama(
+                    prompt=prepared['enhanced_prompt'],
+                    model=backend_model,
+                    context=data.get('context'),
+                    images=prepared['images'] or None,
+                    conversation_id=data.get('conversation_id')
+                )
+        
+        start = {
+            'model': backend_model,
+            'processed_files': prepared['processed_files'],
+            'rag_results': prepared['rag_results'],
+            'search_info': prepared['search_info']
+        }
+        response = Response(
+            stream_events(start, generate, on_close=ticket.release),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        # Also release the ticket if the client is gone before the stream starts
+        response.call_on_close(ticket.release)
+        return response
+        
+    except Exception as e:
+        logger.error(f"Chat stream endpoint error: {e}")
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
 @app.route('/api/rag/upload', methods=['POST'])
 def upload_rag_document():
     """Upload document to RAG directory and auto-index"""
@@ -737,19 +937,22 @@ def index_rag_documents():
         data = request.get_json() or {}
         directory_path = data.get('directory', RAG_DIR)
         file_types = data.get('file_types', ['.txt', '.md', '.pdf', '.json'])
+        force = bool(data.get('force', False))
         
         rag_service = get_rag_service()
         
-        # Index documents from directory
+        # Index documents from directory (unchanged files are skipped unless forced)
         results = rag_service.load_documents_from_directory(
             directory_path=directory_path,
-            file_types=file_types
+            file_types=file_types,
+            force=force
         )
         
         return jsonify({
             'success': True,
             'results': results,
-            'message': f'Indexed {results["total_chunks"]} chunks from {len(results["processed_files"])} files'
+            'message': (f'Indexed {results["total_chunks"]} chunks from {len(results["processed_files"])} files'
+                        f' ({results["unchanged_files"]} unchanged)')
         })
         
     except Exception as e:
@@ -774,6 +977,7 @@ def search_rag_documents():
         file_types = data.get('file_types')  # List of file extensions
         date_range = data.get('date_range')  # {'start': timestamp, 'end': timestamp}
         sort_by = data.get('sort_by', 'similarity')  # 'similarity', 'date', 'source', 'size'
+        retrieval = data.get('retrieval', 'hybrid')  # 'hybrid', 'vector', 'lexical' (or 'keyword')
         
         rag_service = get_rag_service()
         
@@ -784,7 +988,8 @@ def search_rag_documents():
             min_score=min_score,
             file_types=file_types,
             date_range=date_range,
-            sort_by=sort_by
+            sort_by=sort_by,
+            retrieval=retrieval
         )
         
         return jsonify({
@@ -796,7 +1001,8 @@ def search_rag_documents():
                 'file_types': file_types,
                 'date_range': date_range,
                 'sort_by': sort_by,
-                'min_score': min_score
+                'min_score': min_score,
+                'retrieval': retrieval
             }
         })
         
@@ -1155,13 +1361,13 @@ def remove_watch_directory(directory):
 
 @app.route('/api/rag/performance', methods=['GET'])
 def get_performance_stats():
-    """Get RAG performance statistics"""
-    if not RAG_AVAILABLE:
-        return jsonify({'error': 'RAG service not available'}), 503
-    
+    """Get RAG performance statistics and model gateway queue metrics"""
     try:
-        rag_service = get_rag_service()
-        stats = rag_service.get_performance_stats()
+        if RAG_AVAILABLE:
+            stats = get_rag_service().get_performance_stats()
+        else:
+            stats = {'error': 'RAG service not available'}
+        stats['model_gateway'] = model_gateway.stats()
         
         return jsonify({
             'success': True,
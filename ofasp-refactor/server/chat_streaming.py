@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chat Streaming
+Server-sent events for streamed model output
+
+/api/chat waits for the whole completion before answering, which holds a
+worker for up to two minutes per message. /api/chat/stream asks the model
+server for a streamed generation and forwards every token to the browser
+as a server-sent event the moment it arrives:
+
+    event: start   request accepted (model, RAG results, attached files)
+    event: queued  waiting for the model (see model_gateway)
+    event: token   {"text": "..."} for each generated piece
+    event: done    final statistics and the Ollama context for follow-ups
+    event: error   generation failed after the stream started
+
+When the browser goes away the WSGI server closes the response generator;
+closing it closes the upstream HTTP response, which makes Ollama stop
+generating, and gives the model slot back.
+"""
+
+import json
+import time
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+def format_sse(event: str, data: Any) -> str:
+    """One server-sent event (data is sent as JSON)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def ollama_stream_events(lines: Iterable[Union[bytes, str]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Events of an Ollama /api/generate stream (one JSON object per line)
+
+    Yields:
+        ('token', {'text'}) for each piece of output, then
+        ('done', {'context', 'eval_count', 'inference_time', 'tokens_per_second'})
+
+    Raises:
+        RuntimeError: Ollama reported an error inside the stream
+    """
+    for line in lines:
+        if not line:
+            continue
+        chunk = json.loads(line)
+        if chunk.get('error'):
+            raise RuntimeError(chunk['error'])
+        if chunk.get('response'):
+            yield 'token', {'text': chunk['response']}
+        if chunk.get('done'):
+            eval_count = chunk.get('eval_count', 0)
+            eval_seconds = chunk.get('eval_duration', 0) / 1e9
+            yield 'done', {
+                'context': chunk.get('context'),
+                'eval_count': eval_count,
+                'inference_time': chunk.get('total_duration', 0) / 1e9,
+                'tokens_per_second': eval_count / eval_seconds if eval_seconds else 0.0
+            }
+            return
+
+
+def stream_events(start: Dict[str, Any],
+                  generate: Callable[[], Iterable[Tuple[str, Dict[str, Any]]]],
+                  on_close: Optional[Callable[[], None]] = None) -> Iterator[str]:
+    """
+    SSE body of one streamed chat response
+
+    Args:
+        start: Data of the 'start' event (sent before the model is called)
+        generate: Opens the model stream; returns (event, data) pairs
+        on_close: Called once when the stream ends, fails or is abandoned
+
+    Yields:
+        str: Formatted events
+    """
+    started = time.time()
+    first_token = None
+    events = None
+    try:
+        yield format_sse('start', start)
+        events = iter(generate())
+        for event, data in events:
+            if event == 'token' and first_token is None:
+                first_token = time.time() - started
+            if event == 'done':
+                data = {**data, 'time_to_first_token': first_token}
+            yield format_sse(event, data)
+    except GeneratorExit:
+        logger.info(f"Chat stream cancelled by client after {time.time() - started:.1f}s")
+        raise
+    except Exception as e:
+        logger.error(f"Chat stream error: {e}")
+        yield format_sse('error', {'error': str(e)})
+    finally:
+        if hasattr(events, 'close'):
+            events.close()  # closes the upstream response, which stops generation
+        if on_close:
+            on_close()
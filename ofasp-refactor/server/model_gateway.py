@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Model Gateway
+Admission control and scheduling in front of the local LLM backends
+
+Ollama and BitNet run on the same machine as the API. When more users chat
+than the model server can serve, every extra request slows all the others
+down until they all time out together. Every generation now passes this
+gateway first:
+
+    max in-flight   Each model runs at most N generations at once (BitNet,
+                    a CPU-bound subprocess, defaults to one).
+    bounded queue   Further requests wait in a per-model queue of at most
+                    max_queue entries and are started earliest deadline
+                    first.
+    early reject    A request is rejected at once, with a retry-after hint,
+                    when the queue is full or when the expected wait plus
+                    the average generation time would already miss its
+                    deadline. A request whose deadline passes while queued
+                    is dropped instead of being started too late to matter.
+
+The gateway also remembers the Ollama context (the encoded conversation
+so far) by conversation id. Follow-up messages pass it back, so Ollama
+continues from its cached state instead of re-reading the whole history.
+Whoever knows a conversation id can continue that conversation, so only
+random ids (chat-<UUID or 32 hex digits>, 128 bits) are used as keys.
+"""
+
+import re
+import math
+import time
+import heapq
+import itertools
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT = 2
+DEFAULT_MAX_QUEUE = 8
+DEFAULT_DEADLINE = 120.0  # seconds from submission
+EWMA_ALPHA = 0.2
+
+CONVERSATION_ID_PATTERN = re.compile(
+    r'chat-(?:[0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})')
+
+
+class GatewayError(Exception):
+    """A request was not run; retry_after is a hint in seconds"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GatewaySaturated(GatewayError):
+    """Rejected on submission (queue full or deadline cannot be met)"""
+
+
+class GatewayTimeout(GatewayError):
+    """The deadline passed while the request was queued"""
+
+
+def parse_model_limits(spec: Optional[str]) -> Dict[str, int]:
+    """Parse 'model=limit,model=limit' (e.g. 'gpt-oss:20b=1,gemma3:270m=4')"""
+    limits = {}
+    for item in (spec or '').split(','):
+        model, sep, limit = item.strip().rpartition('=')
+        if not sep or not model:
+            continue
+        try:
+            limits[model.strip()] = max(1, int(limit))
+        except ValueError:
+            logger.warning(f"Ignoring invalid model concurrency limit: {item}")
+    return limits
+
+
+def is_conversation_id(value: Any) -> bool:
+    """True for an unguessable client conversation id (see module docstring)"""
+    return isinstance(value, str) and CONVERSATION_ID_PATTERN.fullmatch(value) is not None
+
+
+class ConversationContexts:
+    """
+    LRU of Ollama contexts by (model, conversation id), with expiry
+
+    Ids that are not unguessable (is_conversation_id) are never stored or
+    looked up.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 1800.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model: str, conversation_id: str) -> Optional[List[int]]:
+        if not is_conversation_id(conversation_id):
+            return None
+        key = (model, conversation_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[1] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, model: str, conversation_id: str, context: List[int]):
+        if not is_conversation_id(conversation_id):
+            return
+        key = (model, conversation_id)
+        with self._lock:
+            self._entries[key] = (context, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def drop(self, conversation_id: str):
+        """Forget a conversation (all models)"""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == conversation_id]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class Ticket:
+    """One request's place in the gateway (queued, running, then finished)"""
+
+    QUEUED, RUNNING, FINISHED = 'queued', 'running', 'finished'
+
+    def __init__(self, gateway: 'ModelGateway', model: str, deadline: float):
+        self.model = model
+        self.deadline = deadline
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.state = self.QUEUED
+        self._gateway = gateway
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline"""
+        return self.deadline - time.time()
+
+    def wait(self) -> 'Ticket':
+        """Block until the request may run; raises GatewayTimeout at the deadline"""
+        self._gateway._wait(self)
+        return self
+
+    def release(self):
+        """Finish (or abandon) the request; idempotent"""
+        self._gateway._release(self)
+
+    def __enter__(self):
+        return self.wait()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class _ModelState:
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.queued = 0
+        self.heap: List[tuple] = []
+        self.avg_service_time: Optional[float] = None
+        self.avg_queue_wait = 0.0
+        self.counters = {'submitted': 0, 'completed': 0, 'rejected': 0, 'expired': 0, 'cancelled': 0}
+
+
+class ModelGateway:
+    """Per-model bounded queues and in-flight limits with deadline-aware scheduling"""
+
+    def __init__(self, default_max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 limits: Optional[Dict[str, int]] = None,
+                 max_queue: int = DEFAULT_MAX_QUEUE,
+                 default_deadline: float = DEFAULT_DEADLINE,
+                 contexts: Optional[ConversationContexts] = None):
+        """
+        Args:
+            default_max_in_flight: Concurrent generations of models without a limit
+            limits: Concurrent generations per model name
+            max_queue: Requests waiting per model before new ones are rejected
+            default_deadline: Seconds a request may take (queueing included)
+            contexts: Conversation context store
+        """
+        self.default_max_in_flight = default_max_in_flight
+        self.limits = dict(limits or {})
+        self.max_queue = max_queue
+        self.default_deadline = default_deadline
+        self.contexts = contexts or ConversationContexts()
+        self._condition = threading.Condition()
+        self._models: Dict[str, _ModelState] = {}
+        self._sequence = itertools.count()
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = _ModelState(self.limits.get(model, self.default_max_in_flight))
+        return state
+
+    def _estimated_wait(self, state: _ModelState, position: int) -> float:
+        """Seconds until the request at queue position (0-based) should start"""
+        if state.in_flight + position < state.max_in_flight:
+            return 0.0
+        service = state.avg_service_time or 0.0
+        return (position // state.max_in_flight + 1) * service
+
+    def _retry_after(self, state: _ModelState) -> int:
+        return max(1, min(60, math.ceil(self._estimated_wait(state, state.queued))))
+
+    def submit(self, model: str, deadline: Optional[float] = None) -> Ticket:
+        """
+        Admit a request for model
+
+        Args:
+            model: Backend model name
+            deadline: Absolute time (time.time()) by which the answer is needed
+
+        Returns:
+            Ticket: Already running when a slot was free, otherwise queued
+
+        Raises:
+            GatewaySaturated: The queue is full or the deadline cannot be met
+        """
+        now = time.time()
+        deadline = deadline if deadline is not None else now + self.default_deadline
+        with self._condition:
+            state = self._state(model)
+            state.counters['submitted'] += 1
+            ticket = Ticket(self, model, deadline)
+            if state.in_flight < state.max_in_flight and state.queued == 0:
+                self._start(state, ticket, now)
+                return ticket
+
+            if state.queued >= self.max_queue:
+                state.counters['rejected'] += 1
+                raise GatewaySaturated(f"Model {model} is busy ({state.queued} requests queued)",
+                                       self._retry_after(state))
+            expected_finish = now + self._estimated_wait(state, state.queued) + (state.avg_service_time or 0.0)
+            if state.avg_service_time is not None and expected_finish > deadline:
+                state.counters['rejected'] += 1
+                raise GatewaySaturated(f"Model {model} cannot answer before the deadline",
+                                       self._retry_after(state))
+
+            state.queued += 1
+            heapq.heappush(state.heap, (deadline, next(self._sequence), ticket))
+            return ticket
+
+    def run(self, model: str, fn: Callable[[Ticket], Any], deadline: Optional[float] = None) -> Any:
+        """submit(), wait for a slot, return fn(ticket) and release"""
+        with self.submit(model, deadline) as ticket:
+            return fn(ticket)
+
+    def _start(self, state: _ModelState, ticket: Ticket, now: float):
+        """Move a ticket to running (lock held)"""
+        ticket.state = Ticket.RUNNING
+        ticket.started_at = now
+        state.in_flight += 1
+        wait = now - ticket.submitted_at
+        state.avg_queue_wait += EWMA_ALPHA * (wait - state.avg_queue_wait)
+
+    def _dispatch(self, state: _ModelState):
+        """Start queued tickets, earliest deadline first, while slots are free (lock held)"""
+        now = time.time()
+        while state.heap and state.in_flight < state.max_in_flight:
+            _deadline, _seq, ticket = heapq.heappop(state.heap)
+            if ticket.state != Ticket.QUEUED:
+                continue  # cancelled or expired while queued
+            state.queued -= 1
+            if ticket.deadline <= now:
+                ticket.state = Ticket.FINISHED
+                state.counters['expired'] += 1
+                continue
+            self._start(state, ticket, now)
+        self._condition.notify_all()
+
+    def _wait(self, ticket: Ticket):
+        with self._condition:
+            state = self._state(ticket.model)
+            while ticket.state == Ticket.QUEUED:
+                remaining = ticket.deadline - time.time()
+                if remaining <= 0:
+                    ticket.state = Ticket.FINISHED
+                    state.queued -= 1
+                    state.counters['expired'] += 1
+                    break
+                self._condition.wait(remaining)
+            if ticket.state != Ticket.RUNNING:
+                raise GatewayTimeout(f"Request for {ticket.model} expired while queued",
+                                     self._retry_after(state))
+
+    def _release(self, ticket: Ticket):
+        with self._condition:
+            state = self._state(ticket.model)
+            if ticket.state == Ticket.QUEUED:
+                ticket.state = Ticket.FINISHED
+                state.queued -= 1
+                state.counters['cancelled'] += 1
+            elif ticket.state == Ticket.RUNNING:
+                ticket.state = Ticket.FINISHED
+                state.in_flight -= 1
+                state.counters['completed'] += 1
+                service = time.time() - ticket.started_at
+                if state.avg_service_time is None:
+                    state.avg_service_time = service
+                else:
+                    state.avg_service_time += EWMA_ALPHA * (service - state.avg_service_time)
+            else:
+                return
+            self._dispatch(state)
+
+    def queue_depth(self, model: str) -> int:
+        """Requests of model waiting for a slot"""
+        with self._condition:
+            return self._state(model).queued
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, in-flight generations and timings per model"""
+        with self._condition:
+            models = {
+                model: {
+                    'queue_depth': state.queued,
+                    'in_flight': state.in_flight,
+                    'max_in_flight': state.max_in_flight,
+                    'avg_service_time': round(state.avg_service_time or 0.0, 3),
+                    'avg_queue_wait': round(state.avg_queue_wait, 3),
+                    **state.counters
+                }
+                for model, state in self._models.items()
+            }
+        return {
+            'models': models,
+            'max_queue': self.max_queue,
+            'default_deadline': self.default_deadline,
+            'conversation_contexts': self.contexts.stats()
+        }
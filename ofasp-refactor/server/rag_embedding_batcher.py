@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RAG Embedding Batcher
+Micro-batches query embeddings from concurrent requests
+
+Every search used to call encode([query]) on its own request thread, so
+concurrent users serialized on the model one text at a time. Requests now
+put their texts on a queue and wait on a future. A single worker thread
+takes the first queued text, collects whatever else arrives within the batch
+window (a few milliseconds) or until max_batch_size texts are queued, and
+encodes them with one call. Requests that arrive while a batch is being
+encoded form the next batch, so under load batches grow without any extra
+waiting.
+"""
+
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_WINDOW = 0.005  # seconds
+DEFAULT_MAX_BATCH_SIZE = 64
+
+# Upper bounds of the batch size histogram buckets (larger batches count as '>32')
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+
+class EmbeddingBatcher:
+    """Collects concurrent encode requests into batched model calls"""
+
+    def __init__(self, encode: Callable[[List[str]], List[List[float]]],
+                 batch_window: float = DEFAULT_BATCH_WINDOW,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE):
+        """
+        Args:
+            encode: encode(texts) -> vectors (one model call)
+            batch_window: Seconds to wait for more texts after the first one
+            max_batch_size: Texts per model call
+        """
+        self._encode = encode
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._metrics = {
+            'requests': 0,
+            'batched_requests': 0,
+            'batches': 0,
+            'texts_encoded': 0,
+            'max_queue_depth': 0,
+            'total_wait_time': 0.0,
+            'total_encode_time': 0.0,
+            'errors': 0
+        }
+        self._histogram = {f'<={bucket}': 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._histogram[f'>{BATCH_SIZE_BUCKETS[-1]}'] = 0
+
+    def submit(self, text: str) -> Future:
+        """Queue one text; the future resolves to its vector"""
+        future = Future()
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("Embedding batcher is stopped")
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._metrics['requests'] += 1
+            self._queue.put((text, future, time.time()))
+            depth = self._queue.qsize()
+            if depth > self._metrics['max_queue_depth']:
+                self._metrics['max_queue_depth'] = depth
+        return future
+
+    def encode(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        """Embed texts through the shared batches (blocks the calling thread)"""
+        futures = [self.submit(text) for text in texts]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def stop(self):
+        """Stop accepting texts; queued texts are still encoded"""
+        with self._lock:
+            self._stopped = True
+            thread = self._thread
+        if thread and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.time()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # finish this batch, then stop
+                    break
+                batch.append(item)
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch: List[tuple]):
+        """Encode one batch (identical texts once) and resolve its futures"""
+        started = time.time()
+        positions: Dict[str, List[Future]] = {}
+        for text, future, _queued_at in batch:
+            positions.setdefault(text, []).append(future)
+        texts = list(positions)
+        try:
+            vectors = self._encode(texts)
+        except Exception as e:
+            logger.error(f"Batched embedding of {len(texts)} texts failed: {e}")
+            with self._lock:
+                self._metrics['errors'] += 1
+            for _text, future, _queued_at in batch:
+                future.set_exception(e)
+            return
+
+        finished = time.time()
+        for text, vector in zip(texts, vectors):
+            for future in positions[text]:
+                future.set_result(vector)
+
+        with self._lock:
+            metrics = self._metrics
+            metrics['batches'] += 1
+            metrics['batched_requests'] += len(batch)
+            metrics['texts_encoded'] += len(texts)
+            metrics['total_wait_time'] += sum(started - queued_at for _text, _future, queued_at in batch)
+            metrics['total_encode_time'] += finished - started
+            for bucket in BATCH_SIZE_BUCKETS:
+                if len(batch) <= bucket:
+                    self._histogram[f'<={bucket}'] += 1
+                    break
+            else:
+                self._histogram[f'>{BATCH_SIZE_BUCKETS[-1]}'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and batch size metrics"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            histogram = dict(self._histogram)
+        batches = metrics['batches']
+        batched = metrics['batched_requests']
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': metrics['max_queue_depth'],
+            'requests': metrics['requests'],
+            'batches': batches,
+            'texts_encoded': metrics['texts_encoded'],
+            'avg_batch_size': round(batched / batches, 2) if batches else 0.0,
+            'batch_size_histogram': histogram,
+            'avg_queue_wait_ms': round(metrics['total_wait_time'] * 1000 / batched, 3) if batched else 0.0,
+            'avg_encode_ms': round(metrics['total_encode_time'] * 1000 / batches, 3) if batches else 0.0,
+            'errors': metrics['errors'],
+            'batch_window_ms': self.batch_window * 1000,
+            'max_batch_size': self.max_batch_size
+        }
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RAG Embedding Cache
+Bounded, optionally persistent cache of text embeddings
+
+Entries are keyed by (model name, SHA-256 of the text), so vectors of
+different embedding models never mix and the key does not hold the text.
+Memory holds at most max_entries vectors in an LRU order (O(1) lookup and
+eviction). Vectors are stored compactly:
+
+    float32   4 bytes per dimension, exact
+    float16   2 bytes per dimension (default); ~1e-3 relative error, which
+              does not change cosine rankings in practice
+    int8      1 byte per dimension plus one float32 scale (max-abs scalar
+              quantization)
+
+With a persist path the cache writes through to a SQLite file, so a restart
+keeps the embeddings of frequently repeated queries. The file is trimmed to
+max_persisted entries by last use.
+"""
+
+import time
+import array
+import struct
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DTYPES = ('float32', 'float16', 'int8')
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_PERSISTED = 200000
+
+
+def pack_vector(vector: Sequence[float], dtype: str) -> bytes:
+    """Serialize a vector in the given storage dtype"""
+    if dtype == 'float32':
+        return struct.pack(f'<{len(vector)}f', *vector)
+    if dtype == 'float16':
+        return struct.pack(f'<{len(vector)}e', *vector)
+    if dtype == 'int8':
+        scale = max((abs(value) for value in vector), default=0.0) / 127.0 or 1.0
+        quantized = array.array('b', (max(-127, min(127, round(value / scale))) for value in vector))
+        return struct.pack('<f', scale) + quantized.tobytes()
+    raise ValueError(f"Unknown embedding cache dtype: {dtype}")
+
+
+def unpack_vector(data: bytes, dtype: str) -> List[float]:
+    """Inverse of pack_vector"""
+    if dtype == 'float32':
+        return list(struct.unpack(f'<{len(data) // 4}f', data))
+    if dtype == 'float16':
+        return list(struct.unpack(f'<{len(data) // 2}e', data))
+    if dtype == 'int8':
+        scale = struct.unpack_from('<f', data)[0]
+        return [value * scale for value in array.array('b', data[4:])]
+    raise ValueError(f"Unknown embedding cache dtype: {dtype}")
+
+
+class EmbeddingCache:
+    """LRU embedding cache with compact vectors and optional SQLite persistence"""
+
+    def __init__(self, model_name: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 persist_path: Optional[str] = None, dtype: str = 'float16',
+                 max_persisted: int = DEFAULT_MAX_PERSISTED):
+        """
+        Args:
+            model_name: Embedding model name (part of every key)
+            max_entries: Vectors kept in memory
+            persist_path: SQLite file; None keeps the cache in memory only
+            dtype: Storage dtype ('float32', 'float16' or 'int8')
+            max_persisted: Vectors kept on disk
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown embedding cache dtype: {dtype}")
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.dtype = dtype
+        self.max_persisted = max_persisted
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes_since_trim = 0
+        self.stats_counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        if persist_path:
+            self._open(Path(persist_path))
+
+    def _open(self, path: Path):
+        try:
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings ('
+                ' model TEXT NOT NULL, text_hash TEXT NOT NULL, dtype TEXT NOT NULL,'
+                ' vector BLOB NOT NULL, last_used REAL NOT NULL,'
+                ' PRIMARY KEY (model, text_hash))'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)')
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache persistence disabled ({path}): {e}")
+            self._db = None
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """Cached embedding of text, or None"""
+        key = self.text_hash(text)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.stats_counters['hits'] += 1
+                return unpack_vector(data, self.dtype)
+            data = self._load(key)
+            if data is None:
+                self.stats_counters['misses'] += 1
+                return None
+            self.stats_counters['disk_hits'] += 1
+            self._remember(key, data)
+        return unpack_vector(data, self.dtype)
+
+    def put(self, text: str, vector: Sequence[float]):
+        """Store the embedding of text"""
+        key = self.text_hash(text)
+        data = pack_vector(vector, self.dtype)
+        with self._lock:
+            self._remember(key, data)
+            self._store([(key, data)])
+
+    def get_or_compute(self, texts: List[str],
+                       encode: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Embeddings of texts; misses are encoded with one encode() call
+
+        Args:
+            texts: Texts to embed
+            encode: encode(missing_texts) -> vectors
+
+        Returns:
+            list: One vector per text (computed vectors are returned exactly,
+                  cached ones at the storage precision)
+        """
+        vectors: List[Optional[List[float]]] = [self.get(text) for text in texts]
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(texts[i], []).append(i)
+        if not missing:
+            return vectors
+
+        computed = encode(list(missing))
+        stored = []
+        with self._lock:
+            for (text, positions), vector in zip(missing.items(), computed):
+                vector = list(vector)
+                for i in positions:
+                    vectors[i] = vector
+                key = self.text_hash(text)
+                data = pack_vector(vector, self.dtype)
+                self._remember(key, data)
+                stored.append((key, data))
+            self._store(stored)
+        return vectors
+
+    def _remember(self, key: str, data: bytes):
+        """Insert into the LRU (lock held)"""
+        self._entries[key] = data
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats_counters['evictions'] += 1
+
+    def _load(self, key: str) -> Optional[bytes]:
+        """Read a vector from disk and touch it (lock held)"""
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                'SELECT vector, dtype FROM embeddings WHERE model = ? AND text_hash = ?',
+                (self.model_name, key)
+            ).fetchone()
+            if row is None:
+                return None
+            data, dtype = row
+            if dtype != self.dtype:
+                data = pack_vector(unpack_vector(data, dtype), self.dtype)
+            self._db.execute('UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?',
+                             (time.time(), self.model_name, key))
+            self._db.commit()
+            return data
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache read failed: {e}")
+            return None
+
+    def _store(self, items: List[tuple]):
+        """Write vectors to disk (lock held)"""
+        if self._db is None or not items:
+            return
+        now = time.time()
+        try:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO embeddings (model, text_hash, dtype, vector, last_used) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(self.model_name, key, self.dtype, data, now) for key, data in items]
+            )
+            self._writes_since_trim += len(items)
+            if self._writes_since_trim >= 1000:
+                self._trim()
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def _trim(self):
+        """Keep the max_persisted most recently used vectors (lock held)"""
+        self._writes_since_trim = 0
+        self._db.execute(
+            'DELETE FROM embeddings WHERE rowid IN ('
+            ' SELECT rowid FROM embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+            (self.max_persisted,)
+        )
+
+    def clear(self, persisted: bool = True):
+        """Drop all cached vectors (on disk too unless persisted=False)"""
+        with self._lock:
+            self._entries.clear()
+            if persisted and self._db is not None:
+                try:
+                    self._db.execute('DELETE FROM embeddings WHERE model = ?', (self.model_name,))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Embedding cache clear failed: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, object]:
+        """Entry counts, memory use and hit counters"""
+        with self._lock:
+            persisted = None
+            if self._db is not None:
+                try:
+                    persisted = self._db.execute('SELECT COUNT(*) FROM embeddings WHERE model = ?',
+                                                 (self.model_name,)).fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'vector_bytes': sum(len(data) for data in self._entries.values()),
+                'dtype': self.dtype,
+                'persisted_entries': persisted,
+                **self.stats_counters
+            }
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RAG File Watcher
+Event-driven change detection for the RAG watch directories
+
+On Linux the watcher subscribes to inotify events (bound through ctypes, no
+extra package) for every directory under the watched roots and sleeps in
+select() until the kernel reports a change. Events are not acted on one by
+one: changed paths are collected until no new event has arrived for the
+debounce period, so an editor's save sequence (truncate, write, rename,
+chmod) becomes a single 'modified' change.
+
+A reconcile scan (one os.walk over all roots) runs at start, after an event
+queue overflow and every reconcile_interval seconds as a safety net for
+missed events (network filesystems, watch limits). Where inotify is not
+available the same scan simply runs every poll_interval seconds.
+"""
+
+import os
+import sys
+import errno
+import time
+import select
+import struct
+import logging
+import threading
+import ctypes
+import ctypes.util
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUFFIXES = ('.txt', '.md', '.pdf', '.json')
+DEFAULT_DEBOUNCE = 0.5
+DEFAULT_RECONCILE_INTERVAL = 600.0
+DEFAULT_POLL_INTERVAL = 30.0
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+def _load_libc():
+    """libc with inotify, or None"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1  # noqa: B018 - raises AttributeError when missing
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+_libc = _load_libc()
+INOTIFY_AVAILABLE = _libc is not None
+
+
+class Inotify:
+    """Minimal inotify binding: recursive directory watches and event reads"""
+
+    def __init__(self):
+        self.fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.paths: Dict[int, str] = {}  # wd -> directory
+        self.wds: Dict[str, int] = {}  # directory -> wd
+
+    def add_watch(self, directory: str) -> int:
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_add_watch({directory}): {os.strerror(err)}")
+        self.paths[wd] = directory
+        self.wds[directory] = wd
+        return wd
+
+    def forget(self, wd: int):
+        directory = self.paths.pop(wd, None)
+        if directory is not None and self.wds.get(directory) == wd:
+            del self.wds[directory]
+
+    def read_events(self) -> List[tuple]:
+        """Pending events as (directory, name, mask, wd)"""
+        events = []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return events
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((self.paths.get(wd), os.fsdecode(name), mask, wd))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class DirectoryWatcher:
+    """Watches directory trees and reports debounced file changes"""
+
+    def __init__(self, on_changes: Callable[[List[Dict[str, Any]]], None],
+                 suffixes: Iterable[str] = DEFAULT_SUFFIXES,
+                 known: Optional[Dict[str, float]] = None,
+                 debounce: float = DEFAULT_DEBOUNCE,
+                 reconcile_interval: float = DEFAULT_RECONCILE_INTERVAL,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 use_inotify: bool = True):
+        """
+        Args:
+            on_changes: Called from the watcher thread with
+                        [{'file', 'type': 'added'|'modified'|'deleted', 'mtime'}]
+            suffixes: File extensions to report
+            known: path -> mtime of files already indexed (updated in place)
+            debounce: Quiet period before pending changes are reported
+            reconcile_interval: Seconds between safety-net scans with inotify
+            poll_interval: Seconds between scans without inotify
+            use_inotify: Set False to force polling
+        """
+        self.on_changes = on_changes
+        self.suffixes = tuple(suffixes)
+        self.known = known if known is not None else {}
+        self.debounce = debounce
+        self.reconcile_interval = reconcile_interval
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify and INOTIFY_AVAILABLE
+        self.roots: Set[str] = set()
+        self.mode = 'stopped'
+        self.stats = {'events': 0, 'batches': 0, 'reconciles': 0, 'overflows': 0, 'watch_errors': 0}
+
+        self._inotify: Optional[Inotify] = None
+        self._dirty: Set[str] = set()
+        self._last_event = 0.0
+        self._reconcile_requested = False
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._wake_r, self._wake_w = None, None
+
+    def start(self, roots: Iterable[str] = ()):
+        """Start the watcher thread"""
+        with self._lock:
+            self.roots.update(str(Path(root)) for root in roots)
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._wake_r, self._wake_w = os.pipe()
+        self._inotify = None
+        if self.use_inotify:
+            try:
+                self._inotify = Inotify()
+            except OSError as e:
+                logger.warning(f"inotify unavailable, falling back to polling: {e}")
+        self.mode = 'inotify' if self._inotify else 'polling'
+        for root in list(self.roots):
+            self._watch_tree(root)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info(f"File watcher started ({self.mode}) for {len(self.roots)} directories")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the watcher thread"""
+        if not self.is_running():
+            return
+        self._stop_event.set()
+        self._wake()
+        self._thread.join(timeout=timeout)
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+        for fd in (self._wake_r, self._wake_w):
+            os.close(fd)
+        self._wake_r = self._wake_w = None
+        self.mode = 'stopped'
+
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def add_root(self, root: str):
+        """Watch another directory tree (picked up by a running watcher)"""
+        root = str(Path(root))
+        with self._lock:
+            self.roots.add(root)
+        if self.is_running():
+            self._watch_tree(root)
+            self.request_reconcile()
+
+    def remove_root(self, root: str):
+        """Stop reporting changes under a directory tree"""
+        root = str(Path(root))
+        with self._lock:
+            self.roots.discard(root)
+            if self._inotify:
+                prefix = root + os.sep
+                for directory, wd in list(self._inotify.wds.items()):
+                    if directory == root or directory.startswith(prefix):
+                        _libc.inotify_rm_watch(self._inotify.fd, wd)
+                        self._inotify.forget(wd)
+
+    def request_reconcile(self):
+        """Ask the watcher thread for a full scan"""
+        self._reconcile_requested = True
+        self._wake()
+
+    def _wake(self):
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b'x')
+            except OSError:
+                pass
+
+    def _watch_tree(self, root: str):
+        """Add inotify watches for a directory and its subdirectories"""
+        if not self._inotify:
+            return
+        for directory, _dirs, _files in os.walk(root):
+            try:
+                with self._lock:
+                    self._inotify.add_watch(directory)
+            except OSError as e:
+                self.stats['watch_errors'] += 1
+                if e.errno == errno.ENOSPC:
+                    logger.warning("inotify watch limit reached (fs.inotify.max_user_watches); "
+                                   f"changes under {directory} are found by the reconcile scan")
+                    self.reconcile_interval = min(self.reconcile_interval, self.poll_interval)
+                    return
+                logger.warning(f"Cannot watch {directory}: {e}")
+
+    def _run(self):
+        next_reconcile = 0.0  # scan once at start
+        while not self._stop_event.is_set():
+            now = time.time()
+            interval = self.reconcile_interval if self._inotify else self.poll_interval
+            if self._reconcile_requested or now >= next_reconcile:
+                self._reconcile_requested = False
+                try:
+                    self._reconcile()
+                except Exception as e:
+                    logger.error(f"Error during file reconcile scan: {e}")
+                next_reconcile = time.time() + interval
+
+            timeout = next_reconcile - time.time()
+            if self._dirty:
+                timeout = min(timeout, self._last_event + self.debounce - time.time())
+            readers = [self._wake_r] + ([self._inotify.fd] if self._inotify else [])
+            try:
+                ready, _, _ = select.select(readers, [], [], max(0.0, timeout))
+            except (OSError, ValueError):
+                break
+            if self._wake_r in ready:
+                os.read(self._wake_r, 4096)
+            if self._inotify and self._inotify.fd in ready:
+                self._handle_events(self._inotify.read_events())
+
+            if self._dirty and time.time() - self._last_event >= self.debounce:
+                with self._lock:
+                    dirty, self._dirty = self._dirty, set()
+                self._report(self._diff(dirty))
+
+    def _handle_events(self, events: List[tuple]):
+        for directory, name, mask, wd in events:
+            self.stats['events'] += 1
+            if mask & IN_Q_OVERFLOW:
+                self.stats['overflows'] += 1
+                self._reconcile_requested = True
+                continue
+            if mask & IN_IGNORED:
+                with self._lock:
+                    self._inotify.forget(wd)
+                continue
+            if directory is None:
+                continue
+            path = os.path.join(directory, name) if name else directory
+            if mask & IN_ISDIR or mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # New subtree: watch it and pick up files created before the watch
+                    self._watch_tree(path)
+                    self._mark(self.scan([path]))
+                else:
+                    # Subtree gone or moved away: every known file under it is re-checked
+                    prefix = path + os.sep
+                    self._mark(known for known in list(self.known) if known.startswith(prefix))
+                continue
+            if name.endswith(self.suffixes):
+                self._mark([path])
+
+    def _mark(self, paths: Iterable[str]):
+        with self._lock:
+            before = len(self._dirty)
+            self._dirty.update(paths)
+            if len(self._dirty) != before:
+                self._last_event = time.time()
+
+    def _in_roots(self, path: str) -> bool:
+        with self._lock:
+            roots = list(self.roots)
+        return any(path == root or path.startswith(root + os.sep) for root in roots)
+
+    def _diff(self, paths: Iterable[str]) -> List[Dict[str, Any]]:
+        """Compare paths with the known mtimes and update them"""
+        changes = []
+        for path in sorted(paths):
+            try:
+                mtime = os.stat(path).st_mtime if self._in_roots(path) else None
+            except OSError:
+                mtime = None
+            previous = self.known.get(path)
+            if mtime is None:
+                if previous is not None:
+                    del self.known[path]
+                    changes.append({'file': path, 'type': 'deleted'})
+            elif previous is None:
+                self.known[path] = mtime
+                changes.append({'file': path, 'type': 'added', 'mtime': mtime})
+            elif previous != mtime:
+                self.known[path] = mtime
+                changes.append({'file': path, 'type': 'modified', 'mtime': mtime})
+        return changes
+
+    def scan(self, roots: Iterable[str]) -> Dict[str, float]:
+        """path -> mtime of every matching file under roots (one walk per root)"""
+        found = {}
+        for root in roots:
+            for directory, _dirs, names in os.walk(root):
+                for name in names:
+                    if name.endswith(self.suffixes):
+                        path = os.path.join(directory, name)
+                        try:
+                            found[path] = os.stat(path).st_mtime
+                        except OSError:
+                            pass
+        return found
+
+    def _reconcile(self):
+        self._report(self.reconcile_now())
+
+    def reconcile_now(self) -> List[Dict[str, Any]]:
+        """Full scan in the calling thread: changes against the known map (not reported)"""
+        self.stats['reconciles'] += 1
+        with self._lock:
+            roots = list(self.roots)
+        found = self.scan(root for root in roots if os.path.isdir(root))
+        candidates = [path for path, mtime in found.items() if self.known.get(path) != mtime]
+        candidates.extend(path for path in list(self.known) if path not in found and self._in_roots(path))
+        return self._diff(candidates)
+
+    def _report(self, changes: List[Dict[str, Any]]):
+        if not changes:
+            return
+        self.stats['batches'] += 1
+        try:
+            self.on_changes(changes)
+        except Exception as e:
+            logger.error(f"Error processing file changes: {e}")
@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RAG Ingestion Pipeline
+Parallel, incremental loading of document directories into the vector store
+
+Ingestion runs in three stages:
+
+    load + chunk   process pool; each worker hashes a file, loads it with the
+                   langchain loader for its type and splits it into chunks
+    embed          chunks from many files are gathered into one large batch
+                   and encoded with a single model call
+    upsert         the batch is written to the collection in bulk
+
+A JSON manifest remembers the content hash and chunk ids of every ingested
+file. Files whose size and mtime are unchanged are skipped without being
+read; files whose bytes hash to the recorded value are skipped without being
+loaded.
+
+Chunks are content addressed: a chunk's id is the hash of its normalized
+text, so a chunk is embedded only the first time its text is seen. Editing a
+paragraph of a large manual embeds the chunks around the edit and deletes the
+ones that disappeared; identical chunks in many files (copybook headers,
+boilerplate) are stored once and reference counted through the manifest. The
+'source' metadata of a shared chunk names one of the files that contain it.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FILE_TYPES = ['.txt', '.md', '.pdf', '.json']
+DEFAULT_EMBED_BATCH_SIZE = 256
+DEFAULT_UPSERT_BATCH_SIZE = 1000
+MANIFEST_SAVE_INTERVAL = 5.0  # seconds between manifest checkpoints during a run
+MANIFEST_VERSION = 2  # version 1 used per-file chunk ids
+
+# Text splitters are cached per worker process
+_splitters: Dict[tuple, Any] = {}
+
+
+def _get_splitter(chunk_size: int, chunk_overlap: int):
+    """Text splitter for the given settings (created once per process)"""
+    key = (chunk_size, chunk_overlap)
+    splitter = _splitters.get(key)
+    if splitter is None:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        splitter = _splitters[key] = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+            separators=["\n\n", "\n", ". ", " ", ""]
+        )
+    return splitter
+
+
+def load_documents(path: str) -> list:
+    """Load a file with the langchain loader for its extension"""
+    from langchain_community.document_loaders import (
+        TextLoader,
+        PyPDFLoader,
+        UnstructuredMarkdownLoader
+    )
+    suffix = Path(path).suffix.lower()
+    if suffix == '.pdf':
+        loader = PyPDFLoader(path)
+    elif suffix == '.md':
+        loader = UnstructuredMarkdownLoader(path)
+    else:  # .txt, .json and others
+        loader = TextLoader(path, encoding='utf-8')
+    return loader.load()
+
+
+def normalize_chunk_text(text: str) -> str:
+    """Chunk text as hashed for its id: NFC, whitespace runs collapsed"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def content_chunk_id(text: str) -> str:
+    """Content address of a chunk"""
+    return hashlib.sha256(normalize_chunk_text(text).encode('utf-8')).hexdigest()[:32]
+
+
+def file_content_hash(path: str) -> str:
+    """SHA-256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_file(path: str, chunk_size: int, chunk_overlap: int,
+               known_hash: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load and chunk one file (runs in a pool worker)
+
+    Args:
+        path: File path
+        chunk_size: Maximum chunk size in characters
+        chunk_overlap: Overlap between chunks
+        known_hash: Hash recorded by the manifest; a match skips loading
+
+    Returns:
+        dict: {'path', 'hash', 'unchanged', 'documents': [{'metadata', 'chunks'}]}
+    """
+    content_hash = file_content_hash(path)
+    result = {'path': path, 'hash': content_hash, 'unchanged': content_hash == known_hash, 'documents': []}
+    if result['unchanged']:
+        return result
+
+    splitter = _get_splitter(chunk_size, chunk_overlap)
+    for doc in load_documents(path):
+        chunks = splitter.split_text(doc.page_content) if doc.page_content.strip() else []
+        result['documents'].append({'metadata': dict(doc.metadata), 'chunks': chunks})
+    return result
+
+
+class IngestManifest:
+    """Content hash and chunk ids of every ingested file, persisted as JSON"""
+
+    def __init__(self, manifest_file: Optional[str] = None):
+        self.manifest_file = Path(manifest_file) if manifest_file else None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.manifest_file or not self.manifest_file.exists():
+            return
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._entries = data.get('files', {})
+            if data.get('version', 1) < MANIFEST_VERSION:
+                # Keep the old ids so they are deleted, but re-chunk every file once
+                for entry in self._entries.values():
+                    for key in ('hash', 'size', 'mtime'):
+                        entry.pop(key, None)
+        except Exception as e:
+            logger.warning(f"Failed to load ingest manifest, starting empty: {e}")
+            self._entries = {}
+
+    def save(self):
+        """Write the manifest atomically"""
+        if not self.manifest_file:
+            return
+        with self._lock:
+            snapshot = {'version': MANIFEST_VERSION, 'files': dict(self._entries)}
+        tmp_file = self.manifest_file.with_suffix('.tmp')
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_file, self.manifest_file)
+        except Exception as e:
+            logger.error(f"Failed to save ingest manifest: {e}")
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._entries.get(path)
+
+    def set(self, path: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[path] = entry
+
+    def remove(self, path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._entries.pop(path, None)
+
+    def items(self) -> List[tuple]:
+        """(path, entry) pairs"""
+        with self._lock:
+            return list(self._entries.items())
+
+    def paths_under(self, directory: str) -> List[str]:
+        """Recorded paths inside a directory"""
+        prefix = str(directory).rstrip(os.sep) + os.sep
+        with self._lock:
+            return [path for path in self._entries if path.startswith(prefix)]
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+        self.save()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class IngestionPipeline:
+    """Staged load/chunk -> embed -> upsert pipeline over a collection"""
+
+    def __init__(self, embedding_model, collection, manifest: IngestManifest,
+                 chunk_size: int = 512, chunk_overlap: int = 50,
+                 max_workers: Optional[int] = None,
+                 embed_batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                 upsert_batch_size: int = DEFAULT_UPSERT_BATCH_SIZE,
+                 chunk_id: Callable[[str], str] = content_chunk_id,
+                 chunker: Callable[..., Dict[str, Any]] = chunk_file,
+                 lexical_index=None):
+        """
+        Args:
+            embedding_model: Object with encode(texts, ...) (SentenceTransformer)
+            collection: Chroma collection (upsert/delete)
+            manifest: Ingest manifest
+            chunk_size: Maximum chunk size in characters
+            chunk_overlap: Overlap between chunks
+            max_workers: Loader processes (default: CPU count)
+            embed_batch_size: Chunks gathered across files per encode call
+            upsert_batch_size: Maximum records per upsert call
+            chunk_id: chunk_id(chunk_text) -> id
+            chunker: Picklable chunker with chunk_file's signature
+            lexical_index: LexicalIndex kept in sync with the collection
+        """
+        self.embedding_model = embedding_model
+        self.collection = collection
+        self.manifest = manifest
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.chunk_id = chunk_id
+        self.chunker = chunker
+        self.lexical_index = lexical_index
+        self._run_lock = threading.RLock()  # one ingestion at a time (API, monitor)
+        self.rebuild_refs()
+
+    def rebuild_refs(self):
+        """Recount how many files reference each stored chunk id"""
+        refs: Dict[str, int] = {}
+        for _path, entry in self.manifest.items():
+            for chunk_id in entry.get('ids', []):
+                refs[chunk_id] = refs.get(chunk_id, 0) + 1
+        self._refs = refs
+
+    def discover(self, directory: Path, file_types: Iterable[str]) -> List[str]:
+        """Files of the given types under a directory (one walk for all types)"""
+        suffixes = tuple(file_types)
+        found = []
+        for root, _dirs, names in os.walk(directory):
+            for name in names:
+                if name.endswith(suffixes):
+                    found.append(os.path.join(root, name))
+        return sorted(found)
+
+    def ingest_directory(self, directory_path: str, file_types: List[str] = None,
+                         force: bool = False) -> Dict[str, Any]:
+        """
+        Ingest every matching file under a directory
+
+        Args:
+            directory_path: Document directory
+            file_types: File extensions to process
+            force: Re-ingest files the manifest reports as unchanged
+
+        Returns:
+            dict: Results as returned by ingest_files, plus 'removed_files'
+                  (manifest entries whose file no longer exists)
+        """
+        directory = Path(directory_path)
+        if not directory.exists():
+            raise ValueError(f"Directory not found: {directory}")
+        file_types = file_types or DEFAULT_FILE_TYPES
+        files = self.discover(directory, file_types)
+
+        with self._run_lock:
+            present = set(files)
+            removed = [path for path in self.manifest.paths_under(str(directory))
+                       if path not in present and path.endswith(tuple(file_types))]
+            for path in removed:
+                self.remove_file(path)
+
+            results = self.ingest_files(files, force=force)
+        results['removed_files'] = removed
+        return results
+
+    def ingest_files(self, paths: List[str], force: bool = False) -> Dict[str, Any]:
+        """
+        Ingest specific files
+
+        Args:
+            paths: File paths
+            force: Re-ingest files the manifest reports as unchanged
+
+        Returns:
+            dict: {'processed_files', 'failed_files', 'unchanged_files',
+                   'total_chunks', 'embedded_chunks', 'deleted_chunks',
+                   'processing_time'}; total_chunks counts the processed files'
+                   chunks, embedded_chunks the ones that were new
+        """
+        with self._run_lock:
+            return self._ingest_files(paths, force)
+
+    def _ingest_files(self, paths: List[str], force: bool) -> Dict[str, Any]:
+        start_time = time.time()
+        results = {
+            'processed_files': [],
+            'failed_files': [],
+            'unchanged_files': 0,
+            'total_chunks': 0,
+            'embedded_chunks': 0,
+            'deleted_chunks': 0,
+            'processing_time': 0
+        }
+
+        # Stage 0: stat against the manifest; unchanged size+mtime is skipped without reading
+        todo = []
+        for path in paths:
+            path = str(path)
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                results['failed_files'].append({'file': path, 'error': str(e)})
+                continue
+            entry = self.manifest.get(path)
+            if (not force and entry and entry.get('size') == stat.st_size
+                    and entry.get('mtime') == stat.st_mtime):
+                results['unchanged_files'] += 1
+                continue
+            todo.append((path, stat, None if force or not entry else entry.get('hash')))
+
+        self._pending = []
+        self._pending_chunks = 0
+        self._last_save = time.time()
+        for path, stat, chunked, error in self._chunk_all(todo):
+            if error is not None:
+                logger.error(f"Failed to process {path}: {error}")
+                results['failed_files'].append({'file': path, 'error': str(error)})
+                continue
+            if chunked['unchanged']:
+                # Touched but identical: record the new mtime only
+                entry = dict(self.manifest.get(path) or {}, size=stat.st_size, mtime=stat.st_mtime)
+                self.manifest.set(path, entry)
+                results['unchanged_files'] += 1
+                continue
+            self._pending.append((path, stat, chunked))
+            # Only chunks whose text is not stored yet count toward the embedding batch
+            self._pending_chunks += sum(1 for doc in chunked['documents'] for chunk in doc['chunks']
+                                        if self.chunk_id(chunk) not in self._refs)
+            if self._pending_chunks >= self.embed_batch_size:
+                self._flush(results)
+        self._flush(results)
+        self.manifest.save()
+
+        results['processing_time'] = time.time() - start_time
+        logger.info(
+            f"Ingested {len(results['processed_files'])} files ({results['total_chunks']} chunks), "
+            f"{results['unchanged_files']} unchanged, {len(results['failed_files'])} failed "
+            f"in {results['processing_time']:.2f}s"
+        )
+        return results
+
+    def _chunk_all(self, todo: List[tuple]):
+        """Yield (path, stat, chunked, error) as pool workers finish"""
+        workers = min(self.max_workers, len(todo))
+        if workers <= 1:
+            for path, stat, known_hash in todo:
+                try:
+                    yield path, stat, self.chunker(path, self.chunk_size, self.chunk_overlap, known_hash), None
+                except Exception as e:
+                    yield path, stat, None, e
+            return
+
+        # spawn: the parent holds model and database threads that must not be forked
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            queue = iter(todo)
+            in_flight = {}
+            # Keep a bounded number of files in flight so chunks do not pile up
+            for item in queue:
+                in_flight[executor.submit(self.chunker, item[0], self.chunk_size,
+                                          self.chunk_overlap, item[2])] = item
+                if len(in_flight) >= workers * 4:
+                    break
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, stat, _known_hash = in_flight.pop(future)
+                    try:
+                        yield path, stat, future.result(), None
+                    except Exception as e:
+                        yield path, stat, None, e
+                    item = next(queue, None)
+                    if item is not None:
+                        in_flight[executor.submit(self.chunker, item[0], self.chunk_size,
+                                                  self.chunk_overlap, item[2])] = item
+
+    def _flush(self, results: Dict[str, Any]):
+        """Embed and upsert the pending files' new chunks, then diff them against the manifest"""
+        pending, self._pending, self._pending_chunks = self._pending, [], 0
+        if not pending:
+            return
+
+        new_chunks: Dict[str, tuple] = {}  # id -> (text, metadata), first occurrence wins
+        file_ids = []
+        added_at = time.time()
+        for path, _stat, chunked in pending:
+            own_ids = []
+            seen = set()
+            for doc in chunked['documents']:
+                chunks = doc['chunks']
+                for i, chunk in enumerate(chunks):
+                    chunk_id = self.chunk_id(chunk)
+                    if chunk_id in seen:
+                        continue
+                    seen.add(chunk_id)
+                    own_ids.append(chunk_id)
+                    if chunk_id in self._refs or chunk_id in new_chunks:
+                        continue
+                    metadata = dict(doc['metadata'])
+                    metadata.update({
+                        'source': path,
+                        'chunk_count': len(chunks),
+                        'added_at': added_at,
+                        'chunk_index': i,
+                        'chunk_text': chunk[:200] + "..." if len(chunk) > 200 else chunk
+                    })
+                    new_chunks[chunk_id] = (chunk, metadata)
+            file_ids.append(own_ids)
+
+        ids = list(new_chunks)
+        texts = [new_chunks[chunk_id][0] for chunk_id in ids]
+        metadatas = [new_chunks[chunk_id][1] for chunk_id in ids]
+        try:
+            if texts:
+                embeddings = self.embedding_model.encode(
+                    texts,
+                    batch_size=64,
+                    show_progress_bar=False,
+                    convert_to_numpy=True
+                ).tolist()
+                for start in range(0, len(ids), self.upsert_batch_size):
+                    end = start + self.upsert_batch_size
+                    self.collection.upsert(
+                        ids=ids[start:end],
+                        embeddings=embeddings[start:end],
+                        documents=texts[start:end],
+                        metadatas=metadatas[start:end]
+                    )
+        except Exception as e:
+            logger.error(f"Failed to embed/upsert batch of {len(texts)} chunks: {e}")
+            for path, _stat, _chunked in pending:
+                results['failed_files'].append({'file': path, 'error': str(e)})
+            return
+        results['embedded_chunks'] += len(ids)
+        if ids and self.lexical_index is not None:
+            try:
+                self.lexical_index.add(ids, texts, metadatas)
+            except Exception as e:
+                logger.error(f"Failed to update lexical index: {e}")
+
+        # Take every file's new references before releasing any old ones: a chunk
+        # moving from one file to another in this batch was not re-embedded and
+        # must not be deleted in between
+        released = []
+        for (path, stat, chunked), own_ids in zip(pending, file_ids):
+            previous = self.manifest.get(path)
+            previous_ids = set(previous.get('ids', [])) if previous else set()
+            for chunk_id in own_ids:
+                if chunk_id not in previous_ids:
+                    self._refs[chunk_id] = self._refs.get(chunk_id, 0) + 1
+            self.manifest.set(path, {
+                'hash': chunked['hash'],
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'ids': own_ids
+            })
+            released.append((path, previous_ids - set(own_ids)))
+            results['processed_files'].append(path)
+            results['total_chunks'] += len(own_ids)
+        for path, stale_ids in released:
+            results['deleted_chunks'] += self._release(path, stale_ids)
+
+        if time.time() - self._last_save >= MANIFEST_SAVE_INTERVAL:
+            self.manifest.save()
+            self._last_save = time.time()
+
+    def remove_file(self, path: str) -> int:
+        """Drop a file's chunk references and forget it; returns chunks deleted"""
+        with self._run_lock:
+            entry = self.manifest.remove(str(path))
+            if not entry:
+                return 0
+            return self._release(str(path), set(entry.get('ids', [])))
+
+    def _release(self, path: str, chunk_ids: set) -> int:
+        """
+        Drop one file's references to chunks
+
+        Chunks no other file references are deleted. Chunks that are still
+        shared but name this file as their source are handed to another file.
+
+        Returns:
+            int: Chunks deleted
+        """
+        orphaned, shared = [], []
+        for chunk_id in chunk_ids:
+            count = self._refs.get(chunk_id, 1) - 1
+            if count <= 0:
+                self._refs.pop(chunk_id, None)
+                orphaned.append(chunk_id)
+            else:
+                self._refs[chunk_id] = count
+                shared.append(chunk_id)
+        if orphaned:
+            self._delete_ids(sorted(orphaned))
+        if shared:
+            self._reassign_source(path, shared)
+        return len(orphaned)
+
+    def _reassign_source(self, path: str, chunk_ids: List[str]):
+        """Point shared chunks whose source is path at another file that contains them"""
+        try:
+            stored = self.collection.get(ids=chunk_ids, include=["metadatas"])
+            owned = [(chunk_id, metadata) for chunk_id, metadata in zip(stored['ids'], stored['metadatas'])
+                     if metadata and metadata.get('source') == path]
+            if not owned:
+                return
+            wanted = {chunk_id for chunk_id, _metadata in owned}
+            new_source = {}
+            for other_path, entry in self.manifest.items():
+                for chunk_id in wanted.intersection(entry.get('ids', [])):
+                    new_source.setdefault(chunk_id, other_path)
+            ids, metadatas = [], []
+            for chunk_id, metadata in owned:
+                if chunk_id in new_source:
+                    ids.append(chunk_id)
+                    metadatas.append(dict(metadata, source=new_source[chunk_id]))
+            if ids:
+                self.collection.update(ids=ids, metadatas=metadatas)
+                if self.lexical_index is not None:
+                    self.lexical_index.set_source(ids, [metadata['source'] for metadata in metadatas])
+        except Exception as e:
+            logger.error(f"Failed to reassign shared chunks of {path}: {e}")
+
+    def _delete_ids(self, ids: List[str]):
+        for start in range(0, len(ids), self.upsert_batch_size):
+            try:
+                self.collection.delete(ids=ids[start:start + self.upsert_batch_size])
+                if self.lexical_index is not None:
+                    self.lexical_index.delete(ids[start:start + self.upsert_batch_size])
+            except Exception as e:
+                logger.error(f"Failed to delete stale chunks: {e}")
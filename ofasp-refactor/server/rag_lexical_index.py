@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RAG Lexical Index
+Persistent BM25 inverted index over the chunks held by the vector store
+
+Vector similarity is weak at exact tokens: a COBOL paragraph name, a
+copybook field such as WS-EMP-NO or an error code rarely ranks first by
+embedding. This index stores the same chunks in an SQLite FTS5 table and
+ranks keyword matches with FTS5's built-in BM25.
+
+Text is tokenized here, not by SQLite, so identifiers and Japanese text
+index usefully:
+
+    WS-EMP-NO     kept whole ('ws-emp-no') and split into 'ws', 'emp', 'no'
+    ＷＳ－ＥＭＰ  NFKC-normalized first (full-width to ASCII)
+    社員番号       CJK runs become overlapping bigrams ('社員', '員番', '番号')
+
+A query matches chunks holding any of its tokens, so common English words
+('is', 'the', 'what') are dropped from queries; otherwise every prose chunk
+would match a question.
+
+The ingestion pipeline adds and deletes chunks here whenever it upserts or
+deletes them in the vector store, so the two hold the same chunk ids.
+"""
+
+import re
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_ASCII_TOKEN = r"[a-z0-9][a-z0-9_\-]*"
+_CJK_RUN = r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+"  # kana, kanji, hangul
+_TOKEN_RE = re.compile(f"{_ASCII_TOKEN}|{_CJK_RUN}")
+
+# Not searched for: words that occur in most prose chunks. COBOL words such as
+# 'no', 'set' and 'move' are kept.
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from', 'how', 'i',
+    'in', 'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what', 'when',
+    'where', 'which', 'who', 'why', 'with'
+))
+
+
+def tokenize(text: str) -> List[str]:
+    """Index tokens of a text (see module docstring)"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(unicodedata.normalize('NFKC', text).lower()):
+        token = match.group().strip('-_')
+        if not token:
+            continue
+        if token[0].isascii():
+            tokens.append(token)
+            if '-' in token or '_' in token:
+                tokens.extend(part for part in re.split(r'[-_]+', token) if part)
+        elif len(token) == 1:
+            tokens.append(token)
+        else:
+            tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return tokens
+
+
+def _rowid(chunk_id: str) -> int:
+    """Stable FTS rowid of a hex chunk id (60 bits; other ids are hashed)"""
+    try:
+        return int(chunk_id[:15], 16)
+    except ValueError:
+        return int(hashlib.sha256(chunk_id.encode('utf-8')).hexdigest()[:15], 16)
+
+
+def fts5_available() -> bool:
+    """Whether this SQLite build has FTS5"""
+    try:
+        sqlite3.connect(':memory:').execute('CREATE VIRTUAL TABLE probe USING fts5(text)')
+        return True
+    except sqlite3.Error:
+        return False
+
+
+LEXICAL_INDEX_AVAILABLE = fts5_available()
+
+
+class LexicalIndex:
+    """BM25 keyword index of chunks, persisted in an SQLite FTS5 table"""
+
+    def __init__(self, index_file: str = ':memory:'):
+        """
+        Args:
+            index_file: SQLite file (':memory:' for a transient index)
+        """
+        if not LEXICAL_INDEX_AVAILABLE:
+            raise RuntimeError("SQLite FTS5 is not available")
+        self.index_file = str(index_file)
+        if self.index_file != ':memory:':
+            Path(self.index_file).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.index_file, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5('
+                ' chunk_id UNINDEXED, source UNINDEXED, added_at UNINDEXED, content UNINDEXED, tokens,'
+                " tokenize=\"unicode61 tokenchars '-_'\")"
+            )
+            self._db.commit()
+
+    def add(self, ids: List[str], texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None):
+        """Index chunks (replacing chunks with the same id)"""
+        metadatas = metadatas or [{}] * len(ids)
+        rows = []
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            rows.append((_rowid(chunk_id), chunk_id, (metadata or {}).get('source', ''),
+                         (metadata or {}).get('added_at', time.time()), text, ' '.join(tokenize(text))))
+        with self._lock:
+            self._db.executemany('DELETE FROM chunks WHERE rowid = ?', [(row[0],) for row in rows])
+            self._db.executemany(
+                'INSERT INTO chunks (rowid, chunk_id, source, added_at, content, tokens) VALUES (?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            self._db.commit()
+
+    def delete(self, ids: Iterable[str]):
+        """Remove chunks"""
+        with self._lock:
+            self._db.executemany('DELETE FROM chunks WHERE rowid = ?', [(_rowid(chunk_id),) for chunk_id in ids])
+            self._db.commit()
+
+    def set_source(self, ids: List[str], sources: List[str]):
+        """Update the source recorded for chunks"""
+        with self._lock:
+            self._db.executemany('UPDATE chunks SET source = ? WHERE rowid = ?',
+                                 [(source, _rowid(chunk_id)) for chunk_id, source in zip(ids, sources)])
+            self._db.commit()
+
+    def search(self, query: str, limit: int = 10, file_types: Optional[List[str]] = None,
+               date_range: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """
+        BM25 keyword search
+
+        Args:
+            query: Query text (tokenized like indexed text, stopwords dropped;
+                   any remaining token may match)
+            limit: Maximum results
+            file_types: Keep sources containing one of these extensions
+            date_range: {'start', 'end'} bounds on added_at
+
+        Returns:
+            list: [{'chunk_id', 'source', 'content', 'added_at', 'bm25_score'}]
+                  best first; bm25_score is positive, higher is better
+        """
+        tokens = [token for token in dict.fromkeys(tokenize(query)) if token not in STOPWORDS]
+        if not tokens:
+            return []
+        match = ' OR '.join('"' + token.replace('"', '""') + '"' for token in tokens)
+        sql = 'SELECT chunk_id, source, content, added_at, -bm25(chunks) AS score FROM chunks WHERE chunks MATCH ?'
+        params: List[Any] = [match]
+        if date_range and isinstance(date_range, dict):
+            if 'start' in date_range:
+                sql += ' AND added_at >= ?'
+                params.append(date_range['start'])
+            if 'end' in date_range:
+                sql += ' AND added_at <= ?'
+                params.append(date_range['end'])
+        if file_types:
+            patterns = [ft if ft.startswith('.') else '.' + ft for ft in file_types]
+            sql += ' AND (' + ' OR '.join('instr(source, ?) > 0' for _ in patterns) + ')'
+            params.extend(patterns)
+        sql += ' ORDER BY bm25(chunks) LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            try:
+                rows = self._db.execute(sql, params).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"Lexical search failed: {e}")
+                return []
+        return [{'chunk_id': chunk_id, 'source': source, 'content': content,
+                 'added_at': added_at, 'bm25_score': score}
+                for chunk_id, source, content, added_at, score in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM chunks').fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM chunks')
+            self._db.commit()
+
+    def rebuild_from_collection(self, collection, page_size: int = 1000) -> int:
+        """Index every chunk of a Chroma collection; returns chunks indexed"""
+        indexed = 0
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            ids = page.get('ids') or []
+            if not ids:
+                break
+            self.add(ids, page['documents'], page['metadatas'])
+            indexed += len(ids)
+            offset += len(ids)
+        logger.info(f"Lexical index rebuilt with {indexed} chunks")
+        return indexed
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60,
+                           weights: Optional[List[float]] = None) -> Dict[str, float]:
+    """
+    Fuse ranked id lists: score(id) = sum(weight / (k + rank))
+
+    Rank fusion needs no calibration between BM25 scores and cosine
+    similarities, which live on unrelated scales.
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + weight / (k + rank)
+    return scores
@@ -10,20 +10,22 @@ import logging
 import hashlib
 import re
 import threading
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 import chromadb
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import (
-    TextLoader, 
-    PyPDFLoader, 
-    DirectoryLoader,
-    UnstructuredMarkdownLoader
-)
 import time
 
+from rag_ingest import IngestManifest, IngestionPipeline, DEFAULT_EMBED_BATCH_SIZE
+from rag_file_watcher import DirectoryWatcher, DEFAULT_DEBOUNCE, DEFAULT_RECONCILE_INTERVAL
+from rag_embedding_cache import EmbeddingCache, DEFAULT_MAX_ENTRIES as DEFAULT_EMBEDDING_CACHE_SIZE
+from rag_embedding_batcher import EmbeddingBatcher, DEFAULT_BATCH_WINDOW
+from rag_lexical_index import LexicalIndex, LEXICAL_INDEX_AVAILABLE, reciprocal_rank_fusion
+from rag_vector_shards import ShardedVectorStore, index_directory, NUMPY_AVAILABLE as VECTOR_SHARDS_AVAILABLE
+
 logger = logging.getLogger(__name__)
 
 class RAGService:
@@ -32,7 +34,16 @@ class RAGService:
                  embedding_model: str = "all-MiniLM-L6-v2",
                  use_onnx: bool = True,
                  chunk_size: int = 512,
-                 chunk_overlap: int = 50):
+                 chunk_overlap: int = 50,
+                 ingest_workers: Optional[int] = None,
+                 embed_batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                 watch_debounce: float = DEFAULT_DEBOUNCE,
+                 watch_reconcile_interval: float = DEFAULT_RECONCILE_INTERVAL,
+                 embedding_cache_size: int = DEFAULT_EMBEDDING_CACHE_SIZE,
+                 embedding_cache_dtype: str = 'float16',
+                 persist_embedding_cache: bool = True,
+                 embed_batch_window: float = DEFAULT_BATCH_WINDOW,
+                 vector_backend: str = 'chroma'):
         """
         Initialize RAG Service with optimized settings for local deployment
         
@@ -42,6 +53,16 @@ class RAGService:
             use_onnx: Use ONNX backend for faster inference
             chunk_size: Maximum chunk size in characters
             chunk_overlap: Overlap between chunks
+            ingest_workers: Loader processes for directory ingestion (default: CPU count)
+            embed_batch_size: Chunks gathered across files per embedding call
+            watch_debounce: Quiet seconds before watched file changes are reindexed
+            watch_reconcile_interval: Seconds between safety-net scans of watched directories
+            embedding_cache_size: Embeddings kept in memory
+            embedding_cache_dtype: Cached vector storage ('float32', 'float16', 'int8')
+            persist_embedding_cache: Keep cached embeddings on disk across restarts
+            embed_batch_window: Seconds concurrent query embeddings wait to share a batch
+            vector_backend: 'chroma', or 'sharded' for the int8 memory-mapped store
+                            sharded by document type (rag_vector_shards)
         """
         self.persist_directory = Path(persist_directory)
         self.persist_directory.mkdir(exist_ok=True)
@@ -55,18 +76,28 @@ class RAGService:
         self._load_search_history()
         self._load_favorites()
         
-        # Initialize file monitoring
+        # Initialize file monitoring (inotify events, polling where unavailable)
         self.file_timestamps = {}  # Track file modification times
         self.watch_directories = set()  # Directories to monitor
         self.auto_reindex_enabled = True
-        self.monitor_thread = None
-        self.monitor_stop_event = threading.Event()
+        self.file_watcher = DirectoryWatcher(
+            self._on_file_changes,
+            known=self.file_timestamps,
+            debounce=watch_debounce,
+            reconcile_interval=watch_reconcile_interval
+        )
         
         # Initialize caching
-        self.search_cache = {}  # Cache for search results
+        self.search_cache = OrderedDict()  # Cache for search results (LRU order)
+        self.search_cache_lock = threading.Lock()
         self.cache_max_size = 100  # Maximum cache entries
         self.cache_ttl = 3600  # Cache TTL in seconds (1 hour)
-        self.embedding_cache = {}  # Cache for embeddings
+        self.embedding_cache = EmbeddingCache(  # Cache for embeddings, keyed by model + text hash
+            model_name=embedding_model,
+            max_entries=embedding_cache_size,
+            persist_path=(self.persist_directory / 'embedding_cache.sqlite3') if persist_embedding_cache else None,
+            dtype=embedding_cache_dtype
+        )
         self.performance_stats = {
             'total_searches': 0,
             'cache_hits': 0,
@@ -105,12 +136,27 @@ class RAGService:
             )
         )
         
+        # Query embeddings from concurrent requests share batched model calls
+        self.embedding_batcher = EmbeddingBatcher(self._encode, batch_window=embed_batch_window)
+        
         # Get or create collection
         self.collection = self.chroma_client.get_or_create_collection(
             name="documents",
             metadata={"hnsw:space": "cosine"}
         )
         
+        # Optionally replace it with the quantized store sharded by document type.
+        # Its chunks, manifest and keyword index live in their own directory, so
+        # switching backends never mixes the two stores.
+        self.vector_backend = 'chroma'
+        self.index_directory = index_directory(self.persist_directory, vector_backend)
+        if vector_backend == 'sharded':
+            if VECTOR_SHARDS_AVAILABLE:
+                self.vector_backend = 'sharded'
+                self.collection = self._open_sharded_store(self.collection)
+            else:
+                logger.warning("numpy not available, using the ChromaDB vector store")
+        
         # Initialize text splitter for smart chunking
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
@@ -119,9 +165,63 @@ class RAGService:
             separators=["\n\n", "\n", ". ", " ", ""]
         )
         
+        # Initialize BM25 lexical index over the same chunks (hybrid retrieval)
+        self.lexical_index = None
+        if LEXICAL_INDEX_AVAILABLE:
+            try:
+                self.lexical_index = LexicalIndex(self.index_directory / 'lexical_index.sqlite3')
+            except Exception as e:
+                logger.warning(f"Lexical index unavailable, using vector search only: {e}")
+        else:
+            logger.warning("SQLite FTS5 not available, using vector search only")
+        
+        # Initialize staged ingestion pipeline with its content-hash manifest
+        self.ingest_manifest = IngestManifest(self.index_directory / 'ingest_manifest.json')
+        self.ingest_pipeline = IngestionPipeline(
+            self.embedding_model,
+            self.collection,
+            self.ingest_manifest,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            max_workers=ingest_workers,
+            embed_batch_size=embed_batch_size,
+            lexical_index=self.lexical_index
+        )
+        self._start_lexical_backfill()
+        
         logger.info("RAG Service initialized successfully")
         self._log_collection_stats()
     
+    def _open_sharded_store(self, chroma_collection) -> ShardedVectorStore:
+        """Open the sharded vector store, importing the ChromaDB chunks the first time"""
+        store = ShardedVectorStore(str(self.index_directory))
+        if store.count() == 0 and chroma_collection.count() > 0:
+            logger.info(f"Importing {chroma_collection.count()} chunks from ChromaDB into the sharded store")
+            store.import_from(chroma_collection)
+            manifest = self.persist_directory / 'ingest_manifest.json'
+            if manifest.exists():
+                (self.index_directory / 'ingest_manifest.json').write_bytes(manifest.read_bytes())
+        return store
+    
+    def _start_lexical_backfill(self):
+        """Index existing vector store chunks when the lexical index is new"""
+        if self.lexical_index is None:
+            return
+        try:
+            if self.lexical_index.count() > 0 or self.collection.count() == 0:
+                return
+        except Exception as e:
+            logger.warning(f"Could not compare lexical index with collection: {e}")
+            return
+        
+        def backfill():
+            try:
+                self.lexical_index.rebuild_from_collection(self.collection)
+            except Exception as e:
+                logger.error(f"Lexical index backfill failed: {e}")
+        
+        threading.Thread(target=backfill, daemon=True).start()
+    
     def _log_collection_stats(self):
         """Log current collection statistics"""
         try:
@@ -136,13 +236,19 @@ class RAGService:
         return hashlib.md5(combined.encode()).hexdigest()
     
     def load_documents_from_directory(self, directory_path: str, 
-                                    file_types: List[str] = None) -> Dict[str, Any]:
+                                    file_types: List[str] = None,
+                                    force: bool = False) -> Dict[str, Any]:
         """
         Load and process documents from a directory
         
+        Files are loaded and chunked in a process pool, chunks from many files
+        are embedded and upserted in large batches, and files recorded as
+        unchanged in the ingest manifest are skipped.
+        
         Args:
             directory_path: Path to document directory
             file_types: List of file extensions to process
+            force: Re-ingest files even if unchanged since the last run
             
         Returns:
             Processing results with statistics
@@ -150,58 +256,11 @@ class RAGService:
         if file_types is None:
             file_types = ['.txt', '.md', '.pdf', '.json']
         
-        directory_path = Path(directory_path)
-        if not directory_path.exists():
-            raise ValueError(f"Directory not found: {directory_path}")
-        
-        results = {
-            'processed_files': [],
-            'failed_files': [],
-            'total_chunks': 0,
-            'processing_time': 0
-        }
-        
-        start_time = time.time()
-        
-        # Process each supported file type
-        for file_type in file_types:
-            pattern = f"**/*{file_type}"
-            files = list(directory_path.glob(pattern))
-            
-            for file_path in files:
-                try:
-                    logger.info(f"Processing: {file_path}")
-                    
-                    # Load document based on file type
-                    if file_type == '.pdf':
-                        loader = PyPDFLoader(str(file_path))
-                    elif file_type == '.md':
-                        loader = UnstructuredMarkdownLoader(str(file_path))
-                    else:  # .txt, .json and others
-                        loader = TextLoader(str(file_path), encoding='utf-8')
-                    
-                    documents = loader.load()
-                    
-                    # Process each document
-                    for doc in documents:
-                        chunks_added = self.add_document(
-                            content=doc.page_content,
-                            source=str(file_path),
-                            metadata=doc.metadata
-                        )
-                        results['total_chunks'] += chunks_added
-                    
-                    results['processed_files'].append(str(file_path))
-                    
-                except Exception as e:
-                    logger.error(f"Failed to process {file_path}: {e}")
-                    results['failed_files'].append({
-                        'file': str(file_path),
-                        'error': str(e)
-                    })
-        
-        results['processing_time'] = time.time() - start_time
-        logger.info(f"Directory processing completed: {results}")
+        results = self.ingest_pipeline.ingest_directory(directory_path, file_types, force=force)
+        if results['processed_files'] or results['removed_files']:
+            self.search_cache.clear()
+        logger.info(f"Directory processing completed: {len(results['processed_files'])} files, "
+                    f"{results['total_chunks']} chunks, {results['unchanged_files']} unchanged")
         
         return results
     
@@ -237,14 +296,9 @@ class RAGService:
             'added_at': time.time()
         })
         
-        # Generate embeddings for all chunks at once (batch processing)
+        # Generate embeddings for all chunks at once (batch processing, cached chunks reused)
         try:
-            embeddings = self.embedding_model.encode(
-                chunks, 
-                batch_size=32, 
-                show_progress_bar=False,
-                convert_to_numpy=True
-            ).tolist()
+            embeddings = self.embedding_cache.get_or_compute(chunks, self._encode)
         except Exception as e:
             logger.error(f"Failed to generate embeddings: {e}")
             return 0
@@ -272,6 +326,9 @@ class RAGService:
                 documents=chunks,
                 metadatas=metadatas
             )
+            if self.lexical_index is not None:
+                self.lexical_index.add(ids, chunks, metadatas)
+            self.search_cache.clear()
             
             logger.info(f"Added {len(chunks)} chunks from {source}")
             return len(chunks)
@@ -283,17 +340,22 @@ class RAGService:
     def search_documents(self, query: str, n_results: int = 5,
                         min_score: float = 0.0, file_types: List[str] = None,
                         date_range: Dict[str, float] = None, 
-                        sort_by: str = 'similarity') -> List[Dict[str, Any]]:
+                        sort_by: str = 'similarity',
+                        retrieval: str = 'hybrid') -> List[Dict[str, Any]]:
         """
         Search for relevant documents with advanced filtering
         
         Args:
             query: Search query
             n_results: Maximum number of results
-            min_score: Minimum similarity score (0-1)
+            min_score: Minimum similarity score (0-1), applied to keyword matches
+                       too (scored by their stored embedding)
             file_types: List of file extensions to filter ('.txt', '.md', etc.)
             date_range: Dict with 'start' and 'end' timestamps
-            sort_by: Sort method ('similarity', 'date', 'source')
+            sort_by: Sort method ('similarity', 'date', 'source'); with hybrid
+                     retrieval 'similarity' orders by the fused score
+            retrieval: 'hybrid' (BM25 + vector, rank-fused), 'vector' or 'lexical'
+                       ('keyword' is accepted for 'lexical')
             
         Returns:
             List of relevant documents with metadata
@@ -305,7 +367,12 @@ class RAGService:
         search_start_time = time.time()
         
         # Generate cache key
-        cache_key = self._generate_cache_key(query, n_results, min_score, file_types, date_range, sort_by)
+        if retrieval == 'keyword':
+            retrieval = 'lexical'
+        if self.lexical_index is None:
+            retrieval = 'vector'
+        cache_key = self._generate_cache_key(query, n_results, min_score, file_types, date_range, sort_by,
+                                             retrieval)
         
         # Check cache first
         cached_result = self._get_cached_search(cache_key)
@@ -318,72 +385,25 @@ class RAGService:
         self.performance_stats['cache_misses'] += 1
         
         try:
+            # Keyword hits from the BM25 index
+            lexical_hits = []
+            if retrieval != 'vector':
+                lexical_hits = self.lexical_index.search(
+                    query, limit=min(n_results * 2, 100), file_types=file_types, date_range=date_range
+                )
+            
             # Generate query embedding with caching
             query_embedding = self._get_cached_embedding(query)
             
-            # Build where clause for filtering
-            where_clause = {}
-            if file_types:
-                # Filter by file extensions
-                file_patterns = []
-                for ft in file_types:
-                    if not ft.startswith('.'):
-                        ft = '.' + ft
-                    file_patterns.append({"source": {"$contains": ft}})
-                if len(file_patterns) == 1:
-                    where_clause.update(file_patterns[0])
-                else:
-                    where_clause["$or"] = file_patterns
-            
-            if date_range and isinstance(date_range, dict):
-                date_filters = []
-                if 'start' in date_range:
-                    date_filters.append({"added_at": {"$gte": date_range['start']}})
-                if 'end' in date_range:
-                    date_filters.append({"added_at": {"$lte": date_range['end']}})
-                
-                if date_filters:
-                    if where_clause:
-                        where_clause = {"$and": [where_clause] + date_filters}
-                    else:
-                        where_clause = {"$and": date_filters} if len(date_filters) > 1 else date_filters[0]
-            
-            # Search in ChromaDB with filters
-            search_params = {
-                "query_embeddings": [query_embedding],
-                "n_results": min(n_results * 2, 100),  # Get more results for filtering
-                "include": ["documents", "metadatas", "distances"]
-            }
+            vector_results = None
+            if retrieval != 'lexical':
+                vector_results = self._vector_query(query_embedding, n_results, file_types, date_range)
             
-            if where_clause:
-                search_params["where"] = where_clause
+            documents = self._fuse_results(query_embedding, vector_results, lexical_hits, min_score)
             
-            results = self.collection.query(**search_params)
-            
-            # Process and filter results
-            documents = []
-            if results['documents'] and results['documents'][0]:
-                for i, (doc, metadata, distance) in enumerate(zip(
-                    results['documents'][0],
-                    results['metadatas'][0],
-                    results['distances'][0]
-                )):
-                    # Convert distance to similarity score (ChromaDB uses cosine distance)
-                    similarity = 1 - distance
-                    
-                    if similarity >= min_score:
-                        doc_data = {
-                            'content': doc,
-                            'metadata': metadata,
-                            'similarity': similarity,
-                            'rank': i + 1,
-                            'file_type': self._extract_file_type(metadata.get('source', '')),
-                            'added_date': metadata.get('added_at', 0)
-                        }
-                        documents.append(doc_data)
-            
-            # Apply sorting
-            documents = self._sort_documents(documents, sort_by)
+            # Apply sorting (fused order is kept for 'similarity')
+            if sort_by != 'similarity' or retrieval == 'vector':
+                documents = self._sort_documents(documents, sort_by)
             
             # Limit to requested number of results
             documents = documents[:n_results]
@@ -417,6 +437,111 @@ class RAGService:
             logger.error(f"Search failed: {e}")
             return []
     
+    def _vector_query(self, query_embedding: List[float], n_results: int,
+                      file_types: List[str] = None, date_range: Dict[str, float] = None) -> Dict[str, Any]:
+        """Nearest chunks from ChromaDB with metadata filters"""
+        # Build where clause for filtering
+        where_clause = {}
+        if file_types:
+            # Filter by file extensions
+            file_patterns = []
+            for ft in file_types:
+                if not ft.startswith('.'):
+                    ft = '.' + ft
+                file_patterns.append({"source": {"$contains": ft}})
+            if len(file_patterns) == 1:
+                where_clause.update(file_patterns[0])
+            else:
+                where_clause["$or"] = file_patterns
+        
+        if date_range and isinstance(date_range, dict):
+            date_filters = []
+            if 'start' in date_range:
+                date_filters.append({"added_at": {"$gte": date_range['start']}})
+            if 'end' in date_range:
+                date_filters.append({"added_at": {"$lte": date_range['end']}})
+            
+            if date_filters:
+                if where_clause:
+                    where_clause = {"$and": [where_clause] + date_filters}
+                else:
+                    where_clause = {"$and": date_filters} if len(date_filters) > 1 else date_filters[0]
+        
+        # Search in ChromaDB with filters
+        search_params = {
+            "query_embeddings": [query_embedding],
+            "n_results": min(n_results * 2, 100),  # Get more results for filtering
+            "include": ["documents", "metadatas", "distances"]
+        }
+        
+        if where_clause:
+            search_params["where"] = where_clause
+        
+        return self.collection.query(**search_params)
+    
+    def _fuse_results(self, query_embedding: Optional[List[float]], vector_results: Optional[Dict[str, Any]],
+                      lexical_hits: List[Dict[str, Any]], min_score: float) -> List[Dict[str, Any]]:
+        """
+        Merge vector and BM25 hits into one list ordered by reciprocal rank fusion
+        
+        Keyword-only hits get their real cosine similarity from the stored
+        embedding, so 'similarity' means the same for every result and
+        min_score filters both kinds of hit alike.
+        """
+        by_id = {}
+        vector_ranking = []
+        if vector_results and vector_results['documents'] and vector_results['documents'][0]:
+            for chunk_id, doc, metadata, distance in zip(
+                vector_results['ids'][0],
+                vector_results['documents'][0],
+                vector_results['metadatas'][0],
+                vector_results['distances'][0]
+            ):
+                # Convert distance to similarity score (ChromaDB uses cosine distance)
+                by_id[chunk_id] = self._result_entry(doc, metadata, 1 - distance)
+                vector_ranking.append(chunk_id)
+        
+        lexical_ranking = [hit['chunk_id'] for hit in lexical_hits]
+        missing = [chunk_id for chunk_id in lexical_ranking if chunk_id not in by_id]
+        if missing:
+            stored = self.collection.get(ids=missing, include=["documents", "metadatas", "embeddings"])
+            embeddings = stored.get('embeddings')
+            for i, chunk_id in enumerate(stored['ids']):
+                similarity = 0.0
+                if embeddings is not None and query_embedding is not None:
+                    similarity = _cosine_similarity(query_embedding, embeddings[i])
+                by_id[chunk_id] = self._result_entry(stored['documents'][i], stored['metadatas'][i] or {},
+                                                     similarity)
+            for hit in lexical_hits:
+                if hit['chunk_id'] not in by_id:
+                    # In the keyword index but not (yet) in the vector store
+                    by_id[hit['chunk_id']] = self._result_entry(
+                        hit['content'], {'source': hit['source'], 'added_at': hit['added_at']}, 0.0
+                    )
+        for hit in lexical_hits:
+            by_id[hit['chunk_id']]['bm25_score'] = hit['bm25_score']
+        
+        fused = reciprocal_rank_fusion([vector_ranking, lexical_ranking])
+        documents = []
+        for chunk_id in sorted(fused, key=fused.get, reverse=True):
+            doc_data = by_id[chunk_id]
+            if doc_data['similarity'] < min_score:
+                continue
+            doc_data['fusion_score'] = fused[chunk_id]
+            doc_data['rank'] = len(documents) + 1
+            documents.append(doc_data)
+        return documents
+    
+    def _result_entry(self, content: str, metadata: Dict[str, Any], similarity: float) -> Dict[str, Any]:
+        """Search result dict as returned by search_documents"""
+        return {
+            'content': content,
+            'metadata': metadata,
+            'similarity': similarity,
+            'file_type': self._extract_file_type(metadata.get('source', '')),
+            'added_date': metadata.get('added_at', 0)
+        }
+    
     def get_collection_info(self) -> Dict[str, Any]:
         """Get information about the document collection"""
         try:
@@ -457,12 +582,21 @@ class RAGService:
     def clear_collection(self) -> bool:
         """Clear all documents from the collection"""
         try:
-            # Delete the collection and recreate it
-            self.chroma_client.delete_collection(name="documents")
-            self.collection = self.chroma_client.get_or_create_collection(
-                name="documents",
-                metadata={"hnsw:space": "cosine"}
-            )
+            if self.vector_backend == 'sharded':
+                self.collection.clear()
+            else:
+                # Delete the collection and recreate it
+                self.chroma_client.delete_collection(name="documents")
+                self.collection = self.chroma_client.get_or_create_collection(
+                    name="documents",
+                    metadata={"hnsw:space": "cosine"}
+                )
+            self.ingest_pipeline.collection = self.collection
+            self.ingest_manifest.clear()
+            if self.lexical_index is not None:
+                self.lexical_index.clear()
+            self.ingest_pipeline.rebuild_refs()
+            self.search_cache.clear()
             logger.info("Collection cleared successfully")
             return True
         except Exception as e:
@@ -820,86 +954,30 @@ class RAGService:
             logger.warning("No directories to monitor")
             return
         
-        if self.monitor_thread and self.monitor_thread.is_alive():
+        if self.file_watcher.is_running():
+            for directory in self.watch_directories:
+                self.file_watcher.add_root(str(directory))
             logger.info("File monitoring already running")
             return
         
-        self.monitor_stop_event.clear()
-        self.monitor_thread = threading.Thread(target=self._monitor_files, daemon=True)
-        self.monitor_thread.start()
-        logger.info(f"Started file monitoring for {len(self.watch_directories)} directories")
+        self.file_watcher.start(str(d) for d in self.watch_directories)
+        logger.info(f"Started file monitoring ({self.file_watcher.mode}) "
+                    f"for {len(self.watch_directories)} directories")
     
     def stop_file_monitoring(self):
         """Stop file monitoring"""
-        if self.monitor_thread and self.monitor_thread.is_alive():
-            self.monitor_stop_event.set()
-            self.monitor_thread.join(timeout=5)
+        if self.file_watcher.is_running():
+            self.file_watcher.stop()
             logger.info("File monitoring stopped")
     
-    def _monitor_files(self):
-        """Monitor files for changes (runs in background thread)"""
-        check_interval = 30  # Check every 30 seconds
-        
-        while not self.monitor_stop_event.is_set():
-            try:
-                self._check_file_changes()
-            except Exception as e:
-                logger.error(f"Error during file monitoring: {e}")
-            
-            # Wait for the check interval or until stop event is set
-            self.monitor_stop_event.wait(check_interval)
+    def _on_file_changes(self, changes: List[Dict[str, Any]]):
+        """Debounced changes from the file watcher (runs in the watcher thread)"""
+        if self.auto_reindex_enabled:
+            self._process_file_changes(changes)
     
     def _check_file_changes(self):
-        """Check for file changes and trigger reindexing if needed"""
-        changes_detected = []
-        
-        for directory in self.watch_directories:
-            if not directory.exists():
-                continue
-            
-            # Supported file types
-            file_patterns = ['**/*.txt', '**/*.md', '**/*.pdf', '**/*.json']
-            
-            for pattern in file_patterns:
-                for file_path in directory.glob(pattern):
-                    if not file_path.is_file():
-                        continue
-                    
-                    current_mtime = file_path.stat().st_mtime
-                    file_key = str(file_path)
-                    
-                    # Check if file is new or modified
-                    if file_key not in self.file_timestamps:
-                        # New file
-                        self.file_timestamps[file_key] = current_mtime
-                        changes_detected.append({
-                            'file': file_key,
-                            'type': 'added',
-                            'mtime': current_mtime
-                        })
-                    elif self.file_timestamps[file_key] != current_mtime:
-                        # Modified file
-                        self.file_timestamps[file_key] = current_mtime
-                        changes_detected.append({
-                            'file': file_key,
-                            'type': 'modified',
-                            'mtime': current_mtime
-                        })
-        
-        # Check for deleted files
-        existing_files = set()
-        for directory in self.watch_directories:
-            if directory.exists():
-                for pattern in ['**/*.txt', '**/*.md', '**/*.pdf', '**/*.json']:
-                    existing_files.update(str(f) for f in directory.glob(pattern) if f.is_file())
-        
-        for file_key in list(self.file_timestamps.keys()):
-            if file_key not in existing_files:
-                del self.file_timestamps[file_key]
-                changes_detected.append({
-                    'file': file_key,
-                    'type': 'deleted'
-                })
+        """Scan watched directories now and trigger reindexing if needed"""
+        changes_detected = self.file_watcher.reconcile_now()
         
         # Process changes
         if changes_detected and self.auto_reindex_enabled:
@@ -931,6 +1009,12 @@ class RAGService:
     def _remove_document_from_collection(self, file_path: str):
         """Remove all chunks of a document from the collection"""
         try:
+            if self.ingest_manifest.get(file_path) is not None:
+                # Content-addressed chunks: only those no other file shares are deleted
+                removed = self.ingest_pipeline.remove_file(file_path)
+                logger.info(f"Removed {removed} chunks for deleted file: {file_path}")
+                return
+            
             # Query for all chunks from this source
             results = self.collection.get(
                 where={"source": file_path},
@@ -939,43 +1023,32 @@ class RAGService:
             
             if results['ids']:
                 self.collection.delete(ids=results['ids'])
+                if self.lexical_index is not None:
+                    self.lexical_index.delete(results['ids'])
                 logger.info(f"Removed {len(results['ids'])} chunks for deleted file: {file_path}")
         except Exception as e:
             logger.error(f"Failed to remove document {file_path}: {e}")
     
     def _reindex_files(self, file_paths: List[str]):
-        """Reindex specified files"""
+        """Reindex specified files, embedding only chunks whose text is new"""
         try:
+            existing = []
             for file_path in file_paths:
-                # Remove existing chunks first
-                self._remove_document_from_collection(file_path)
-                
-                # Add updated content
-                try:
-                    path = Path(file_path)
-                    if path.exists():
-                        # Determine loader based on file extension
-                        if path.suffix == '.pdf':
-                            from langchain_community.document_loaders import PyPDFLoader
-                            loader = PyPDFLoader(str(path))
-                        elif path.suffix == '.md':
-                            from langchain_community.document_loaders import UnstructuredMarkdownLoader
-                            loader = UnstructuredMarkdownLoader(str(path))
-                        else:
-                            from langchain_community.document_loaders import TextLoader
-                            loader = TextLoader(str(path), encoding='utf-8')
-                        
-                        documents = loader.load()
-                        for doc in documents:
-                            self.add_document(
-                                content=doc.page_content,
-                                source=str(path),
-                                metadata=doc.metadata
-                            )
-                        
-                        logger.info(f"Reindexed file: {file_path}")
-                except Exception as e:
-                    logger.error(f"Failed to reindex {file_path}: {e}")
+                if self.ingest_manifest.get(file_path) is None:
+                    # Indexed outside the pipeline: drop its per-file chunk ids first
+                    self._remove_document_from_collection(file_path)
+                if Path(file_path).exists():
+                    existing.append(file_path)
+            
+            # Diff the changed files' chunks against the manifest as one batch
+            results = self.ingest_pipeline.ingest_files(existing)
+            for file_path in results['processed_files']:
+                logger.info(f"Reindexed file: {file_path}")
+            logger.info(f"Reindex embedded {results['embedded_chunks']} new chunks, "
+                        f"deleted {results['deleted_chunks']}")
+            for failure in results['failed_files']:
+                logger.error(f"Failed to reindex {failure['file']}: {failure['error']}")
+            self.search_cache.clear()
         
         except Exception as e:
             logger.error(f"Error during reindexing: {e}")
@@ -987,12 +1060,10 @@ class RAGService:
             if path.exists() and path.is_dir():
                 self.watch_directories.add(path)
                 
-                # Initialize file timestamps for this directory
-                file_patterns = ['**/*.txt', '**/*.md', '**/*.pdf', '**/*.json']
-                for pattern in file_patterns:
-                    for file_path in path.glob(pattern):
-                        if file_path.is_file():
-                            self.file_timestamps[str(file_path)] = file_path.stat().st_mtime
+                # Initialize file timestamps for this directory (one walk)
+                self.file_timestamps.update(self.file_watcher.scan([str(path)]))
+                if self.file_watcher.is_running():
+                    self.file_watcher.add_root(str(path))
                 
                 logger.info(f"Added directory to monitoring: {directory_path}")
                 return True
@@ -1009,9 +1080,11 @@ class RAGService:
             path = Path(directory_path)
             if path in self.watch_directories:
                 self.watch_directories.remove(path)
+                self.file_watcher.remove_root(str(path))
                 
                 # Remove file timestamps for this directory
-                to_remove = [f for f in self.file_timestamps.keys() if f.startswith(str(path))]
+                prefix = str(path) + os.sep
+                to_remove = [f for f in list(self.file_timestamps) if f.startswith(prefix)]
                 for f in to_remove:
                     del self.file_timestamps[f]
                 
@@ -1026,15 +1099,19 @@ class RAGService:
         """Get current monitoring status"""
         return {
             'enabled': self.auto_reindex_enabled,
-            'running': self.monitor_thread and self.monitor_thread.is_alive(),
+            'running': self.file_watcher.is_running(),
+            'mode': self.file_watcher.mode,
             'watched_directories': [str(d) for d in self.watch_directories],
             'tracked_files': len(self.file_timestamps),
-            'check_interval': 30
+            'debounce_seconds': self.file_watcher.debounce,
+            'check_interval': (self.file_watcher.reconcile_interval if self.file_watcher.mode == 'inotify'
+                               else self.file_watcher.poll_interval),
+            'watcher_stats': dict(self.file_watcher.stats)
         }
     
     def _generate_cache_key(self, query: str, n_results: int = 5, min_score: float = 0.0,
                            file_types: List[str] = None, date_range: Dict[str, float] = None,
-                           sort_by: str = 'similarity') -> str:
+                           sort_by: str = 'similarity', retrieval: str = 'hybrid') -> str:
         """Generate cache key for search parameters"""
         key_data = {
             'query': query.lower().strip(),
@@ -1042,90 +1119,50 @@ class RAGService:
             'min_score': min_score,
             'file_types': sorted(file_types) if file_types else None,
             'date_range': date_range,
-            'sort_by': sort_by
+            'sort_by': sort_by,
+            'retrieval': retrieval
         }
         key_string = json.dumps(key_data, sort_keys=True)
         return hashlib.md5(key_string.encode()).hexdigest()
     
     def _get_cached_search(self, cache_key: str) -> Optional[List[Dict[str, Any]]]:
         """Get cached search result if valid"""
-        if cache_key not in self.search_cache:
-            return None
-        
-        cached_entry = self.search_cache[cache_key]
-        
-        # Check if cache entry is still valid
-        if time.time() - cached_entry['timestamp'] > self.cache_ttl:
-            del self.search_cache[cache_key]
-            return None
-        
-        return cached_entry['results']
+        with self.search_cache_lock:
+            cached_entry = self.search_cache.get(cache_key)
+            if cached_entry is None:
+                return None
+            
+            # Check if cache entry is still valid
+            if time.time() - cached_entry['timestamp'] > self.cache_ttl:
+                del self.search_cache[cache_key]
+                return None
+            
+            self.search_cache.move_to_end(cache_key)
+            return cached_entry['results']
     
     def _cache_search_result(self, cache_key: str, results: List[Dict[str, Any]]):
-        """Cache search results"""
-        # Clean up old cache entries if cache is full
-        if len(self.search_cache) >= self.cache_max_size:
-            self._cleanup_cache()
-        
-        self.search_cache[cache_key] = {
-            'results': results,
-            'timestamp': time.time()
-        }
-    
-    def _cleanup_cache(self):
-        """Remove expired and oldest cache entries"""
-        current_time = time.time()
-        
-        # Remove expired entries first
-        expired_keys = []
-        for key, entry in self.search_cache.items():
-            if current_time - entry['timestamp'] > self.cache_ttl:
-                expired_keys.append(key)
-        
-        for key in expired_keys:
-            del self.search_cache[key]
-        
-        # If still over limit, remove oldest entries
-        if len(self.search_cache) >= self.cache_max_size:
-            sorted_entries = sorted(
-                self.search_cache.items(),
-                key=lambda x: x[1]['timestamp']
-            )
-            # Remove oldest 25% of entries
-            remove_count = max(1, len(sorted_entries) // 4)
-            for key, _ in sorted_entries[:remove_count]:
-                del self.search_cache[key]
+        """Cache search results, evicting the least recently used entry when full"""
+        with self.search_cache_lock:
+            self.search_cache[cache_key] = {
+                'results': results,
+                'timestamp': time.time()
+            }
+            self.search_cache.move_to_end(cache_key)
+            while len(self.search_cache) > self.cache_max_size:
+                self.search_cache.popitem(last=False)
     
-    def _get_cached_embedding(self, text: str):
-        """Get embedding with caching"""
-        # Create cache key for embedding
-        embedding_key = hashlib.md5(text.encode()).hexdigest()
-        
-        if embedding_key in self.embedding_cache:
-            cached_entry = self.embedding_cache[embedding_key]
-            # Check if cache entry is still valid (longer TTL for embeddings)
-            if time.time() - cached_entry['timestamp'] < self.cache_ttl * 24:  # 24 hours
-                return cached_entry['embedding']
-        
-        # Generate new embedding
-        embedding = self.embedding_model.encode(
-            [text], 
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the model"""
+        return self.embedding_model.encode(
+            texts,
+            batch_size=32,
             show_progress_bar=False,
             convert_to_numpy=True
-        ).tolist()[0]
-        
-        # Cache the embedding
-        if len(self.embedding_cache) >= 1000:  # Limit embedding cache size
-            oldest_key = min(self.embedding_cache.keys(), 
-                           key=lambda k: self.embedding_cache[k]['timestamp'])
-            del self.embedding_cache[oldest_key]
-        
-        self.embedding_cache[embedding_key] = {
-            'embedding': embedding,
-            'timestamp': time.time()
-        }
-        
-        return embedding
+        ).tolist()
+    
+    def _get_cached_embedding(self, text: str):
+        """Get embedding with caching (misses go through the shared micro-batches)"""
+        return self.embedding_cache.get_or_compute([text], self.embedding_batcher.encode)[0]
     
     def clear_cache(self) -> bool:
         """Clear all caches"""
@@ -1155,9 +1192,19 @@ class RAGService:
             'avg_search_time_seconds': round(self.performance_stats['avg_search_time'], 3),
             'total_search_time_seconds': round(self.performance_stats['total_search_time'], 3),
             'cache_entries': len(self.search_cache),
-            'embedding_cache_entries': len(self.embedding_cache)
+            'embedding_cache_entries': len(self.embedding_cache),
+            'embedding_cache': self.embedding_cache.stats(),
+            'embedding_batcher': self.embedding_batcher.stats(),
+            'lexical_index_entries': self.lexical_index.count() if self.lexical_index is not None else None,
+            'vector_store': self.collection.stats() if self.vector_backend == 'sharded' else {'backend': 'chroma'}
         }
 
+def _cosine_similarity(a, b) -> float:
+    """Cosine similarity of two vectors"""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = (sum(x * x for x in a) ** 0.5) * (sum(y * y for y in b) ** 0.5)
+    return float(dot / norm) if norm else 0.0
+
 # Global RAG service instance
 rag_service = None
 
@@ -1169,10 +1216,28 @@ def get_rag_service() -> RAGService:
         persist_dir = os.getenv('RAG_PERSIST_DIR', './chromadb')
         embedding_model = os.getenv('RAG_EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
         use_onnx = os.getenv('RAG_USE_ONNX', 'true').lower() == 'true'
+        ingest_workers = int(os.getenv('RAG_INGEST_WORKERS', '0')) or None
+        embed_batch_size = int(os.getenv('RAG_EMBED_BATCH_SIZE', str(DEFAULT_EMBED_BATCH_SIZE)))
+        watch_debounce = float(os.getenv('RAG_WATCH_DEBOUNCE', str(DEFAULT_DEBOUNCE)))
+        watch_reconcile_interval = float(os.getenv('RAG_WATCH_RECONCILE_INTERVAL', str(DEFAULT_RECONCILE_INTERVAL)))
+        embedding_cache_size = int(os.getenv('RAG_EMBEDDING_CACHE_SIZE', str(DEFAULT_EMBEDDING_CACHE_SIZE)))
+        embedding_cache_dtype = os.getenv('RAG_EMBEDDING_CACHE_DTYPE', 'float16')
+        persist_embedding_cache = os.getenv('RAG_EMBEDDING_CACHE_PERSIST', 'true').lower() == 'true'
+        embed_batch_window = float(os.getenv('RAG_EMBED_BATCH_WINDOW_MS', str(DEFAULT_BATCH_WINDOW * 1000))) / 1000
+        vector_backend = os.getenv('RAG_VECTOR_BACKEND', 'chroma').lower()
         
         rag_service = RAGService(
             persist_directory=persist_dir,
             embedding_model=embedding_model,
-            use_onnx=use_onnx
+            use_onnx=use_onnx,
+            ingest_workers=ingest_workers,
+            embed_batch_size=embed_batch_size,
+            watch_debounce=watch_debounce,
+            watch_reconcile_interval=watch_reconcile_interval,
+            embedding_cache_size=embedding_cache_size,
+            embedding_cache_dtype=embedding_cache_dtype,
+            persist_embedding_cache=persist_embedding_cache,
+            embed_batch_window=embed_batch_window,
+            vector_backend=vector_backend
         )
     return rag_service
\ No newline at end of file
@@ -0,0 +1,623 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RAG Vector Shards
+Quantized, memory-mapped vector store sharded by document type
+
+The default store keeps every chunk as a float32 vector in one Chroma
+collection, so memory and search time grow with everything indexed. This
+store is an optional replacement (RAG_VECTOR_BACKEND=sharded):
+
+    sharding      Chunks are split by document type of their source:
+                  cobol, copybook, smed, manual and other. A query only
+                  scans shards that can satisfy its metadata filter, e.g.
+                  file_types=['.cpy'] reads the copybook shard alone.
+    quantization  Vectors are normalized and stored as int8 codes with one
+                  float32 scale per vector (1 byte per dimension). The
+                  codes are scanned to pick candidates. The candidates are
+                  re-ranked with float16 copies of the vectors, which are
+                  only read from disk for those rows.
+    memory maps   Codes, scales and float16 vectors live in per-shard files
+                  mapped with numpy.memmap, so the OS pages in only the
+                  shards (and rows) being searched.
+
+Ids, documents and metadata are kept in SQLite. The class implements the
+subset of the Chroma collection API used by the RAG service and the
+ingestion pipeline (upsert, query, get, update, delete, count, peek),
+including Chroma-style where filters, so it can be swapped in for a
+collection. bench_rag_vector_store.py compares its recall and latency with
+Chroma.
+"""
+
+import json
+import heapq
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_TYPES = ('cobol', 'copybook', 'smed', 'manual', 'other')
+
+# File name suffix -> document type (program suffixes win over text ones: PAYROLL.cbl.txt is COBOL)
+_SUFFIX_TYPES = {
+    '.cbl': 'cobol', '.cob': 'cobol', '.cobol': 'cobol',
+    '.cpy': 'copybook', '.copy': 'copybook', '.cpybk': 'copybook',
+    '.smed': 'smed',
+    '.md': 'manual', '.txt': 'manual', '.pdf': 'manual', '.json': 'manual', '.html': 'manual', '.rst': 'manual',
+}
+_PROGRAM_TYPES = ('cobol', 'copybook', 'smed')
+
+INITIAL_CAPACITY = 1024  # rows per shard file before the first growth
+SCAN_BLOCK_ROWS = 16384  # rows dequantized at a time while scanning
+RERANK_FACTOR = 4  # candidates re-ranked per requested result
+
+SHARDS_DIRECTORY = 'vector_shards'  # under the RAG persist directory
+
+
+def index_directory(persist_directory, vector_backend: str = 'chroma') -> Path:
+    """Directory holding the chunks, manifest and keyword index of a vector backend
+
+    The sharded store keeps its own copies so switching backends never mixes
+    the two stores; without numpy the Chroma store (and its directory) is used.
+    """
+    if vector_backend == 'sharded' and NUMPY_AVAILABLE:
+        return Path(persist_directory) / SHARDS_DIRECTORY
+    return Path(persist_directory)
+
+
+def classify_document(source: str) -> str:
+    """Document type (shard) of a chunk source path"""
+    source = (source or '').replace('\\', '/')
+    parts = [part.lower() for part in source.split('/')]
+    if any(part in ('smed', 'smed_files') for part in parts[:-1]):
+        return 'smed'
+    name = parts[-1]
+    types = [_SUFFIX_TYPES['.' + suffix] for suffix in name.split('.')[1:] if '.' + suffix in _SUFFIX_TYPES]
+    for doc_type in types:
+        if doc_type in _PROGRAM_TYPES:
+            return doc_type
+    return types[0] if types else 'other'
+
+
+def _match_value(value: Any, condition: Any) -> bool:
+    """Whether a metadata value satisfies a Chroma where condition"""
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, operand in condition.items():
+        if op == '$eq':
+            ok = value == operand
+        elif op == '$ne':
+            ok = value != operand
+        elif op in ('$gt', '$gte', '$lt', '$lte'):
+            if value is None:
+                return False
+            ok = {'$gt': value > operand, '$gte': value >= operand,
+                  '$lt': value < operand, '$lte': value <= operand}[op]
+        elif op == '$in':
+            ok = value in operand
+        elif op == '$nin':
+            ok = value not in operand
+        elif op == '$contains':
+            ok = isinstance(value, str) and operand in value
+        elif op == '$not_contains':
+            ok = not (isinstance(value, str) and operand in value)
+        else:
+            raise ValueError(f"Unsupported where operator: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def match_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Chroma where clause ($and, $or, $eq, $gte, $contains, ...) on metadata"""
+    for key, condition in (where or {}).items():
+        if key == '$and':
+            if not all(match_where(metadata, clause) for clause in condition):
+                return False
+        elif key == '$or':
+            if not any(match_where(metadata, clause) for clause in condition):
+                return False
+        elif not _match_value(metadata.get(key), condition):
+            return False
+    return True
+
+
+def _range_may_match(low: float, high: float, condition: Any) -> bool:
+    """Whether any value in [low, high] can satisfy a condition"""
+    if not isinstance(condition, dict):
+        return low <= condition <= high
+    checks = {'$gt': lambda x: high > x, '$gte': lambda x: high >= x,
+              '$lt': lambda x: low < x, '$lte': lambda x: low <= x,
+              '$eq': lambda x: low <= x <= high}
+    return all(checks[op](operand) for op, operand in condition.items() if op in checks)
+
+
+def _quantize(vectors: "np.ndarray"):
+    """Normalized vectors -> (int8 codes, float32 scales, float16 copies)"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    normalized = vectors / np.where(norms == 0, 1.0, norms)
+    scales = np.abs(normalized).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(normalized / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32), normalized.astype(np.float16)
+
+
+class _Shard:
+    """Memory-mapped vectors of one document type"""
+
+    def __init__(self, directory: Path, name: str, dim: int):
+        self.name = name
+        self.dim = dim
+        self.paths = {
+            'codes': directory / f'{name}.i8',
+            'scales': directory / f'{name}.scale',
+            'vectors': directory / f'{name}.f16',
+        }
+        self.capacity = 0
+        self.size = 0  # rows in use or freed (high-water mark)
+        self.codes = self.scales = self.vectors = None
+        self.alive = np.zeros(0, dtype=bool)
+        self.row_ids: List[Optional[str]] = []
+        self.row_meta: List[Optional[Dict[str, Any]]] = []  # source, added_at (filters without SQLite)
+        self.free: List[int] = []
+        self.sources: Dict[str, int] = {}
+        self.added_range = [float('inf'), float('-inf')]
+        existing = self.paths['codes'].exists() and self.paths['codes'].stat().st_size
+        if existing:
+            self._map(existing // dim)
+
+    def _map(self, capacity: int):
+        """(Re)map the shard files with room for capacity rows"""
+        self.flush()
+        self.codes = self.scales = self.vectors = None
+        for key, itemsize, width in (('codes', 1, self.dim), ('scales', 4, 1), ('vectors', 2, self.dim)):
+            with open(self.paths[key], 'ab') as f:
+                if f.tell() < capacity * itemsize * width:
+                    f.truncate(capacity * itemsize * width)
+        self.codes = np.memmap(self.paths['codes'], dtype=np.int8, mode='r+', shape=(capacity, self.dim))
+        self.scales = np.memmap(self.paths['scales'], dtype=np.float32, mode='r+', shape=(capacity,))
+        self.vectors = np.memmap(self.paths['vectors'], dtype=np.float16, mode='r+', shape=(capacity, self.dim))
+        self.alive = np.concatenate([self.alive, np.zeros(capacity - len(self.alive), dtype=bool)])
+        self.row_ids.extend([None] * (capacity - len(self.row_ids)))
+        self.row_meta.extend([None] * (capacity - len(self.row_meta)))
+        self.capacity = capacity
+
+    def restore(self, row: int, chunk_id: str, source: str, added_at: Optional[float]):
+        """Register a row found in SQLite when the store is opened"""
+        if row >= self.capacity:
+            raise ValueError(f"Shard {self.name} file is shorter than its index (row {row})")
+        self._register(row, chunk_id, source, added_at)
+        self.size = max(self.size, row + 1)
+
+    def finish_restore(self):
+        self.free = [row for row in range(self.size - 1, -1, -1) if not self.alive[row]]
+
+    def _register(self, row: int, chunk_id: str, source: str, added_at: Optional[float]):
+        self.alive[row] = True
+        self.row_ids[row] = chunk_id
+        self.row_meta[row] = {'source': source, 'added_at': added_at, 'doc_type': self.name}
+        self.sources[source] = self.sources.get(source, 0) + 1
+        if added_at is not None:
+            self.added_range[0] = min(self.added_range[0], added_at)
+            self.added_range[1] = max(self.added_range[1], added_at)
+
+    def put(self, chunk_id: str, codes, scale, vector, source: str, added_at: Optional[float],
+            row: Optional[int] = None) -> int:
+        """Store a vector (in row when overwriting); returns its row"""
+        if row is None:
+            if self.free:
+                row = self.free.pop()
+            else:
+                if self.size >= self.capacity:
+                    self._map(max(INITIAL_CAPACITY, self.capacity * 2))
+                row = self.size
+                self.size += 1
+        else:
+            self._unregister(row)
+        self.codes[row] = codes
+        self.scales[row] = scale
+        self.vectors[row] = vector
+        self._register(row, chunk_id, source, added_at)
+        return row
+
+    def _unregister(self, row: int):
+        source = self.row_meta[row]['source']
+        self.sources[source] -= 1
+        if not self.sources[source]:
+            del self.sources[source]
+        self.alive[row] = False
+        self.row_ids[row] = None
+        self.row_meta[row] = None
+
+    def remove(self, row: int):
+        self._unregister(row)
+        self.free.append(row)
+
+    def set_source(self, row: int, source: str, added_at: Optional[float]):
+        chunk_id = self.row_ids[row]
+        self._unregister(row)
+        self._register(row, chunk_id, source, added_at)
+
+    def count(self) -> int:
+        return int(self.alive[:self.size].sum())
+
+    def may_match(self, where: Optional[Dict[str, Any]]) -> bool:
+        """Whether any chunk of this shard can satisfy the where clause"""
+        for key, condition in (where or {}).items():
+            if key == '$and':
+                if not all(self.may_match(clause) for clause in condition):
+                    return False
+            elif key == '$or':
+                if not any(self.may_match(clause) for clause in condition):
+                    return False
+            elif key == 'source':
+                if not any(_match_value(source, condition) for source in self.sources):
+                    return False
+            elif key == 'doc_type':
+                if not _match_value(self.name, condition):
+                    return False
+            elif key == 'added_at':
+                if self.added_range[0] > self.added_range[1]:
+                    return False
+                if not _range_may_match(self.added_range[0], self.added_range[1], condition):
+                    return False
+        return True
+
+    def approximate_scores(self, query: "np.ndarray") -> "np.ndarray":
+        """Cosine scores from the int8 codes (dead rows are -inf)"""
+        scores = np.empty(self.size, dtype=np.float32)
+        for start in range(0, self.size, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, self.size)
+            scores[start:end] = (self.codes[start:end].astype(np.float32) @ query) * self.scales[start:end]
+        scores[~self.alive[:self.size]] = -np.inf
+        return scores
+
+    def exact_scores(self, rows: "np.ndarray", query: "np.ndarray") -> "np.ndarray":
+        return self.vectors[rows].astype(np.float32) @ query
+
+    def flush(self):
+        for array in (self.codes, self.scales, self.vectors):
+            if array is not None:
+                array.flush()
+
+    def disk_bytes(self) -> int:
+        return sum(path.stat().st_size for path in self.paths.values() if path.exists())
+
+
+class ShardedVectorStore:
+    """Chroma-collection-compatible store of int8 vectors in per-type memory-mapped shards"""
+
+    name = 'documents'
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: Holds index.sqlite3 and the shard files
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy is required for the sharded vector store")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(self.directory / 'index.sqlite3'), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS chunks ('
+            ' chunk_id TEXT PRIMARY KEY, shard TEXT NOT NULL, row INTEGER NOT NULL,'
+            ' source TEXT, added_at REAL, document TEXT, metadata TEXT)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)')
+        self._db.commit()
+        self.dim: Optional[int] = None
+        self._shards: Dict[str, _Shard] = {}
+        self._locations: Dict[str, tuple] = {}  # chunk id -> (shard name, row)
+        self._load()
+
+    def _load(self):
+        row = self._db.execute("SELECT value FROM settings WHERE key = 'dim'").fetchone()
+        if row is None:
+            return
+        self.dim = int(row[0])
+        for chunk_id, shard_name, row_number, source, added_at in self._db.execute(
+                'SELECT chunk_id, shard, row, source, added_at FROM chunks'):
+            self._shard(shard_name).restore(row_number, chunk_id, source, added_at)
+            self._locations[chunk_id] = (shard_name, row_number)
+        for shard in self._shards.values():
+            shard.finish_restore()
+        logger.info(f"Sharded vector store loaded: {len(self._locations)} chunks in {len(self._shards)} shards")
+
+    def _shard(self, name: str) -> _Shard:
+        shard = self._shards.get(name)
+        if shard is None:
+            shard = self._shards[name] = _Shard(self.directory, name, self.dim)
+        return shard
+
+    def _set_dim(self, dim: int):
+        if self.dim is None:
+            self.dim = dim
+            self._db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('dim', ?)", (str(dim),))
+        elif dim != self.dim:
+            raise ValueError(f"Embedding dimension {dim} does not match the store ({self.dim})")
+
+    # Collection API
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._locations)
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]],
+               documents: Optional[List[str]] = None, metadatas: Optional[List[Dict[str, Any]]] = None):
+        """Insert or replace chunks"""
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+        with self._lock:
+            self._set_dim(vectors.shape[1])
+            codes, scales, halves = _quantize(vectors)
+            rows = []
+            for i, chunk_id in enumerate(ids):
+                metadata = metadatas[i] or {}
+                source = metadata.get('source', '')
+                added_at = metadata.get('added_at')
+                shard_name = classify_document(source)
+                overwrite = None
+                location = self._locations.get(chunk_id)
+                if location is not None:
+                    if location[0] == shard_name:
+                        overwrite = location[1]
+                    else:
+                        self._shards[location[0]].remove(location[1])
+                row = self._shard(shard_name).put(chunk_id, codes[i], scales[i], halves[i], source, added_at,
+                                                  row=overwrite)
+                self._locations[chunk_id] = (shard_name, row)
+                rows.append((chunk_id, shard_name, row, source, added_at, documents[i],
+                             json.dumps(metadata, ensure_ascii=False)))
+            self._db.executemany('INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            self._db.commit()
+            for shard in self._shards.values():
+                shard.flush()
+
+    add = upsert
+
+    def update(self, ids: List[str], metadatas: Optional[List[Dict[str, Any]]] = None,
+               documents: Optional[List[str]] = None, embeddings: Optional[List[List[float]]] = None):
+        """Change metadata, documents or vectors of existing chunks"""
+        with self._lock:
+            stored = self.get(ids=ids, include=['documents', 'metadatas', 'embeddings'])
+            current = {chunk_id: i for i, chunk_id in enumerate(stored['ids'])}
+            keep = [chunk_id for chunk_id in ids if chunk_id in current]
+            if not keep:
+                return
+            position = {chunk_id: i for i, chunk_id in enumerate(ids)}
+            new_embeddings, new_documents, new_metadatas = [], [], []
+            for chunk_id in keep:
+                i, j = position[chunk_id], current[chunk_id]
+                new_embeddings.append(embeddings[i] if embeddings else stored['embeddings'][j])
+                new_documents.append(documents[i] if documents else stored['documents'][j])
+                new_metadatas.append(metadatas[i] if metadatas else stored['metadatas'][j])
+            if embeddings is None:
+                # Keep the stored vectors: only move rows whose source changes shard
+                self._update_in_place(keep, new_documents, new_metadatas, new_embeddings)
+            else:
+                self.upsert(keep, new_embeddings, new_documents, new_metadatas)
+
+    def _update_in_place(self, ids, documents, metadatas, embeddings):
+        moved = []
+        for chunk_id, document, metadata, embedding in zip(ids, documents, metadatas, embeddings):
+            shard_name, row = self._locations[chunk_id]
+            source = metadata.get('source', '')
+            if classify_document(source) != shard_name:
+                moved.append((chunk_id, embedding, document, metadata))
+                continue
+            self._shards[shard_name].set_source(row, source, metadata.get('added_at'))
+            self._db.execute('UPDATE chunks SET source = ?, added_at = ?, document = ?, metadata = ? '
+                             'WHERE chunk_id = ?',
+                             (source, metadata.get('added_at'), document,
+                              json.dumps(metadata, ensure_ascii=False), chunk_id))
+        self._db.commit()
+        if moved:
+            self.upsert(*[list(column) for column in zip(*moved)])
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
+        """Remove chunks by id or where clause"""
+        with self._lock:
+            if ids is None:
+                ids = self.get(where=where, include=[])['ids'] if where else []
+            removed = []
+            for chunk_id in ids:
+                location = self._locations.pop(chunk_id, None)
+                if location is not None:
+                    self._shards[location[0]].remove(location[1])
+                    removed.append((chunk_id,))
+            self._db.executemany('DELETE FROM chunks WHERE chunk_id = ?', removed)
+            self._db.commit()
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Iterable[str] = ('documents', 'metadatas')) -> Dict[str, Any]:
+        """Chunks by id and/or where clause, Chroma result layout"""
+        include = set(include)
+        with self._lock:
+            columns = 'chunk_id, shard, row, document, metadata'
+            if ids is not None:
+                rows = []
+                for start in range(0, len(ids), 500):
+                    batch = ids[start:start + 500]
+                    rows.extend(self._db.execute(
+                        f'SELECT {columns} FROM chunks WHERE chunk_id IN ({",".join("?" * len(batch))})', batch))
+                order = {chunk_id: i for i, chunk_id in enumerate(ids)}
+                rows.sort(key=lambda row: order[row[0]])
+            elif isinstance(where, dict) and list(where) == ['source'] and not isinstance(where['source'], dict):
+                rows = self._db.execute(f'SELECT {columns} FROM chunks WHERE source = ? ORDER BY rowid',
+                                        (where['source'],)).fetchall()
+                where = None
+            else:
+                rows = self._db.execute(f'SELECT {columns} FROM chunks ORDER BY rowid').fetchall()
+            if where:
+                rows = [row for row in rows if match_where(dict(json.loads(row[4]), doc_type=row[1]), where)]
+            rows = rows[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+            result = {'ids': [row[0] for row in rows]}
+            if 'documents' in include:
+                result['documents'] = [row[3] for row in rows]
+            if 'metadatas' in include:
+                result['metadatas'] = [json.loads(row[4]) for row in rows]
+            if 'embeddings' in include:
+                result['embeddings'] = [self._shards[row[1]].vectors[row[2]].astype(np.float32).tolist()
+                                        for row in rows]
+            return result
+
+    def peek(self, limit: int = 10) -> Dict[str, Any]:
+        return self.get(limit=limit)
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None,
+              include: Iterable[str] = ('documents', 'metadatas', 'distances')) -> Dict[str, Any]:
+        """
+        Nearest chunks by cosine distance, Chroma result layout
+
+        Only shards that can satisfy where are scanned. Candidates from the
+        int8 scan are re-ranked with the float16 vectors, then filtered by
+        where until n_results are found.
+        """
+        include = set(include)
+        result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        with self._lock:
+            for query_embedding in query_embeddings:
+                hits = self._search(np.asarray(query_embedding, dtype=np.float32), n_results, where)
+                stored = self.get(ids=[chunk_id for chunk_id, _score in hits], include=include)
+                result['ids'].append(stored['ids'])
+                result['documents'].append(stored.get('documents', []))
+                result['metadatas'].append(stored.get('metadatas', []))
+                result['distances'].append([1.0 - score for _chunk_id, score in hits])
+        return {key: value for key, value in result.items() if key == 'ids' or key in include}
+
+    def route(self, where: Optional[Dict[str, Any]]) -> List[str]:
+        """Names of the shards a query with this where clause scans"""
+        with self._lock:
+            return [name for name, shard in self._shards.items() if shard.count() and shard.may_match(where)]
+
+    def _search(self, query: "np.ndarray", n_results: int, where: Optional[Dict[str, Any]]) -> List[tuple]:
+        norm = np.linalg.norm(query)
+        query = query / norm if norm else query
+        hits = []
+        for name in self.route(where):
+            hits.extend(self._search_shard(self._shards[name], query, n_results, where))
+        return heapq.nlargest(n_results, hits, key=lambda hit: hit[1])
+
+    def _search_shard(self, shard: _Shard, query: "np.ndarray", n_results: int,
+                      where: Optional[Dict[str, Any]]) -> List[tuple]:
+        approximate = shard.approximate_scores(query)
+        alive = int(np.isfinite(approximate).sum())
+        needs_metadata = where and not set(_where_keys(where)) <= {'source', 'added_at', 'doc_type'}
+        candidates = min(alive, max(n_results * RERANK_FACTOR, 32))
+        while True:
+            if candidates < len(approximate):
+                rows = np.argpartition(-approximate, candidates - 1)[:candidates]
+            else:
+                rows = np.arange(len(approximate))
+            rows = rows[np.isfinite(approximate[rows])]
+            exact = shard.exact_scores(rows, query)
+            order = np.argsort(-exact)
+            metadata = self._row_metadata(shard, rows) if needs_metadata else None
+            hits = []
+            for i in order:
+                row = int(rows[i])
+                row_metadata = metadata[row] if needs_metadata else shard.row_meta[row]
+                if where and not match_where(row_metadata, where):
+                    continue
+                hits.append((shard.row_ids[row], float(exact[i])))
+                if len(hits) == n_results:
+                    return hits
+            if candidates >= alive:
+                return hits
+            candidates = min(alive, candidates * 4)  # selective filter: widen the candidate set
+
+    def _row_metadata(self, shard: _Shard, rows) -> Dict[int, Dict[str, Any]]:
+        ids = [shard.row_ids[int(row)] for row in rows]
+        stored = self.get(ids=ids, include=['metadatas'])
+        by_id = {chunk_id: dict(metadata, doc_type=shard.name)
+                 for chunk_id, metadata in zip(stored['ids'], stored['metadatas'])}
+        return {int(row): by_id.get(shard.row_ids[int(row)], {}) for row in rows}
+
+    # Maintenance
+
+    def clear(self):
+        """Delete every chunk and the shard files"""
+        with self._lock:
+            for shard in self._shards.values():
+                shard.codes = shard.scales = shard.vectors = None
+                for path in shard.paths.values():
+                    if path.exists():
+                        path.unlink()
+            self._shards.clear()
+            self._locations.clear()
+            self._db.execute('DELETE FROM chunks')
+            self._db.execute('DELETE FROM settings')
+            self._db.commit()
+            self.dim = None
+
+    def import_from(self, collection, page_size: int = 1000) -> int:
+        """Copy every chunk (with its stored embedding) of a Chroma collection; returns chunks copied"""
+        copied = 0
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset)
+            ids = page.get('ids') or []
+            if not ids:
+                break
+            self.upsert(ids, [list(vector) for vector in page['embeddings']], page['documents'], page['metadatas'])
+            copied += len(ids)
+            offset += len(ids)
+        logger.info(f"Imported {copied} chunks into the sharded vector store")
+        return copied
+
+    def stats(self) -> Dict[str, Any]:
+        """Chunks, capacity and disk use per shard"""
+        with self._lock:
+            shards = {
+                name: {'chunks': shard.count(), 'capacity': shard.capacity, 'disk_bytes': shard.disk_bytes()}
+                for name, shard in self._shards.items()
+            }
+            total = len(self._locations)
+            return {
+                'backend': 'sharded',
+                'dimension': self.dim,
+                'chunks': total,
+                'shards': shards,
+                'vector_bytes': sum(shard['disk_bytes'] for shard in shards.values()),
+                'float32_equivalent_bytes': total * (self.dim or 0) * 4
+            }
+
+    def close(self):
+        with self._lock:
+            for shard in self._shards.values():
+                shard.flush()
+            self._db.close()
+
+
+def _where_keys(where: Dict[str, Any]) -> List[str]:
+    """Metadata keys referenced by a where clause"""
+    keys = []
+    for key, condition in where.items():
+        if key in ('$and', '$or'):
+            for clause in condition:
+                keys.extend(_where_keys(clause))
+        else:
+            keys.append(key)
+    return keys
+
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Search Fan-out
+Concurrent local/remote search with per-source timeouts and a remote result cache
+
+The hybrid route of the smart search services used to query the local RAG
+store and then the web, so a hybrid answer took the sum of both latencies,
+and one slow web search instance held the whole request. Both sources are
+now queried at the same time on a shared thread pool. Every source has its
+own timeout. A source that misses it is left to finish in the background,
+and the request returns with the results of the sources that answered
+(marked partial).
+
+Remote results are cached by normalized query (NFKC, case-folded,
+whitespace collapsed) with a TTL. A remote search that finishes after its
+timeout still fills the cache, so repeating the query gets its results.
+
+StandInSearchBackend is a local, in-memory backend with configurable delay
+and failure. Use it to exercise the fan-out offline.
+"""
+
+import re
+import time
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_TTL = 300  # seconds
+DEFAULT_CACHE_ENTRIES = 512
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: NFKC, case-folded, single spaces, no trailing punctuation"""
+    query = unicodedata.normalize('NFKC', query).casefold()
+    return re.sub(r'\s+', ' ', query).strip().rstrip('?!.。？！ ')
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds"""
+
+    def __init__(self, ttl: float = DEFAULT_CACHE_TTL, max_entries: int = DEFAULT_CACHE_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[1] >= self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
+
+
+@dataclass
+class SearchSource:
+    """One backend of a fan-out: search(query, limit) -> results"""
+    name: str
+    search: Callable[[str, int], List[Any]]
+    timeout: float
+
+
+@dataclass
+class FanOutResult:
+    """Results per source plus how each source fared"""
+    results: Dict[str, List[Any]] = field(default_factory=dict)
+    status: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    @property
+    def partial(self) -> bool:
+        """Whether any source timed out or failed"""
+        return any(info['status'] != 'ok' for info in self.status.values())
+
+
+class FanOutSearcher:
+    """Runs several search sources concurrently, each bounded by its own timeout"""
+
+    def __init__(self, sources: List[SearchSource], max_workers: int = 8):
+        """
+        Args:
+            sources: Backends to query
+            max_workers: Threads shared by all searches (abandoned slow
+                         searches keep a thread until they return)
+        """
+        self.sources = sources
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='search-fanout')
+
+    def search(self, query: str, limits: Dict[str, int]) -> FanOutResult:
+        """
+        Query every source that has a limit
+
+        Args:
+            query: Search query
+            limits: Maximum results per source name
+
+        Returns:
+            FanOutResult: status[name]['status'] is 'ok', 'timeout' or 'error'
+        """
+        started = time.time()
+        pending = {}
+        for source in self.sources:
+            if source.name in limits:
+                future = self._executor.submit(source.search, query, limits[source.name])
+                pending[future] = source
+
+        outcome = FanOutResult()
+        while pending:
+            now = time.time()
+            # Give up on sources whose timeout has passed
+            for future, source in list(pending.items()):
+                if not future.done() and now - started >= source.timeout:
+                    del pending[future]
+                    outcome.results[source.name] = []
+                    outcome.status[source.name] = {'status': 'timeout', 'count': 0, 'time': round(now - started, 3)}
+                    logger.warning(f"Search source {source.name} timed out after {source.timeout}s")
+            if not pending:
+                break
+            next_deadline = min(started + source.timeout for source in pending.values())
+            done, _ = wait(list(pending), timeout=max(0.0, next_deadline - time.time()), return_when=FIRST_COMPLETED)
+            for future in done:
+                source = pending.pop(future)
+                elapsed = round(time.time() - started, 3)
+                try:
+                    results = future.result()
+                    outcome.results[source.name] = results
+                    outcome.status[source.name] = {'status': 'ok', 'count': len(results), 'time': elapsed}
+                except Exception as e:
+                    logger.error(f"Search source {source.name} failed: {e}")
+                    outcome.results[source.name] = []
+                    outcome.status[source.name] = {'status': 'error', 'count': 0, 'time': elapsed, 'error': str(e)}
+        return outcome
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+class StandInSearchBackend:
+    """In-memory keyword search backend for offline runs and tests"""
+
+    def __init__(self, documents: Dict[str, str], delay: float = 0.0, fail: bool = False,
+                 make_result: Optional[Callable[[str, str, float], Any]] = None):
+        """
+        Args:
+            documents: source -> text
+            delay: Seconds each search takes
+            fail: Raise instead of answering
+            make_result: make_result(content, source, score) -> result object
+                         (defaults to a dict)
+        """
+        self.documents = documents
+        self.delay = delay
+        self.fail = fail
+        self.make_result = make_result or (lambda content, source, score:
+                                           {'content': content, 'source': source, 'score': score})
+        self.calls = 0
+
+    def __call__(self, query: str, limit: int) -> List[Any]:
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("stand-in backend unavailable")
+        terms = set(normalize_query(query).split())
+        scored = []
+        for source, text in self.documents.items():
+            words = set(normalize_query(text).split())
+            overlap = len(terms & words)
+            if overlap:
+                scored.append((overlap / len(terms), source, text))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [self.make_result(text, source, score) for score, source, text in scored[:limit]]
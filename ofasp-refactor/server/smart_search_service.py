@@ -17,6 +17,8 @@ from langchain.memory import ConversationBufferMemory
 from langchain_community.tools.tavily_search import TavilySearchResults
 from tavily import TavilyClient
 
+from search_fanout import FanOutSearcher, SearchSource, TTLCache, normalize_query
+
 # Import existing RAG service
 try:
     from rag_service import get_rag_service
@@ -113,9 +115,17 @@ class SmartSearchService:
             self.tavily_client = None
             logger.warning("Tavily API key not provided - web search disabled")
         
-        # Search cache for performance
-        self.search_cache = {}
+        # Web search cache by normalized query
         self.cache_ttl = 300  # 5 minutes
+        self.search_cache = TTLCache(ttl=self.cache_ttl)
+        
+        # Hybrid route queries both sources concurrently, each with its own timeout
+        self.fanout = FanOutSearcher([
+            SearchSource('local_rag', self.search_local_rag,
+                         timeout=float(os.getenv('SMART_SEARCH_LOCAL_TIMEOUT', '3'))),
+            SearchSource('web_search', self.search_web_tavily,
+                         timeout=float(os.getenv('SMART_SEARCH_WEB_TIMEOUT', '5')))
+        ])
     
     def route_query(self, query: str) -> str:
         """Determine optimal information source for the query"""
@@ -186,12 +196,11 @@ class SmartSearchService:
             return []
         
         # Check cache first
-        cache_key = f"web_{hash(query)}"
-        if cache_key in self.search_cache:
-            cached_result, timestamp = self.search_cache[cache_key]
-            if time.time() - timestamp < self.cache_ttl:
-                logger.info("Returning cached web search results")
-                return cached_result
+        cache_key = (normalize_query(query), max_results)
+        cached_result = self.search_cache.get(cache_key)
+        if cached_result is not None:
+            logger.info("Returning cached web search results")
+            return cached_result
         
         try:
             logger.info(f"Searching web via Tavily for: {query}")
@@ -231,8 +240,8 @@ class SmartSearchService:
                     }
                 ))
             
-            # Cache results
-            self.search_cache[cache_key] = (search_results, time.time())
+            # Cache results (also when the hybrid route has stopped waiting)
+            self.search_cache.put(cache_key, search_results)
             
             logger.info(f"Found {len(search_results)} web results")
             return search_results
@@ -241,19 +250,14 @@ class SmartSearchService:
             logger.error(f"Web search error: {e}")
             return []
     
-    def hybrid_search(self, query: str, n_results: int = 10) -> List[SearchResult]:
-        """Perform hybrid search combining local RAG and web search"""
+    def _hybrid_fan_out(self, query: str, n_results: int):
+        """Query local RAG and the web concurrently (partial results on timeout)"""
         logger.info(f"Performing hybrid search for: {query}")
-        
-        all_results = []
-        
-        # Get local results
-        local_results = self.search_local_rag(query, n_results // 2)
-        all_results.extend(local_results)
-        
-        # Get web results
-        web_results = self.search_web_tavily(query, n_results // 2)
-        all_results.extend(web_results)
+        half = max(1, n_results // 2)
+        return self.fanout.search(query, {'local_rag': half, 'web_search': half})
+    
+    def _merge_hybrid(self, outcome, n_results: int) -> List[SearchResult]:
+        all_results = outcome.results.get('local_rag', []) + outcome.results.get('web_search', [])
         
         # Sort by score and source type preference
         all_results.sort(key=lambda x: (
@@ -263,6 +267,10 @@ class SmartSearchService:
         
         return all_results[:n_results]
     
+    def hybrid_search(self, query: str, n_results: int = 10) -> List[SearchResult]:
+        """Perform hybrid search combining local RAG and web search"""
+        return self._merge_hybrid(self._hybrid_fan_out(query, n_results), n_results)
+    
     def smart_search(self, query: str, max_results: int = 10) -> Dict[str, Any]:
         """Main search method with intelligent routing"""
         start_time = time.time()
@@ -271,18 +279,21 @@ class SmartSearchService:
         route = self.route_query(query)
         
         # Perform search based on route
+        sources = None
         if route == "local_rag":
             results = self.search_local_rag(query, max_results)
         elif route == "web_search":
             results = self.search_web_tavily(query, max_results)
         elif route == "hybrid":
-            results = self.hybrid_search(query, max_results)
+            outcome = self._hybrid_fan_out(query, max_results)
+            results = self._merge_hybrid(outcome, max_results)
+            sources = outcome
         else:
             results = []
         
         search_time = time.time() - start_time
         
-        return {
+        response = {
             'query': query,
             'route_used': route,
             'results': results,
@@ -290,6 +301,10 @@ class SmartSearchService:
             'search_time': search_time,
             'timestamp': datetime.now().isoformat()
         }
+        if sources is not None:
+            response['partial'] = sources.partial
+            response['sources'] = sources.status
+        return response
     
     def get_service_status(self) -> Dict[str, Any]:
         """Get service status and capabilities"""
@@ -297,6 +312,7 @@ class SmartSearchService:
             'rag_available': self.rag_service is not None,
             'web_search_available': self.tavily_client is not None,
             'cache_size': len(self.search_cache),
+            'cache': self.search_cache.stats(),
             'supported_routes': ['local_rag', 'web_search', 'hybrid']
         }
 
@@ -22,6 +22,8 @@ from langchain_community.utilities import SearxSearchWrapper
 import requests
 from bs4 import BeautifulSoup
 
+from search_fanout import FanOutSearcher, SearchSource, TTLCache, normalize_query
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -87,6 +89,15 @@ class SmartSearchService:
         self.classifier = QueryClassifier()
         self.cache_ttl = timedelta(minutes=cache_ttl_minutes)
         self._search_cache = {}
+        self._web_cache = TTLCache(ttl=cache_ttl_minutes * 60)  # web results by normalized query
+        
+        # Hybrid route queries both sources concurrently, each with its own timeout
+        self.fanout = FanOutSearcher([
+            SearchSource('local_rag', self.search_local_rag,
+                         timeout=float(os.getenv('SMART_SEARCH_LOCAL_TIMEOUT', '3'))),
+            SearchSource('web_search', self.search_web_searxng,
+                         timeout=float(os.getenv('SMART_SEARCH_WEB_TIMEOUT', '5')))
+        ])
         
         # Initialize ChromaDB for local RAG
         try:
@@ -190,7 +201,7 @@ class SmartSearchService:
     
     def _get_cache_key(self, query: str, search_type: str) -> str:
         """Generate cache key for search results"""
-        return hashlib.md5(f"{query}:{search_type}".encode()).hexdigest()
+        return hashlib.md5(f"{normalize_query(query)}:{search_type}".encode()).hexdigest()
     
     def _is_cache_valid(self, cached_entry: Dict) -> bool:
         """Check if cached entry is still valid"""
@@ -262,6 +273,19 @@ class SmartSearchService:
         if not self.web_search_available:
             return []
         
+        cache_key = (normalize_query(query), max_results)
+        cached = self._web_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Returning cached web results for query: {query}")
+            return cached
+        
+        results = self._search_searxng(query, max_results)
+        # Cache real results only (also when the hybrid route has stopped waiting)
+        if any(r.metadata.get('engine') != 'mock' for r in results):
+            self._web_cache.put(cache_key, results)
+        return results
+    
+    def _search_searxng(self, query: str, max_results: int) -> List[SearchResult]:
         try:
             start_time = time.time()
             
@@ -368,19 +392,23 @@ class SmartSearchService:
         ]
         return mock_results
     
-    def hybrid_search(self, query: str, n_results: int = 10) -> List[SearchResult]:
-        """Perform hybrid search combining local and web results"""
-        # Get results from both sources
-        local_results = self.search_local_rag(query, n_results=n_results//2)
-        web_results = self.search_web_searxng(query, max_results=n_results//2)
-        
+    def _hybrid_fan_out(self, query: str, n_results: int):
+        """Query local RAG and SearXNG concurrently (partial results on timeout)"""
+        half = max(1, n_results // 2)
+        return self.fanout.search(query, {'local_rag': half, 'web_search': half})
+    
+    def _merge_hybrid(self, outcome, n_results: int) -> List[SearchResult]:
         # Combine and sort by score
-        all_results = local_results + web_results
+        all_results = outcome.results.get('local_rag', []) + outcome.results.get('web_search', [])
         all_results.sort(key=lambda x: x.score, reverse=True)
         
         # Take top n_results
         return all_results[:n_results]
     
+    def hybrid_search(self, query: str, n_results: int = 10) -> List[SearchResult]:
+        """Perform hybrid search combining local and web results"""
+        return self._merge_hybrid(self._hybrid_fan_out(query, n_results), n_results)
+    
     def smart_search(self, query: str, max_results: int = 10) -> Dict[str, Any]:
         """Perform smart search with automatic routing"""
         # Check cache first
@@ -398,12 +426,14 @@ class SmartSearchService:
         logger.info(f"Query '{query}' routed to: {route}")
         
         # Execute search based on route
+        outcome = None
         if route == "local_rag":
             results = self.search_local_rag(query, n_results=max_results)
         elif route == "web_search":
             results = self.search_web_searxng(query, max_results=max_results)
         else:  # hybrid
-            results = self.hybrid_search(query, n_results=max_results)
+            outcome = self._hybrid_fan_out(query, max_results)
+            results = self._merge_hybrid(outcome, max_results)
         
         search_time = time.time() - start_time
         
@@ -426,12 +456,16 @@ class SmartSearchService:
             "search_time": search_time,
             "timestamp": datetime.now().isoformat()
         }
+        if outcome is not None:
+            response["partial"] = outcome.partial
+            response["sources"] = outcome.status
         
-        # Cache results
-        self._search_cache[cache_key] = {
-            'data': response,
-            'timestamp': datetime.now().isoformat()
-        }
+        # Cache complete results (a partial answer would hide late web results)
+        if not response.get("partial"):
+            self._search_cache[cache_key] = {
+                'data': response,
+                'timestamp': datetime.now().isoformat()
+            }
         
         # Clean old cache entries
         self._clean_cache()
@@ -458,6 +492,7 @@ class SmartSearchService:
             "web_search_available": self.web_search_available,
             "llm_available": self.llm_available,
             "cache_size": len(self._search_cache),
+            "web_cache": self._web_cache.stats(),
             "supported_routes": ["local_rag", "web_search", "hybrid"],
             "searxng_engines": ["google", "bing", "duckduckgo", "wikipedia"] if self.web_search_available else []
         }
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test streamed chat events and cancellation
+"""
+
+import os
+import sys
+import json
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chat_streaming import format_sse, ollama_stream_events, stream_events
+
+OLLAMA_LINES = [
+    b'{"model":"gemma3:270m","response":"COBOL ","done":false}',
+    b'',
+    b'{"model":"gemma3:270m","response":"\xe3\x83\x97\xe3\x83\xad\xe3\x82\xb0\xe3\x83\xa9\xe3\x83\xa0","done":false}',
+    b'{"model":"gemma3:270m","response":"","done":true,"context":[1,2,3],'
+    b'"total_duration":2000000000,"eval_count":20,"eval_duration":1000000000}',
+]
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        event_line, data_line = block.split('\n')
+        events.append((event_line[len('event: '):], json.loads(data_line[len('data: '):])))
+    return events
+
+
+def test_ollama_stream_is_converted_to_events():
+    events = list(ollama_stream_events(OLLAMA_LINES))
+    assert events[:2] == [('token', {'text': 'COBOL '}), ('token', {'text': 'プログラム'})]
+    assert events[2] == ('done', {'context': [1, 2, 3], 'eval_count': 20,
+                                  'inference_time': 2.0, 'tokens_per_second': 20.0})
+    assert format_sse('token', {'text': '社員'}) == 'event: token\ndata: {"text": "社員"}\n\n'
+
+
+def test_stream_reports_errors_as_events():
+    released = []
+
+    def generate():
+        return ollama_stream_events([b'{"response":"a","done":false}', b'{"error":"model not found"}'])
+
+    events = parse_sse(''.join(stream_events({'model': 'm'}, generate, on_close=lambda: released.append(1))))
+    assert [event for event, _ in events] == ['start', 'token', 'error']
+    assert events[2][1] == {'error': 'model not found'}
+    assert released == [1]
+
+
+def test_client_disconnect_closes_upstream():
+    upstream_closed = threading.Event()
+    released = []
+
+    def generate():
+        try:
+            for i in range(1000):
+                yield 'token', {'text': str(i)}
+        finally:
+            upstream_closed.set()
+
+    body = stream_events({}, generate, on_close=lambda: released.append(1))
+    assert next(body).startswith('event: start')
+    assert next(body).startswith('event: token')
+    body.close()  # what the WSGI server does when the browser goes away
+    assert upstream_closed.is_set()
+    assert released == [1]
+
+
+if __name__ == "__main__":
+    test_ollama_stream_is_converted_to_events()
+    test_stream_reports_errors_as_events()
+    test_client_disconnect_closes_upstream()
+    print("All chat streaming tests passed")
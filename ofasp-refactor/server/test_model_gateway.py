@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test admission control, deadline scheduling and context reuse of the model gateway
+"""
+
+import os
+import sys
+import time
+import uuid
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from model_gateway import (ConversationContexts, GatewaySaturated, GatewayTimeout, ModelGateway,
+                           is_conversation_id, parse_model_limits)
+
+
+def test_parse_model_limits():
+    assert parse_model_limits('gpt-oss:20b=1, gemma3:270m=4, bad, x=y') == {'gpt-oss:20b': 1, 'gemma3:270m': 4}
+    assert parse_model_limits(None) == {}
+
+
+def test_in_flight_limit_and_bounded_queue():
+    gateway = ModelGateway(default_max_in_flight=1, max_queue=1)
+    running = gateway.submit('gemma3:270m')
+    assert running.state == running.RUNNING
+    queued = gateway.submit('gemma3:270m')
+    assert queued.state == queued.QUEUED
+    with pytest.raises(GatewaySaturated) as rejected:
+        gateway.submit('gemma3:270m')
+    assert rejected.value.retry_after >= 1
+
+    # Other models have their own limits
+    assert gateway.submit('qwen2.5-coder:1.5b').state == 'running'
+
+    running.release()
+    running.release()  # idempotent
+    assert queued.wait().state == queued.RUNNING
+    stats = gateway.stats()['models']['gemma3:270m']
+    assert stats['queue_depth'] == 0 and stats['in_flight'] == 1
+    assert stats['completed'] == 1 and stats['rejected'] == 1
+
+
+def test_earliest_deadline_runs_first():
+    gateway = ModelGateway(default_max_in_flight=1)
+    running = gateway.submit('m')
+    now = time.time()
+    late = gateway.submit('m', deadline=now + 60)
+    early = gateway.submit('m', deadline=now + 30)
+    running.release()
+    assert early.state == early.RUNNING and late.state == late.QUEUED
+    early.release()
+    assert late.state == late.RUNNING
+
+
+def test_queued_request_expires_at_its_deadline():
+    gateway = ModelGateway(default_max_in_flight=1)
+    running = gateway.submit('m')
+    queued = gateway.submit('m', deadline=time.time() + 0.05)
+    with pytest.raises(GatewayTimeout):
+        queued.wait()
+    running.release()
+    assert gateway.stats()['models']['m']['expired'] == 1
+    assert gateway.queue_depth('m') == 0
+
+
+def test_rejects_requests_that_cannot_meet_their_deadline():
+    gateway = ModelGateway(default_max_in_flight=1)
+    with gateway.submit('m'):
+        time.sleep(0.05)  # teaches the gateway the average generation time
+    running = gateway.submit('m')
+    with pytest.raises(GatewaySaturated):
+        gateway.submit('m', deadline=time.time() + 0.01)
+    assert gateway.submit('m', deadline=time.time() + 5).state == 'queued'
+    running.release()
+
+
+def test_waiters_are_woken_and_cancelled_tickets_skipped():
+    gateway = ModelGateway(default_max_in_flight=1)
+    running = gateway.submit('m')
+    abandoned = gateway.submit('m', deadline=time.time() + 10)
+    waiting = gateway.submit('m', deadline=time.time() + 20)
+    abandoned.release()  # client went away while queued
+    results = []
+    thread = threading.Thread(target=lambda: results.append(gateway.run('m', lambda ticket: ticket.model)))
+    thread.start()
+    running.release()
+    waiting.wait()
+    waiting.release()
+    thread.join(5)
+    assert results == ['m']
+    assert gateway.stats()['models']['m']['cancelled'] == 1
+
+
+CHAT_1, CHAT_2, CHAT_3 = (f'chat-{uuid.uuid4()}' for _ in range(3))
+
+
+def test_conversation_contexts_are_reused_per_model():
+    contexts = ConversationContexts(max_entries=2, ttl=60)
+    contexts.put('gemma3:270m', CHAT_1, [1, 2, 3])
+    assert contexts.get('gemma3:270m', CHAT_1) == [1, 2, 3]
+    assert contexts.get('qwen2.5-coder:1.5b', CHAT_1) is None
+    contexts.put('gemma3:270m', CHAT_2, [4])
+    contexts.put('gemma3:270m', CHAT_3, [5])
+    assert contexts.get('gemma3:270m', CHAT_1) is None  # evicted (least recently used)
+    contexts.drop(CHAT_3)
+    assert contexts.get('gemma3:270m', CHAT_3) is None
+    assert contexts.stats()['entries'] == 1
+
+
+def test_guessable_conversation_ids_are_not_cached():
+    contexts = ConversationContexts()
+    for conversation_id in ('chat-lq3x9k2a', 'chat-1', None, 'chat-' + 'A' * 32):
+        contexts.put('gemma3:270m', conversation_id, [1])
+        assert contexts.get('gemma3:270m', conversation_id) is None
+    assert contexts.stats()['entries'] == 0
+    assert is_conversation_id('chat-' + uuid.uuid4().hex)
+
+
+if __name__ == "__main__":
+    test_parse_model_limits()
+    test_in_flight_limit_and_bounded_queue()
+    test_earliest_deadline_runs_first()
+    test_queued_request_expires_at_its_deadline()
+    test_rejects_requests_that_cannot_meet_their_deadline()
+    test_waiters_are_woken_and_cancelled_tickets_skipped()
+    test_conversation_contexts_are_reused_per_model()
+    test_guessable_conversation_ids_are_not_cached()
+    print("All model gateway tests passed")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test micro-batching of concurrent RAG query embeddings
+"""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from rag_embedding_batcher import EmbeddingBatcher
+
+
+class SlowEncoder:
+    """Stand-in model whose cost is mostly per call, not per text"""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        time.sleep(self.delay)
+        return [[float(len(text))] for text in texts]
+
+
+def test_concurrent_requests_share_batches():
+    encoder = SlowEncoder()
+    batcher = EmbeddingBatcher(encoder, batch_window=0.01)
+    results = {}
+
+    def search(i):
+        results[i] = batcher.encode(['x' * i])[0]
+
+    threads = [threading.Thread(target=search, args=(i,)) for i in range(1, 51)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.stop()
+
+    assert results == {i: [float(i)] for i in range(1, 51)}
+    stats = batcher.stats()
+    assert stats['requests'] == 50 and stats['batches'] == len(encoder.batches) < 10
+    assert stats['avg_batch_size'] > 5 and sum(stats['batch_size_histogram'].values()) == stats['batches']
+    assert stats['max_queue_depth'] > 1 and stats['queue_depth'] == 0
+
+
+def test_identical_texts_are_encoded_once_and_batches_are_capped():
+    encoder = SlowEncoder(delay=0)
+    batcher = EmbeddingBatcher(encoder, batch_window=0.05, max_batch_size=3)
+    futures = [batcher.submit(text) for text in ['a', 'a', 'b', 'c', 'd']]
+    assert [future.result(timeout=2) for future in futures] == [[1.0]] * 5
+    batcher.stop()
+    assert encoder.batches == [['a', 'b'], ['c', 'd']]
+
+
+def test_encode_errors_reach_every_waiting_request():
+    def failing(texts):
+        raise RuntimeError('onnx session lost')
+
+    batcher = EmbeddingBatcher(failing, batch_window=0.01)
+    futures = [batcher.submit('q1'), batcher.submit('q2')]
+    for future in futures:
+        with pytest.raises(RuntimeError, match='onnx session lost'):
+            future.result(timeout=2)
+    batcher.stop()
+    assert batcher.stats()['errors'] == 1
+    with pytest.raises(RuntimeError):
+        batcher.submit('late')
+
+
+if __name__ == "__main__":
+    test_concurrent_requests_share_batches()
+    test_identical_texts_are_encoded_once_and_batches_are_capped()
+    test_encode_errors_reach_every_waiting_request()
+    print("All RAG embedding batcher tests passed")
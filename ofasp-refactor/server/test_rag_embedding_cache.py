@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the bounded, persistent RAG embedding cache
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rag_embedding_cache import EmbeddingCache, pack_vector, unpack_vector
+
+VECTOR = [0.5, -0.25, 0.125, 0.0312, -1.0]
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+
+def test_vector_storage_precision():
+    assert all(abs(a - b) < 1e-7 for a, b in zip(unpack_vector(pack_vector(VECTOR, 'float32'), 'float32'), VECTOR))
+    assert len(pack_vector(VECTOR, 'float16')) == 2 * len(VECTOR)
+    assert all(abs(a - b) < 1e-3 for a, b in zip(unpack_vector(pack_vector(VECTOR, 'float16'), 'float16'), VECTOR))
+    assert len(pack_vector(VECTOR, 'int8')) == 4 + len(VECTOR)
+    assert all(abs(a - b) < 1e-2 for a, b in zip(unpack_vector(pack_vector(VECTOR, 'int8'), 'int8'), VECTOR))
+
+
+def test_lru_eviction_and_batched_misses():
+    cache = EmbeddingCache('model-a', max_entries=2)
+    encode = CountingEncoder()
+    assert cache.get_or_compute(['a', 'bb', 'a'], encode) == [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5]]
+    assert encode.calls == [['a', 'bb']]  # one call, duplicates encoded once
+
+    cache.get('a')  # 'bb' is now least recently used
+    cache.put('ccc', [3.0, 0.5])
+    assert cache.get('bb') is None and cache.get('a') == [1.0, 0.5]
+    assert len(cache) == 2 and cache.stats()['evictions'] == 1
+
+
+def test_persisted_vectors_survive_restart_per_model():
+    with tempfile.TemporaryDirectory() as persist:
+        path = os.path.join(persist, 'embedding_cache.sqlite3')
+        cache = EmbeddingCache('model-a', persist_path=path)
+        cache.put('PERFORM 1000-INIT', VECTOR)
+        cache.close()
+
+        restarted = EmbeddingCache('model-a', persist_path=path)
+        vector = restarted.get('PERFORM 1000-INIT')
+        assert vector is not None and abs(vector[0] - 0.5) < 1e-3
+        assert restarted.stats()['disk_hits'] == 1 and restarted.stats()['persisted_entries'] == 1
+        assert EmbeddingCache('model-b', persist_path=path).get('PERFORM 1000-INIT') is None
+
+        restarted.clear()
+        assert EmbeddingCache('model-a', persist_path=path).get('PERFORM 1000-INIT') is None
+
+
+if __name__ == "__main__":
+    test_vector_storage_precision()
+    test_lru_eviction_and_batched_misses()
+    test_persisted_vectors_survive_restart_per_model()
+    print("All RAG embedding cache tests passed")
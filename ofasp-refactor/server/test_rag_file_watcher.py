@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the debounced RAG directory watcher (inotify and polling)
+"""
+
+import os
+import sys
+import time
+import queue
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from rag_file_watcher import DirectoryWatcher, INOTIFY_AVAILABLE
+
+
+def write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def collect(batches, timeout=3.0):
+    """Changes of the next reported batch as {file: type}"""
+    return {change['file']: change['type'] for change in batches.get(timeout=timeout)}
+
+
+@pytest.mark.skipif(not INOTIFY_AVAILABLE, reason="inotify is Linux only")
+def test_rapid_saves_are_coalesced_into_one_change():
+    with tempfile.TemporaryDirectory() as root:
+        manual = os.path.join(root, 'manual.md')
+        write(manual, 'v0')
+        batches = queue.Queue()
+        watcher = DirectoryWatcher(batches.put, debounce=0.2, reconcile_interval=3600)
+        watcher.start([root])
+        try:
+            assert collect(batches) == {manual: 'added'}  # initial reconcile
+            assert watcher.mode == 'inotify'
+
+            for i in range(5):
+                write(manual, f'v{i + 1}')
+                os.utime(manual, (time.time(), time.time() + i + 1))
+            write(os.path.join(root, 'ignored.log'), 'x')
+            assert collect(batches) == {manual: 'modified'}
+            assert batches.empty()
+
+            # Files in a directory created after start are picked up
+            os.mkdir(os.path.join(root, 'copybooks'))
+            copybook = os.path.join(root, 'copybooks', 'EMP.txt')
+            write(copybook, '01 EMP-REC.')
+            os.remove(manual)
+            assert collect(batches) == {copybook: 'added', manual: 'deleted'}
+            assert watcher.stats['reconciles'] == 1
+        finally:
+            watcher.stop()
+        assert not watcher.is_running()
+
+
+def test_polling_fallback_reports_changes():
+    with tempfile.TemporaryDirectory() as root:
+        source = os.path.join(root, 'a.txt')
+        write(source, 'x')
+        known = {}
+        batches = queue.Queue()
+        watcher = DirectoryWatcher(batches.put, known=known, debounce=0.05,
+                                   poll_interval=0.1, use_inotify=False)
+        watcher.start([root])
+        try:
+            assert watcher.mode == 'polling'
+            assert collect(batches) == {source: 'added'}
+            assert source in known
+            os.remove(source)
+            assert collect(batches) == {source: 'deleted'}
+            assert known == {}
+        finally:
+            watcher.stop()
+
+
+def test_reconcile_now_diffs_against_known_mtimes():
+    with tempfile.TemporaryDirectory() as root:
+        kept, edited = os.path.join(root, 'kept.json'), os.path.join(root, 'edited.json')
+        write(kept, '{}')
+        write(edited, '{}')
+        watcher = DirectoryWatcher(lambda changes: None)
+        watcher.roots.add(root)
+        watcher.known.update(watcher.scan([root]))
+        os.utime(edited, (0, 0))
+        watcher.known[os.path.join(root, 'gone.md')] = 1.0
+        changes = {change['file']: change['type'] for change in watcher.reconcile_now()}
+        assert changes == {edited: 'modified', os.path.join(root, 'gone.md'): 'deleted'}
+
+
+if __name__ == "__main__":
+    if INOTIFY_AVAILABLE:
+        test_rapid_saves_are_coalesced_into_one_change()
+    test_polling_fallback_reports_changes()
+    test_reconcile_now_diffs_against_known_mtimes()
+    print("All RAG file watcher tests passed")
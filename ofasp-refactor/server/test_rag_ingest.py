@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the staged, incremental RAG ingestion pipeline
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rag_ingest import IngestManifest, IngestionPipeline, content_chunk_id, file_content_hash
+from rag_lexical_index import LEXICAL_INDEX_AVAILABLE, LexicalIndex
+
+
+def paragraph_chunker(path, chunk_size, chunk_overlap, known_hash=None):
+    """Picklable stand-in for chunk_file: one chunk per paragraph"""
+    content_hash = file_content_hash(path)
+    result = {'path': path, 'hash': content_hash, 'unchanged': content_hash == known_hash, 'documents': []}
+    if not result['unchanged']:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        if content.startswith('BROKEN'):
+            raise ValueError('unreadable document')
+        chunks = [part.strip() for part in content.split('\n\n') if part.strip()]
+        result['documents'].append({'metadata': {}, 'chunks': chunks})
+    return result
+
+
+class FakeEmbeddings(list):
+    def tolist(self):
+        return list(self)
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return FakeEmbeddings([[float(len(text)), 1.0] for text in texts])
+
+
+class FakeCollection:
+    def __init__(self):
+        self.records = {}
+        self.upserts = 0
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.upserts += 1
+        for record in zip(ids, embeddings, documents, metadatas):
+            self.records[record[0]] = record
+
+    def delete(self, ids):
+        for record_id in ids:
+            self.records.pop(record_id, None)
+
+    def get(self, ids, include=None):
+        found = [record_id for record_id in ids if record_id in self.records]
+        return {'ids': found, 'metadatas': [self.records[record_id][3] for record_id in found]}
+
+    def update(self, ids, metadatas):
+        for record_id, metadata in zip(ids, metadatas):
+            record = self.records[record_id]
+            self.records[record_id] = record[:3] + (metadata,)
+
+    def texts(self):
+        return sorted(record[2] for record in self.records.values())
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def make_pipeline(persist_dir, **kwargs):
+    model, collection = FakeModel(), FakeCollection()
+    manifest = IngestManifest(os.path.join(persist_dir, 'ingest_manifest.json'))
+    pipeline = IngestionPipeline(model, collection, manifest, chunker=paragraph_chunker, **kwargs)
+    return pipeline, model, collection
+
+
+def test_chunks_are_batched_across_files():
+    with tempfile.TemporaryDirectory() as docs, tempfile.TemporaryDirectory() as persist:
+        for i in range(5):
+            write(os.path.join(docs, 'sub', f'prog{i}.txt'), f'PROGRAM {i}\n\nPROCEDURE DIVISION {i}')
+        write(os.path.join(docs, 'ignored.bin'), 'x')
+        pipeline, model, collection = make_pipeline(persist, max_workers=1, embed_batch_size=100)
+
+        results = pipeline.ingest_directory(docs, ['.txt'])
+        assert len(results['processed_files']) == 5 and results['total_chunks'] == 10
+        assert len(model.calls) == 1 and len(model.calls[0]) == 10  # one encode for all files
+        assert collection.upserts == 1 and len(collection.records) == 10
+        metadata = next(iter(collection.records.values()))[3]
+        assert metadata['chunk_count'] == 2 and 'chunk_index' in metadata
+
+
+def test_unchanged_files_are_skipped_and_stale_chunks_removed():
+    with tempfile.TemporaryDirectory() as docs, tempfile.TemporaryDirectory() as persist:
+        kept, edited, deleted = (os.path.join(docs, name) for name in ('a.md', 'b.md', 'c.md'))
+        write(kept, 'alpha\n\nbeta')
+        write(edited, 'gamma\n\ndelta')
+        write(deleted, 'epsilon')
+        pipeline, model, collection = make_pipeline(persist, max_workers=1)
+        pipeline.ingest_directory(docs, ['.md'])
+
+        # A fresh pipeline reads the saved manifest
+        pipeline, model, _ = make_pipeline(persist, max_workers=1)
+        pipeline.collection = collection
+        write(edited, 'gamma\n\nDELTA')
+        os.remove(deleted)
+        os.utime(kept)  # touched, same bytes
+
+        results = pipeline.ingest_directory(docs, ['.md'])
+        assert results['processed_files'] == [edited]
+        assert results['unchanged_files'] == 1 and results['removed_files'] == [deleted]
+        assert model.calls == [['DELTA']]  # 'gamma' is already stored
+        assert collection.texts() == ['DELTA', 'alpha', 'beta', 'gamma']
+
+        results = pipeline.ingest_directory(docs, ['.md'])
+        assert results['processed_files'] == [] and results['unchanged_files'] == 2
+        assert pipeline.ingest_directory(docs, ['.md'], force=True)['total_chunks'] == 4
+
+
+def test_identical_chunks_are_stored_once():
+    with tempfile.TemporaryDirectory() as docs, tempfile.TemporaryDirectory() as persist:
+        header = '* COPYRIGHT FUJITSU\n*   ALL RIGHTS   RESERVED'
+        first, second = os.path.join(docs, 'A.cpy.txt'), os.path.join(docs, 'B.cpy.txt')
+        write(first, header + '\n\n01 A-REC PIC X(10).')
+        write(second, '* COPYRIGHT FUJITSU\n* ALL RIGHTS RESERVED\n\n01 B-REC PIC 9(4).')
+        pipeline, model, collection = make_pipeline(persist, max_workers=1)
+
+        results = pipeline.ingest_directory(docs, ['.txt'])
+        assert results['total_chunks'] == 4 and results['embedded_chunks'] == 3
+        shared_id = content_chunk_id(header)
+        assert collection.records[shared_id][3]['source'] == first
+
+        # The first file drops the header: the chunk stays, now attributed to the second file
+        write(first, '01 A-REC PIC X(10).')
+        results = pipeline.ingest_files([first])
+        assert results['embedded_chunks'] == 0 and results['deleted_chunks'] == 0
+        assert collection.records[shared_id][3]['source'] == second
+
+        assert pipeline.remove_file(second) == 2
+        assert collection.texts() == ['01 A-REC PIC X(10).']
+
+
+def test_chunk_moving_between_files_in_one_batch_is_kept():
+    with tempfile.TemporaryDirectory() as docs, tempfile.TemporaryDirectory() as persist:
+        losing, gaining = os.path.join(docs, 'a.md'), os.path.join(docs, 'b.md')
+        write(losing, 'SHARED PARA\n\nalpha')
+        write(gaining, 'beta')
+        pipeline, model, collection = make_pipeline(persist, max_workers=1)
+        pipeline.ingest_directory(docs, ['.md'])
+
+        # a.md (processed first) loses the paragraph b.md gains, in the same batch
+        write(losing, 'alpha')
+        write(gaining, 'beta\n\nSHARED PARA')
+        results = pipeline.ingest_directory(docs, ['.md'])
+        shared_id = content_chunk_id('SHARED PARA')
+        assert results['deleted_chunks'] == 0
+        assert shared_id in pipeline.manifest.get(gaining)['ids']
+        assert collection.records[shared_id][3]['source'] == gaining
+        assert collection.texts() == ['SHARED PARA', 'alpha', 'beta']
+
+
+def test_lexical_index_follows_the_collection():
+    if not LEXICAL_INDEX_AVAILABLE:
+        return
+    with tempfile.TemporaryDirectory() as docs, tempfile.TemporaryDirectory() as persist:
+        source = os.path.join(docs, 'PAYROLL.txt')
+        write(source, 'MOVE WS-EMP-NO TO OUT-EMP-NO.\n\nPERFORM 2000-CALC.')
+        lexical = LexicalIndex()
+        pipeline, _, collection = make_pipeline(persist, max_workers=1, lexical_index=lexical)
+        pipeline.ingest_files([source])
+        assert {hit['chunk_id'] for hit in lexical.search('ws-emp-no 2000-calc')} == set(collection.records)
+
+        write(source, 'PERFORM 2000-CALC.')
+        pipeline.ingest_files([source])
+        assert lexical.search('WS-EMP-NO') == [] and lexical.count() == 1
+
+
+def test_process_pool_loads_files():
+    with tempfile.TemporaryDirectory() as docs, tempfile.TemporaryDirectory() as persist:
+        for i in range(6):
+            write(os.path.join(docs, f'copy{i}.txt'), f'01 FIELD-{i} PIC X.')
+        write(os.path.join(docs, 'broken.txt'), 'BROKEN')
+        pipeline, _, collection = make_pipeline(persist, max_workers=2, embed_batch_size=4)
+
+        results = pipeline.ingest_directory(docs, ['.txt'])
+        assert len(results['processed_files']) == 6 and len(collection.records) == 6
+        assert [failure['file'] for failure in results['failed_files']] == [os.path.join(docs, 'broken.txt')]
+        assert results['failed_files'][0]['error'] == 'unreadable document'
+
+
+if __name__ == "__main__":
+    test_chunks_are_batched_across_files()
+    test_unchanged_files_are_skipped_and_stale_chunks_removed()
+    test_identical_chunks_are_stored_once()
+    test_chunk_moving_between_files_in_one_batch_is_kept()
+    test_lexical_index_follows_the_collection()
+    test_process_pool_loads_files()
+    print("All RAG ingestion tests passed")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the BM25 lexical index and rank fusion used by hybrid RAG retrieval
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from rag_lexical_index import LEXICAL_INDEX_AVAILABLE, LexicalIndex, reciprocal_rank_fusion, tokenize
+
+pytestmark = pytest.mark.skipif(not LEXICAL_INDEX_AVAILABLE, reason="SQLite FTS5 not available")
+
+CHUNKS = {
+    'a' * 32: ('MOVE WS-EMP-NO TO OUT-EMP-NO.', '/rag/PAYROLL.cbl.txt'),
+    'b' * 32: ('The employee number is printed on the report header.', '/rag/manual.md'),
+    'c' * 32: ('01 EMP-REC.\n   05 EMP-NAME PIC X(20).', '/rag/EMP.cpy.txt'),
+    'd' * 32: ('社員番号を画面に表示する。', '/rag/画面仕様.md'),
+}
+
+
+def make_index(index_file=':memory:'):
+    index = LexicalIndex(index_file)
+    ids = list(CHUNKS)
+    index.add(ids, [CHUNKS[i][0] for i in ids], [{'source': CHUNKS[i][1], 'added_at': 100.0} for i in ids])
+    return index
+
+
+def test_tokenizer_keeps_identifiers_and_splits_cjk():
+    assert tokenize('MOVE WS-EMP-NO') == ['move', 'ws-emp-no', 'ws', 'emp', 'no']
+    assert tokenize('ＥＭＰ－ＲＥＣ') == ['emp-rec', 'emp', 'rec']
+    assert tokenize('社員番号') == ['社員', '員番', '番号']
+
+
+def test_exact_identifier_ranks_first():
+    index = make_index()
+    hits = index.search('where is WS-EMP-NO set')
+    assert hits[0]['chunk_id'] == 'a' * 32 and hits[0]['bm25_score'] > 0
+    assert index.search('EMP-NAME')[0]['source'] == '/rag/EMP.cpy.txt'
+    assert [hit['chunk_id'] for hit in index.search('社員番号')] == ['d' * 32]
+    assert index.search('   ') == []
+
+
+def test_common_words_do_not_match():
+    index = make_index()
+    assert index.search('what is the') == []
+    # The manual chunk contains 'is' but not the identifier
+    hits = [hit['chunk_id'] for hit in index.search('what is EMP-NAME')]
+    assert hits[0] == 'c' * 32 and 'b' * 32 not in hits
+    assert index.search('employee number')[0]['chunk_id'] == 'b' * 32
+
+
+def test_filters_and_deletes():
+    index = make_index()
+    assert {hit['source'] for hit in index.search('emp', file_types=['md'])} == set()
+    assert {hit['source'] for hit in index.search('emp', file_types=['.txt'])} == {
+        '/rag/PAYROLL.cbl.txt', '/rag/EMP.cpy.txt'}
+    assert index.search('emp', date_range={'start': 200.0}) == []
+
+    index.delete(['c' * 32])
+    index.set_source(['a' * 32], ['/rag/PAYROLL2.cbl.txt'])
+    assert [hit['source'] for hit in index.search('emp')] == ['/rag/PAYROLL2.cbl.txt']
+    assert index.count() == 3
+
+
+def test_index_persists():
+    with tempfile.TemporaryDirectory() as persist:
+        index_file = os.path.join(persist, 'lexical_index.sqlite3')
+        make_index(index_file).close()
+        assert LexicalIndex(index_file).search('OUT-EMP-NO')[0]['chunk_id'] == 'a' * 32
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([['v1', 'both'], ['both', 'k1']], k=1)
+    assert max(fused, key=fused.get) == 'both'
+    assert fused['v1'] == 0.5 and fused['k1'] == pytest.approx(1 / 3)
+
+
+if __name__ == "__main__":
+    test_tokenizer_keeps_identifiers_and_splits_cjk()
+    test_exact_identifier_ranks_first()
+    test_common_words_do_not_match()
+    test_filters_and_deletes()
+    test_index_persists()
+    test_reciprocal_rank_fusion()
+    print("All RAG lexical index tests passed")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the quantized, memory-mapped vector store sharded by document type
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from rag_vector_shards import ShardedVectorStore, classify_document, index_directory, match_where
+
+SOURCES = ['src/PAYROLL.cbl', 'copybooks/EMPREC.cpy', 'SMED_FILES/MAINMENU', 'manual/CALL.md']
+
+
+def make_store(directory, count=400, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    store = ShardedVectorStore(str(directory))
+    store.upsert(
+        ids=[f'c{i}' for i in range(count)],
+        embeddings=vectors.tolist(),
+        documents=[f'chunk {i}' for i in range(count)],
+        metadatas=[{'source': SOURCES[i % 4], 'added_at': float(i), 'chunk_index': i} for i in range(count)]
+    )
+    return store, vectors
+
+
+def exact_ids(vectors, query, k, rows=None):
+    scores = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)) @ (query / np.linalg.norm(query))
+    rows = np.arange(len(vectors)) if rows is None else np.asarray(rows)
+    return [f'c{rows[i]}' for i in np.argsort(-scores[rows])[:k]]
+
+
+def test_classify_document():
+    assert classify_document('/src/PAYROLL.cbl') == 'cobol'
+    assert classify_document('PAYROLL.cbl.txt') == 'cobol'
+    assert classify_document('copybooks/EMPREC.CPY') == 'copybook'
+    assert classify_document('/volume/DISK01/SMED_FILES/MAINMENU') == 'smed'
+    assert classify_document('screens/LOGIN.smed') == 'smed'
+    assert classify_document('manual/CALL.md') == 'manual'
+    assert classify_document('bin/loader') == 'other'
+
+
+def test_match_where():
+    metadata = {'source': 'copybooks/EMPREC.cpy', 'added_at': 10.0}
+    assert match_where(metadata, {'source': {'$contains': '.cpy'}})
+    assert match_where(metadata, {'$or': [{'source': {'$contains': '.cbl'}}, {'added_at': {'$gte': 5}}]})
+    assert not match_where(metadata, {'$and': [{'added_at': {'$gte': 5}}, {'added_at': {'$lte': 9}}]})
+    assert match_where(metadata, {'source': 'copybooks/EMPREC.cpy'})
+
+
+def test_query_matches_exact_search(tmp_path):
+    store, vectors = make_store(tmp_path)
+    query = np.random.default_rng(1).standard_normal(vectors.shape[1]).astype(np.float32)
+    result = store.query(query_embeddings=[query.tolist()], n_results=5)
+    assert result['ids'][0] == exact_ids(vectors, query, 5)
+    assert result['distances'][0] == sorted(result['distances'][0])
+    assert result['documents'][0][0] == 'chunk ' + result['ids'][0][0][1:]
+    assert store.count() == 400
+    assert set(store.stats()['shards']) == {'cobol', 'copybook', 'smed', 'manual'}
+
+
+def test_filters_route_to_matching_shards(tmp_path):
+    store, vectors = make_store(tmp_path)
+    copybooks = {'source': {'$contains': '.cpy'}}
+    assert store.route(copybooks) == ['copybook']
+    assert sorted(store.route({'$or': [copybooks, {'source': {'$contains': '.cbl'}}]})) == ['cobol', 'copybook']
+    assert store.route({'added_at': {'$gte': 1000.0}}) == []
+
+    query = vectors[5]
+    where = {'$and': [copybooks, {'added_at': {'$gte': 200.0}}]}
+    result = store.query(query_embeddings=[query.tolist()], n_results=3, where=where)
+    rows = [i for i in range(400) if i % 4 == 1 and i >= 200]
+    assert result['ids'][0] == exact_ids(vectors, query, 3, rows)
+
+    # Filters on other metadata are read from SQLite
+    result = store.query(query_embeddings=[query.tolist()], n_results=2, where={'chunk_index': {'$in': [7, 11]}})
+    assert sorted(result['ids'][0]) == ['c11', 'c7']
+
+
+def test_get_update_delete_and_reopen(tmp_path):
+    store, vectors = make_store(tmp_path)
+    assert store.get(where={'source': 'manual/CALL.md'}, limit=2)['ids'] == ['c3', 'c7']
+
+    # Renaming the source moves the chunk to the shard of its new type
+    store.update(ids=['c3'], metadatas=[{'source': 'copybooks/NEW.cpy', 'added_at': 3.0}])
+    assert 'c3' in store.get(where={'source': {'$contains': '.cpy'}})['ids']
+    assert store.query(query_embeddings=[vectors[3].tolist()], n_results=1,
+                       where={'source': {'$contains': '.cpy'}})['ids'][0] == ['c3']
+
+    store.delete(ids=['c0', 'c4'])
+    store.delete(where={'source': 'manual/CALL.md'})
+    assert store.count() == 400 - 2 - 99
+    store.close()
+
+    reopened = ShardedVectorStore(str(tmp_path))
+    assert reopened.count() == 299
+    assert reopened.get(ids=['c0'])['ids'] == []
+    embedding = reopened.get(ids=['c3'], include=['embeddings'])['embeddings'][0]
+    assert np.allclose(embedding, vectors[3] / np.linalg.norm(vectors[3]), atol=1e-2)
+    assert reopened.query(query_embeddings=[vectors[8].tolist()], n_results=1)['ids'][0] == ['c8']
+
+    # Freed rows are reused
+    reopened.upsert(ids=['new'], embeddings=[vectors[0].tolist()], metadatas=[{'source': 'src/PAYROLL.cbl'}])
+    assert reopened.stats()['shards']['cobol']['chunks'] == 99
+    assert reopened.get(ids=['new'])['ids'] == ['new'] and reopened._locations['new'][1] in (0, 1)
+
+    reopened.clear()
+    assert reopened.count() == 0 and reopened.stats()['shards'] == {}
+
+
+def test_index_directory_follows_backend():
+    assert index_directory('./chromadb') == Path('./chromadb')
+    assert index_directory('./chromadb', 'sharded') == Path('./chromadb') / 'vector_shards'
+
+
+if __name__ == "__main__":
+    import tempfile
+    test_classify_document()
+    test_match_where()
+    test_query_matches_exact_search(Path(tempfile.mkdtemp()))
+    test_filters_route_to_matching_shards(Path(tempfile.mkdtemp()))
+    test_get_update_delete_and_reopen(Path(tempfile.mkdtemp()))
+    test_index_directory_follows_backend()
+    print("All vector shard tests passed")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test concurrent hybrid search fan-out with offline stand-in backends
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from search_fanout import FanOutSearcher, SearchSource, StandInSearchBackend, TTLCache, normalize_query
+
+LOCAL_DOCS = {
+    'manual/CALL.md': 'CALL command runs a COBOL program in the open environment',
+    'manual/SNDMSG.md': 'SNDMSG sends a message to a workstation',
+}
+WEB_DOCS = {
+    'https://example.com/cobol': 'COBOL compilers for the open environment',
+}
+
+
+def cached_web_search(cache, backend):
+    """What the smart search services do: cache remote results by normalized query"""
+    def search(query, limit):
+        key = (normalize_query(query), limit)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        results = backend(query, limit)
+        cache.put(key, results)
+        return results
+    return search
+
+
+def test_normalize_query():
+    assert normalize_query('  ＣＯＢＯＬ   Compiler? ') == 'cobol compiler'
+    assert normalize_query('cobol compiler') == normalize_query('COBOL\tcompiler!')
+
+
+def test_sources_are_queried_concurrently():
+    local = StandInSearchBackend(LOCAL_DOCS, delay=0.2)
+    web = StandInSearchBackend(WEB_DOCS, delay=0.2)
+    searcher = FanOutSearcher([SearchSource('local_rag', local, timeout=2),
+                               SearchSource('web_search', web, timeout=2)])
+    started = time.time()
+    outcome = searcher.search('COBOL open environment', {'local_rag': 5, 'web_search': 5})
+    assert time.time() - started < 0.35
+    assert not outcome.partial
+    assert outcome.results['local_rag'][0]['source'] == 'manual/CALL.md'
+    assert outcome.status['web_search'] == {'status': 'ok', 'count': 1, 'time': outcome.status['web_search']['time']}
+
+
+def test_slow_source_gives_partial_results_and_fills_cache_later():
+    cache = TTLCache(ttl=60)
+    web = StandInSearchBackend(WEB_DOCS, delay=0.3)
+    searcher = FanOutSearcher([SearchSource('local_rag', StandInSearchBackend(LOCAL_DOCS), timeout=2),
+                               SearchSource('web_search', cached_web_search(cache, web), timeout=0.05)])
+    started = time.time()
+    outcome = searcher.search('cobol', {'local_rag': 5, 'web_search': 5})
+    assert time.time() - started < 0.2
+    assert outcome.partial
+    assert outcome.status['web_search']['status'] == 'timeout'
+    assert outcome.results['local_rag'] and outcome.results['web_search'] == []
+
+    time.sleep(0.4)  # the abandoned web search finishes in the background
+    outcome = searcher.search('  COBOL ', {'local_rag': 5, 'web_search': 5})
+    assert not outcome.partial
+    assert outcome.results['web_search'][0]['source'] == 'https://example.com/cobol'
+    assert web.calls == 1
+
+
+def test_failing_source_is_reported():
+    searcher = FanOutSearcher([SearchSource('local_rag', StandInSearchBackend(LOCAL_DOCS), timeout=1),
+                               SearchSource('web_search', StandInSearchBackend(WEB_DOCS, fail=True), timeout=1)])
+    outcome = searcher.search('sndmsg', {'local_rag': 5, 'web_search': 5})
+    assert outcome.status['web_search']['status'] == 'error'
+    assert [r['source'] for r in outcome.results['local_rag']] == ['manual/SNDMSG.md']
+
+    # Only sources with a limit are queried
+    assert list(searcher.search('sndmsg', {'local_rag': 1}).status) == ['local_rag']
+
+
+def test_ttl_cache_expires_and_evicts():
+    cache = TTLCache(ttl=0.05, max_entries=2)
+    cache.put('a', 1)
+    assert cache.get('a') == 1
+    time.sleep(0.06)
+    assert cache.get('a') is None
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.put('c', 3)
+    assert cache.get('a') is None and len(cache) == 2
+    assert cache.stats()['hits'] == 1
+
+
+if __name__ == "__main__":
+    test_normalize_query()
+    test_sources_are_queried_concurrently()
+    test_slow_source_gives_partial_results_and_fills_cache_later()
+    test_failing_source_is_reported()
+    test_ttl_cache_expires_and_evicts()
+    print("All search fan-out tests passed")
@@ -33,6 +33,8 @@ class WebSocketService {
   private heartbeatInterval: NodeJS.Timeout | null = null;
   private duplicateFilter: Set<string> = new Set();
   private filterCleanupInterval: NodeJS.Timeout | null = null;
+  // Last complete screen received via smed_display; delta updates apply to it
+  private screenState: { version: number; map_file: string; fields: Record<string, any> } | null = null;
 
   connect(apiUrl: string = 'http://localhost:8000') {
     if (this.socket?.connected) {
@@ -121,6 +123,7 @@ class WebSocketService {
       this.connectionHealth = false;
       this.stopHeartbeat();
       this.stopDuplicateFilterCleanup();
+      this.screenState = null;
       this.emit('hub_disconnected', { connected: false, reason });
     });
 
@@ -141,8 +144,12 @@ class WebSocketService {
     });
     
     // API server에서 보내는 smed_display 이벤트 처리 (서버에서 실제로 전송하는 이벤트)
-    this.socket.on('smed_display', (data: any) => {
+    const onSmedDisplay = (data: any) => {
       console.log('[DEBUG] WebSocket Hub: smed_display event triggered');
+      
+      // delta 업데이트는 마지막 화면에 적용하여 전체 화면으로 복원
+      data = this.applyScreenUpdate(data);
+      if (!data) return;
       console.log('[DEBUG] WebSocket Hub: Raw data from API server:', JSON.stringify(data, null, 2));
       
       // 서버에서 받은 형식을 smed_data_direct 형식으로 변환
@@ -164,10 +171,11 @@ class WebSocketService {
       
       console.log('[DEBUG] WebSocket Hub: Converted smed_display data:', JSON.stringify(convertedData, null, 2));
       this.handleSmedDataDirect(convertedData);
-    });
+    };
+    this.socket.on('smed_display', onSmedDisplay);
 
     // API server에서 보내는 smed_data_received 이벤트도 처리
-    this.socket.on('smed_data_received', (data: any) => {
+    const onSmedDataReceived = (data: any) => {
       console.log('[DEBUG] WebSocket Hub: smed_data_received event triggered');
       console.log('[DEBUG] WebSocket Hub: Raw data from API server:', JSON.stringify(data, null, 2));
       console.log('[DEBUG] WebSocket Hub: Data type:', typeof data);
@@ -202,6 +210,23 @@ class WebSocketService {
       
       console.log('[DEBUG] WebSocket Hub: Converted data structure:', JSON.stringify(convertedData, null, 2));
       this.handleSmedDataDirect(convertedData);
+    };
+    this.socket.on('smed_data_received', onSmedDataReceived);
+
+    // 서버는 짧은 시간 안에 쌓인 메시지를 hub_batch 하나로 묶어서 전송 (순서 유지)
+    const batchHandlers: { [event: string]: (data: any) => void } = {
+      smed_display: onSmedDisplay,
+      smed_data_received: onSmedDataReceived
+    };
+    this.socket.on('hub_batch', (batch: { messages: { event: string; data: any }[] }) => {
+      (batch?.messages || []).forEach(({ event, data }) => {
+        const handler = batchHandlers[event];
+        if (handler) {
+          handler(data);
+        } else {
+          console.warn('[WebSocket Hub] Unknown event in hub_batch:', event);
+        }
+      });
     });
     
     // Command confirmation 이벤트 처리
@@ -256,6 +281,30 @@ class WebSocketService {
     });
   }
 
+  private applyScreenUpdate(data: any): any | null {
+    if (data.update_mode !== 'delta') {
+      if (data.version !== undefined) {
+        this.screenState = { version: data.version, map_file: data.map_file, fields: { ...(data.fields || {}) } };
+      }
+      return data;
+    }
+
+    const state = this.screenState;
+    if (!state || state.map_file !== data.map_file || state.version !== data.base_version) {
+      console.warn('[WebSocket Hub] SMED update version gap, requesting resync:', {
+        current: state?.version, base: data.base_version, version: data.version
+      });
+      this.socket?.emit('smed_resync', { terminal_id: this.terminalId, version: state?.version ?? null });
+      return null;
+    }
+
+    const fields = { ...state.fields, ...(data.fields || {}) };
+    (data.removed_fields || []).forEach((name: string) => delete fields[name]);
+    this.screenState = { version: data.version, map_file: data.map_file, fields };
+
+    return { ...data, fields, update_mode: 'full', changed_fields: Object.keys(data.fields || {}) };
+  }
+
   private handleSmedDataDirect(data: SmedDataDirectEvent) {
     try {
       console.log('[DEBUG] WebSocket Hub: handleSmedDataDirect called - START');
@@ -55,11 +55,26 @@ interface ArtifactData {
   title?: string;
 }
 
+// Anyone holding a conversation id can continue that conversation on the
+// server, so it must be unguessable (128 random bits)
+const newConversationId = (): string => {
+  if (typeof crypto.randomUUID === 'function') {
+    return `chat-${crypto.randomUUID()}`;
+  }
+  // randomUUID is only available in secure contexts (HTTPS or localhost)
+  const bytes = crypto.getRandomValues(new Uint8Array(16));
+  return `chat-${Array.from(bytes, (byte) => byte.toString(16).padStart(2, '0')).join('')}`;
+};
+
 const ChatPage: React.FC<ChatPageProps> = ({ isDarkMode }) => {
   const { t } = useI18n();
   const [messages, setMessages] = useState<Message[]>([]);
   const [inputMessage, setInputMessage] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  const [streamingMessageId, setStreamingMessageId] = useState<string | null>(null);
+  const abortControllerRef = useRef<AbortController | null>(null);
+  // Lets the server continue the model's cached conversation state
+  const conversationIdRef = useRef<string>(newConversationId());
   const [attachedFiles, setAttachedFiles] = useState<FileData[]>([]);
   const fileInputRef = useRef<HTMLInputElement>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
@@ -87,6 +102,11 @@ const ChatPage: React.FC<ChatPageProps> = ({ isDarkMode }) => {
     scrollToBottom();
   }, [messages]);
 
+  // Cancel a running generation when leaving the page
+  useEffect(() => {
+    return () => abortControllerRef.current?.abort();
+  }, []);
+
   // Check API connection and load models on mount
   useEffect(() => {
     const checkApiConnection = async () => {
@@ -212,11 +232,13 @@ const ChatPage: React.FC<ChatPageProps> = ({ isDarkMode }) => {
         }>;
         use_rag: boolean;
         model: string;
+        conversation_id: string;
       } = {
         message: messageText,
         files: [],
         use_rag: useRAG && ragStatus === 'available',
-        model: selectedModel
+        model: selectedModel,
+        conversation_id: conversationIdRef.current
       };
 
       // Only process files if we have them and message sending works
@@ -264,45 +286,105 @@ const ChatPage: React.FC<ChatPageProps> = ({ isDarkMode }) => {
         model: selectedModel
       });
 
-      // Call our chat API backend
-      const response = await fetch('/api/chat', {
+      // Call our chat API backend; the answer is streamed as server-sent events
+      const controller = new AbortController();
+      abortControllerRef.current = controller;
+      const response = await fetch('/api/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify(requestPayload),
+        signal: controller.signal,
       });
 
       console.log('Response status:', response.status);
 
-      if (!response.ok) {
+      if (response.status === 429) {
+        // Model saturated: the server rejected the request early with a retry hint
+        const busy = await response.json();
+        setMessages(prev => [...prev, {
+          id: (Date.now() + 1).toString(),
+          type: 'assistant',
+          content: `モデルが混雑しています。${busy.retry_after || 1}秒後に再試行してください。`,
+          timestamp: new Date()
+        }]);
+        return;
+      }
+
+      if (!response.ok || !response.body) {
         const errorText = await response.text();
         console.error('API error response:', errorText);
         throw new Error(`HTTP error! status: ${response.status}, response: ${errorText}`);
       }
 
-      const data = await response.json();
-      console.log('Response data:', data);
+      const assistantId = (Date.now() + 1).toString();
+      const assistantMessage: Message = {
+        id: assistantId,
+        type: 'assistant',
+        content: '',
+        timestamp: new Date(),
+        ragResults: []
+      };
+      setMessages(prev => [...prev, assistantMessage]);
+      setStreamingMessageId(assistantId);
+
+      const updateAssistant = (changes: Partial<Message>) => {
+        setMessages(prev => prev.map(m => (m.id === assistantId ? { ...m, ...changes } : m)));
+      };
+
+      let responseText = '';
+      let processedFiles: any[] = [];
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary: number;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const block = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+
+          let event = 'message';
+          let payload = '';
+          block.split('\n').forEach(line => {
+            if (line.startsWith('event: ')) event = line.slice(7);
+            else if (line.startsWith('data: ')) payload += line.slice(6);
+          });
+          const data = payload ? JSON.parse(payload) : {};
+
+          if (event === 'start') {
+            processedFiles = data.processed_files || [];
+            updateAssistant({ ragResults: data.rag_results || [] });
+          } else if (event === 'queued') {
+            updateAssistant({ content: `順番待ち中... (${data.queue_depth})` });
+          } else if (event === 'token') {
+            responseText += data.text;
+            updateAssistant({ content: responseText });
+          } else if (event === 'done') {
+            console.log('Stream finished:', data);
+          } else if (event === 'error') {
+            throw new Error(data.error);
+          }
+        }
+      }
 
-      let responseText = data.response || 'Sorry, I could not generate a response.';
+      if (!responseText) {
+        responseText = 'Sorry, I could not generate a response.';
+      }
       
       // Add file processing information if available (keep this in main content)
-      if (data.processed_files && data.processed_files.length > 0) {
+      if (processedFiles.length > 0) {
         responseText += '\n\n📎 処理したファイル:';
-        data.processed_files.forEach((file: any) => {
+        processedFiles.forEach((file: any) => {
           responseText += `\n- ${file.description}`;
         });
       }
-
-      const assistantMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        type: 'assistant',
-        content: responseText,
-        timestamp: new Date(),
-        ragResults: data.rag_results || []
-      };
-
-      setMessages(prev => [...prev, assistantMessage]);
+      updateAssistant({ content: responseText });
       
       // Extract artifacts if Qwen2.5 Coder is selected
       if (shouldShowArtifactWindow) {
@@ -313,6 +395,10 @@ const ChatPage: React.FC<ChatPageProps> = ({ isDarkMode }) => {
         }
       }
     } catch (error) {
+      if (error instanceof DOMException && error.name === 'AbortError') {
+        console.log('Chat request cancelled');
+        return;
+      }
       console.error('Error calling chat API:', error);
       const errorMessage: Message = {
         id: (Date.now() + 1).toString(),
@@ -322,6 +408,8 @@ const ChatPage: React.FC<ChatPageProps> = ({ isDarkMode }) => {
       };
       setMessages(prev => [...prev, errorMessage]);
     } finally {
+      abortControllerRef.current = null;
+      setStreamingMessageId(null);
       setIsLoading(false);
     }
   };
@@ -334,6 +422,8 @@ const ChatPage: React.FC<ChatPageProps> = ({ isDarkMode }) => {
   };
 
   const clearChat = () => {
+    abortControllerRef.current?.abort();
+    conversationIdRef.current = newConversationId();
     setMessages([]);
     setAttachedFiles([]);
     setArtifactData(null);
@@ -637,7 +727,7 @@ const ChatPage: React.FC<ChatPageProps> = ({ isDarkMode }) => {
           ))
         )}
         
-        {isLoading && (
+        {isLoading && !streamingMessageId && (
           <div className="flex justify-start">
             <div className="flex">
               <div className="flex-shrink-0 mr-3">
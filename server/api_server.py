@@ -13,6 +13,7 @@ import subprocess
 import threading
 import time
 import signal
+import atexit
 import ctypes
 import psutil
 import shutil
@@ -28,6 +29,31 @@ try:
 except ImportError:
     SMART_ENCODING_AVAILABLE = False
 
+# Parsed SMED map cache (mtime-validated, evicted on /api/smed/save)
+from smed_map_cache import smed_map_cache, text_body
+
+# Per-terminal screen state for delta-encoded SMED updates
+from smed_screen_state import ScreenStateTracker, merge_screen_messages, position_update_key
+
+# Write-behind persistence for workstation sessions
+from session_store import WriteBehindSessionStore
+
+# Indexed terminal registry and per-terminal send queues for the WebSocket hub
+from terminal_registry import BROADCAST, TerminalRegistry, TerminalOutbox
+
+# Shared state for multi-worker deployments (memory://, redis://, broker://)
+from shared_state import create_state_store, SharedMap
+
+# Indexed execution log store with rotating on-disk segments
+from log_store import ExecutionLogStore, read_from_offset, tail_file
+
+# Position grid renderer (per-session buffers, full-width aware)
+from position_grid import position_grid_renderers, display_width
+
+# Negotiated compact wire formats for position-based SMED payloads
+from position_wire_format import (WIRE_FORMAT_JSON, encode_position_payload, map_definition,
+                                  map_definition_id, negotiate_wire_format, supported_wire_formats)
+
 # Import DBIO system for PostgreSQL catalog integration
 sys.path.append('/home/aspuser/app/server/system-cmds')
 try:
@@ -40,6 +66,23 @@ except ImportError as e:
     DBIO_AVAILABLE = False
     print(f"[API_SERVER] DBIO system not available, using JSON fallback: {e}")
 
+# Import job event bus for live REFJOB/DSPJOB job monitoring
+try:
+    from functions.job_events import (JobEventBus, JOB_STATUS_EVENT, JOB_LOG_EVENT,
+                                      ensure_publisher_token, is_publisher_auth)
+    JOB_EVENTS_AVAILABLE = True
+except ImportError as e:
+    JOB_EVENTS_AVAILABLE = False
+    print(f"[API_SERVER] Job event bus not available: {e}")
+
+# Import process supervisor for O(children) program cleanup and accounting
+try:
+    from functions.process_supervisor import process_supervisor
+    PROCESS_SUPERVISOR_AVAILABLE = True
+except ImportError as e:
+    PROCESS_SUPERVISOR_AVAILABLE = False
+    print(f"[API_SERVER] Process supervisor not available: {e}")
+
 # Import PostgreSQL session manager for enterprise features
 try:
     from postgresql_session_manager import PostgreSQLSessionManager
@@ -76,8 +119,19 @@ except ImportError as e:
 app = Flask(__name__)
 CORS(app, origins=['http://localhost:3005', 'http://localhost:3000', 'http://localhost:3007', 'http://localhost:3006'])
 
+# Multi-worker deployment: workers share state through ASP_STATE_STORE and
+# relay Socket.IO emits to each other through ASP_SOCKETIO_MESSAGE_QUEUE
+WORKER_ID = os.environ.get('ASP_WORKER_ID')
+STATE_STORE_URL = os.environ.get('ASP_STATE_STORE', 'memory://')
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('ASP_SOCKETIO_MESSAGE_QUEUE') or None
+state_store = create_state_store(STATE_STORE_URL)
+if state_store.shared:
+    logger.info(f"[WORKER] Worker {WORKER_ID} using shared state store {STATE_STORE_URL}, "
+                f"message queue {SOCKETIO_MESSAGE_QUEUE}")
+
 # Initialize SocketIO for WebSocket support
-socketio = SocketIO(app, cors_allowed_origins=['http://localhost:3005', 'http://localhost:3000', 'http://localhost:3007', 'http://localhost:3006'])
+socketio = SocketIO(app, cors_allowed_origins=['http://localhost:3005', 'http://localhost:3000', 'http://localhost:3007', 'http://localhost:3006'],
+                    message_queue=SOCKETIO_MESSAGE_QUEUE)
 
 # Register layout API routes
 if LAYOUT_API_AVAILABLE:
@@ -110,8 +164,16 @@ smed_pgm_config = {}
 map_pgm_config = {}
 java_manager = None
 
-# Log storage (keep last 1000 logs)
-execution_logs = deque(maxlen=1000)
+# Log storage: indexed ring buffer of recent records, spilled to rotating
+# segment files (execution[-w<worker>]-<start ms>.log) in LOGS_DIR
+LOGS_DIR = os.environ.get('ASP_LOGS_DIR', '/home/aspuser/app/logs')
+execution_logs = ExecutionLogStore(
+    capacity=int(os.environ.get('ASP_LOG_CAPACITY', '20000')),
+    segment_dir=LOGS_DIR,
+    segment_prefix='execution' + (f"-w{os.environ['ASP_WORKER_ID']}" if os.environ.get('ASP_WORKER_ID') else '')
+)
+execution_logs.start()
+atexit.register(execution_logs.stop)
 
 # ENHANCED WORKSTATION SESSION MANAGEMENT SYSTEM
 import threading
@@ -120,6 +182,10 @@ from typing import Dict, List, Optional, Any
 import uuid
 import json
 import os
+import atexit
+
+# Session fields that change on activity only; persisted by the periodic snapshot
+VOLATILE_SESSION_FIELDS = {'last_activity', 'websocket_rooms'}
 
 class WorkstationSessionManager:
     """Enhanced session manager for Workstation login/logout with position-based SMED integration"""
@@ -129,8 +195,24 @@ class WorkstationSessionManager:
         self.workstation_sessions: Dict[str, str] = {}  # wsname -> session_id
         self.user_sessions: Dict[str, List[str]] = {}  # user_id -> [session_ids]
         self.lock = threading.RLock()
-        self.session_file = os.path.join(CONFIG_DIR, 'workstation_sessions.json') if CONFIG_DIR else None
+        # Workers keep separate files; PostgreSQL is the shared session store.
+        # Not covered by ASP_STATE_STORE: a workstation session lives on the worker
+        # that created it, so multi-worker deployments need sticky routing per client
+        session_file_name = f'workstation_sessions.{WORKER_ID}.json' if WORKER_ID else 'workstation_sessions.json'
+        self.session_file = os.path.join(CONFIG_DIR, session_file_name) if CONFIG_DIR else None
+        self.store = WriteBehindSessionStore(self.session_file, self.lock, self._session_tables) if self.session_file else None
         self._load_sessions()
+        if self.store:
+            self.store.start()
+            atexit.register(self.store.stop)
+    
+    def _session_tables(self) -> Dict[str, Any]:
+        """Tables persisted by the session store (called with the lock held)"""
+        return {
+            'sessions': self.sessions,
+            'workstation_sessions': self.workstation_sessions,
+            'user_sessions': self.user_sessions
+        }
     
     def create_session(self, wsname: str, user_id: str, terminal_id: str = None, 
                       display_mode: str = 'legacy', encoding: str = 'sjis') -> str:
@@ -169,16 +251,18 @@ class WorkstationSessionManager:
             self.user_sessions[user_id].append(session_id)
             
             # Maintain backward compatibility
-            active_terminals[session_id] = {
+            terminal_registry.register(session_id, {
                 'terminal_id': terminal_id or wsname,
                 'user': user_id,
                 'room': f'terminal_{terminal_id or wsname}',
                 'workstation': wsname,
                 'session_data': session_data
-            }
-            terminal_to_session[terminal_id or wsname] = session_id
+            })
             
-            self._save_sessions()
+            if self.store:
+                self.store.log_set('sessions', session_id, session_data)
+                self.store.log_set('workstation_sessions', wsname, session_id)
+                self.store.log_set('user_sessions', user_id, self.user_sessions[user_id])
             logger.info(f"Created workstation session: {session_id} for {wsname} (user: {user_id})")
             return session_id
     
@@ -210,6 +294,9 @@ class WorkstationSessionManager:
             if session_id not in self.sessions:
                 return False
             
+            # Activity-only updates are left to the periodic snapshot
+            volatile = set(updates) <= VOLATILE_SESSION_FIELDS
+            
             # Update last activity
             updates['last_activity'] = datetime.now(timezone.utc).isoformat()
             
@@ -217,14 +304,22 @@ class WorkstationSessionManager:
             self.sessions[session_id].update(updates)
             
             # Update backward compatibility data
-            if session_id in active_terminals:
-                if 'user_id' in updates:
-                    active_terminals[session_id]['user'] = updates['user_id']
-                active_terminals[session_id]['session_data'] = self.sessions[session_id]
-            
-            self._save_sessions()
+            terminal_fields = {'session_data': self.sessions[session_id]}
+            if 'user_id' in updates:
+                terminal_fields['user'] = updates['user_id']
+            terminal_registry.update(session_id, **terminal_fields)
+            
+            if self.store:
+                if volatile:
+                    self.store.mark_dirty()
+                else:
+                    self.store.log_set('sessions', session_id, self.sessions[session_id])
             return True
     
+    def touch_session(self, session_id: str) -> bool:
+        """Record activity on a session (in memory; written by the next snapshot)"""
+        return self.update_session(session_id, {})
+    
     def set_display_mode(self, wsname: str, display_mode: str) -> bool:
         """Set display mode for workstation session"""
         session = self.get_session_by_workstation(wsname)
@@ -293,11 +388,12 @@ class WorkstationSessionManager:
             session = self.sessions[session_id]
             wsname = session.get('wsname')
             user_id = session.get('user_id')
-            terminal_id = session.get('terminal_id')
             
             # Remove from workstation mapping
             if wsname and wsname in self.workstation_sessions:
                 del self.workstation_sessions[wsname]
+                if self.store:
+                    self.store.log_delete('workstation_sessions', wsname)
             
             # Remove from user sessions
             if user_id and user_id in self.user_sessions:
@@ -305,41 +401,40 @@ class WorkstationSessionManager:
                     self.user_sessions[user_id].remove(session_id)
                 if not self.user_sessions[user_id]:
                     del self.user_sessions[user_id]
+                    if self.store:
+                        self.store.log_delete('user_sessions', user_id)
+                elif self.store:
+                    self.store.log_set('user_sessions', user_id, self.user_sessions[user_id])
             
             # Cleanup backward compatibility
-            if session_id in active_terminals:
-                del active_terminals[session_id]
-            if terminal_id and terminal_id in terminal_to_session:
-                del terminal_to_session[terminal_id]
+            terminal_registry.unregister(session_id)
             
             # Remove session
             del self.sessions[session_id]
-            
-            self._save_sessions()
+            if self.store:
+                self.store.log_delete('sessions', session_id)
     
     def _save_sessions(self):
-        """Save sessions to file"""
-        if not self.session_file:
-            return
-        
+        """Schedule a snapshot of all sessions (written by the background flusher)"""
+        if self.store:
+            self.store.mark_dirty()
+    
+    def flush_sessions(self) -> bool:
+        """Write pending session changes to disk now"""
         try:
-            with open(self.session_file, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'sessions': self.sessions,
-                    'workstation_sessions': self.workstation_sessions,
-                    'user_sessions': self.user_sessions
-                }, f, indent=2, ensure_ascii=False)
+            return self.store.flush() if self.store else False
         except Exception as e:
             logger.warning(f"Failed to save sessions: {e}")
+            return False
     
     def _load_sessions(self):
-        """Load sessions from file"""
-        if not self.session_file or not os.path.exists(self.session_file):
+        """Load sessions from snapshot and change log"""
+        if not self.store:
             return
         
         try:
-            with open(self.session_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with self.lock:
+                data = self.store.load()
                 self.sessions = data.get('sessions', {})
                 self.workstation_sessions = data.get('workstation_sessions', {})
                 self.user_sessions = data.get('user_sessions', {})
@@ -347,14 +442,13 @@ class WorkstationSessionManager:
                 # Restore backward compatibility data
                 for session_id, session in self.sessions.items():
                     if session.get('status') == 'ON':
-                        active_terminals[session_id] = {
+                        terminal_registry.register(session_id, {
                             'terminal_id': session.get('terminal_id'),
                             'user': session.get('user_id'),
                             'room': f"terminal_{session.get('terminal_id')}",
                             'workstation': session.get('wsname'),
                             'session_data': session
-                        }
-                        terminal_to_session[session.get('terminal_id')] = session_id
+                        })
                 
                 logger.info(f"Loaded {len(self.sessions)} sessions from storage")
         except Exception as e:
@@ -432,12 +526,18 @@ class WorkstationSessionManager:
                         sessions.append(dict(session))
         return sessions
 
-# Initialize session manager
-workstation_session_manager = WorkstationSessionManager()
+# Terminal/Session routing: session_id -> {'terminal_id', 'user', 'workstation', 'room', ...}
+# indexed by terminal_id, user and workstation
+terminal_registry = TerminalRegistry(store=state_store if state_store.shared else None)
 
-# Legacy Terminal/Session Management (for backward compatibility)
-active_terminals = {}  # {session_id: {'terminal_id': str, 'user': str, 'room': str}}
-terminal_to_session = {}  # {terminal_id: session_id}
+# Hub emits are queued per terminal (BROADCAST for all clients) and sent by a
+# background dispatcher in few-millisecond batches; room None broadcasts
+terminal_outbox = TerminalOutbox(flush_window=float(os.environ.get('ASP_HUB_FLUSH_WINDOW', '0.005')))
+socketio.start_background_task(
+    terminal_outbox.run, lambda event, room, payload: socketio.emit(event, payload, room=room))
+
+# Initialize session manager (after the registry it restores on load)
+workstation_session_manager = WorkstationSessionManager()
 
 def convert_sjis_to_unicode(raw_bytes, destination='web_ui'):
     """
@@ -983,7 +1083,7 @@ def connect(sid, environ):
 # Removed catch_all function due to SocketIO compatibility issues
 
 @socketio.on('connect')  
-def handle_connect():
+def handle_connect(auth=None):
     """Handle client connection"""
     client_info = {
         'session_id': request.sid,
@@ -999,6 +1099,8 @@ def handle_connect():
     # PostgreSQL session will be created when client registers with specific WSNAME
     # Store connection info for now
     websocket_sessions[request.sid] = {'wsname': None, 'user': None, 'registered': False}
+    if job_event_publisher_token and is_publisher_auth(auth, job_event_publisher_token):
+        websocket_sessions[request.sid]['job_publisher'] = True
     
     # Send connection confirmation with debug info
     emit('connected', {
@@ -1061,20 +1163,18 @@ def handle_disconnect():
         logger.error(f"Error cleaning up interactive session: {e}")
     
     # Clean up terminal registration
-    if request.sid in active_terminals:
-        terminal_info = active_terminals[request.sid]
+    terminal_info = terminal_registry.unregister(request.sid)
+    if terminal_info is not None:
         terminal_id = terminal_info.get('terminal_id')
         
         logger.info(f"[WEBSOCKET] Cleaning up terminal registration: {terminal_id}")
         disconnect_info['terminal_id'] = terminal_id
         disconnect_info['terminal_info'] = terminal_info
         
-        if terminal_id and terminal_id in terminal_to_session:
-            del terminal_to_session[terminal_id]
+        if terminal_id and terminal_registry.session_for_terminal(terminal_id) is None:
+            terminal_outbox.discard(terminal_id)
             logger.info(f"[WEBSOCKET] Removed terminal mapping: {terminal_id}")
         
-        del active_terminals[request.sid]
-        
         # Notify others in the room
         if 'room' in terminal_info:
             leave_room(terminal_info['room'])
@@ -1092,7 +1192,7 @@ def handle_disconnect():
         if session_info and session_info.get('subscriptions'):
             for map_name in session_info['subscriptions']:
                 room_name = f'position_smed_{map_name}'
-                leave_room(room_name)
+                leave_position_room(request.sid, room_name)
                 logger.info(f"[WEBSOCKET] Left position SMED room: {room_name}")
         
         # Unregister the session
@@ -1131,29 +1231,20 @@ def handle_register_terminal(data):
     logger.info(f"[TERMINAL_REG] Registering terminal: {terminal_id} for session: {session_id}")
     logger.info(f"[TERMINAL_REG] Registration details: {registration_info}")
     
-    # Check if terminal_id is already registered
-    if terminal_id in terminal_to_session and terminal_to_session[terminal_id] != session_id:
-        existing_session = terminal_to_session[terminal_id]
-        logger.warning(f"[TERMINAL_REG] Terminal ID {terminal_id} already registered to session {existing_session}")
-        
-        # Clean up old registration
-        if existing_session in active_terminals:
-            del active_terminals[existing_session]
-        
-        logger.info(f"[TERMINAL_REG] Overriding existing registration for terminal: {terminal_id}")
-    
-    # Store terminal registration
-    active_terminals[session_id] = {
+    # Store terminal registration and map terminal ID to session for routing;
+    # an older registration of the same terminal ID is cleaned up
+    existing_session = terminal_registry.register(session_id, {
         'terminal_id': terminal_id,
         'user': user,
         'workstation': workstation,
         'room': f'terminal_{terminal_id}',
         'connected_at': datetime.now().isoformat(),
         'registration_data': data
-    }
+    }, replace_existing=True)
     
-    # Map terminal ID to session for routing
-    terminal_to_session[terminal_id] = session_id
+    if existing_session:
+        logger.warning(f"[TERMINAL_REG] Terminal ID {terminal_id} already registered to session {existing_session}")
+        logger.info(f"[TERMINAL_REG] Overriding existing registration for terminal: {terminal_id}")
     
     # Join terminal-specific room
     join_room(f'terminal_{terminal_id}')
@@ -1273,13 +1364,13 @@ def handle_register_client(data):
             'status': 'registered'
         }
         
-        # Store in active terminals for tracking
-        active_terminals[session_id] = {
+        # Store in terminal registry for tracking (not routed by terminal ID)
+        terminal_registry.register(session_id, {
             'terminal_id': client_id,
             'user': 'hub_client',
             'room': f'hub_client_{session_id}',
             'client_info': client_info
-        }
+        }, map_terminal=False)
         
         logger.info(f"[HUB_CLIENT_REG] Client registered successfully: {client_id}")
         
@@ -1329,16 +1420,17 @@ def handle_hub_register(data):
             'status': 'registered'
         }
         
-        # Store in active terminals
-        active_terminals[session_id] = {
+        # Store in terminal registry and update terminal mapping
+        terminal_registry.register(session_id, {
             'terminal_id': terminal_id,
             'user': user,
+            'workstation': wsname,
             'room': f'terminal_{terminal_id}',
             'hub_info': terminal_info
-        }
+        })
         
-        # Update terminal mapping
-        terminal_to_session[terminal_id] = session_id
+        # (Re)registered client has no screen yet: next SMED update is a full snapshot
+        smed_screen_tracker.reset(terminal_id)
         
         # Create or update session in both managers
         # First, update workstation_session_manager (used by API v1 endpoints)
@@ -1443,18 +1535,13 @@ def handle_smed_data_direct(data):
         
         # Handle new employee data format (type: 'smed_map' with data array)
         if data.get('type') == 'smed_map' and data.get('data'):
-            print(f"[DEBUG] API Server: Processing new employee data format")
-            print(f"[DEBUG] API Server: Raw employee data received: {json.dumps(data, indent=2)}")
-            print(f"[DEBUG] API Server: Employee data count: {len(data.get('data', []))}")
-            print(f"[DEBUG] API Server: Headers: {data.get('headers', [])}")
-            logger.info(f"[WEBSOCKET_HUB] Processing new employee data format")
+            logger.info(f"[WEBSOCKET_HUB] Processing new employee data format: "
+                        f"{len(data.get('data', []))} rows")
             
-            # Forward new format directly to terminals
-            print(f"[DEBUG] API Server: About to emit smed_data_received with broadcast=True")
-            print(f"[DEBUG] API Server: Data being broadcast: {json.dumps(data, indent=2)}")
-            
-            emit('smed_data_received', data, broadcast=True)
-            print(f"[DEBUG] API Server: smed_data_received event emitted successfully")
+            # Forward new format to all terminals; a newer update for the same
+            # map replaces one still waiting in the broadcast queue
+            terminal_outbox.enqueue(BROADCAST, None, 'smed_data_received', data,
+                                    coalesce_key=data.get('map_name') or data.get('program') or terminal_id)
             
             # Send confirmation
             confirmation_data = {
@@ -1466,7 +1553,6 @@ def handle_smed_data_direct(data):
                 'timestamp': datetime.now().isoformat(),
                 'message': f'Employee data delivered via WebSocket Hub'
             }
-            print(f"[DEBUG] API Server: Sending confirmation: {json.dumps(confirmation_data, indent=2)}")
             emit('smed_data_confirmation', confirmation_data)
             
             add_log('INFO', 'WEBSOCKET_HUB', f'Employee data processed: {terminal_id}', {
@@ -1550,8 +1636,8 @@ def handle_terminal_output(data):
     output_data = data.get('data', '')
     output_type = data.get('type', 'text')
     
-    if session_id in active_terminals:
-        terminal_info = active_terminals[session_id]
+    terminal_info = terminal_registry.get(session_id)
+    if terminal_info is not None:
         terminal_id = terminal_info.get('terminal_id')
         
         logger.info(f"Terminal output from {terminal_id}: {output_type}")
@@ -1572,6 +1658,123 @@ def handle_terminal_output(data):
                 'status': 'processed'
             })
 
+# Job event relay: job processors (aspcli/cmd_runner processes) forward their
+# status changes and log lines here; the relay fans them out to Socket.IO rooms
+JOB_MONITOR_ROOM = 'job_monitor'
+job_event_relay = JobEventBus() if JOB_EVENTS_AVAILABLE else None
+job_event_publisher_token = None
+if JOB_EVENTS_AVAILABLE:
+    try:
+        job_event_publisher_token = ensure_publisher_token()
+    except OSError as e:
+        print(f"[API_SERVER] Job event publisher token unavailable, relay disabled: {e}")
+
+def _emit_job_event(event):
+    """Push a relayed job event to the job's room (and status changes to monitors)"""
+    job_id = event.get('job_id')
+    socketio.emit(event.get('type'), event, room=f'job_{job_id}')
+    if event.get('type') == JOB_STATUS_EVENT:
+        socketio.emit(JOB_STATUS_EVENT, event, room=JOB_MONITOR_ROOM)
+
+if job_event_relay is not None:
+    job_event_relay.subscribe(_emit_job_event)
+
+@socketio.on('job_event')
+def handle_job_event(data):
+    """Receive a job event from a job processor and relay it to subscribers
+
+    Only connections that authenticated with the publisher token may publish.
+    """
+    if not websocket_sessions.get(request.sid, {}).get('job_publisher'):
+        logger.warning(f"[WEBSOCKET] Rejected job_event from unauthenticated client: {request.sid}")
+        return
+    if job_event_relay is None or not isinstance(data, dict) or not data.get('job_id'):
+        return
+    if data.get('type') not in (JOB_STATUS_EVENT, JOB_LOG_EVENT):
+        return
+    job_event_relay.dispatch(data)
+
+@socketio.on('job_subscribe')
+def handle_job_subscribe(data):
+    """Subscribe to live job events
+
+    With job_id: join the job's room and replay buffered events after since_seq.
+    Without job_id: join the monitor room and receive every job status change.
+    """
+    data = data or {}
+    job_id = data.get('job_id')
+    if job_event_relay is None:
+        emit('job_subscribe_error', {'error': 'Job event bus not available'})
+        return
+
+    if not job_id:
+        join_room(JOB_MONITOR_ROOM)
+        emit('job_subscribed', {'success': True, 'room': JOB_MONITOR_ROOM})
+        return
+
+    room_name = f'job_{job_id}'
+    join_room(room_name)
+    emit('job_subscribed', {
+        'success': True,
+        'job_id': job_id,
+        'room': room_name,
+        'backlog': job_event_relay.recent_events(job_id, int(data.get('since_seq', 0) or 0))
+    })
+
+@socketio.on('job_unsubscribe')
+def handle_job_unsubscribe(data):
+    """Unsubscribe from live job events"""
+    job_id = (data or {}).get('job_id')
+    leave_room(f'job_{job_id}' if job_id else JOB_MONITOR_ROOM)
+    emit('job_unsubscribed', {'success': True, 'job_id': job_id})
+
+# Last SMED screen sent to each terminal / position map room; shared between
+# workers, so a resync handled by any worker finds the screen another one sent
+smed_screen_tracker = ScreenStateTracker(store=state_store if state_store.shared else None,
+                                         namespace='smed_screens')
+position_screen_tracker = ScreenStateTracker(store=state_store if state_store.shared else None,
+                                             namespace='position_screens')
+
+def build_smed_display_message(terminal_id: str, session_id: str, program_name: str, screen_update) -> dict:
+    """Build a smed_display event from a versioned (full or delta) screen update"""
+    smed_message = screen_update.to_message()
+    smed_message.update({
+        'action': 'display_map',
+        'timestamp': datetime.now().isoformat(),
+        'terminal_id': terminal_id,
+        'session_id': session_id,
+        'program_name': program_name,
+        'hub_source': 'websocket_hub',
+        'hub_version': '1.0',
+        'data_flow': 'single_channel'  # Indicates this bypassed HTTP API
+    })
+    return smed_message
+
+@socketio.on('smed_resync')
+def handle_smed_resync(data):
+    """Client detected a version gap (or lost its screen): send a full snapshot"""
+    # Only the screen of the terminal this socket registered as
+    terminal_info = terminal_registry.get(request.sid)
+    requested = (data or {}).get('terminal_id')
+    if terminal_info is None:
+        emit('smed_resync_error', {'terminal_id': requested, 'error': 'Socket is not registered to a terminal'})
+        return
+    terminal_id = terminal_info['terminal_id']
+    if requested and requested != terminal_id:
+        logger.warning(f"[WEBSOCKET_HUB] Rejected resync of terminal {requested} from session "
+                       f"{request.sid} registered as {terminal_id}")
+        emit('smed_resync_error', {'terminal_id': requested, 'error': 'Not registered to this terminal'})
+        return
+    snapshot = smed_screen_tracker.snapshot(terminal_id)
+    if snapshot is None:
+        emit('smed_resync_error', {'terminal_id': terminal_id, 'error': 'No screen sent to terminal yet'})
+        return
+    logger.info(f"[WEBSOCKET_HUB] Resync for terminal {terminal_id}: client version "
+                f"{(data or {}).get('version')}, snapshot version {snapshot.version}")
+    # Through the terminal's queue, so deltas still pending there are sent before the snapshot
+    terminal_outbox.enqueue(terminal_id, request.sid, 'smed_display',
+                            build_smed_display_message(terminal_id, request.sid, 'resync', snapshot))
+
 def send_smed_to_terminal(terminal_id: str, map_file: str, fields: dict):
     """Legacy function - redirects to WebSocket Hub"""
     logger.info(f"[WEBSOCKET_HUB] Legacy send_smed_to_terminal called, redirecting to hub")
@@ -1590,40 +1793,38 @@ def send_smed_to_terminal_hub(terminal_id: str, map_file: str, fields: dict, pro
     }
     
     logger.info(f"[WEBSOCKET_HUB] Centralized SMED transmission to terminal: {terminal_id}")
-    logger.info(f"[WEBSOCKET_HUB] Active terminals: {list(active_terminals.keys())}")
-    logger.info(f"[WEBSOCKET_HUB] Terminal mappings: {terminal_to_session}")
     
-    if terminal_id in terminal_to_session:
-        session_id = terminal_to_session[terminal_id]
+    session_id = terminal_registry.session_for_terminal(terminal_id)
+    if session_id:
         room_name = f'terminal_{terminal_id}'
         
-        logger.info(f"[WEBSOCKET_HUB] Terminal {terminal_id} → Session {session_id} → Room {room_name}")
+        logger.debug(f"[WEBSOCKET_HUB] Terminal {terminal_id} → Session {session_id} → Room {room_name}")
         
-        # Enhanced SMED message with hub metadata
-        smed_message = {
-            'map_file': map_file,
-            'fields': fields,
-            'action': 'display_map',
-            'timestamp': datetime.now().isoformat(),
-            'terminal_id': terminal_id,
-            'session_id': session_id,
-            'program_name': program_name,
-            'hub_source': 'websocket_hub',
-            'hub_version': '1.0',
-            'data_flow': 'single_channel'  # Indicates this bypassed HTTP API
-        }
+        # Enhanced SMED message with hub metadata; only changed fields are sent
+        # once the terminal has a screen (full snapshot on first display/map change)
+        screen_update = smed_screen_tracker.update(terminal_id, map_file, fields)
+        smed_message = build_smed_display_message(terminal_id, session_id, program_name, screen_update)
+        hub_send_info.update({
+            'update_mode': screen_update.mode,
+            'version': screen_update.version,
+            'sent_fields_count': len(screen_update.fields)
+        })
         
         try:
-            # Single WebSocket emission (no HTTP duplication)
-            socketio.emit('smed_display', smed_message, room=room_name)
-            logger.info(f"[WEBSOCKET_HUB] Single-channel SMED data sent to room: {room_name}")
+            # Single WebSocket emission (no HTTP duplication), queued per terminal;
+            # an update still pending for the screen is merged with this one, and
+            # a dropped update shows up as a version gap and the client resyncs
+            queued = terminal_outbox.enqueue(terminal_id, room_name, 'smed_display', smed_message,
+                                             coalesce_key='screen', merge=merge_screen_messages)
+            logger.info(f"[WEBSOCKET_HUB] Single-channel SMED data queued for room: {room_name}")
             
             # Hub success confirmation
             hub_send_info.update({
                 'success': True,
                 'session_id': session_id,
                 'room_name': room_name,
-                'bypass_http': True
+                'bypass_http': True,
+                'dropped_pending': not queued
             })
             
             add_log('INFO', 'WEBSOCKET_HUB', f'Hub transmission successful: {terminal_id}', hub_send_info)
@@ -1640,12 +1841,11 @@ def send_smed_to_terminal_hub(terminal_id: str, map_file: str, fields: dict, pro
             return False
     else:
         logger.warning(f"[WEBSOCKET_HUB] Terminal not connected to hub: {terminal_id}")
-        logger.warning(f"[WEBSOCKET_HUB] Available hub terminals: {list(terminal_to_session.keys())}")
         
         hub_send_info.update({
             'success': False,
             'error': 'Terminal not connected to hub',
-            'available_terminals': list(terminal_to_session.keys())
+            'connected_terminals': terminal_registry.stats()['terminals']
         })
         
         add_log('WARNING', 'WEBSOCKET_HUB', f'Terminal not in hub: {terminal_id}', hub_send_info)
@@ -1845,7 +2045,11 @@ def health_check():
         'smed_pgm_maps': len(smed_pgm_config),
         'map_pgm_maps': len(map_pgm_config.get('maps', {})),
         'java_available': multi_executor.java_available if multi_executor else False,
-        'jar_exists': os.path.exists(multi_executor.jar_path) if multi_executor and multi_executor.jar_path else False
+        'jar_exists': os.path.exists(multi_executor.jar_path) if multi_executor and multi_executor.jar_path else False,
+        'smed_map_cache': smed_map_cache.stats(),
+        'position_grid_renderers': position_grid_renderers.stats(),
+        'execution_logs': execution_logs.stats(),
+        'session_store': workstation_session_manager.store.stats() if workstation_session_manager.store else None
     })
 
 @app.route('/broadcast-smed', methods=['POST'])
@@ -1858,10 +2062,12 @@ def broadcast_smed():
         
         logger.info(f"[BROADCAST_SMED] Received SMED data for broadcast: {data.get('program', 'unknown')}")
         
-        # Broadcast to all connected Socket.IO clients
-        socketio.emit('smed_data_received', data)
+        # Broadcast to all connected Socket.IO clients, batched with other
+        # pending broadcasts; a newer update for the same map supersedes this one
+        terminal_outbox.enqueue(BROADCAST, None, 'smed_data_received', data,
+                                coalesce_key=data.get('map_name') or data.get('program'))
         
-        logger.info(f"[BROADCAST_SMED] Successfully broadcasted SMED data")
+        logger.info(f"[BROADCAST_SMED] SMED data queued for broadcast")
         
         return jsonify({
             'status': 'success',
@@ -1882,11 +2088,11 @@ def get_smed_map(map_name):
     if not file_path:
         return jsonify({'error': f'SMED file not found: {map_name}'}), 404
     
-    smed_data = parse_smed_file(file_path)
-    if not smed_data:
+    cached = smed_map_cache.get(file_path, 'parsed', parse_smed_file)
+    if not cached:
         return jsonify({'error': f'Failed to parse SMED file: {map_name}'}), 500
     
-    return jsonify(smed_data)
+    return app.response_class(cached.body, mimetype='application/json')
 
 @app.route('/api/smed/logo', methods=['GET'])
 def get_logo_map():
@@ -2371,12 +2577,10 @@ def migrate_workstation_session():
             return jsonify({'error': 'terminal_id, wsname, and user_id required'}), 400
         
         # Check if legacy session exists
-        legacy_session_id = terminal_to_session.get(terminal_id)
-        if not legacy_session_id or legacy_session_id not in active_terminals:
+        legacy_session_id, legacy_session = terminal_registry.lookup_terminal(terminal_id)
+        if legacy_session is None:
             return jsonify({'error': 'Legacy session not found'}), 404
         
-        legacy_session = active_terminals[legacy_session_id]
-        
         # Create new workstation session
         new_session_id = workstation_session_manager.create_session(
             wsname=wsname,
@@ -2419,8 +2623,9 @@ def check_workstation_compatibility():
     try:
         # Check for legacy sessions that could be migrated
         legacy_sessions = []
-        for session_id, terminal_info in active_terminals.items():
-            if session_id not in [s.get('session_id') for s in workstation_session_manager.list_all_sessions()]:
+        workstation_session_ids = {s.get('session_id') for s in workstation_session_manager.list_all_sessions()}
+        for session_id, terminal_info in terminal_registry.items():
+            if session_id not in workstation_session_ids:
                 legacy_sessions.append({
                     'session_id': session_id,
                     'terminal_id': terminal_info.get('terminal_id'),
@@ -2473,8 +2678,9 @@ def auto_migrate_workstation_sessions():
         failed_migrations = []
         
         # Find legacy sessions to migrate
-        for session_id, terminal_info in list(active_terminals.items()):
-            if session_id not in [s.get('session_id') for s in workstation_session_manager.list_all_sessions()]:
+        workstation_session_ids = {s.get('session_id') for s in workstation_session_manager.list_all_sessions()}
+        for session_id, terminal_info in terminal_registry.items():
+            if session_id not in workstation_session_ids:
                 try:
                     terminal_id = terminal_info.get('terminal_id')
                     user_id = terminal_info.get('user')
@@ -2786,6 +2992,7 @@ def save_smed_file():
         
         with open(file_path, 'w', encoding=encoding, errors='replace') as f:
             f.write(content)
+        smed_map_cache.invalidate(file_path)
         logger.info(f"SAVE DEBUG: File written successfully with {encoding} encoding")
         
         # Verify file was saved with correct encoding
@@ -2904,6 +3111,57 @@ def get_smed_content(filename):
         logger.error(f"SMEDファイル内容取得エラー: {e}")
         return jsonify({'error': str(e)}), 500
 
+def read_smed_volume_content(file_path):
+    """Read a volume SMED map as text (loader for smed_map_cache)"""
+    # File hex analysis shows Japanese text is SJIS encoded (83 81 = メ, etc.)
+    try:
+        logger.info(f"SMED File DEBUG: Reading file with SJIS encoding: {file_path}")
+        print(f"CONSOLE DEBUG: Using SJIS encoding for: {file_path}", flush=True)
+        
+        # Use SJIS encoding (hex analysis shows 83 81 83 43 83 93... = メインン...)
+        with open(file_path, 'r', encoding='shift_jis', errors='replace') as f:
+            content = f.read()
+        
+        logger.info(f"SMED File DEBUG: SJIS read completed, length: {len(content)}")
+        
+        # Verify if we got proper Japanese characters
+        if 'OpenASP' in content:
+            title2_line = next((line for line in content.split('\n') if 'TITLE2' in line and 'OpenASP' in line), None)
+            if title2_line:
+                openasp_pos = title2_line.find('OpenASP')
+                if openasp_pos >= 0:
+                    japanese_part = title2_line[openasp_pos+8:openasp_pos+18].strip()
+                    unicode_points = [ord(c) for c in japanese_part[:5]]  # First 5 chars
+                    logger.info(f"SMED File DEBUG: Japanese part Unicode: {unicode_points}")
+                    
+                    # Check if we got proper Japanese characters (Katakana range: 12448-12543)
+                    if any(12448 <= point <= 12543 for point in unicode_points):
+                        logger.info("SMED File DEBUG: Proper Japanese characters detected with SJIS")
+                    else:
+                        logger.warning(f"SMED File DEBUG: Check Unicode range: {unicode_points}")
+        
+    except Exception as fallback_e:
+        logger.warning(f"SJIS read failed, trying UTF-8 fallback: {fallback_e}")
+        # Fallback to UTF-8
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                content = f.read()
+        except Exception:
+            # Last resort - read as binary and decode with smart conversion
+            with open(file_path, 'rb') as f:
+                raw_content = f.read()
+            # API response destination - conversion may be needed for web UI
+            content = convert_sjis_to_unicode(raw_content, destination='api')
+    
+    # DEBUG: Check final content before returning
+    logger.info(f"FINAL RESPONSE DEBUG: Content length: {len(content)}")
+    content_sample = content[content.find('OpenASP'):content.find('OpenASP')+20] if 'OpenASP' in content else 'OpenASP not found'
+    logger.info(f"FINAL RESPONSE DEBUG: Content sample: {repr(content_sample)}")
+    logger.info(f"FINAL RESPONSE DEBUG: Content sample UTF-8 bytes: {content_sample.encode('utf-8').hex()}")
+    print(f"CONSOLE DEBUG: Final response content type: {type(content)}, length: {len(content)}", flush=True)
+    
+    return content
+
 @app.route('/api/smed/content/<volume>/<library>/<mapname>', methods=['GET'])
 def get_smed_content_from_volume(volume, library, mapname):
     """볼륨/라이브러리 구조의 SMEDファイル内容取得"""
@@ -2925,56 +3183,13 @@ def get_smed_content_from_volume(volume, library, mapname):
             logger.warning(f"SMED file not found: {file_path}")
             return jsonify({'error': f'File not found: {volume}/{library}/{mapname}'}), 404
         
-        # File hex analysis shows Japanese text is SJIS encoded (83 81 = メ, etc.)
-        try:
-            logger.info(f"SMED File DEBUG: Reading file with SJIS encoding: {file_path}")
-            print(f"CONSOLE DEBUG: Using SJIS encoding for: {file_path}", flush=True)
-            
-            # Use SJIS encoding (hex analysis shows 83 81 83 43 83 93... = メインン...)
-            with open(file_path, 'r', encoding='shift_jis', errors='replace') as f:
-                content = f.read()
-            
-            logger.info(f"SMED File DEBUG: SJIS read completed, length: {len(content)}")
-            
-            # Verify if we got proper Japanese characters
-            if 'OpenASP' in content:
-                title2_line = next((line for line in content.split('\n') if 'TITLE2' in line and 'OpenASP' in line), None)
-                if title2_line:
-                    openasp_pos = title2_line.find('OpenASP')
-                    if openasp_pos >= 0:
-                        japanese_part = title2_line[openasp_pos+8:openasp_pos+18].strip()
-                        unicode_points = [ord(c) for c in japanese_part[:5]]  # First 5 chars
-                        logger.info(f"SMED File DEBUG: Japanese part Unicode: {unicode_points}")
-                        
-                        # Check if we got proper Japanese characters (Katakana range: 12448-12543)
-                        if any(12448 <= point <= 12543 for point in unicode_points):
-                            logger.info("SMED File DEBUG: Proper Japanese characters detected with SJIS")
-                        else:
-                            logger.warning(f"SMED File DEBUG: Check Unicode range: {unicode_points}")
-            
-        except Exception as fallback_e:
-            logger.warning(f"SJIS read failed, trying UTF-8 fallback: {fallback_e}")
-            # Fallback to UTF-8
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                    content = f.read()
-            except Exception:
-                # Last resort - read as binary and decode with smart conversion
-                with open(file_path, 'rb') as f:
-                    raw_content = f.read()
-                # API response destination - conversion may be needed for web UI
-                content = convert_sjis_to_unicode(raw_content, destination='api')
+        cached = smed_map_cache.get(file_path, 'content', read_smed_volume_content, text_body)
+        if not cached:
+            return jsonify({'error': f'File not found: {volume}/{library}/{mapname}'}), 404
         
         logger.info(f"Successfully loaded SMED content from {volume}/{library}/{mapname}")
         
-        # DEBUG: Check final content before returning
-        logger.info(f"FINAL RESPONSE DEBUG: Content length: {len(content)}")
-        content_sample = content[content.find('OpenASP'):content.find('OpenASP')+20] if 'OpenASP' in content else 'OpenASP not found'
-        logger.info(f"FINAL RESPONSE DEBUG: Content sample: {repr(content_sample)}")
-        logger.info(f"FINAL RESPONSE DEBUG: Content sample UTF-8 bytes: {content_sample.encode('utf-8').hex()}")
-        print(f"CONSOLE DEBUG: Final response content type: {type(content)}, length: {len(content)}", flush=True)
-        
-        return content, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+        return cached.body, 200, {'Content-Type': 'text/plain; charset=utf-8'}
         
     except Exception as e:
         logger.error(f"볼륨 SMED파일 내용 취득 에러: {e}")
@@ -3474,14 +3689,34 @@ def multi_executor_status():
 
 @app.route('/api/logs', methods=['GET'])
 def get_logs():
-    """Get execution logs"""
+    """Get execution logs
+    
+    Optional filters: level, source, terminal_id (indexed), since/until
+    (epoch, ISO or 'YYYY-MM-DD HH:MM:SS'; older than memory reads segments),
+    search (substring) and limit (default 1000, newest kept).
+    """
     try:
-        logs_list = list(execution_logs)
+        level = request.args.get('level')
+        try:
+            limit = int(request.args.get('limit', 1000))
+        except ValueError:
+            limit = 1000
+        logs_list = execution_logs.query(
+            level=None if level in (None, '', 'ALL') else level,
+            source=request.args.get('source') or None,
+            terminal_id=request.args.get('terminal_id') or None,
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            search=request.args.get('search') or None,
+            limit=limit
+        )
         return jsonify({
             'success': True,
             'logs': logs_list,
             'count': len(logs_list)
         })
+    except ValueError as e:
+        return jsonify({'error': f'Invalid time range: {e}'}), 400
     except Exception as e:
         logger.error(f"Failed to get logs: {e}")
         return jsonify({'error': str(e)}), 500
@@ -3491,15 +3726,13 @@ def add_log_entry():
     """Add a new log entry"""
     try:
         data = request.get_json()
-        log_entry = {
-            'id': str(uuid.uuid4()),
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'level': data.get('level', 'INFO'),
-            'source': data.get('service', 'UNKNOWN'),
-            'message': data.get('message', ''),
-            'details': data.get('details', {})
-        }
-        execution_logs.append(log_entry)
+        log_entry = execution_logs.append(
+            data.get('level', 'INFO'),
+            data.get('service') or data.get('source') or 'UNKNOWN',
+            data.get('message', ''),
+            data.get('details', {}),
+            terminal_id=data.get('terminal_id')
+        )
         logger.info(f"[{log_entry['level']}] {log_entry['source']}: {log_entry['message']}")
         return jsonify({
             'success': True,
@@ -3528,7 +3761,7 @@ def get_active_terminals():
     """Get list of active terminals with detailed status"""
     try:
         terminals = []
-        for session_id, terminal_info in active_terminals.items():
+        for session_id, terminal_info in terminal_registry.items():
             terminals.append({
                 'session_id': session_id,
                 'terminal_id': terminal_info.get('terminal_id'),
@@ -3538,14 +3771,16 @@ def get_active_terminals():
                 'connected_at': terminal_info.get('connected_at'),
                 'registration_data': terminal_info.get('registration_data')
             })
+        terminal_mappings = terminal_registry.terminal_mappings()
         
         return jsonify({
             'success': True,
             'terminals': terminals,
-            'terminal_mappings': terminal_to_session,
-            'active_sessions': list(active_terminals.keys()),
-            'registered_terminal_ids': list(terminal_to_session.keys()),
+            'terminal_mappings': terminal_mappings,
+            'active_sessions': terminal_registry.session_ids(),
+            'registered_terminal_ids': list(terminal_mappings.keys()),
             'count': len(terminals),
+            'outbox': terminal_outbox.stats(),
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
@@ -3564,13 +3799,11 @@ def get_terminal_status(terminal_id):
             'terminal_info': None
         }
         
-        if terminal_id in terminal_to_session:
-            session_id = terminal_to_session[terminal_id]
+        session_id, terminal_info = terminal_registry.lookup_terminal(terminal_id)
+        if session_id:
             status_info['connected'] = True
             status_info['session_id'] = session_id
-            
-            if session_id in active_terminals:
-                status_info['terminal_info'] = active_terminals[session_id]
+            status_info['terminal_info'] = terminal_info
         
         logger.info(f"[TERMINAL_STATUS] Status check for {terminal_id}: {status_info}")
         
@@ -3614,6 +3847,112 @@ def test_terminal_connection(terminal_id):
         logger.error(f"Failed to test terminal connection for {terminal_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
+def build_smed_grid(map_path):
+    """Parse a SMED map into a 24x80 grid layout (loader for smed_map_cache)"""
+    # Parse SMED file - handle corrupted SJIS gracefully
+    try:
+        # Try SJIS first with error handling (standard for Japanese SMED files)
+        with open(map_path, 'r', encoding='shift_jis', errors='replace') as f:
+            smed_content = f.read()
+    except Exception:
+        # Fallback to UTF-8 with error handling
+        try:
+            with open(map_path, 'r', encoding='utf-8', errors='replace') as f:
+                smed_content = f.read()
+        except Exception:
+            # Last resort - read as binary and decode manually
+            with open(map_path, 'rb') as f:
+                raw_bytes = f.read()
+            smed_content = raw_bytes.decode('utf-8', errors='replace')
+    
+    # Fix common corrupted Japanese text patterns
+    smed_content = fix_corrupted_japanese_text(smed_content)
+    
+    # Initialize 24x80 grid
+    grid = [[' ' for _ in range(80)] for _ in range(24)]
+    fields = []
+    
+    # Parse SMED content line by line
+    lines = smed_content.strip().split('\n')
+    map_name_parsed = None
+    
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+            
+        if line.startswith('MAPNAME'):
+            map_name_parsed = line.split()[1] if len(line.split()) > 1 else 'UNKNOWN'
+        elif line.startswith('ITEM'):
+            # Parse ITEM definition
+            parts = line.split()
+            if len(parts) < 2:
+                continue
+                
+            field_name = parts[1]
+            field_info = {
+                'name': field_name,
+                'type': 'output',  # Default
+                'row': 0,
+                'col': 0,
+                'length': 0,
+                'value': '',
+                'color': '#FFFFFF',
+                'prompt': ''
+            }
+            
+            # Parse attributes
+            for i, part in enumerate(parts[2:]):
+                if part.startswith('TYPE='):
+                    field_info['type'] = 'output' if part.split('=')[1] == 'T' else 'input'
+                elif part.startswith('POS='):
+                    pos_str = part.split('=')[1]
+                    if pos_str.startswith('(') and ')' in pos_str:
+                        row, col = pos_str.strip('()').split(',')
+                        field_info['row'] = int(row) - 1  # Convert to 0-based
+                        field_info['col'] = int(col) - 1
+                elif part.startswith('LEN='):
+                    field_info['length'] = int(part.split('=')[1])
+                elif part.startswith('COLOR='):
+                    field_info['color'] = part.split('=')[1]
+                elif part.startswith('PROMPT='):
+                    # Handle quoted prompt text
+                    prompt_start = line.find('PROMPT="') + 8
+                    prompt_end = line.find('"', prompt_start)
+                    if prompt_start > 7 and prompt_end > prompt_start:
+                        field_info['prompt'] = line[prompt_start:prompt_end]
+                        field_info['value'] = field_info['prompt']
+            
+            # If PROMPT exists, it's output mode; if not, it's input mode
+            if field_info['prompt']:
+                field_info['type'] = 'output'
+                # Place prompt text on grid
+                text = field_info['prompt']
+                row = field_info['row']
+                col = field_info['col']
+                for j, char in enumerate(text):
+                    if col + j < 80 and row < 24:
+                        grid[row][col + j] = char
+            else:
+                field_info['type'] = 'input'
+                # Set default length if not specified
+                if field_info['length'] == 0:
+                    field_info['length'] = 10
+            
+            fields.append(field_info)
+    
+    # Convert grid to string representation for easy rendering
+    grid_lines = [''.join(row) for row in grid]
+    
+    return {
+        'success': True,
+        'map_name': map_name_parsed,
+        'grid': grid_lines,
+        'fields': fields,
+        'rows': 24,
+        'cols': 80
+    }
+
 @app.route('/api/smed/parse', methods=['POST'])
 def parse_smed_map():
     """Parse SMED map file and return grid layout for web rendering"""
@@ -3653,109 +3992,10 @@ def parse_smed_map():
         if not map_path:
             return jsonify({'error': f'Map file not found. Tried: {base_path}/{map_name} and {base_path}/{map_name}.smed'}), 404
         
-        # Parse SMED file - handle corrupted SJIS gracefully
-        try:
-            # Try SJIS first with error handling (standard for Japanese SMED files)
-            with open(map_path, 'r', encoding='shift_jis', errors='replace') as f:
-                smed_content = f.read()
-        except Exception:
-            # Fallback to UTF-8 with error handling
-            try:
-                with open(map_path, 'r', encoding='utf-8', errors='replace') as f:
-                    smed_content = f.read()
-            except Exception:
-                # Last resort - read as binary and decode manually
-                with open(map_path, 'rb') as f:
-                    raw_bytes = f.read()
-                smed_content = raw_bytes.decode('utf-8', errors='replace')
-        
-        # Fix common corrupted Japanese text patterns
-        smed_content = fix_corrupted_japanese_text(smed_content)
-        
-        # Initialize 24x80 grid
-        grid = [[' ' for _ in range(80)] for _ in range(24)]
-        fields = []
-        
-        # Parse SMED content line by line
-        lines = smed_content.strip().split('\n')
-        map_name_parsed = None
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            if line.startswith('MAPNAME'):
-                map_name_parsed = line.split()[1] if len(line.split()) > 1 else 'UNKNOWN'
-            elif line.startswith('ITEM'):
-                # Parse ITEM definition
-                parts = line.split()
-                if len(parts) < 2:
-                    continue
-                    
-                field_name = parts[1]
-                field_info = {
-                    'name': field_name,
-                    'type': 'output',  # Default
-                    'row': 0,
-                    'col': 0,
-                    'length': 0,
-                    'value': '',
-                    'color': '#FFFFFF',
-                    'prompt': ''
-                }
-                
-                # Parse attributes
-                for i, part in enumerate(parts[2:]):
-                    if part.startswith('TYPE='):
-                        field_info['type'] = 'output' if part.split('=')[1] == 'T' else 'input'
-                    elif part.startswith('POS='):
-                        pos_str = part.split('=')[1]
-                        if pos_str.startswith('(') and ')' in pos_str:
-                            row, col = pos_str.strip('()').split(',')
-                            field_info['row'] = int(row) - 1  # Convert to 0-based
-                            field_info['col'] = int(col) - 1
-                    elif part.startswith('LEN='):
-                        field_info['length'] = int(part.split('=')[1])
-                    elif part.startswith('COLOR='):
-                        field_info['color'] = part.split('=')[1]
-                    elif part.startswith('PROMPT='):
-                        # Handle quoted prompt text
-                        prompt_start = line.find('PROMPT="') + 8
-                        prompt_end = line.find('"', prompt_start)
-                        if prompt_start > 7 and prompt_end > prompt_start:
-                            field_info['prompt'] = line[prompt_start:prompt_end]
-                            field_info['value'] = field_info['prompt']
-                
-                # If PROMPT exists, it's output mode; if not, it's input mode
-                if field_info['prompt']:
-                    field_info['type'] = 'output'
-                    # Place prompt text on grid
-                    text = field_info['prompt']
-                    row = field_info['row']
-                    col = field_info['col']
-                    for j, char in enumerate(text):
-                        if col + j < 80 and row < 24:
-                            grid[row][col + j] = char
-                else:
-                    field_info['type'] = 'input'
-                    # Set default length if not specified
-                    if field_info['length'] == 0:
-                        field_info['length'] = 10
-                
-                fields.append(field_info)
-        
-        # Convert grid to string representation for easy rendering
-        grid_lines = [''.join(row) for row in grid]
-        
-        return jsonify({
-            'success': True,
-            'map_name': map_name_parsed,
-            'grid': grid_lines,
-            'fields': fields,
-            'rows': 24,
-            'cols': 80
-        })
+        cached = smed_map_cache.get(map_path, 'grid', build_smed_grid)
+        if not cached:
+            return jsonify({'error': f'Map file not found: {map_path}'}), 404
+        return app.response_class(cached.body, mimetype='application/json')
         
     except Exception as e:
         logger.error(f"Failed to parse SMED map: {e}")
@@ -3832,51 +4072,19 @@ def validate_position_data(data_array, position_map):
         if not isinstance(data_item, str):
             return False, f"Data item {i} must be a string, got {type(data_item).__name__}"
         
-        if len(data_item) > map_item['length']:
-            return False, f"Data item {i} length ({len(data_item)}) exceeds map length ({map_item['length']})"
+        # Field length is in display columns (full-width characters take two)
+        width = display_width(data_item)
+        if width > map_item['length']:
+            return False, f"Data item {i} width ({width} columns) exceeds map length ({map_item['length']})"
     
     return True, "Valid"
 
-def render_position_grid(position_map, data_array):
-    """Render position-based data to 24x80 grid"""
-    # Initialize empty grid
-    grid = [[' ' for _ in range(80)] for _ in range(24)]
-    rendered_fields = []
-    
-    for i, (map_item, data_item) in enumerate(zip(position_map, data_array)):
-        row = map_item['row']
-        col = map_item['col']
-        length = map_item['length']
-        
-        # Pad or truncate data to fit length
-        padded_data = data_item.ljust(length)[:length]
-        
-        # Place data on grid
-        for j, char in enumerate(padded_data):
-            if col + j < 80:
-                grid[row][col + j] = char
-        
-        rendered_fields.append({
-            'index': i,
-            'row': row,
-            'col': col,
-            'length': length,
-            'value': data_item,
-            'rendered_value': padded_data
-        })
-    
-    # Convert grid to string lines
-    grid_lines = [''.join(row) for row in grid]
-    
-    return {
-        'grid': grid_lines,
-        'fields': rendered_fields,
-        'rows': 24,
-        'cols': 80
-    }
+def render_position_grid(position_map, data_array, session_key='default'):
+    """Render position-based data to 24x80 grid (display-width aware, buffer reused per session)"""
+    return position_grid_renderers.render(session_key, position_map, data_array)
 
-# Position-based map storage (in-memory for demo)
-position_maps = {}
+# Position-based map storage (shared between workers; replace entries, don't mutate them)
+position_maps = SharedMap(state_store, 'position_maps')
 
 @app.route('/api/smed/position-render/<map_name>', methods=['GET'])
 def get_position_render_map(map_name):
@@ -3919,6 +4127,7 @@ def create_or_update_position_render_map(map_name):
         
         position_maps[map_name] = {
             'map': position_map,
+            'map_id': map_definition_id(position_map),
             'created_at': position_maps[map_name]['created_at'] if map_exists else timestamp,
             'updated_at': timestamp
         }
@@ -3959,7 +4168,7 @@ def render_position_data(map_name):
             return jsonify({'error': error_msg}), 400
         
         # Render to grid
-        rendered = render_position_grid(position_map, data_array)
+        rendered = render_position_grid(position_map, data_array, data.get('terminal_id') or map_name)
         
         logger.info(f"Position data rendered for map {map_name}: {len(data_array)} fields")
         
@@ -3997,7 +4206,7 @@ def update_position_data(map_name):
             return jsonify({'error': error_msg}), 400
         
         # Render to grid
-        rendered = render_position_grid(position_map, data_array)
+        rendered = render_position_grid(position_map, data_array, terminal_id)
         
         # Broadcast update via WebSocket
         update_message = {
@@ -4008,7 +4217,14 @@ def update_position_data(map_name):
             **rendered
         }
         
-        socketio.emit('position_render_update', update_message, broadcast=True)
+        # JSON to everyone except clients that negotiated a compact format for
+        # this map; those get map id + values (no grid) in their format room
+        room_name = f'position_smed_{map_name}'
+        compact_sids = position_compact_sessions(room_name)
+        socketio.emit('position_render_update', update_message, broadcast=True, skip_sid=compact_sids or None)
+        map_id = position_maps[map_name].get('map_id') or map_definition_id(position_map)
+        announce_position_map(room_name, map_name, map_id, position_map)
+        emit_position_formats('position_render_update', update_message, room_name, map_id)
         
         logger.info(f"Position data updated and broadcasted for map {map_name}: {len(data_array)} fields")
         
@@ -4179,6 +4395,10 @@ def handle_hub_key_event(data):
         field_values = data.get('field_values', {})
         program_name = data.get('program_name', 'unknown')
         
+        ws_session = workstation_session_manager.get_session_by_workstation(wsname)
+        if ws_session:
+            workstation_session_manager.touch_session(ws_session['session_id'])
+        
         # Handle function keys based on program logic
         response = {
             'success': True,
@@ -4370,9 +4590,14 @@ def handle_position_smed_display(data):
             'api_integrated': api_result is not None
         }
         
-        # Broadcast to all clients subscribed to this map
+        # Broadcast to all clients subscribed to this map; a new display
+        # starts a new screen, so later updates are diffed against it
         room_name = f'position_smed_{map_name}'
-        emit('position_smed_display_received', response_data, room=room_name)
+        position_screen_tracker.reset(room_name)
+        map_id = map_definition_id(map_data) if map_data else None
+        if map_id:
+            announce_position_map(room_name, map_name, map_id, map_data)
+        emit_position_event('position_smed_display_received', response_data, room_name, map_id)
         
         # Also emit to the sender for confirmation
         emit('position_smed_display_confirmed', {
@@ -4430,11 +4655,22 @@ def handle_position_smed_update(data):
             )
             logger.info(f"[POSITION_SMED_UPDATE] Converted {len(updates)} updates from SJIS to UTF-8")
         
+        # Keep only updates that change what the map room last received
+        room_name = f'position_smed_{map_name}'
+        screen_update = position_screen_tracker.merge(
+            room_name, map_name,
+            {position_update_key(update): update for update in processed_updates}
+        )
+        changed_updates = list(screen_update.fields.values())
+        
         # Prepare response data
         response_data = {
             'event_type': 'position_smed_update',
             'map_name': map_name,
-            'updates': processed_updates,
+            'updates': changed_updates,
+            'update_mode': screen_update.mode,
+            'version': screen_update.version,
+            'base_version': screen_update.base_version,
             'terminal_id': terminal_id,
             'encoding': 'utf-8',
             'timestamp': timestamp,
@@ -4442,14 +4678,16 @@ def handle_position_smed_update(data):
         }
         
         # Broadcast to all clients subscribed to this map
-        room_name = f'position_smed_{map_name}'
-        emit('position_smed_update_received', response_data, room=room_name)
+        if changed_updates:
+            emit_position_event('position_smed_update_received', response_data, room_name)
         
         # Confirm to sender
         emit('position_smed_update_confirmed', {
             'success': True,
             'map_name': map_name,
             'update_count': len(updates),
+            'changed_count': len(changed_updates),
+            'version': screen_update.version,
             'terminal_id': terminal_id,
             'timestamp': timestamp
         })
@@ -4472,6 +4710,43 @@ def handle_position_smed_update(data):
             'session_id': session_id
         })
 
+@socketio.on('position_smed_resync')
+def handle_position_smed_resync(data):
+    """Send every known position update of a map to a client that missed a version"""
+    map_name = (data or {}).get('map_name')
+    if not map_name:
+        emit('position_smed_error', {'error': 'map_name is required'})
+        return
+    
+    room_name = f'position_smed_{map_name}'
+    snapshot = position_screen_tracker.snapshot(room_name)
+    emit('position_smed_update_received', encode_position_payload({
+        'event_type': 'position_smed_update',
+        'map_name': map_name,
+        'updates': list(snapshot.fields.values()) if snapshot else [],
+        'update_mode': 'full',
+        'version': snapshot.version if snapshot else 0,
+        'encoding': 'utf-8',
+        'timestamp': datetime.now().isoformat(),
+        'session_id': request.sid
+    }, position_wire_format_for(request.sid, room_name)))
+
+@socketio.on('position_smed_map_request')
+def handle_position_smed_map_request(data):
+    """Send a map definition a compact-format client has not seen (by map_id or map_name)"""
+    data = data or {}
+    definition = None
+    if data.get('map_id'):
+        definition = position_map_definitions.get(data['map_id'])
+    elif data.get('map_name') in position_maps:
+        map_entry = position_maps[data['map_name']]
+        definition = map_definition(data['map_name'], map_entry['map'], map_entry.get('map_id'))
+    if definition is None:
+        emit('position_smed_error', {'error': 'Unknown map definition', 'event_type': 'position_smed_map_request',
+                                     'map_id': data.get('map_id'), 'map_name': data.get('map_name')})
+        return
+    emit('position_smed_map_definition', definition)
+
 @socketio.on('position_smed_key_event')
 def handle_position_smed_key_event(data):
     """Handle key events for position-based SMED rendering"""
@@ -4543,7 +4818,7 @@ def handle_position_smed_key_event(data):
         # Send response back to requesting terminal and broadcast to room
         room_name = f'position_smed_{map_name}'
         emit('position_smed_key_event_response', response)
-        emit('position_smed_key_event_broadcast', response, room=room_name)
+        emit_position_event('position_smed_key_event_broadcast', response, room_name)
         
         # Log the key event
         add_log('INFO', f'POSITION_SMED/{map_name}', f'Key event: {key}', {
@@ -4599,9 +4874,22 @@ def handle_position_smed_subscribe(data):
         # Legacy session registration (for backward compatibility)
         register_position_smed_session(session_id, map_name, terminal_id)
         
-        # Join room for this map
+        # Join room for this map; clients that negotiated a compact wire
+        # format join that format's room instead of the JSON room
         room_name = f'position_smed_{map_name}'
-        join_room(room_name)
+        wire_format = negotiate_wire_format(data.get('wire_formats') or data.get('wire_format'))
+        join_room(position_wire_room(room_name, wire_format))
+        if wire_format != WIRE_FORMAT_JSON:
+            add_position_compact_session(session_id, room_name, wire_format)
+            # Current layout: last announced to the room, else the stored map
+            definition = None
+            if position_room_map_ids.get(room_name):
+                definition = position_map_definitions.get(position_room_map_ids[room_name])
+            if definition is None and map_name in position_maps:
+                map_entry = position_maps[map_name]
+                definition = map_definition(map_name, map_entry['map'], map_entry.get('map_id'))
+            if definition is not None:
+                emit('position_smed_map_definition', definition)
         
         # Add subscription to legacy session info
         session_info = get_position_smed_session(session_id)
@@ -4619,6 +4907,8 @@ def handle_position_smed_subscribe(data):
             'map_name': map_name,
             'terminal_id': terminal_id,
             'room': room_name,
+            'wire_format': wire_format,
+            'supported_wire_formats': supported_wire_formats(),
             'timestamp': datetime.now().isoformat(),
             'map_info': map_info
         })
@@ -4666,9 +4956,9 @@ def handle_position_smed_unsubscribe(data):
                     workstation_session_manager.update_session(workstation_session['session_id'], {'websocket_rooms': rooms})
                 logger.info(f"[POSITION_SMED_UNSUBSCRIBE] Removed subscription from workstation session: {wsname}")
         
-        # Leave room for this map
+        # Leave room for this map (in whatever wire format it was joined)
         room_name = f'position_smed_{map_name}'
-        leave_room(room_name)
+        leave_position_room(session_id, room_name)
         
         logger.info(f"[POSITION_SMED_UNSUBSCRIBE] Client {session_id} unsubscribed from map: {map_name}")
         
@@ -4752,6 +5042,83 @@ def unregister_position_smed_session(session_id):
         session_info = position_smed_sessions.pop(session_id)
         logger.info(f"[POSITION_SMED_SESSION] Unregistered session {session_id} for map {session_info.get('map_name')}")
 
+# Negotiated wire formats. A client with a compact format is in the room
+# f'{room}#{format}' instead of the JSON room; {room: {session_id: format}}
+# for this worker's clients
+position_wire_subscribers = {}
+position_wire_lock = threading.Lock()
+position_room_map_ids = {}  # {room: map_id last announced to its compact rooms}
+
+# Map definitions by map_id, for clients that missed an announcement
+position_map_definitions = SharedMap(state_store, 'position_map_definitions')
+
+# Compact-format sessions of every worker ('{room}\t{sid}' -> format), so a
+# JSON broadcast can skip them wherever they are connected
+position_compact_sids = SharedMap(state_store, 'position_compact_sessions') if state_store.shared else None
+
+def position_wire_room(room_name, wire_format):
+    """Room of a map's subscribers in a wire format"""
+    return room_name if wire_format == WIRE_FORMAT_JSON else f'{room_name}#{wire_format}'
+
+def position_wire_format_for(session_id, room_name):
+    """Wire format a session negotiated for a map room"""
+    with position_wire_lock:
+        return position_wire_subscribers.get(room_name, {}).get(session_id, WIRE_FORMAT_JSON)
+
+def position_compact_sessions(room_name):
+    """Sessions (of every worker when workers share state) receiving a map room in a compact format"""
+    if position_compact_sids is not None:
+        prefix = f'{room_name}\t'
+        return [key[len(prefix):] for key in position_compact_sids if key.startswith(prefix)]
+    with position_wire_lock:
+        return list(position_wire_subscribers.get(room_name, {}))
+
+def add_position_compact_session(session_id, room_name, wire_format):
+    """Record a session that receives a map room in a compact format"""
+    with position_wire_lock:
+        position_wire_subscribers.setdefault(room_name, {})[session_id] = wire_format
+    if position_compact_sids is not None:
+        position_compact_sids[f'{room_name}\t{session_id}'] = wire_format
+
+def position_room_formats(room_name):
+    """Compact formats to encode for a room (all of them when workers share rooms)"""
+    if state_store.shared:
+        return [wire_format for wire_format in supported_wire_formats() if wire_format != WIRE_FORMAT_JSON]
+    with position_wire_lock:
+        return set(position_wire_subscribers.get(room_name, {}).values())
+
+def leave_position_room(session_id, room_name):
+    """Leave a map room in every wire format"""
+    with position_wire_lock:
+        wire_format = position_wire_subscribers.get(room_name, {}).pop(session_id, WIRE_FORMAT_JSON)
+        if not position_wire_subscribers.get(room_name, True):
+            del position_wire_subscribers[room_name]
+    if position_compact_sids is not None and wire_format != WIRE_FORMAT_JSON:
+        position_compact_sids.pop(f'{room_name}\t{session_id}', None)
+    leave_room(position_wire_room(room_name, wire_format), sid=session_id)
+
+def emit_position_formats(event, payload, room_name, map_id=None):
+    """Emit a payload to the compact-format rooms of a map room"""
+    for wire_format in position_room_formats(room_name):
+        socketio.emit(event, encode_position_payload(payload, wire_format, map_id),
+                      room=position_wire_room(room_name, wire_format))
+
+def emit_position_event(event, payload, room_name, map_id=None):
+    """Emit a payload to a map room: JSON as-is, compact formats encoded once per format"""
+    socketio.emit(event, payload, room=room_name)
+    emit_position_formats(event, payload, room_name, map_id)
+
+def announce_position_map(room_name, map_name, map_id, position_map):
+    """Send a map definition to a room's compact-format clients when its layout changes"""
+    if position_room_map_ids.get(room_name) == map_id:
+        return
+    definition = map_definition(map_name, position_map, map_id)
+    position_map_definitions[map_id] = definition
+    position_room_map_ids[room_name] = map_id
+    for wire_format in position_room_formats(room_name):
+        socketio.emit('position_smed_map_definition', definition,
+                      room=position_wire_room(room_name, wire_format))
+
 def get_position_smed_session(session_id):
     """Get position-based SMED session info"""
     return position_smed_sessions.get(session_id)
@@ -5276,12 +5643,13 @@ def force_disconnect_websockets_by_workstations(workstation_names: List[str]) ->
                     'type': 'websocket'
                 })
         
-        # Check active_terminals (maps session_id to terminal info)
-        for session_id, terminal_info in active_terminals.items():
-            workstation = terminal_info.get('workstation')
-            if workstation in workstation_names:
+        # Check terminal registry (indexed by workstation)
+        queued_session_ids = {s['session_id'] for s in sessions_to_disconnect}
+        for workstation in workstation_names:
+            for session_id in terminal_registry.sessions_for_workstation(workstation):
                 # Check if we haven't already added this session
-                if not any(s['session_id'] == session_id for s in sessions_to_disconnect):
+                if session_id not in queued_session_ids:
+                    queued_session_ids.add(session_id)
                     sessions_to_disconnect.append({
                         'session_id': session_id,
                         'wsname': workstation,
@@ -5303,15 +5671,10 @@ def force_disconnect_websockets_by_workstations(workstation_names: List[str]) ->
                 if session_id in websocket_sessions:
                     del websocket_sessions[session_id]
                 
-                if session_id in active_terminals:
-                    terminal_info = active_terminals[session_id]
-                    terminal_id = terminal_info.get('terminal_id')
-                    
-                    # Clean up terminal mappings
-                    if terminal_id and terminal_id in terminal_to_session:
-                        del terminal_to_session[terminal_id]
-                    
-                    del active_terminals[session_id]
+                # Clean up terminal mappings
+                terminal_info = terminal_registry.unregister(session_id)
+                if terminal_info and terminal_info.get('terminal_id'):
+                    terminal_outbox.discard(terminal_info['terminal_id'])
                 
                 disconnected.append(wsname)
                 logger.info(f"[FORCE_DISCONNECT] Successfully disconnected {wsname}")
@@ -5327,21 +5690,24 @@ def force_disconnect_websockets_by_workstations(workstation_names: List[str]) ->
     return disconnected
 
 def add_log(level, source, message, details=None):
-    """Add log entry"""
-    log_entry = {
-        'id': str(uuid.uuid4()),
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'level': level,
-        'source': source,
-        'message': message,
-        'details': details
-    }
-    execution_logs.append(log_entry)
-    logger.info(f"[{level}] {source}: {message}")
+    """Add log entry (kept in the log store; warnings and errors also go to the file logger)"""
+    execution_logs.append(level, source, message, details)
+    if level.upper() in ('WARNING', 'ERROR', 'CRITICAL'):
+        logger.log(getattr(logging, level.upper()), f"[{level}] {source}: {message}")
 
 @app.route('/api/cleanup-processes', methods=['POST'])
 def cleanup_processes():
-    """Generic cleanup endpoint to terminate all active main programs and their forked processes"""
+    """Generic cleanup endpoint to terminate active main programs and their forked processes
+    
+    Only process groups registered by CALL/SBMJOB/cmdRunner are signalled.
+    Optional session_id, terminal_id and job_id narrow the cleanup. SBMJOB
+    jobs (and programs they called) are only ended when job_id is given.
+    
+    cleanup_mode:
+        all_main_programs  every registered interactive program, narrowed by the filters (default)
+        scoped             like all_main_programs, but refused without a filter so
+                           a client that lost its session id cannot end everyone's programs
+    """
     try:
         data = request.get_json()
         
@@ -5351,155 +5717,35 @@ def cleanup_processes():
         user = data.get('user', 'unknown')
         cleanup_mode = data.get('cleanup_mode', 'all_main_programs')
         reason = data.get('reason', 'manual_cleanup')
+        session_id = data.get('session_id')
+        terminal_id = data.get('terminal_id')
+        job_id = data.get('job_id')
+        
+        if cleanup_mode not in ('all_main_programs', 'scoped'):
+            return jsonify({'error': f'Unknown cleanup_mode: {cleanup_mode}'}), 400
+        if cleanup_mode == 'scoped' and not (session_id or terminal_id or job_id):
+            return jsonify({'error': 'cleanup_mode scoped requires session_id, terminal_id or job_id'}), 400
         
         logger.info(f"Process cleanup requested by user: {user}, mode: {cleanup_mode}, reason: {reason}")
         add_log('INFO', 'PROCESS_CLEANUP', f'Cleanup requested: mode={cleanup_mode}, reason={reason}', 
-               {'user': user, 'cleanup_mode': cleanup_mode, 'reason': reason})
+               {'user': user, 'cleanup_mode': cleanup_mode, 'reason': reason,
+                'session_id': session_id, 'terminal_id': terminal_id, 'job_id': job_id})
+        
+        if not PROCESS_SUPERVISOR_AVAILABLE:
+            return jsonify({'success': False, 'error': 'Process supervisor not available'}), 503
         
         cleaned_processes = 0
         cleanup_details = []
         
         try:
-            # Get PID directory from environment or default
-            call_pid_dir = os.environ.get('ASP_PID_DIR', '/tmp/asp_call_pids')
+            cleanup_details = process_supervisor.cleanup(
+                session_id=session_id, terminal_id=terminal_id, job_id=job_id,
+                include_jobs=job_id is not None)
             
-            # First, try to clean up processes tracked by call.py PID files
-            if os.path.exists(call_pid_dir):
-                for pid_file in os.listdir(call_pid_dir):
-                    if not pid_file.endswith('.json'):
-                        continue
-                        
-                    pid_file_path = os.path.join(call_pid_dir, pid_file)
-                    try:
-                        with open(pid_file_path, 'r') as f:
-                            pid_data = json.load(f)
-                        
-                        pid = pid_data.get('pid')
-                        program = pid_data.get('program', 'UNKNOWN')
-                        
-                        # Check if process still exists
-                        try:
-                            proc = psutil.Process(pid)
-                            logger.info(f"Terminating tracked process PID {pid}: {program}")
-                            proc.terminate()
-                            
-                            # Wait for graceful termination
-                            try:
-                                proc.wait(timeout=5)
-                                logger.info(f"Process {pid} terminated gracefully")
-                            except psutil.TimeoutExpired:
-                                logger.warning(f"Process {pid} did not terminate gracefully, forcing kill")
-                                proc.kill()
-                                proc.wait(timeout=2)
-                            
-                            cleaned_processes += 1
-                            cleanup_details.append({
-                                'pid': pid,
-                                'program': program,
-                                'method': 'pid_tracking',
-                                'status': 'terminated'
-                            })
-                            
-                        except psutil.NoSuchProcess:
-                            logger.info(f"Process {pid} already terminated")
-                            cleanup_details.append({
-                                'pid': pid,
-                                'program': program,
-                                'method': 'pid_tracking', 
-                                'status': 'already_terminated'
-                            })
-                        
-                        # Remove PID file
-                        os.remove(pid_file_path)
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing PID file {pid_file}: {e}")
-            
-            # Fallback: Find and terminate any remaining Java processes that match patterns from any ASP volume
-            volume_root = os.environ.get('ASP_VOLUME_ROOT', '/home/aspuser/app/volume')
-            
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'create_time']):
-                try:
-                    proc_info = proc.info
-                    if not proc_info['cmdline']:
-                        continue
-                    
-                    cmdline_str = ' '.join(proc_info['cmdline'])
-                    
-                    # Check if this is a Java process running a program from ASP volume structure
-                    if ('java' in proc_info['name'].lower() and 
-                        any('MAIN' in arg for arg in proc_info['cmdline']) and
-                        volume_root in cmdline_str):
-                        
-                        # Extract program name for logging
-                        main_program = None
-                        for arg in proc_info['cmdline']:
-                            if 'MAIN' in arg and '.class' in arg:
-                                main_program = arg.replace('.class', '')
-                                break
-                        
-                        if not main_program:
-                            main_program = 'UNKNOWN_MAIN'
-                        
-                        logger.info(f"Terminating process PID {proc_info['pid']}: {main_program}")
-                        proc.terminate()
-                        
-                        # Wait for graceful termination
-                        try:
-                            proc.wait(timeout=3)
-                        except psutil.TimeoutExpired:
-                            logger.warning(f"Force killing process PID {proc_info['pid']}: {main_program}")
-                            proc.kill()
-                        
-                        cleaned_processes += 1
-                        cleanup_details.append({
-                            'pid': proc_info['pid'],
-                            'program': main_program,
-                            'method': 'fallback_scan',
-                            'status': 'terminated'
-                        })
-                        
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    # Process already gone or no access
-                    continue
-                except Exception as e:
-                    logger.warning(f"Error processing PID {proc_info.get('pid', 'unknown')}: {e}")
-                    continue
-            
-            # Also clean up any forked subprocesses by looking for processes with DISK01 in their path
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'ppid']):
-                try:
-                    proc_info = proc.info
-                    if not proc_info['cmdline']:
-                        continue
-                    
-                    cmdline_str = ' '.join(proc_info['cmdline'])
-                    
-                    # Check if this is a subprocess related to our system
-                    if ('volume/DISK01' in cmdline_str and 
-                        any(ext in cmdline_str for ext in ['.java', '.class', '.py', '.sh']) and
-                        proc_info['pid'] != os.getpid()):  # Don't kill ourselves
-                        
-                        logger.info(f"Terminating subprocess PID {proc_info['pid']}: {proc_info['name']}")
-                        proc.terminate()
-                        
-                        try:
-                            proc.wait(timeout=2)
-                        except psutil.TimeoutExpired:
-                            proc.kill()
-                        
-                        cleaned_processes += 1
-                        cleanup_details.append({
-                            'pid': proc_info['pid'],
-                            'program': f"subprocess_{proc_info['name']}",
-                            'action': 'terminated'
-                        })
-                        
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    continue
-                except Exception as e:
-                    logger.warning(f"Error processing subprocess PID {proc_info.get('pid', 'unknown')}: {e}")
-                    continue
+            for detail in cleanup_details:
+                if detail['status'] != 'already_terminated':
+                    cleaned_processes += 1
+                    logger.info(f"Process group {detail['pgid'] or detail['pid']} ({detail['program']}): {detail['status']}")
             
             result_message = f"Process cleanup completed. Cleaned up {cleaned_processes} processes."
             logger.info(result_message)
@@ -5531,12 +5777,36 @@ def cleanup_processes():
         logger.error(error_msg)
         return jsonify({'error': error_msg}), 500
 
+@app.route('/api/processes', methods=['GET'])
+def get_supervised_processes():
+    """List supervised program processes with CPU/memory usage
+    
+    Query parameters session_id, terminal_id and job_id filter the list.
+    """
+    if not PROCESS_SUPERVISOR_AVAILABLE:
+        return jsonify({'success': False, 'error': 'Process supervisor not available'}), 503
+    
+    try:
+        processes = process_supervisor.status(
+            session_id=request.args.get('session_id'),
+            terminal_id=request.args.get('terminal_id'),
+            job_id=request.args.get('job_id'))
+        return jsonify({
+            'success': True,
+            'processes': processes,
+            'count': len(processes),
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Failed to list supervised processes: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # WEBSOCKET STATUS AND MONITORING ENDPOINTS
 @app.route('/api/websocket/status', methods=['GET'])
 def get_websocket_status():
     """Get WebSocket server status including position-based SMED sessions"""
     try:
-        active_sessions = len(active_terminals)
+        active_sessions = len(terminal_registry)
         position_smed_active = len(position_smed_sessions)
         
         # Count subscriptions
@@ -5616,9 +5886,11 @@ def test_position_smed_websocket():
             'timestamp': datetime.now().isoformat()
         }
         
-        # Broadcast test data to room
+        # Broadcast test data to room (compact-format clients get the map definition first)
         room_name = f'position_smed_{map_name}'
-        socketio.emit('position_smed_display_received', test_data, room=room_name)
+        map_id = map_definition_id(test_data['map_data'])
+        announce_position_map(room_name, map_name, map_id, test_data['map_data'])
+        emit_position_event('position_smed_display_received', test_data, room_name, map_id)
         
         logger.info(f"[TEST] Broadcasted test data to room: {room_name}")
         
@@ -5753,9 +6025,9 @@ def clear_logs():
 
 @app.route('/api/log-files', methods=['GET'])
 def get_log_files():
-    """Get list of log files in /home/aspuser/app/logs directory"""
+    """Get list of log files in the logs directory (including execution log segments)"""
     try:
-        logs_dir = "/home/aspuser/app/logs"
+        logs_dir = LOGS_DIR
         
         if not os.path.exists(logs_dir):
             return jsonify({'error': 'Logs directory not found'}), 404
@@ -5785,18 +6057,35 @@ def get_log_files():
 
 @app.route('/api/log-files/<filename>', methods=['GET'])
 def get_log_file_content(filename):
-    """Get log file content with optional line limit"""
+    """Get log file content: the last N lines, or what was appended since an offset
+    
+    ?lines=N (default 1000) tails the file reading backwards from its end;
+    ?from_offset=B returns the text after byte B and the next offset to poll with.
+    """
     try:
         # Security check: prevent path traversal
         if '..' in filename or '/' in filename or '\\' in filename:
             return jsonify({'error': 'Invalid filename'}), 400
         
-        logs_dir = "/home/aspuser/app/logs"
+        logs_dir = LOGS_DIR
         file_path = os.path.join(logs_dir, filename)
         
         if not os.path.exists(file_path):
             return jsonify({'error': f'Log file not found: {filename}'}), 404
         
+        if request.args.get('from_offset') is not None:
+            try:
+                offset = max(0, int(request.args['from_offset']))
+            except ValueError:
+                return jsonify({'error': 'from_offset must be an integer'}), 400
+            content, next_offset = read_from_offset(file_path, offset)
+            return jsonify({
+                'success': True,
+                'filename': filename,
+                'content': content,
+                'next_offset': next_offset
+            })
+        
         # Get line limit from query parameter (default: 1000)
         lines = request.args.get('lines', '1000')
         try:
@@ -5804,24 +6093,16 @@ def get_log_file_content(filename):
         except ValueError:
             line_limit = 1000
         
-        # Read file and get last N lines
-        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-            all_lines = f.readlines()
-        
-        # Get last N lines
-        if line_limit > 0:
-            content_lines = all_lines[-line_limit:]
-        else:
-            content_lines = all_lines
-        
-        content = ''.join(content_lines)
+        # Last N lines without reading the whole file
+        content_lines, size = tail_file(file_path, line_limit)
         
         return jsonify({
             'success': True,
             'filename': filename,
-            'total_lines': len(all_lines),
             'displayed_lines': len(content_lines),
-            'content': content
+            'size': size,
+            'next_offset': size,
+            'content': ''.join(content_lines)
         })
         
     except Exception as e:
@@ -6776,7 +7057,7 @@ if __name__ == "__main__":
     socketio.run(
         app,
         host='0.0.0.0',
-        port=8000,
+        port=int(os.environ.get('ASP_PORT', '8000')),
         debug=False,
         allow_unsafe_werkzeug=True
     )
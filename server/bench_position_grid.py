@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: 24x80 position grid rendering of a 200-field screen
+
+Compares the previous character-by-character renderer with the buffered
+PositionGridRenderer, for ASCII and mixed full-width (Japanese) values.
+
+Usage:
+    python bench_position_grid.py [--iterations 2000]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from position_grid import PositionGridRenderer
+
+FIELD_COUNT = 200
+
+
+def legacy_render(position_map, data_array):
+    """Character-by-character renderer this module replaced (for comparison)"""
+    grid = [[' ' for _ in range(80)] for _ in range(24)]
+    rendered_fields = []
+    for i, (map_item, data_item) in enumerate(zip(position_map, data_array)):
+        row, col, length = map_item['row'], map_item['col'], map_item['length']
+        padded_data = data_item.ljust(length)[:length]
+        for j, char in enumerate(padded_data):
+            if col + j < 80:
+                grid[row][col + j] = char
+        rendered_fields.append({'index': i, 'row': row, 'col': col, 'length': length,
+                                'value': data_item, 'rendered_value': padded_data})
+    return {'grid': [''.join(row) for row in grid], 'fields': rendered_fields, 'rows': 24, 'cols': 80}
+
+
+def screen_200_fields():
+    """200 fields of 8 columns: 24 rows x 9 fields, minus the last 16"""
+    position_map = [{'row': row, 'col': slot * 9, 'length': 8}
+                    for row in range(24) for slot in range(9)][:FIELD_COUNT]
+    ascii_data = [f'FLD{i:05d}' for i in range(FIELD_COUNT)]
+    mixed_data = [('社員' + str(i)) if i % 2 else f'EMP{i:04d}' for i in range(FIELD_COUNT)]
+    return position_map, ascii_data, mixed_data
+
+
+def bench(label, render, position_map, data_array, iterations, repeats=5):
+    """Best of repeats, in seconds per render"""
+    render(position_map, data_array)  # warm up
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            render(position_map, data_array)
+        elapsed = (time.perf_counter() - start) / iterations
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<32} {best * 1e6:9.1f} us/render")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark 24x80 position grid rendering')
+    parser.add_argument('--iterations', type=int, default=2000, help='Renders per case')
+    args = parser.parse_args()
+
+    position_map, ascii_data, mixed_data = screen_200_fields()
+    renderer = PositionGridRenderer()
+
+    print(f"[INFO] {FIELD_COUNT}-field 24x80 screen, {args.iterations} renders per case")
+    legacy = bench('legacy (ascii)', legacy_render, position_map, ascii_data, args.iterations)
+    buffered = bench('buffered (ascii)', renderer.render, position_map, ascii_data, args.iterations)
+    bench('buffered (mixed full-width)', renderer.render, position_map, mixed_data, args.iterations)
+    print(f"[INFO] Speedup (ascii): {legacy / buffered:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Execution Log Store
+Bounded, indexed in-memory log with rotating on-disk segments
+
+Records live in a fixed-size ring buffer as compact tuples. Secondary indexes
+(level, source, terminal) hold record sequence numbers in arrival order, so a
+filtered query walks only the matching records, newest first, and stops at
+its limit. When the ring overwrites a record, the record is also the oldest
+entry in each of its index lists and is dropped from their left end.
+
+Every record is also queued for the current on-disk segment
+(<prefix>-<first record time>.log, one JSON object per line). A background thread
+appends queued records, and rotates segments by size and count. Queries
+older than the ring read only the segments that overlap the time range
+(records are assumed to arrive roughly in time order).
+tail_file() reads the end of a log file backwards in blocks, so it never
+loads the whole file.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_CAPACITY = 20000
+DEFAULT_SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_SEGMENTS = 20
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_QUERY_LIMIT = 1000
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+TAIL_BLOCK_SIZE = 64 * 1024
+
+# Record tuple layout
+SEQ, TS, LEVEL, SOURCE, MESSAGE, DETAILS, TERMINAL = range(7)
+
+
+def parse_time(value: Any) -> Optional[float]:
+    """Epoch seconds from an epoch number, ISO string or 'YYYY-MM-DD HH:MM:SS'"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return datetime.strptime(str(value), TIMESTAMP_FORMAT).timestamp()
+
+
+def tail_file(path: str, lines: int, block_size: int = TAIL_BLOCK_SIZE) -> Tuple[List[str], int]:
+    """
+    Last lines of a text file, reading backwards from the end
+
+    Args:
+        path: File path
+        lines: Number of lines (<= 0 returns the whole file)
+        block_size: Bytes read per step
+
+    Returns:
+        tuple: (lines, file size in bytes)
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if lines <= 0:
+            f.seek(0)
+            data = f.read()
+        else:
+            data = b''
+            position = size
+            # One extra line: the first one read is usually partial
+            while position > 0 and data.count(b'\n') <= lines:
+                step = min(block_size, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+            if position > 0:
+                data = data[data.index(b'\n') + 1:]
+    text = data.decode('utf-8', errors='replace').splitlines(keepends=True)
+    return (text[-lines:] if lines > 0 else text), size
+
+
+def read_from_offset(path: str, offset: int, max_bytes: int = 1024 * 1024) -> Tuple[str, int]:
+    """
+    Bytes appended to a file since offset (for polling clients)
+
+    Returns:
+        tuple: (text, next offset); a file smaller than offset (rotated or
+               truncated) is read from the start
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if offset > size:
+            offset = 0
+        f.seek(offset)
+        data = f.read(max_bytes)
+    # Stop at the last complete line; the rest comes with the next poll
+    end = data.rfind(b'\n') + 1 if len(data) == max_bytes else len(data)
+    return data[:end].decode('utf-8', errors='replace'), offset + end
+
+
+class ExecutionLogStore:
+    """Ring buffer of log records with level/source/terminal indexes and disk segments"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, segment_dir: Optional[str] = None,
+                 segment_prefix: str = 'execution',
+                 segment_max_bytes: int = DEFAULT_SEGMENT_MAX_BYTES,
+                 max_segments: int = DEFAULT_MAX_SEGMENTS,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        """
+        Args:
+            capacity: Records kept in memory
+            segment_dir: Directory for on-disk segments (None keeps memory only)
+            segment_prefix: Segment file name prefix (one writer per prefix)
+            segment_max_bytes: Size at which a new segment is started
+            max_segments: Segments kept; older ones are deleted
+            flush_interval: Seconds between background segment writes
+        """
+        self.capacity = capacity
+        self.segment_dir = segment_dir
+        self.segment_prefix = segment_prefix
+        self.segment_max_bytes = segment_max_bytes
+        self.max_segments = max_segments
+        self.flush_interval = flush_interval
+
+        self._ring: List[Optional[tuple]] = [None] * capacity
+        self._next_seq = 0
+        self._by_level: Dict[str, deque] = {}
+        self._by_source: Dict[str, deque] = {}
+        self._by_terminal: Dict[str, deque] = {}
+        self._id_prefix = format(int(time.time()), 'x')
+        self._lock = threading.Lock()
+
+        self._pending: List[Tuple[float, str]] = []
+        self._segment_path: Optional[str] = None
+        self._segment_size = 0
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        if segment_dir:
+            try:
+                os.makedirs(segment_dir, exist_ok=True)
+            except OSError as e:
+                print(f"[WARN] Log segments disabled, cannot create {segment_dir}: {e}")
+                self.segment_dir = None
+
+    # Writing
+
+    def append(self, level: str, source: str, message: str, details: Any = None,
+               terminal_id: Optional[str] = None, timestamp: Any = None) -> Dict[str, Any]:
+        """
+        Add a record
+
+        Args:
+            level: INFO, WARNING, ERROR, DEBUG, ...
+            source: Emitting component
+            message: Log message
+            details: JSON-serializable details
+            terminal_id: Terminal the record belongs to (defaults to
+                         details['terminal_id'] when present)
+            timestamp: Record time (epoch/ISO/'YYYY-MM-DD HH:MM:SS'); now if omitted
+
+        Returns:
+            dict: The stored record as returned by queries
+        """
+        if terminal_id is None and isinstance(details, dict):
+            terminal_id = details.get('terminal_id')
+        try:
+            ts = parse_time(timestamp) or time.time()
+        except ValueError:
+            ts = time.time()
+        level = str(level).upper()
+
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            slot = seq % self.capacity
+            evicted = self._ring[slot]
+            if evicted is not None:
+                self._unindex(evicted)
+            record = (seq, ts, level, source, message, details, terminal_id)
+            self._ring[slot] = record
+            self._by_level.setdefault(level, deque()).append(seq)
+            self._by_source.setdefault(source, deque()).append(seq)
+            if terminal_id:
+                self._by_terminal.setdefault(terminal_id, deque()).append(seq)
+
+        entry = self._to_dict(record)
+        if self.segment_dir:
+            line = json.dumps(entry, ensure_ascii=False, default=str)
+            with self._lock:
+                self._pending.append((entry['ts'], line))
+                if len(self._pending) > self.capacity:
+                    del self._pending[0]  # segment writes are failing; keep memory bounded
+        return entry
+
+    def _unindex(self, record: tuple):
+        """Drop an overwritten record from its indexes (it is their oldest entry)"""
+        for index, key in ((self._by_level, record[LEVEL]), (self._by_source, record[SOURCE]),
+                           (self._by_terminal, record[TERMINAL])):
+            seqs = index.get(key)
+            if seqs and seqs[0] == record[SEQ]:
+                seqs.popleft()
+                if not seqs:
+                    del index[key]
+
+    def clear(self):
+        """Forget in-memory records (segments on disk are kept)"""
+        with self._lock:
+            self._ring = [None] * self.capacity
+            self._by_level.clear()
+            self._by_source.clear()
+            self._by_terminal.clear()
+
+    # Reading
+
+    def _to_dict(self, record: tuple) -> Dict[str, Any]:
+        return {
+            'id': f"{self._id_prefix}-{record[SEQ]}",
+            'seq': record[SEQ],
+            'timestamp': datetime.fromtimestamp(record[TS]).strftime(TIMESTAMP_FORMAT),
+            'ts': record[TS],
+            'level': record[LEVEL],
+            'source': record[SOURCE],
+            'message': record[MESSAGE],
+            'details': record[DETAILS],
+            'terminal_id': record[TERMINAL]
+        }
+
+    def _candidates(self, level, source, terminal_id) -> Iterator[int]:
+        """Sequence numbers to examine, newest first (smallest matching index)"""
+        indexes = []
+        if level:
+            indexes.append(self._by_level.get(str(level).upper(), ()))
+        if source:
+            indexes.append(self._by_source.get(source, ()))
+        if terminal_id:
+            indexes.append(self._by_terminal.get(terminal_id, ()))
+        if indexes:
+            return reversed(min(indexes, key=len))
+        oldest = max(0, self._next_seq - self.capacity)
+        return iter(range(self._next_seq - 1, oldest - 1, -1))
+
+    def query(self, level: Optional[str] = None, source: Optional[str] = None,
+              terminal_id: Optional[str] = None, since: Any = None, until: Any = None,
+              search: Optional[str] = None, limit: int = DEFAULT_QUERY_LIMIT) -> List[Dict[str, Any]]:
+        """
+        Newest matching records, returned oldest first
+
+        Records older than the in-memory ring are read from disk segments
+        when since reaches back before it.
+
+        Args:
+            level, source, terminal_id: Exact-match filters (indexed)
+            since, until: Time range (epoch, ISO or 'YYYY-MM-DD HH:MM:SS')
+            search: Case-insensitive substring of message or source
+            limit: Maximum records (<= 0 for no limit)
+
+        Returns:
+            list: Record dicts
+        """
+        since_ts, until_ts = parse_time(since), parse_time(until)
+        needle = search.lower() if search else None
+        level = str(level).upper() if level else None
+        matches = []
+
+        with self._lock:
+            for seq in self._candidates(level, source, terminal_id):
+                record = self._ring[seq % self.capacity]
+                if record is None or record[SEQ] != seq:
+                    continue
+                if since_ts is not None and record[TS] < since_ts:
+                    break  # arrival order: everything further is older
+                if not self._matches(record, level, source, terminal_id, until_ts, needle):
+                    continue
+                matches.append(self._to_dict(record))
+                if 0 < limit <= len(matches):
+                    break
+            oldest = self._ring[max(0, self._next_seq - self.capacity) % self.capacity]
+            ring_start = oldest[TS] if oldest is not None else None
+
+        matches.reverse()
+        reaches_disk = since_ts is not None and (ring_start is None or since_ts < ring_start)
+        if reaches_disk and not (0 < limit <= len(matches)):
+            # Disk holds what the ring no longer has: stop where the ring starts
+            older = self.query_segments(since_ts, until_ts, level, source, terminal_id, needle,
+                                        before_ts=ring_start)
+            if limit > 0:
+                older = older[-(limit - len(matches)):]
+            matches = older + matches
+        return matches
+
+    @staticmethod
+    def _matches(record, level, source, terminal_id, until_ts, needle) -> bool:
+        if level and record[LEVEL] != level:
+            return False
+        if source and record[SOURCE] != source:
+            return False
+        if terminal_id and record[TERMINAL] != terminal_id:
+            return False
+        if until_ts is not None and record[TS] > until_ts:
+            return False
+        if needle and needle not in str(record[MESSAGE]).lower() and needle not in str(record[SOURCE]).lower():
+            return False
+        return True
+
+    def query_segments(self, since_ts: float, until_ts: Optional[float], level=None, source=None,
+                       terminal_id=None, needle=None, before_ts: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Records in [since_ts, until_ts] from the on-disk segments overlapping the range
+
+        The range is inclusive at both ends, like query(). before_ts
+        additionally excludes records at or after it (the ring start).
+        """
+        results = []
+        segments = self.segments()
+        for i, (path, start_ts) in enumerate(segments):
+            end_ts = segments[i + 1][1] if i + 1 < len(segments) else None
+            if ((end_ts is not None and end_ts < since_ts) or (until_ts is not None and start_ts > until_ts)
+                    or (before_ts is not None and start_ts >= before_ts)):
+                continue
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    ts = entry.get('ts', 0)
+                    if ts < since_ts or (before_ts is not None and ts >= before_ts):
+                        continue
+                    record = (entry.get('seq'), ts, entry.get('level'), entry.get('source'),
+                              entry.get('message'), entry.get('details'), entry.get('terminal_id'))
+                    if self._matches(record, level, source, terminal_id, until_ts, needle):
+                        results.append(entry)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Ring usage, index sizes and segment state"""
+        segments = len(self.segments())
+        with self._lock:
+            return {
+                'capacity': self.capacity,
+                'records': min(self._next_seq, self.capacity),
+                'total_appended': self._next_seq,
+                'levels': {level: len(seqs) for level, seqs in self._by_level.items()},
+                'sources': len(self._by_source),
+                'terminals': len(self._by_terminal),
+                'pending_segment_writes': len(self._pending),
+                'segment_dir': self.segment_dir,
+                'segments': segments
+            }
+
+    # Segments
+
+    def segments(self) -> List[Tuple[str, float]]:
+        """(path, start time) of this store's segments, oldest first"""
+        if not self.segment_dir:
+            return []
+        segments = []
+        prefix = self.segment_prefix + '-'
+        for name in os.listdir(self.segment_dir):
+            if name.startswith(prefix) and name.endswith('.log'):
+                try:
+                    start_ts = int(name[len(prefix):-4]) / 1000.0
+                except ValueError:
+                    continue
+                segments.append((os.path.join(self.segment_dir, name), start_ts))
+        segments.sort(key=lambda segment: segment[1])
+        return segments
+
+    def flush(self) -> int:
+        """
+        Append pending records to the current segment, rotating by size
+
+        Returns:
+            int: Records written
+        """
+        if not self.segment_dir:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                lines, self._pending = self._pending, []
+            if not lines:
+                return 0
+            data = ('\n'.join(line for _, line in lines) + '\n').encode('utf-8')
+            if self._segment_path is None or self._segment_size + len(data) > self.segment_max_bytes:
+                self._rotate(lines[0][0])
+            with open(self._segment_path, 'ab') as f:
+                f.write(data)
+            self._segment_size += len(data)
+            return len(lines)
+
+    def _rotate(self, start_ts: float):
+        """Start a segment named after the time of its first record"""
+        start_ms = int(start_ts * 1000)
+        existing = self.segments()
+        if existing and int(existing[-1][1] * 1000) >= start_ms:
+            start_ms = int(existing[-1][1] * 1000) + 1  # keep names unique and ordered
+        self._segment_path = os.path.join(self.segment_dir, f"{self.segment_prefix}-{start_ms}.log")
+        self._segment_size = 0
+        # The new segment counts towards max_segments
+        excess = len(existing) - (self.max_segments - 1)
+        for path, _ in existing[:max(excess, 0)]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"[WARN] Could not remove old log segment {path}: {e}")
+
+    def start(self):
+        """Start the background segment writer"""
+        if not self.segment_dir or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='log-segment-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the writer and flush what is pending"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval + 1)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[WARN] Log segment write failed: {e}")
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Position Grid Renderer
+Renders position-based SMED data onto a 24x80 screen grid
+
+Each renderer owns one preallocated cell buffer per row and is reused for
+every render of its session: a render blanks the rows with one slice copy
+each and writes every field with a single slice assignment, instead of
+building a fresh list of lists and placing characters one at a time.
+
+Field lengths and columns are display columns. Full-width characters
+(East Asian Wide/Fullwidth, e.g. kanji, hiragana, full-width alphanumerics)
+take two columns; their second cell holds '' so a joined row is always 80
+columns wide on a terminal. Widths come from a table precomputed at import,
+and ASCII values skip the lookup entirely.
+"""
+
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+GRID_ROWS = 24
+GRID_COLS = 80
+DEFAULT_MAX_RENDERERS = 256
+
+# Display width of every BMP code point (1 or 2)
+_WIDTH_TABLE = bytes(
+    2 if unicodedata.east_asian_width(chr(code)) in ('W', 'F') else 1
+    for code in range(0x10000)
+)
+
+
+def char_width(char: str) -> int:
+    """Display columns of one character"""
+    code = ord(char)
+    if code < 0x10000:
+        return _WIDTH_TABLE[code]
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+
+def display_width(text: str) -> int:
+    """Display columns of a string"""
+    if text.isascii():
+        return len(text)
+    return sum(map(char_width, text))
+
+
+def fit_to_width(text: str, width: int) -> List[str]:
+    """
+    Pad or truncate text to exactly width columns as grid cells
+
+    Args:
+        text: Field value
+        width: Field length in display columns
+
+    Returns:
+        list: width cells; a full-width character is followed by ''. A
+              full-width character that would straddle the end becomes ' '.
+    """
+    if text.isascii():
+        cells = list(text[:width])
+    else:
+        cells = []
+        used = 0
+        for char in text:
+            char_cols = char_width(char)
+            if used + char_cols > width:
+                break
+            cells.append(char)
+            if char_cols == 2:
+                cells.append('')
+            used += char_cols
+    if len(cells) < width:
+        cells.extend(' ' * (width - len(cells)))
+    return cells
+
+
+class PositionGridRenderer:
+    """Reusable grid buffer for one session (hold .lock while rendering)"""
+
+    def __init__(self, rows: int = GRID_ROWS, cols: int = GRID_COLS):
+        self.rows = rows
+        self.cols = cols
+        self._blank = [' '] * cols
+        self._grid = [list(self._blank) for _ in range(rows)]
+        self.lock = threading.Lock()
+
+    def render(self, position_map: List[Dict[str, Any]], data_array: List[str]) -> Dict[str, Any]:
+        """
+        Render data onto the grid
+
+        Args:
+            position_map: [{'row', 'col', 'length'}, ...] (0-based row/col)
+            data_array: Field values in map order
+
+        Returns:
+            dict: {'grid': [str] * rows, 'fields': [...], 'rows', 'cols'} as
+                  produced by render_position_grid
+        """
+        grid = self._grid
+        blank = self._blank
+        cols = self.cols
+        for row_cells in grid:
+            row_cells[:] = blank
+
+        rows = self.rows
+        has_wide = False  # half-cell checks are only needed once a wide character is on the grid
+        rendered_fields = []
+        append = rendered_fields.append
+        for i, (map_item, data_item) in enumerate(zip(position_map, data_array)):
+            row = map_item['row']
+            col = map_item['col']
+            length = map_item['length']
+
+            if data_item.isascii():
+                # Fast path: one cell per character; a str slice-assigns as cells
+                rendered_value = data_item.ljust(length)[:length]
+                if 0 <= row < rows and 0 <= col < cols:
+                    row_cells = grid[row]
+                    end = col + length
+                    if has_wide:
+                        # Overwriting half of a full-width character blanks the other half
+                        if row_cells[col] == '' and col > 0:
+                            row_cells[col - 1] = ' '
+                        if end < cols and row_cells[end] == '':
+                            row_cells[end] = ' '
+                    row_cells[col:end] = rendered_value[:cols - col]
+            else:
+                rendered_value = self._write_wide(grid, row, col, length, data_item)
+                has_wide = True
+
+            append({
+                'index': i,
+                'row': row,
+                'col': col,
+                'length': length,
+                'value': data_item,
+                'rendered_value': rendered_value
+            })
+
+        return {
+            'grid': [''.join(row_cells) for row_cells in grid],
+            'fields': rendered_fields,
+            'rows': self.rows,
+            'cols': cols
+        }
+
+    def _write_wide(self, grid: List[List[str]], row: int, col: int, length: int, text: str) -> str:
+        """Write a value containing full-width characters; returns its rendered value"""
+        cols = self.cols
+        cells = fit_to_width(text, length)
+        rendered_value = ''.join(cells)
+        if 0 <= row < self.rows and 0 <= col < cols:
+            end = min(col + length, cols)
+            row_cells = grid[row]
+            # Overwriting half of a full-width character blanks the other half
+            if row_cells[col] == '' and col > 0:
+                row_cells[col - 1] = ' '
+            if end < cols and row_cells[end] == '':
+                row_cells[end] = ' '
+            last = end - col - 1
+            if end - col < length and cells[last] != '' and char_width(cells[last]) == 2:
+                cells[last] = ' '  # clipped at the right edge
+            row_cells[col:end] = cells[:end - col]
+        return rendered_value
+
+
+class PositionGridRendererPool:
+    """Per-session renderers, least recently used evicted beyond max_renderers"""
+
+    def __init__(self, max_renderers: int = DEFAULT_MAX_RENDERERS):
+        self.max_renderers = max_renderers
+        self._renderers: "OrderedDict[str, PositionGridRenderer]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_key: str) -> PositionGridRenderer:
+        """Renderer of a session (created on first use)"""
+        with self._lock:
+            renderer = self._renderers.get(session_key)
+            if renderer is None:
+                renderer = self._renderers[session_key] = PositionGridRenderer()
+                while len(self._renderers) > self.max_renderers:
+                    self._renderers.popitem(last=False)
+            else:
+                self._renderers.move_to_end(session_key)
+            return renderer
+
+    def render(self, session_key: str, position_map: List[Dict[str, Any]],
+               data_array: List[str]) -> Dict[str, Any]:
+        """Render with the session's renderer"""
+        renderer = self.get(session_key)
+        with renderer.lock:
+            return renderer.render(position_map, data_array)
+
+    def discard(self, session_key: str):
+        """Drop a session's renderer"""
+        with self._lock:
+            self._renderers.pop(session_key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Pool size"""
+        with self._lock:
+            return {'renderers': len(self._renderers), 'max_renderers': self.max_renderers}
+
+
+# Global renderer pool
+position_grid_renderers = PositionGridRendererPool()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact wire formats for position-based SMED payloads
+
+The JSON payloads repeat every field's keys ('row', 'col', 'length', 'value',
+'rendered_value') and carry the full 24x80 grid on each refresh. A client can
+negotiate a compact format when it subscribes to a map instead:
+
+    json     unchanged payloads (default; clients that do not negotiate)
+    packed   JSON, map definition referenced by id, field values as a plain
+             array, position updates as column-ordered rows, no grid
+    msgpack  the packed payload serialized with MessagePack (binary frame);
+             offered only when the msgpack package is installed
+
+A map definition is sent once per subscription as
+{'map_id', 'map_name', 'columns', 'rows'}; later payloads carry only its
+map_id. The id is a content hash, so every worker assigns the same id to the
+same layout and a client can ask for a definition it has not seen.
+
+The web clients decode JSON payloads only, so compact formats are not
+offered unless enabled with ASP_POSITION_WIRE_FORMATS (e.g. 'packed,msgpack').
+"""
+
+import os
+import json
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+# Optional MessagePack serialization
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+WIRE_FORMAT_JSON = 'json'
+WIRE_FORMAT_PACKED = 'packed'
+WIRE_FORMAT_MSGPACK = 'msgpack'
+
+# Column order of packed position updates
+UPDATE_COLUMNS = ['row', 'col', 'length', 'value']
+
+# Compact formats offered to clients (none by default, see module docstring)
+ENABLED_WIRE_FORMATS = [name.strip() for name in os.environ.get('ASP_POSITION_WIRE_FORMATS', '').split(',')
+                        if name.strip()]
+
+
+def supported_wire_formats(enabled: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Wire formats this server sends, most compact first
+
+    Args:
+        enabled: Compact formats to offer (default: ENABLED_WIRE_FORMATS)
+    """
+    enabled = ENABLED_WIRE_FORMATS if enabled is None else list(enabled)
+    formats = [WIRE_FORMAT_JSON]
+    if WIRE_FORMAT_PACKED in enabled:
+        formats.insert(0, WIRE_FORMAT_PACKED)
+    if WIRE_FORMAT_MSGPACK in enabled and MSGPACK_AVAILABLE:
+        formats.insert(0, WIRE_FORMAT_MSGPACK)
+    return formats
+
+
+def negotiate_wire_format(requested: Union[str, Iterable[str], None],
+                          enabled: Optional[Iterable[str]] = None) -> str:
+    """
+    Pick the wire format for a client
+
+    Args:
+        requested: Format name or client preference list (best first)
+        enabled: Compact formats to offer (default: ENABLED_WIRE_FORMATS)
+
+    Returns:
+        str: First requested format the server supports, else 'json'
+    """
+    if not requested:
+        return WIRE_FORMAT_JSON
+    if isinstance(requested, str):
+        requested = [requested]
+    supported = supported_wire_formats(enabled)
+    for wire_format in requested:
+        if wire_format in supported:
+            return wire_format
+    return WIRE_FORMAT_JSON
+
+
+def pack_records(records: List[Dict[str, Any]], columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Turn a list of dicts into {'columns': [...], 'rows': [[...], ...]}
+
+    Args:
+        records: Dicts sharing (mostly) the same keys
+        columns: Column order; defaults to keys in order of first appearance
+
+    Returns:
+        dict: Packed records (keys missing from a record become None)
+    """
+    if columns is None:
+        columns = []
+        for record in records:
+            for key in record:
+                if key not in columns:
+                    columns.append(key)
+    return {'columns': columns, 'rows': [[record.get(column) for column in columns] for record in records]}
+
+
+def unpack_records(packed: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Inverse of pack_records (None values are dropped)"""
+    columns = packed['columns']
+    return [{column: value for column, value in zip(columns, row) if value is not None}
+            for row in packed['rows']]
+
+
+def map_definition_id(position_map: List[Dict[str, Any]]) -> str:
+    """Stable id of a map layout (same layout, same id, on every worker)"""
+    canonical = json.dumps(position_map, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:12]
+
+
+def map_definition(map_name: str, position_map: List[Dict[str, Any]],
+                   map_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the one-time map definition message
+
+    Args:
+        map_name: Map name
+        position_map: Field layout ([{'row', 'col', 'length', ...}, ...])
+        map_id: Precomputed map_definition_id, if known
+
+    Returns:
+        dict: {'map_id', 'map_name', 'columns', 'rows'}
+    """
+    return {
+        'map_id': map_id or map_definition_id(position_map),
+        'map_name': map_name,
+        **pack_records(position_map)
+    }
+
+
+def pack_rendered(rendered: Dict[str, Any], map_id: str) -> Dict[str, Any]:
+    """
+    Replace a render_position_grid result with its packed form
+
+    The grid and per-field dicts are dropped: the client rebuilds them from
+    the map definition and the values, which are the rendered values (already
+    fitted to each field's display width by the server).
+
+    Returns:
+        dict: {'map_id', 'values', 'rows', 'cols'}
+    """
+    return {
+        'map_id': map_id,
+        'values': [field['rendered_value'] for field in rendered['fields']],
+        'rows': rendered['rows'],
+        'cols': rendered['cols']
+    }
+
+
+def encode_position_payload(payload: Dict[str, Any], wire_format: str,
+                            map_id: Optional[str] = None) -> Union[Dict[str, Any], bytes]:
+    """
+    Encode a position SMED event payload for a negotiated wire format
+
+    Handles the three payload shapes the server emits:
+    - render results (grid/fields from render_position_grid)
+    - display events (map_data + field_data)
+    - update events (updates: [{'row', 'col', 'length', 'value'}, ...])
+
+    Args:
+        payload: JSON payload as sent to clients that did not negotiate
+        wire_format: Negotiated format
+        map_id: Id of the payload's map definition (render/display payloads)
+
+    Returns:
+        dict for json/packed, bytes for msgpack
+    """
+    if wire_format == WIRE_FORMAT_JSON:
+        return payload
+
+    packed = dict(payload, wire_format=WIRE_FORMAT_PACKED)
+    if 'grid' in payload and 'fields' in payload:
+        del packed['grid'], packed['fields']
+        packed.update(pack_rendered(payload, map_id))
+    if 'map_data' in payload:
+        del packed['map_data']
+        packed['map_id'] = map_id
+    if 'updates' in payload:
+        packed['updates'] = pack_records(payload['updates'], UPDATE_COLUMNS)['rows']
+
+    if wire_format == WIRE_FORMAT_MSGPACK:
+        packed['wire_format'] = WIRE_FORMAT_MSGPACK
+        return msgpack.packb(packed, use_bin_type=True)
+    return packed
@@ -3,6 +3,14 @@
 """
 PostgreSQL-based Session Manager for Enterprise Terminal Sessions
 Replaces file-based session storage with PostgreSQL database
+
+Connections come from a process-wide ThreadedConnectionPool shared by every
+manager with the same database configuration. Callers wait for a free
+connection (up to DB_POOL_TIMEOUT seconds) instead of opening a new one, so a
+login storm is bounded by DB_POOL_MAX connections. Hot statements are
+PREPAREd once per pooled connection, bulk operations are set-based
+(wsname = ANY(...)), and get_session_by_workstation is served from a short
+TTL cache that is invalidated by every write made through the manager.
 """
 
 import os
@@ -11,8 +19,11 @@ import json
 import threading
 import time
 import uuid
+import weakref
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any
 import logging
@@ -20,10 +31,150 @@ import logging
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Pool sizing: a login storm waits for a pooled connection instead of opening more
+DEFAULT_POOL_MIN = int(os.getenv('DB_POOL_MIN', '2'))
+DEFAULT_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+DEFAULT_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DEFAULT_SESSION_CACHE_TTL = float(os.getenv('DB_SESSION_CACHE_TTL', '2'))
+
+# Server-side prepared statements, created once per pooled connection
+PREPARED_STATEMENTS = {
+    'asp_session_by_ws': "SELECT * FROM asp_terminal WHERE wsname = $1",
+    'asp_session_by_id': "SELECT * FROM asp_terminal WHERE session_id = $1",
+    'asp_sessions_by_ws_list': "SELECT * FROM asp_terminal WHERE wsname = ANY($1) ORDER BY wsname",
+    'asp_wsnames_in_list': "SELECT wsname FROM asp_terminal WHERE wsname = ANY($1)",
+    'asp_upsert_session': """
+        INSERT INTO asp_terminal
+        (wsname, username, conn_time, status, terminal_id, session_id,
+         display_mode, encoding, login_time, last_activity)
+        VALUES ($1, $2, $3, '1', $4, $5, $6, $7, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        ON CONFLICT (wsname) DO UPDATE
+        SET username = EXCLUDED.username, terminal_id = EXCLUDED.terminal_id,
+            session_id = EXCLUDED.session_id, display_mode = EXCLUDED.display_mode,
+            encoding = EXCLUDED.encoding, status = '1', conn_time = EXCLUDED.conn_time,
+            login_time = CURRENT_TIMESTAMP, last_activity = CURRENT_TIMESTAMP
+    """,
+    'asp_set_status_by_ws': """
+        UPDATE asp_terminal SET status = $2, last_activity = CURRENT_TIMESTAMP
+        WHERE wsname = $1
+    """,
+    'asp_logout_by_id': """
+        UPDATE asp_terminal SET status = '0', last_activity = CURRENT_TIMESTAMP
+        WHERE session_id = $1 RETURNING wsname
+    """,
+    'asp_bulk_logout': """
+        UPDATE asp_terminal SET status = '0', last_activity = CURRENT_TIMESTAMP
+        WHERE wsname = ANY($1) AND status <> '0' RETURNING wsname
+    """,
+    'asp_delete_by_ws': "DELETE FROM asp_terminal WHERE wsname = $1",
+}
+
+class SessionPool:
+    """
+    ThreadedConnectionPool plus the checkout state its users share
+
+    Checkouts queue on a semaphore of maxconn slots instead of failing with
+    PoolError, and each connection gets the search path and the prepared
+    statements once, whichever manager borrows it first.
+    """
+
+    def __init__(self, db_config: Dict[str, Any], minconn: int, maxconn: int):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self._pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, **db_config)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._prepared = weakref.WeakSet()
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+    @property
+    def closed(self) -> bool:
+        return self._pool.closed
+
+    @contextmanager
+    def connection(self, timeout: float):
+        """
+        Borrow a connection (commit on success, rollback on error)
+
+        Raises:
+            psycopg2.pool.PoolError: No connection freed up within timeout
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise psycopg2.pool.PoolError(f"No database connection available within {timeout}s")
+        conn = None
+        broken = False
+        try:
+            conn = self._pool.getconn()
+            with self._lock:
+                self._in_use += 1
+            if conn not in self._prepared:
+                self._prepare(conn)
+            yield conn
+            conn.commit()
+        except Exception:
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            raise
+        finally:
+            if conn is not None:
+                with self._lock:
+                    self._in_use -= 1
+                self._pool.putconn(conn, close=broken or bool(conn.closed))
+            self._slots.release()
+
+    def _prepare(self, conn):
+        """Set search path and PREPARE the hot statements on a new connection"""
+        with conn.cursor() as cur:
+            # Set search path to include aspuser schema
+            cur.execute("SET search_path TO aspuser, public")
+            for name, statement in PREPARED_STATEMENTS.items():
+                cur.execute(f"PREPARE {name} AS {statement}")
+        conn.commit()
+        self._prepared.add(conn)
+
+    def status(self) -> Dict[str, int]:
+        with self._lock:
+            in_use = self._in_use
+        return {'pool_min': self.minconn, 'pool_max': self.maxconn,
+                'pool_in_use': in_use, 'pool_available': self.maxconn - in_use}
+
+
+_shared_pools: Dict[tuple, SessionPool] = {}
+_shared_pools_lock = threading.Lock()
+
+
+def get_shared_pool(db_config: Dict[str, Any], minconn: int = DEFAULT_POOL_MIN,
+                    maxconn: int = DEFAULT_POOL_MAX) -> SessionPool:
+    """
+    Get the process-wide connection pool for a database configuration
+
+    Args:
+        db_config: psycopg2.connect() keyword arguments
+        minconn: Connections kept open
+        maxconn: Upper bound of open connections
+
+    Returns:
+        SessionPool shared by all managers with the same config
+    """
+    key = tuple(sorted(db_config.items()))
+    with _shared_pools_lock:
+        pool = _shared_pools.get(key)
+        if pool is None or pool.closed:
+            pool = SessionPool(db_config, minconn, maxconn)
+            _shared_pools[key] = pool
+            logger.info(f"PostgreSQL session pool initialized (min={minconn}, max={maxconn})")
+        return pool
+
+
 class PostgreSQLSessionManager:
     """PostgreSQL-based session manager for enterprise terminal sessions"""
     
-    def __init__(self, db_config=None):
+    def __init__(self, db_config=None, pool_min: int = DEFAULT_POOL_MIN,
+                 pool_max: int = DEFAULT_POOL_MAX, pool_timeout: float = DEFAULT_POOL_TIMEOUT,
+                 cache_ttl: float = DEFAULT_SESSION_CACHE_TTL):
         self.lock = threading.RLock()
         
         # Default database configuration
@@ -35,6 +186,16 @@ class PostgreSQLSessionManager:
             'password': os.getenv('DB_PASSWORD', 'aspuser123')
         }
         
+        # Shared pool; its semaphore makes callers queue instead of failing
+        # with PoolError when every connection is checked out
+        self.pool = get_shared_pool(self.db_config, pool_min, pool_max)
+        self.pool_timeout = pool_timeout
+        
+        # wsname -> (expires_at, row) read cache
+        self.cache_ttl = cache_ttl
+        self._session_cache: Dict[str, tuple] = {}
+        self._cache_lock = threading.Lock()
+        
         # Test database connection
         self._test_connection()
     
@@ -62,12 +223,39 @@ class PostgreSQLSessionManager:
             raise
     
     def _get_connection(self):
-        """Get database connection"""
-        conn = psycopg2.connect(**self.db_config)
-        # Set search path to include aspuser schema
-        with conn.cursor() as cur:
-            cur.execute("SET search_path TO aspuser, public")
-        return conn
+        """Borrow a pooled connection (see SessionPool.connection)"""
+        return self.pool.connection(self.pool_timeout)
+    
+    def _cache_get(self, wsname: str) -> Optional[Dict[str, Any]]:
+        with self._cache_lock:
+            entry = self._session_cache.get(wsname)
+            if entry and entry[0] > time.monotonic():
+                return dict(entry[1])
+            self._session_cache.pop(wsname, None)
+            return None
+    
+    def _cache_put(self, wsname: str, row: Dict[str, Any]):
+        if self.cache_ttl <= 0:
+            return
+        with self._cache_lock:
+            self._session_cache[wsname] = (time.monotonic() + self.cache_ttl, dict(row))
+    
+    def invalidate_cache(self, *wsnames: str):
+        """Drop cached sessions (all of them when no names are given)"""
+        with self._cache_lock:
+            if not wsnames:
+                self._session_cache.clear()
+            for wsname in wsnames:
+                self._session_cache.pop(wsname, None)
+    
+    def get_pool_status(self) -> Dict[str, Any]:
+        """Pool and cache counters for health endpoints"""
+        status = self.pool.status()
+        status.update({
+            'cached_sessions': len(self._session_cache),
+            'cache_ttl': self.cache_ttl
+        })
+        return status
     
     def _format_conn_time(self, dt=None):
         """Format datetime to yyyy/mm/dd-hh:mm:ss format"""
@@ -84,76 +272,57 @@ class PostgreSQLSessionManager:
     
     def create_session(self, wsname: str, user_id: str, terminal_id: str = None, 
                       display_mode: str = 'legacy', encoding: str = 'sjis') -> str:
-        """Create new workstation session in PostgreSQL"""
-        with self.lock:
-            try:
-                session_id = f"ws_{wsname}_{uuid.uuid4().hex[:8]}"
-                terminal_id = terminal_id or wsname
-                conn_time = self._format_conn_time()
-                
-                with self._get_connection() as conn:
-                    with conn.cursor() as cur:
-                        # Check if session already exists
-                        cur.execute(
-                            "SELECT wsname FROM asp_terminal WHERE wsname = %s",
-                            (wsname,)
-                        )
-                        
-                        if cur.fetchone():
-                            # Update existing session
-                            cur.execute("""
-                                UPDATE asp_terminal 
-                                SET username = %s, terminal_id = %s, session_id = %s,
-                                    display_mode = %s, encoding = %s, status = '1',
-                                    conn_time = %s, login_time = CURRENT_TIMESTAMP,
-                                    last_activity = CURRENT_TIMESTAMP
-                                WHERE wsname = %s
-                            """, (user_id, terminal_id, session_id, display_mode, 
-                                 encoding, conn_time, wsname))
-                        else:
-                            # Insert new session
-                            cur.execute("""
-                                INSERT INTO asp_terminal 
-                                (wsname, username, conn_time, status, terminal_id, session_id,
-                                 display_mode, encoding, login_time, last_activity)
-                                VALUES (%s, %s, %s, '1', %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                            """, (wsname, user_id, conn_time, terminal_id, session_id,
-                                 display_mode, encoding))
-                        
-                        conn.commit()
-                        logger.info(f"Created/Updated session {session_id} for {wsname} (user: {user_id})")
-                        return session_id
-                        
-            except Exception as e:
-                logger.error(f"Failed to create session: {e}")
-                raise
+        """Create new workstation session in PostgreSQL (insert or reactivate)"""
+        try:
+            session_id = f"ws_{wsname}_{uuid.uuid4().hex[:8]}"
+            terminal_id = terminal_id or wsname
+            conn_time = self._format_conn_time()
+            
+            with self._get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "EXECUTE asp_upsert_session (%s, %s, %s, %s, %s, %s, %s)",
+                        (wsname, user_id, conn_time, terminal_id, session_id,
+                         display_mode, encoding)
+                    )
+            
+            self.invalidate_cache(wsname)
+            logger.info(f"Created/Updated session {session_id} for {wsname} (user: {user_id})")
+            return session_id
+                    
+        except Exception as e:
+            logger.error(f"Failed to create session: {e}")
+            raise
     
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session by session ID"""
         try:
             with self._get_connection() as conn:
                 with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-                    cur.execute(
-                        "SELECT * FROM asp_terminal WHERE session_id = %s",
-                        (session_id,)
-                    )
+                    cur.execute("EXECUTE asp_session_by_id (%s)", (session_id,))
                     row = cur.fetchone()
                     return dict(row) if row else None
         except Exception as e:
             logger.error(f"Failed to get session {session_id}: {e}")
             return None
     
-    def get_session_by_workstation(self, wsname: str) -> Optional[Dict[str, Any]]:
-        """Get session by workstation name"""
+    def get_session_by_workstation(self, wsname: str, use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """Get session by workstation name (served from the read cache when fresh)"""
+        if use_cache:
+            cached = self._cache_get(wsname)
+            if cached is not None:
+                return cached
+        
         try:
             with self._get_connection() as conn:
                 with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-                    cur.execute(
-                        "SELECT * FROM asp_terminal WHERE wsname = %s",
-                        (wsname,)
-                    )
+                    cur.execute("EXECUTE asp_session_by_ws (%s)", (wsname,))
                     row = cur.fetchone()
-                    return dict(row) if row else None
+            if not row:
+                return None
+            session = dict(row)
+            self._cache_put(wsname, session)
+            return session
         except Exception as e:
             logger.error(f"Failed to get session for workstation {wsname}: {e}")
             return None
@@ -200,96 +369,89 @@ class PostgreSQLSessionManager:
             logger.error(f"Failed to list sessions: {e}")
             return []
     
+    def _update_where(self, column: str, value: str, updates: Dict[str, Any]) -> bool:
+        """Single-statement UPDATE of the allowed columns, keyed by wsname or session_id"""
+        set_clauses = []
+        params = []
+        
+        for key, update_value in updates.items():
+            if key in ['wsname', 'username', 'status', 'terminal_id', 
+                      'display_mode', 'encoding', 'conn_time', 'properties']:
+                set_clauses.append(f"{key} = %s")
+                params.append(update_value)
+        
+        # Always update last_activity
+        set_clauses.append("last_activity = CURRENT_TIMESTAMP")
+        params.append(value)
+        
+        query = f"UPDATE asp_terminal SET {', '.join(set_clauses)} WHERE {column} = %s RETURNING wsname"
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                updated = [row[0] for row in cur.fetchall()]
+        
+        # Renames leave the old name cached otherwise
+        self.invalidate_cache(*updated, *([updates['wsname']] if 'wsname' in updates else []))
+        return bool(updated)
+    
     def update_session(self, session_id: str, updates: Dict[str, Any]) -> bool:
         """Update session data"""
         try:
-            with self._get_connection() as conn:
-                with conn.cursor() as cur:
-                    # Check if session exists
-                    cur.execute(
-                        "SELECT wsname FROM asp_terminal WHERE session_id = %s",
-                        (session_id,)
-                    )
-                    
-                    if not cur.fetchone():
-                        return False
-                    
-                    # Build update query
-                    set_clauses = []
-                    params = []
-                    
-                    for key, value in updates.items():
-                        if key in ['wsname', 'username', 'status', 'terminal_id', 
-                                  'display_mode', 'encoding', 'conn_time', 'properties']:
-                            set_clauses.append(f"{key} = %s")
-                            params.append(value)
-                    
-                    # Always update last_activity
-                    set_clauses.append("last_activity = CURRENT_TIMESTAMP")
-                    params.append(session_id)
-                    
-                    if set_clauses:
-                        query = f"UPDATE asp_terminal SET {', '.join(set_clauses)} WHERE session_id = %s"
-                        cur.execute(query, params)
-                        conn.commit()
-                        
-                        logger.info(f"Updated session {session_id}")
-                        return True
-                    
-                    return False
-                    
+            success = self._update_where('session_id', session_id, updates)
+            if success:
+                logger.info(f"Updated session {session_id}")
+            return success
         except Exception as e:
             logger.error(f"Failed to update session {session_id}: {e}")
             return False
     
     def update_session_by_wsname(self, wsname: str, updates: Dict[str, Any]) -> bool:
         """Update session data by workstation name"""
+        try:
+            success = self._update_where('wsname', wsname, updates)
+            if success:
+                logger.info(f"Updated session for wsname {wsname}")
+            return success
+        except Exception as e:
+            logger.error(f"Failed to update session for wsname {wsname}: {e}")
+            return False
+    
+    def update_session_status(self, wsname: str, status: str) -> bool:
+        """Set session status ('1' active, '0' inactive) by workstation name"""
         try:
             with self._get_connection() as conn:
                 with conn.cursor() as cur:
-                    # Check if session exists
-                    cur.execute(
-                        "SELECT session_id FROM asp_terminal WHERE wsname = %s",
-                        (wsname,)
-                    )
-                    
-                    row = cur.fetchone()
-                    if not row:
-                        return False
-                    
-                    session_id = row[0]
-                    return self.update_session(session_id, updates)
-                    
+                    cur.execute("EXECUTE asp_set_status_by_ws (%s, %s)", (wsname, status))
+                    updated = cur.rowcount > 0
+            self.invalidate_cache(wsname)
+            return updated
         except Exception as e:
-            logger.error(f"Failed to update session for wsname {wsname}: {e}")
+            logger.error(f"Failed to set status for wsname {wsname}: {e}")
             return False
     
+    # Alias used by the terminal disconnect path
+    set_session_status = update_session_status
+    
     def logout_session(self, session_id: str = None, wsname: str = None) -> bool:
         """Logout session by ID or workstation name"""
         try:
-            with self._get_connection() as conn:
-                with conn.cursor() as cur:
-                    if wsname:
-                        # Logout by workstation name
-                        cur.execute(
-                            "UPDATE asp_terminal SET status = '0', last_activity = CURRENT_TIMESTAMP WHERE wsname = %s",
-                            (wsname,)
-                        )
-                    elif session_id:
-                        # Logout by session ID
-                        cur.execute(
-                            "UPDATE asp_terminal SET status = '0', last_activity = CURRENT_TIMESTAMP WHERE session_id = %s",
-                            (session_id,)
-                        )
-                    else:
-                        return False
-                    
-                    if cur.rowcount > 0:
-                        conn.commit()
-                        logger.info(f"Logged out session (session_id: {session_id}, wsname: {wsname})")
-                        return True
-                    
-                    return False
+            if wsname:
+                # Logout by workstation name
+                success = self.update_session_status(wsname, '0')
+            elif session_id:
+                # Logout by session ID
+                with self._get_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("EXECUTE asp_logout_by_id (%s)", (session_id,))
+                        updated = [row[0] for row in cur.fetchall()]
+                self.invalidate_cache(*updated)
+                success = bool(updated)
+            else:
+                return False
+            
+            if success:
+                logger.info(f"Logged out session (session_id: {session_id}, wsname: {wsname})")
+            return success
                     
         except Exception as e:
             logger.error(f"Failed to logout session: {e}")
@@ -300,22 +462,21 @@ class PostgreSQLSessionManager:
         try:
             with self._get_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute(
-                        "DELETE FROM asp_terminal WHERE wsname = %s",
-                        (wsname,)
-                    )
-                    
-                    if cur.rowcount > 0:
-                        conn.commit()
-                        logger.info(f"Deleted session for wsname {wsname}")
-                        return True
-                    
-                    return False
+                    cur.execute("EXECUTE asp_delete_by_ws (%s)", (wsname,))
+                    deleted = cur.rowcount > 0
+            
+            self.invalidate_cache(wsname)
+            if deleted:
+                logger.info(f"Deleted session for wsname {wsname}")
+            return deleted
                     
         except Exception as e:
             logger.error(f"Failed to delete session {wsname}: {e}")
             return False
     
+    # Alias used by the v1 sessions API
+    cleanup_session = delete_session
+    
     def cleanup_old_sessions(self, days_old=30):
         """Clean up old inactive sessions"""
         try:
@@ -324,16 +485,16 @@ class PostgreSQLSessionManager:
                     cur.execute("""
                         DELETE FROM asp_terminal 
                         WHERE status = '0' 
-                        AND last_activity < CURRENT_TIMESTAMP - INTERVAL '%s days'
+                        AND last_activity < CURRENT_TIMESTAMP - %s * INTERVAL '1 day'
                     """, (days_old,))
                     
                     deleted_count = cur.rowcount
-                    conn.commit()
-                    
-                    if deleted_count > 0:
-                        logger.info(f"Cleaned up {deleted_count} old sessions")
-                    
-                    return deleted_count
+            
+            if deleted_count > 0:
+                self.invalidate_cache()
+                logger.info(f"Cleaned up {deleted_count} old sessions")
+            
+            return deleted_count
                     
         except Exception as e:
             logger.error(f"Failed to cleanup old sessions: {e}")
@@ -344,24 +505,17 @@ class PostgreSQLSessionManager:
         try:
             with self._get_connection() as conn:
                 with conn.cursor() as cur:
-                    # Get various statistics
+                    # Counts in one pass over the table
                     stats = {}
-                    
-                    # Total sessions
-                    cur.execute("SELECT COUNT(*) FROM asp_terminal")
-                    stats['total_sessions'] = cur.fetchone()[0]
-                    
-                    # Active sessions
-                    cur.execute("SELECT COUNT(*) FROM asp_terminal WHERE status = '1'")
-                    stats['active_sessions'] = cur.fetchone()[0]
-                    
-                    # Inactive sessions  
-                    cur.execute("SELECT COUNT(*) FROM asp_terminal WHERE status = '0'")
-                    stats['inactive_sessions'] = cur.fetchone()[0]
-                    
-                    # Unique users
-                    cur.execute("SELECT COUNT(DISTINCT username) FROM asp_terminal")
-                    stats['unique_users'] = cur.fetchone()[0]
+                    cur.execute("""
+                        SELECT COUNT(*),
+                               COUNT(*) FILTER (WHERE status = '1'),
+                               COUNT(*) FILTER (WHERE status = '0'),
+                               COUNT(DISTINCT username)
+                        FROM asp_terminal
+                    """)
+                    (stats['total_sessions'], stats['active_sessions'],
+                     stats['inactive_sessions'], stats['unique_users']) = cur.fetchone()
                     
                     # Sessions by user
                     cur.execute("""
@@ -373,81 +527,62 @@ class PostgreSQLSessionManager:
                     stats['sessions_by_user'] = [{'username': row[0], 'count': row[1]} 
                                                 for row in cur.fetchall()]
                     
-                    return stats
+            stats['pool'] = self.get_pool_status()
+            return stats
                     
         except Exception as e:
             logger.error(f"Failed to get session statistics: {e}")
             return {}
 
     def bulk_logout_sessions(self, workstation_names: List[str]) -> Dict[str, Any]:
-        """Bulk logout sessions by workstation names"""
+        """Bulk logout sessions by workstation names (one UPDATE for all of them)"""
         results = {
             'success': [],
             'failed': [],
             'total_processed': len(workstation_names)
         }
         
+        if not workstation_names:
+            return results
+        
         try:
             with self._get_connection() as conn:
                 with conn.cursor() as cur:
-                    for wsname in workstation_names:
-                        try:
-                            # Check if session exists and is active
-                            cur.execute(
-                                "SELECT wsname, status FROM asp_terminal WHERE wsname = %s",
-                                (wsname,)
-                            )
-                            row = cur.fetchone()
-                            
-                            if not row:
-                                results['failed'].append({
-                                    'wsname': wsname,
-                                    'error': 'Session not found'
-                                })
-                                continue
-                                
-                            if row[1] == '0':
-                                results['failed'].append({
-                                    'wsname': wsname,
-                                    'error': 'Session already inactive'
-                                })
-                                continue
-                            
-                            # Logout the session
-                            cur.execute(
-                                "UPDATE asp_terminal SET status = '0', last_activity = CURRENT_TIMESTAMP WHERE wsname = %s",
-                                (wsname,)
-                            )
-                            
-                            if cur.rowcount > 0:
-                                results['success'].append(wsname)
-                                logger.info(f"Bulk logout successful for workstation: {wsname}")
-                            else:
-                                results['failed'].append({
-                                    'wsname': wsname,
-                                    'error': 'Failed to update session status'
-                                })
-                                
-                        except Exception as e:
-                            logger.error(f"Failed to logout session {wsname}: {e}")
-                            results['failed'].append({
-                                'wsname': wsname,
-                                'error': str(e)
-                            })
-                    
-                    # Commit all changes
-                    conn.commit()
-                    logger.info(f"Bulk logout completed: {len(results['success'])} successful, {len(results['failed'])} failed")
-                    
-        except Exception as e:
-            logger.error(f"Bulk logout operation failed: {e}")
-            # If connection failed, mark all as failed
+                    cur.execute("EXECUTE asp_bulk_logout (%s)", (list(workstation_names),))
+                    logged_out = {row[0] for row in cur.fetchall()}
+                    
+                    # Classify the rest: missing or already inactive
+                    remaining = [wsname for wsname in workstation_names if wsname not in logged_out]
+                    existing = set()
+                    if remaining:
+                        cur.execute("EXECUTE asp_wsnames_in_list (%s)", (remaining,))
+                        existing = {row[0] for row in cur.fetchall()}
+            
+            self.invalidate_cache(*workstation_names)
             for wsname in workstation_names:
-                if wsname not in [item['wsname'] if isinstance(item, dict) else item for item in results['success'] + [f['wsname'] for f in results['failed']]]:
+                if wsname in logged_out:
+                    results['success'].append(wsname)
+                elif wsname in existing:
+                    results['failed'].append({
+                        'wsname': wsname,
+                        'error': 'Session already inactive'
+                    })
+                else:
                     results['failed'].append({
                         'wsname': wsname,
-                        'error': f'Database error: {str(e)}'
+                        'error': 'Session not found'
                     })
+            
+            logger.info(f"Bulk logout completed: {len(results['success'])} successful, {len(results['failed'])} failed")
+                    
+        except Exception as e:
+            logger.error(f"Bulk logout operation failed: {e}")
+            # The statement is atomic: nothing was logged out
+            results['success'] = []
+            results['failed'] = [{
+                'wsname': wsname,
+                'error': f'Database error: {str(e)}'
+            } for wsname in workstation_names]
         
         return results
 
@@ -459,11 +594,7 @@ class PostgreSQLSessionManager:
                 
             with self._get_connection() as conn:
                 with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-                    # Create placeholders for the IN clause
-                    placeholders = ','.join(['%s'] * len(workstation_names))
-                    query = f"SELECT * FROM asp_terminal WHERE wsname IN ({placeholders}) ORDER BY wsname"
-                    
-                    cur.execute(query, workstation_names)
+                    cur.execute("EXECUTE asp_sessions_by_ws_list (%s)", (list(workstation_names),))
                     rows = cur.fetchall()
                     return [dict(row) for row in rows]
                     
@@ -474,11 +605,8 @@ class PostgreSQLSessionManager:
     def cleanup_inactive_sessions(self, minutes=30):
         """Clean up inactive sessions older than specified minutes."""
         try:
-            with psycopg2.connect(**self.db_config) as conn:
+            with self._get_connection() as conn:
                 with conn.cursor() as cur:
-                    # Set search path to find the table
-                    cur.execute("SET search_path TO aspuser, public")
-                    
                     # Calculate cutoff time
                     from datetime import datetime, timedelta
                     cutoff_time = datetime.now() - timedelta(minutes=minutes)
@@ -491,10 +619,11 @@ class PostgreSQLSessionManager:
                     """, (cutoff_time,))
                     
                     cleaned_count = cur.rowcount
-                    conn.commit()
-                    
-                    logger.info(f"Cleaned up {cleaned_count} inactive sessions older than {minutes} minutes")
-                    return cleaned_count
+            
+            if cleaned_count > 0:
+                self.invalidate_cache()
+            logger.info(f"Cleaned up {cleaned_count} inactive sessions older than {minutes} minutes")
+            return cleaned_count
                     
         except Exception as e:
             logger.error(f"Session cleanup failed: {e}")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Multi-worker launcher for the OpenASP API server
+
+Starts N api_server.py processes on consecutive ports (ASP_PORT) that share
+state through ASP_STATE_STORE and relay Socket.IO emits through
+ASP_SOCKETIO_MESSAGE_QUEUE. Put a load balancer with sticky sessions in front
+of the ports (Socket.IO long-polling needs every request of a client to reach
+the same worker), e.g. nginx upstream with ip_hash.
+
+Shared state covers terminal routes, position maps and the SMED screen
+states used for delta updates and resyncs. Workstation sessions
+(WorkstationSessionManager) are not shared: each worker keeps its own, so a
+client must stay on the worker it logged in through.
+
+Without --state-store a local StateBroker is started and shared by the
+workers. Cross-worker emits need a message queue (e.g. redis://host:6379/0);
+without one each worker only reaches its own clients.
+
+Usage:
+    python run_api_workers.py --workers 4 --base-port 8000 \
+        --message-queue redis://localhost:6379/0
+"""
+
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+
+from shared_state import start_state_broker
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_server.py')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run multiple OpenASP API server workers')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Number of worker processes')
+    parser.add_argument('--base-port', type=int, default=8000, help='Port of worker 0; worker i listens on base+i')
+    parser.add_argument('--state-store', default=os.environ.get('ASP_STATE_STORE'),
+                        help='Shared state store URL (default: start a local broker)')
+    parser.add_argument('--message-queue', default=os.environ.get('ASP_SOCKETIO_MESSAGE_QUEUE'),
+                        help='Socket.IO message queue URL, e.g. redis://localhost:6379/0')
+    args = parser.parse_args()
+
+    broker = None
+    state_store = args.state_store
+    if not state_store:
+        broker = start_state_broker()
+        host, port = broker.address
+        state_store = f'broker://{host}:{port}'
+        print(f"[INFO] Started local state broker at {state_store}")
+
+    if args.workers > 1 and not args.message_queue:
+        print("[WARN] No Socket.IO message queue: emits only reach clients of the emitting worker")
+
+    workers = []
+    for worker_id in range(args.workers):
+        env = dict(os.environ,
+                   ASP_WORKER_ID=str(worker_id),
+                   ASP_PORT=str(args.base_port + worker_id),
+                   ASP_STATE_STORE=state_store)
+        if args.message_queue:
+            env['ASP_SOCKETIO_MESSAGE_QUEUE'] = args.message_queue
+        workers.append(subprocess.Popen([sys.executable, SERVER_SCRIPT], env=env))
+        print(f"[INFO] Worker {worker_id} started on port {args.base_port + worker_id} (PID: {workers[-1].pid})")
+
+    def stop(signum=None, frame=None):
+        for process in workers:
+            if process.poll() is None:
+                process.terminate()
+        for process in workers:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if broker:
+            broker.shutdown()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # A worker that dies takes the deployment down; the supervisor restarts it
+    while all(process.poll() is None for process in workers):
+        time.sleep(1)
+    print("[ERROR] A worker exited; stopping all workers")
+    stop()
+
+
+if __name__ == '__main__':
+    main()
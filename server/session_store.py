@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Write-Behind Session Store
+Persists WorkstationSessionManager state without rewriting it on every update
+
+State lives in memory; the store only decides when it reaches disk:
+- mark_dirty()   : volatile change (last_activity, websocket rooms); picked up
+                   by the next periodic snapshot, never written synchronously
+- log_set/log_delete : structural change (login, logout, status); appended as
+                   one JSON line to the change log so it survives a crash
+- flush()        : snapshot written to a temp file and os.replace()'d over the
+                   session file, then the change log is truncated
+
+The snapshot records the last change-log sequence it contains. On startup,
+load() reads the snapshot and replays newer change-log entries; a torn last
+line from a crash mid-append is ignored.
+"""
+
+import os
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_FLUSH_INTERVAL = 2.0
+SESSION_TABLES = ('sessions', 'workstation_sessions', 'user_sessions')
+
+
+class WriteBehindSessionStore:
+    """Snapshot file plus append-only change log for session tables"""
+
+    def __init__(self, session_file: str, lock: threading.RLock,
+                 state_provider: Callable[[], Dict[str, Any]],
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        """
+        Args:
+            session_file: Snapshot path (the change log is session_file + '.log')
+            lock: Lock guarding the tables returned by state_provider
+            state_provider: Returns {table: dict} for all SESSION_TABLES
+            flush_interval: Seconds between background snapshots
+        """
+        self.session_file = session_file
+        self.log_file = session_file + '.log'
+        self.lock = lock
+        self.state_provider = state_provider
+        self.flush_interval = flush_interval
+
+        self._seq = 0
+        self._dirty = False
+        self._pending: List[Tuple[int, str]] = []  # change-log lines since last snapshot
+        self._log = None
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._snapshots = 0
+        self._log_writes = 0
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Recover tables from the snapshot and change log
+
+        Returns:
+            dict: {table: dict} for all SESSION_TABLES (empty if nothing stored)
+        """
+        state = {table: {} for table in SESSION_TABLES}
+        snapshot_seq = 0
+
+        if os.path.exists(self.session_file):
+            with open(self.session_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for table in SESSION_TABLES:
+                state[table] = data.get(table, {})
+            snapshot_seq = data.get('log_seq', 0)
+        self._seq = snapshot_seq
+
+        replayed = 0
+        if os.path.exists(self.log_file):
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn write at crash time; later lines cannot exist
+                    seq = entry.get('seq', 0)
+                    if seq <= snapshot_seq or entry.get('table') not in state:
+                        continue
+                    table = state[entry['table']]
+                    if entry.get('op') == 'del':
+                        table.pop(entry['key'], None)
+                    else:
+                        table[entry['key']] = entry.get('value')
+                    self._seq = max(self._seq, seq)
+                    replayed += 1
+
+        # Replayed changes are not in the snapshot yet
+        self._dirty = replayed > 0
+        return state
+
+    def mark_dirty(self):
+        """Schedule the current state for the next snapshot (no I/O)"""
+        self._dirty = True
+
+    def log_set(self, table: str, key: str, value: Any):
+        """Durably record table[key] = value; caller holds the lock"""
+        self._append({'op': 'set', 'table': table, 'key': key, 'value': value})
+
+    def log_delete(self, table: str, key: str):
+        """Durably record removal of table[key]; caller holds the lock"""
+        self._append({'op': 'del', 'table': table, 'key': key})
+
+    def _append(self, entry: Dict[str, Any]):
+        self._seq += 1
+        entry['seq'] = self._seq
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        self._pending.append((self._seq, line))
+        self._dirty = True
+        if self._log is None:
+            self._log = open(self.log_file, 'a', encoding='utf-8')
+        self._log.write(line)
+        self._log.flush()
+        self._log_writes += 1
+
+    def flush(self) -> bool:
+        """
+        Write a snapshot if anything changed since the last one
+
+        Returns:
+            bool: True if a snapshot was written
+        """
+        with self._flush_lock:
+            with self.lock:
+                if not self._dirty:
+                    return False
+                state = self.state_provider()
+                state['log_seq'] = seq = self._seq
+                payload = json.dumps(state, indent=2, ensure_ascii=False)
+                self._dirty = False
+
+            try:
+                temp_file = self.session_file + '.tmp'
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, self.session_file)
+            except Exception:
+                self._dirty = True
+                raise
+
+            # Keep only change-log entries newer than the snapshot
+            with self.lock:
+                self._pending = [(s, line) for s, line in self._pending if s > seq]
+                if self._log is not None:
+                    self._log.close()
+                    self._log = None
+                temp_log = self.log_file + '.tmp'
+                with open(temp_log, 'w', encoding='utf-8') as f:
+                    f.writelines(line for _, line in self._pending)
+                os.replace(temp_log, self.log_file)
+
+            self._snapshots += 1
+            return True
+
+    def start(self):
+        """Start the background flusher thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='session-store-flusher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and write a final snapshot"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval + 1)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[WARN] Session snapshot failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Persistence counters"""
+        return {
+            'dirty': self._dirty,
+            'log_seq': self._seq,
+            'pending_log_entries': len(self._pending),
+            'log_writes': self._log_writes,
+            'snapshots': self._snapshots,
+            'flush_interval': self.flush_interval
+        }
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared State Store for multi-process API server deployments
+Namespaced key/value state visible to every API server worker
+
+A single API server keeps its state in process memory (memory://). When
+several workers serve terminals behind a load balancer, state that any worker
+may need - terminal routes, position maps - goes to a shared backend instead,
+selected by URL:
+
+    memory://                   in-process dict (single worker, default)
+    redis://host:6379/0         Redis hashes, one per namespace
+    broker://host:port          StateBroker (stdlib multiprocessing manager);
+                                a local stand-in for Redis on one host and in tests
+
+Socket.IO traffic between workers goes through Flask-SocketIO's own
+message-queue adapter (message_queue=redis://... or any kombu URL).
+"""
+
+import json
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from multiprocessing.managers import BaseManager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# Optional Redis backend
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+DEFAULT_STATE_STORE_URL = 'memory://'
+DEFAULT_BROKER_AUTHKEY = b'openasp-state'
+
+# Sentinel for absent keys; a plain string so it survives pickling and JSON
+MISSING = '__asp_state_missing__'
+
+
+class StateStore(ABC):
+    """Namespaced key/value store interface"""
+
+    shared = False
+
+    @abstractmethod
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        """Value of key, or default if absent"""
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any):
+        """Store value under key"""
+
+    @abstractmethod
+    def set_if(self, namespace: str, key: str, value: Any, expected: Any = MISSING) -> bool:
+        """Store value only while key still holds expected, or is absent if expected is
+        not given (compare-and-set)"""
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> bool:
+        """Remove key; True if it existed"""
+
+    @abstractmethod
+    def delete_if(self, namespace: str, key: str, expected: Any) -> bool:
+        """Delete key only while it still holds expected (compare-and-delete)"""
+
+    @abstractmethod
+    def items(self, namespace: str) -> List[Tuple[str, Any]]:
+        """All (key, value) pairs of a namespace"""
+
+    def contains(self, namespace: str, key: str) -> bool:
+        return self.get(namespace, key, MISSING) != MISSING
+
+    def count(self, namespace: str) -> int:
+        return len(self.items(namespace))
+
+
+class LocalStateStore(StateStore):
+    """In-process store (single worker; also the broker's backing store)"""
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            return self._data.get(namespace, {}).get(key, default)
+
+    def set(self, namespace, key, value):
+        with self._lock:
+            self._data.setdefault(namespace, {})[key] = value
+
+    def set_if(self, namespace, key, value, expected=MISSING):
+        with self._lock:
+            table = self._data.setdefault(namespace, {})
+            if table.get(key, MISSING) != expected:
+                return False
+            table[key] = value
+            return True
+
+    def delete(self, namespace, key):
+        with self._lock:
+            return self._data.get(namespace, {}).pop(key, MISSING) != MISSING
+
+    def delete_if(self, namespace, key, expected):
+        with self._lock:
+            table = self._data.get(namespace, {})
+            if key in table and table[key] == expected:
+                del table[key]
+                return True
+            return False
+
+    def items(self, namespace):
+        with self._lock:
+            return list(self._data.get(namespace, {}).items())
+
+    def count(self, namespace):
+        with self._lock:
+            return len(self._data.get(namespace, {}))
+
+
+class RedisStateStore(StateStore):
+    """Redis-backed store: one hash per namespace, JSON values"""
+
+    shared = True
+
+    # Compare-and-delete/set must be atomic across workers
+    _DELETE_IF = """
+        if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+            return redis.call('HDEL', KEYS[1], ARGV[1])
+        end
+        return 0
+    """
+
+    # ARGV[4] = '1': the key must be absent
+    _SET_IF = """
+        local current = redis.call('HGET', KEYS[1], ARGV[1])
+        if (ARGV[4] == '1' and not current) or (ARGV[4] ~= '1' and current == ARGV[3]) then
+            redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+            return 1
+        end
+        return 0
+    """
+
+    def __init__(self, url: str, prefix: str = 'asp:'):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package is required for redis:// state stores")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._delete_if = self.client.register_script(self._DELETE_IF)
+        self._set_if = self.client.register_script(self._SET_IF)
+
+    def _key(self, namespace):
+        return f"{self.prefix}{namespace}"
+
+    def get(self, namespace, key, default=None):
+        raw = self.client.hget(self._key(namespace), key)
+        return json.loads(raw) if raw is not None else default
+
+    def set(self, namespace, key, value):
+        self.client.hset(self._key(namespace), key, json.dumps(value, ensure_ascii=False))
+
+    def set_if(self, namespace, key, value, expected=MISSING):
+        absent = expected == MISSING
+        return bool(self._set_if(keys=[self._key(namespace)],
+                                 args=[key, json.dumps(value, ensure_ascii=False),
+                                       '' if absent else json.dumps(expected, ensure_ascii=False),
+                                       '1' if absent else '0']))
+
+    def delete(self, namespace, key):
+        return bool(self.client.hdel(self._key(namespace), key))
+
+    def delete_if(self, namespace, key, expected):
+        return bool(self._delete_if(keys=[self._key(namespace)],
+                                    args=[key, json.dumps(expected, ensure_ascii=False)]))
+
+    def items(self, namespace):
+        return [(k.decode('utf-8'), json.loads(v))
+                for k, v in self.client.hgetall(self._key(namespace)).items()]
+
+    def contains(self, namespace, key):
+        return bool(self.client.hexists(self._key(namespace), key))
+
+    def count(self, namespace):
+        return self.client.hlen(self._key(namespace))
+
+
+class StateBroker(BaseManager):
+    """Multiprocessing manager serving one LocalStateStore to all workers"""
+
+
+_broker_store = None
+
+
+def _get_broker_store():
+    global _broker_store
+    if _broker_store is None:
+        _broker_store = LocalStateStore()
+    return _broker_store
+
+
+StateBroker.register('state_store', callable=_get_broker_store)
+
+
+def start_state_broker(address: Tuple[str, int] = ('127.0.0.1', 0),
+                       authkey: bytes = DEFAULT_BROKER_AUTHKEY) -> StateBroker:
+    """
+    Start a state broker in a child process
+
+    Args:
+        address: (host, port) to listen on; port 0 picks a free port
+        authkey: Shared secret workers connect with
+
+    Returns:
+        StateBroker: Started broker (broker.address is the bound address)
+    """
+    broker = StateBroker(address=address, authkey=authkey)
+    broker.start()
+    return broker
+
+
+class BrokerStateStore(StateStore):
+    """Client of a StateBroker"""
+
+    shared = True
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes = DEFAULT_BROKER_AUTHKEY):
+        self.address = address
+        self._manager = StateBroker(address=address, authkey=authkey)
+        self._manager.connect()
+        # Proxies open one connection per calling thread
+        self._store = self._manager.state_store()
+
+    def get(self, namespace, key, default=None):
+        return self._store.get(namespace, key, default)
+
+    def set(self, namespace, key, value):
+        self._store.set(namespace, key, value)
+
+    def set_if(self, namespace, key, value, expected=MISSING):
+        return self._store.set_if(namespace, key, value, expected)
+
+    def delete(self, namespace, key):
+        return self._store.delete(namespace, key)
+
+    def delete_if(self, namespace, key, expected):
+        return self._store.delete_if(namespace, key, expected)
+
+    def items(self, namespace):
+        return self._store.items(namespace)
+
+    def contains(self, namespace, key):
+        return self._store.contains(namespace, key)
+
+    def count(self, namespace):
+        return self._store.count(namespace)
+
+
+def create_state_store(url: Optional[str] = None, authkey: bytes = DEFAULT_BROKER_AUTHKEY) -> StateStore:
+    """
+    Create a state store from a URL (memory://, redis://, broker://host:port)
+
+    Args:
+        url: Store URL; None or empty means memory://
+        authkey: Shared secret for broker:// stores
+
+    Returns:
+        StateStore
+    """
+    url = url or DEFAULT_STATE_STORE_URL
+    scheme = urlparse(url).scheme
+    if scheme == 'memory':
+        return LocalStateStore()
+    if scheme in ('redis', 'rediss', 'unix'):
+        return RedisStateStore(url)
+    if scheme == 'broker':
+        parsed = urlparse(url)
+        return BrokerStateStore((parsed.hostname or '127.0.0.1', parsed.port), authkey)
+    raise ValueError(f"Unsupported state store URL: {url}")
+
+
+class SharedMap(MutableMapping):
+    """
+    dict view of one store namespace
+
+    Values are copied in and out of the store: replace an entry with
+    map[key] = value rather than mutating a value obtained from the map.
+    """
+
+    def __init__(self, store: StateStore, namespace: str):
+        self.store = store
+        self.namespace = namespace
+
+    def __getitem__(self, key):
+        value = self.store.get(self.namespace, key, MISSING)
+        if value == MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.store.set(self.namespace, key, value)
+
+    def __delitem__(self, key):
+        if not self.store.delete(self.namespace, key):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return self.store.contains(self.namespace, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([key for key, _ in self.store.items(self.namespace)])
+
+    def __len__(self):
+        return self.store.count(self.namespace)
+
+    def items(self):
+        return self.store.items(self.namespace)
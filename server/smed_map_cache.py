@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SMED Map Cache
+Keeps parsed SMED maps and their prerendered response bodies in memory
+
+Entries are keyed by file path and kind ('parsed', 'content', 'grid', ...)
+and validated against the file's mtime and size. The file is stat'ed at most
+once per stat interval per entry, so a hot map costs a dictionary lookup
+instead of a Shift-JIS read and an ITEM-by-ITEM parse. Writers that change a
+map (e.g. /api/smed/save) call invalidate() to evict it immediately.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_STAT_INTERVAL = 1.0
+
+
+def json_body(value: Any) -> bytes:
+    """Serialize a parsed map as a UTF-8 JSON response body"""
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+def text_body(value: str) -> bytes:
+    """Serialize map content as a UTF-8 text response body"""
+    return value.encode('utf-8')
+
+
+@dataclass
+class SmedCacheEntry:
+    """Cached map: loader result plus its prerendered response body"""
+    value: Any
+    body: bytes
+    mtime_ns: int
+    size: int
+    checked_at: float
+
+
+class SmedMapCache:
+    """Thread-safe LRU cache of loaded SMED maps with stat-based invalidation"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 stat_interval: float = DEFAULT_STAT_INTERVAL):
+        self.max_entries = max_entries
+        self.stat_interval = stat_interval
+        self._entries: "OrderedDict[Tuple[str, str], SmedCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, file_path: str, kind: str, loader: Callable[[str], Any],
+            serializer: Callable[[Any], bytes] = json_body) -> Optional[SmedCacheEntry]:
+        """
+        Get a loaded map, calling loader(file_path) only if the file changed
+
+        Args:
+            file_path: SMED map file
+            kind: Representation name (one entry per path and kind)
+            loader: Reads and parses the file; None means failure (not cached)
+            serializer: Builds the response body from the loader result
+
+        Returns:
+            SmedCacheEntry or None if the file is missing or the loader failed
+        """
+        key = (os.path.abspath(file_path), kind)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.checked_at < self.stat_interval:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry
+
+        try:
+            stat = os.stat(key[0])
+        except OSError:
+            self.invalidate(file_path)
+            return None
+
+        if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+            with self._lock:
+                entry.checked_at = now
+                self._hits += 1
+            return entry
+
+        value = loader(file_path)
+        if value is None:
+            return None
+
+        entry = SmedCacheEntry(
+            value=value,
+            body=serializer(value),
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            checked_at=now
+        )
+        with self._lock:
+            self._misses += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, file_path: str) -> int:
+        """
+        Evict every cached representation of a file
+
+        Returns:
+            int: Number of entries removed
+        """
+        path = os.path.abspath(file_path)
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == path]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        """Evict all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and hit/miss counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+
+# Global cache instance used by the API server
+smed_map_cache = SmedMapCache()
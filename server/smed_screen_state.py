@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SMED Screen State Tracker
+Delta encoding of SMED screen updates per terminal (or per map room)
+
+The tracker remembers the field values last sent to each screen and turns a
+new full field dict into a versioned update:
+- 'full'  : complete snapshot (first display, map change, reconnect, resync)
+- 'delta' : only fields whose values changed plus removed field names
+
+Every update carries a version; a delta also carries the base_version it
+applies to. A client that sees base_version != its current version has missed
+an update and asks for a resync, which is answered with a full snapshot.
+
+With several API server workers the states live in the shared state store, so
+a resync handled by another worker than the one that sent the delta still
+finds the screen. Each change is written with a compare-and-set against the
+state it was computed from and retried if another worker got there first, so
+two workers never hand out the same version.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from shared_state import MISSING as STORE_MISSING
+
+UPDATE_MODE_FULL = 'full'
+UPDATE_MODE_DELTA = 'delta'
+
+DEFAULT_MAX_SCREENS = 1000
+
+_MISSING = object()
+
+
+@dataclass
+class ScreenState:
+    """Last field values sent to one screen"""
+    map_file: str
+    fields: Dict[str, Any] = field(default_factory=dict)
+    version: int = 0
+
+
+@dataclass
+class ScreenUpdate:
+    """Versioned update to send to one screen"""
+    mode: str
+    map_file: str
+    version: int
+    fields: Dict[str, Any]
+    base_version: Optional[int] = None
+    removed_fields: List[str] = field(default_factory=list)
+
+    def to_message(self) -> Dict[str, Any]:
+        """Protocol fields merged into the outgoing event"""
+        message = {
+            'map_file': self.map_file,
+            'fields': self.fields,
+            'update_mode': self.mode,
+            'version': self.version
+        }
+        if self.mode == UPDATE_MODE_DELTA:
+            message['base_version'] = self.base_version
+            message['removed_fields'] = self.removed_fields
+        return message
+
+
+class ScreenStateTracker:
+    """Thread-safe per-screen state used to compute delta updates"""
+
+    def __init__(self, max_screens: int = DEFAULT_MAX_SCREENS, store=None, namespace: str = 'screen_state'):
+        """
+        Args:
+            max_screens: Screens remembered (least recently updated dropped)
+            store: Shared StateStore (multi-worker); states are kept there instead
+                   of in memory
+            namespace: Store namespace of this tracker
+        """
+        self.max_screens = max_screens
+        self.store = store
+        self.namespace = namespace
+        self._screens: "OrderedDict[str, ScreenState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, screen_id: str, map_file: str, fields: Dict[str, Any],
+               force_full: bool = False) -> ScreenUpdate:
+        """
+        Record new screen contents and get the update to send
+
+        Args:
+            screen_id: Terminal ID (or map room) the update is sent to
+            map_file: Map being displayed
+            fields: Complete field values for the screen
+            force_full: Send a full snapshot even if a delta is possible
+
+        Returns:
+            ScreenUpdate: Full snapshot or delta against the last sent state
+        """
+        fields = dict(fields or {})
+        with self._lock:
+            while True:
+                state, stored = self._get(screen_id)
+                previous_version = state.version if state else 0
+                new_state = ScreenState(map_file=map_file, fields=fields, version=previous_version + 1)
+                if self._remember(screen_id, new_state, stored):
+                    break
+
+            if state is None or force_full or state.map_file != map_file:
+                return ScreenUpdate(UPDATE_MODE_FULL, map_file, new_state.version, fields)
+
+            changed = {
+                name: value for name, value in fields.items()
+                if state.fields.get(name, _MISSING) != value
+            }
+            removed = [name for name in state.fields if name not in fields]
+            return ScreenUpdate(UPDATE_MODE_DELTA, map_file, new_state.version, changed,
+                                base_version=state.version, removed_fields=removed)
+
+    def merge(self, screen_id: str, map_file: str, changes: Dict[str, Any]) -> ScreenUpdate:
+        """
+        Apply partial changes to the last sent state and get the delta
+
+        Changes whose value equals the current value are dropped. Without a
+        known state for the screen the changes are sent as a full snapshot.
+        """
+        with self._lock:
+            while True:
+                update = self._merge_once(screen_id, map_file, changes)
+                if update is not None:
+                    return update
+
+    def _merge_once(self, screen_id: str, map_file: str, changes: Dict[str, Any]) -> Optional[ScreenUpdate]:
+        """One merge attempt; None if another worker changed the screen meanwhile"""
+        state, stored = self._get(screen_id)
+        if state is None or state.map_file != map_file:
+            new_state = ScreenState(map_file=map_file, fields=dict(changes),
+                                    version=(state.version if state else 0) + 1)
+            if not self._remember(screen_id, new_state, stored):
+                return None
+            return ScreenUpdate(UPDATE_MODE_FULL, map_file, new_state.version, dict(changes))
+
+        changed = {
+            name: value for name, value in changes.items()
+            if state.fields.get(name, _MISSING) != value
+        }
+        if not changed:
+            return ScreenUpdate(UPDATE_MODE_DELTA, map_file, state.version, {},
+                                base_version=state.version)
+
+        fields = dict(state.fields)
+        fields.update(changed)
+        new_state = ScreenState(map_file=map_file, fields=fields, version=state.version + 1)
+        if not self._remember(screen_id, new_state, stored):
+            return None
+        return ScreenUpdate(UPDATE_MODE_DELTA, map_file, new_state.version, changed,
+                            base_version=state.version)
+
+    def snapshot(self, screen_id: str) -> Optional[ScreenUpdate]:
+        """
+        Full snapshot of the current state for a resync
+
+        The snapshot carries the current version, so later deltas apply to it
+        (and other clients sharing the screen are unaffected).
+
+        Returns:
+            ScreenUpdate or None if nothing was sent to the screen yet
+        """
+        with self._lock:
+            state, _ = self._get(screen_id)
+            if state is None:
+                return None
+            return ScreenUpdate(UPDATE_MODE_FULL, state.map_file, state.version, dict(state.fields))
+
+    def reset(self, screen_id: str):
+        """Forget a screen (disconnect/reconnect); the next update is full"""
+        with self._lock:
+            if self.store is not None:
+                self.store.delete(self.namespace, screen_id)
+            self._screens.pop(screen_id, None)
+
+    def _get(self, screen_id: str):
+        """(state or None, stored value to compare-and-set against)"""
+        if self.store is None:
+            return self._screens.get(screen_id), None
+        value = self.store.get(self.namespace, screen_id, STORE_MISSING)
+        if value == STORE_MISSING:
+            return None, value
+        return ScreenState(value['map_file'], value['fields'], value['version']), value
+
+    def _remember(self, screen_id: str, state: ScreenState, stored: Any) -> bool:
+        """Save a state computed from stored; False if the screen changed meanwhile"""
+        if self.store is None:
+            self._screens[screen_id] = state
+            self._screens.move_to_end(screen_id)
+            while len(self._screens) > self.max_screens:
+                self._screens.popitem(last=False)
+            return True
+
+        value = {'map_file': state.map_file, 'fields': state.fields, 'version': state.version,
+                 'updated': time.time()}
+        if not self.store.set_if(self.namespace, screen_id, value, stored):
+            return False
+        if stored == STORE_MISSING:
+            self._evict_shared()
+        return True
+
+    def _evict_shared(self):
+        """Drop the least recently updated shared screens beyond max_screens"""
+        excess = self.store.count(self.namespace) - self.max_screens
+        if excess <= 0:
+            return
+        entries = sorted(self.store.items(self.namespace), key=lambda item: item[1].get('updated', 0))
+        for screen_id, value in entries[:excess]:
+            # Skip a screen another worker updated since we listed it
+            self.store.delete_if(self.namespace, screen_id, value)
+
+
+def position_update_key(update: Dict[str, Any]) -> str:
+    """Key of a position-based update ({row, col, length, value}) by location"""
+    return f"{update.get('row')},{update.get('col')}"
+
+
+def merge_screen_messages(pending: Dict[str, Any], new: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Combine a pending smed_display message with a newer one for the same screen
+
+    A full snapshot supersedes whatever is pending. A delta is folded into the
+    pending message when it applies directly on top of it (same map, base
+    version equal to the pending version); the result keeps the pending
+    message's mode and base version and carries the newer version.
+
+    Returns:
+        dict: Combined message, or None if the delta cannot be folded in
+    """
+    if new.get('update_mode', UPDATE_MODE_FULL) == UPDATE_MODE_FULL:
+        return new
+    if pending.get('map_file') != new.get('map_file') or pending.get('version') != new.get('base_version'):
+        return None
+
+    removed = new.get('removed_fields') or []
+    fields = {name: value for name, value in (pending.get('fields') or {}).items() if name not in removed}
+    fields.update(new.get('fields') or {})
+
+    merged = dict(new)
+    merged['fields'] = fields
+    merged['update_mode'] = pending.get('update_mode', UPDATE_MODE_FULL)
+    if merged['update_mode'] == UPDATE_MODE_FULL:
+        merged.pop('base_version', None)
+        merged.pop('removed_fields', None)
+    else:
+        merged['base_version'] = pending.get('base_version')
+        merged['removed_fields'] = [
+            name for name in pending.get('removed_fields') or [] if name not in fields
+        ] + [name for name in removed if name not in fields]
+    return merged
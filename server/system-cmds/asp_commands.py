@@ -1,5 +1,7 @@
 import subprocess
 import os
+import threading
+from contextlib import contextmanager
 import json
 import psutil
 import socket
@@ -54,19 +56,40 @@ os.makedirs(JOB_LOG_DIR, exist_ok=True)
 # Global variable for program execution code (@PGMEC)
 _PGMEC = 0
 
+# Per-thread @PGMEC used while a CL step runs concurrently with others
+_pgmec_scope = threading.local()
+
 def set_pgmec(value):
     """Set @PGMEC variable (program execution code)"""
     global _PGMEC
-    _PGMEC = value
+    if getattr(_pgmec_scope, 'active', False):
+        _pgmec_scope.value = value
+    else:
+        _PGMEC = value
 
 def get_pgmec():
     """Get @PGMEC variable (program execution code)"""
+    if getattr(_pgmec_scope, 'active', False):
+        return _pgmec_scope.value
     return _PGMEC
 
 def reset_pgmec():
     """Reset @PGMEC to 0 (successful execution)"""
-    global _PGMEC
-    _PGMEC = 0
+    set_pgmec(0)
+
+@contextmanager
+def pgmec_scope():
+    """Give the current thread its own @PGMEC until the block exits
+
+    Used by the parallel CL engine so concurrently running steps do not
+    overwrite each other's execution code.
+    """
+    _pgmec_scope.active = True
+    _pgmec_scope.value = 0
+    try:
+        yield
+    finally:
+        _pgmec_scope.active = False
 
 def get_catalog_info():
     """
@@ -750,13 +773,38 @@ def CRTPGM(command):
         program_attrs['EXECUTABLE'] = params.get('EXECUTABLE', pgm_name)
     elif pgmtype.upper() == 'SHELL':
         program_attrs['SHELLFILE'] = params.get('SHELLFILE', f'{pgm_name}.sh')
+    elif pgmtype.upper() == 'CL':
+        program_attrs['SOURCEFILE'] = params.get('SOURCEFILE', f'{pgm_name}.cl')
 
-    # Create program entry in filesystem (placeholder)
     pgm_path = os.path.join(lib_path, pgm_name)
-    with open(pgm_path, 'w', encoding='utf-8') as f:
-        f.write(f"# {pgmtype} Program: {pgm_name}\n")
-        f.write(f"# Description: {description}\n")
-        f.write(f"# Version: {version}\n")
+
+    if pgmtype.upper() == 'CL':
+        # Compile the CL source now so syntax errors surface at CRTPGM time
+        # and SBMJOB/CALL start from the cached compiled form
+        source_path = os.path.join(lib_path, program_attrs['SOURCEFILE'])
+        if not os.path.exists(source_path):
+            print(f"[ERROR] CL source '{program_attrs['SOURCEFILE']}' not found in library '{pgm_lib}'.")
+            set_pgmec(999)
+            return
+
+        from cl_executor import get_cl_compiler
+        compiled = get_cl_compiler().load(source_path)
+        for warning in compiled.warnings:
+            print(f"[WARN] {warning}")
+        if compiled.errors:
+            for error in compiled.errors:
+                print(f"[ERROR] {error}")
+            print(f"[ERROR] Program '{pgm_name}' not created: {len(compiled.errors)} syntax error(s) in CL source.")
+            set_pgmec(999)
+            return
+        program_attrs['INSTRUCTIONS'] = len(compiled.instructions)
+
+    # Create program entry in filesystem (placeholder); never overwrite CL source
+    if pgmtype.upper() != 'CL' or program_attrs['SOURCEFILE'] != pgm_name:
+        with open(pgm_path, 'w', encoding='utf-8') as f:
+            f.write(f"# {pgmtype} Program: {pgm_name}\n")
+            f.write(f"# Description: {description}\n")
+            f.write(f"# Version: {version}\n")
 
     # Update catalog with new hierarchical structure
     update_catalog_info(
@@ -777,6 +825,9 @@ def CRTPGM(command):
         print(f"       JARFILE: {program_attrs.get('JARFILE')}")
     elif pgmtype.upper() == 'COBOL':
         print(f"       SOURCEFILE: {program_attrs.get('SOURCEFILE')}")
+    elif pgmtype.upper() == 'CL':
+        print(f"       SOURCEFILE: {program_attrs.get('SOURCEFILE')}")
+        print(f"       INSTRUCTIONS: {program_attrs.get('INSTRUCTIONS')}")
 
 def CRTMAP(command):
     # Example: CRTMAP MAP(TESTLIB/MAINMENU),VOL-DISK01,MAPTYPE-SMED,ROWS-24,COLS-80,DESC-'Main menu screen'
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CL (Control Language) Compiler for OpenASP
+Compiles CL members into a cached intermediate form
+
+A compiled member holds the parsed instructions with their ASP command lines
+already formatted and command handlers resolved. Compiled members are kept in
+memory and on disk, keyed by source path and validated by mtime/size, with a
+SHA-256 content hash so a touched-but-unchanged member is not reparsed.
+CRTPGM rejects members with syntax errors; running a member executes the
+instructions that parse, as it did before compilation was cached.
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cl_parser import parse_cl_script
+from functions.config_manager import config
+
+# Bump when the compiled representation or command line formatting changes
+CL_CACHE_FORMAT = 1
+
+# Outside the volume root so WRKVOL/WRKLIB do not list it as a volume
+DEFAULT_CL_CACHE_DIR = "/home/aspuser/app/cache/cl"
+
+COMMAND_NAME_PATTERN = re.compile(r'^[A-Z@][A-Z0-9@]*$')
+
+
+@dataclass
+class CompiledCL:
+    """Compiled CL member"""
+    source_path: str
+    mtime_ns: int = 0
+    size: int = 0
+    sha256: str = ""
+    instructions: List[Dict] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        """Serializable form (command handlers are resolved again on load)"""
+        return {
+            'format': CL_CACHE_FORMAT,
+            'source_path': self.source_path,
+            'mtime_ns': self.mtime_ns,
+            'size': self.size,
+            'sha256': self.sha256,
+            'instructions': [
+                {key: value for key, value in instr.items() if key != 'handler'}
+                for instr in self.instructions
+            ],
+            'errors': self.errors,
+            'warnings': self.warnings
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CompiledCL':
+        return cls(
+            source_path=data['source_path'],
+            mtime_ns=data['mtime_ns'],
+            size=data['size'],
+            sha256=data['sha256'],
+            instructions=data['instructions'],
+            errors=data.get('errors', []),
+            warnings=data.get('warnings', [])
+        )
+
+
+def check_cl_syntax(script: str, known_commands=None) -> Tuple[List[str], List[str]]:
+    """
+    Check a CL script for syntax errors
+
+    Args:
+        script: CL script content
+        known_commands: Command names the executor can run (None = skip check)
+
+    Returns:
+        Tuple of (errors, warnings), each entry prefixed with the line number
+    """
+    errors = []
+    warnings = []
+    statement = ""
+    start_line = 0
+
+    lines = script.splitlines()
+    for line_no, line in enumerate(lines, 1):
+        line = line.rstrip()
+        if not statement:
+            start_line = line_no
+        if line.endswith("+"):
+            statement += line[:-1] + " "
+            continue
+        statement += line
+        text = statement.strip()
+        statement = ""
+
+        if not text or text.startswith("*") or text.startswith("/*"):
+            continue
+
+        command = text.split(maxsplit=1)[0].upper()
+        if not COMMAND_NAME_PATTERN.match(command):
+            errors.append(f"Line {start_line}: Invalid command name '{command}'")
+            continue
+        if known_commands is not None and command not in known_commands:
+            warnings.append(f"Line {start_line}: Unknown command '{command}' will be skipped")
+
+        quote_char = None
+        depth = 0
+        for char in text:
+            if quote_char:
+                if char == quote_char:
+                    quote_char = None
+            elif char in ("'", '"'):
+                quote_char = char
+            elif char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+                if depth < 0:
+                    break
+        if quote_char:
+            errors.append(f"Line {start_line}: Unterminated quoted string")
+        if depth != 0:
+            errors.append(f"Line {start_line}: Unbalanced parentheses")
+
+    if statement.strip():
+        errors.append(f"Line {start_line}: Continuation '+' at end of member")
+
+    return errors, warnings
+
+
+class CLCompiler:
+    """Compiles CL members and caches the result in memory and on disk"""
+
+    def __init__(self, command_map: Dict[str, Callable],
+                 formatter: Callable[[str, Dict[str, str]], str],
+                 cache_dir: Optional[str] = None):
+        self.command_map = command_map
+        self.formatter = formatter
+        self.cache_dir = cache_dir or config.get('cl.cache_dir', DEFAULT_CL_CACHE_DIR)
+        self._memory: Dict[str, CompiledCL] = {}
+        self._lock = threading.Lock()
+
+    def compile_script(self, script: str, source_path: str = "") -> CompiledCL:
+        """
+        Compile CL script text (no caching)
+
+        Args:
+            script: CL script content
+            source_path: Path recorded in the compiled member
+
+        Returns:
+            CompiledCL: Compiled member; check .errors before executing
+        """
+        compiled = CompiledCL(source_path=source_path)
+        compiled.errors, compiled.warnings = check_cl_syntax(script, self.command_map)
+
+        for instruction in parse_cl_script(script):
+            instruction["command_line"] = self.formatter(instruction["command"], instruction["params"])
+            compiled.instructions.append(instruction)
+
+        self._resolve_handlers(compiled)
+        return compiled
+
+    def load(self, source_path: str) -> CompiledCL:
+        """
+        Get the compiled form of a CL member, compiling only if it changed
+
+        Args:
+            source_path: Path to the CL member
+
+        Returns:
+            CompiledCL: Compiled member with handlers resolved
+        """
+        source_path = os.path.abspath(source_path)
+        stat = os.stat(source_path)
+
+        with self._lock:
+            cached = self._memory.get(source_path)
+        if cached and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+            return cached
+
+        if cached is None:
+            cached = self._read_cache_file(source_path)
+            if cached and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+                self._resolve_handlers(cached)
+                return self._remember(cached)
+
+        with open(source_path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+
+        if cached and cached.sha256 == digest:
+            # Touched but unchanged: keep the compiled form, record the new mtime
+            cached.mtime_ns = stat.st_mtime_ns
+            cached.size = stat.st_size
+            self._resolve_handlers(cached)
+        else:
+            cached = self.compile_script(content.decode('utf-8'), source_path)
+            cached.mtime_ns = stat.st_mtime_ns
+            cached.size = stat.st_size
+            cached.sha256 = digest
+
+        self._write_cache_file(cached)
+        return self._remember(cached)
+
+    def invalidate(self, source_path: str):
+        """Drop the compiled form of a member from memory and disk"""
+        source_path = os.path.abspath(source_path)
+        with self._lock:
+            self._memory.pop(source_path, None)
+        try:
+            os.remove(self._cache_file(source_path))
+        except OSError:
+            pass
+
+    def _remember(self, compiled: CompiledCL) -> CompiledCL:
+        with self._lock:
+            self._memory[compiled.source_path] = compiled
+        return compiled
+
+    def _resolve_handlers(self, compiled: CompiledCL):
+        for instruction in compiled.instructions:
+            instruction["handler"] = self.command_map.get(instruction["command"])
+
+    def _cache_file(self, source_path: str) -> str:
+        name = hashlib.sha1(source_path.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def _read_cache_file(self, source_path: str) -> Optional[CompiledCL]:
+        try:
+            with open(self._cache_file(source_path), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') != CL_CACHE_FORMAT or data.get('source_path') != source_path:
+                return None
+            return CompiledCL.from_dict(data)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_cache_file(self, compiled: CompiledCL):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            cache_file = self._cache_file(compiled.source_path)
+            temp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(compiled.to_dict(), f, ensure_ascii=False)
+            os.replace(temp_file, cache_file)
+        except OSError as e:
+            print(f"[WARN] Failed to write CL cache for {compiled.source_path}: {e}")
@@ -16,7 +16,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from cl_parser import parse_cl_script, parse_cl_file
 from asp_commands import (
     CALL, CRTFILE, DLTFILE, CRTLIB, DLTLIB, CHGLIBL,
-    WRKLIB, DSPFD, WRKOBJ, WRKVOL, SAVLIB, RSTLIB,
+    WRKLIB, DSPFD, WRKOBJ, WRKVOL, SAVLIB, RSTLIB, CTTFILE,
     SNDMSG, RCVMSG, EDTFILE, CRTPGM, CRTMAP,
     get_pgmec, reset_pgmec, set_pgmec
 )
@@ -37,6 +37,7 @@ COMMAND_MAP = {
     "DLTFILE": DLTFILE,
     "DSPFD": DSPFD,
     "EDTFILE": EDTFILE,
+    "CTTFILE": CTTFILE,
     
     # Library operations
     "CRTLIB": CRTLIB,
@@ -90,6 +91,8 @@ def format_command_line(command: str, params: Dict[str, str]) -> str:
         return format_call_command(command, params)
     elif command in ["OVRF", "DLTOVR"]:
         return format_override_command(command, params)
+    elif command == "CTTFILE":
+        return format_cttfile_command(command, params)
     else:
         # Default formatting for other commands
         return format_default_command(command, params)
@@ -193,6 +196,23 @@ def format_override_command(command: str, params: Dict[str, str]) -> str:
     
     return f"{command} {' '.join(param_parts)}"
 
+def format_cttfile_command(command: str, params: Dict[str, str]) -> str:
+    """Format CTTFILE command to ASP format"""
+    # CTTFILE INFILE(LIB/FILE),OUTFILE(LIB/FILE),VOL-volume,MODE=COPY|REPL|CONV
+    param_parts = []
+    
+    for key, value in params.items():
+        if value is None:
+            param_parts.append(key)
+        elif key in ["INFILE", "OUTFILE"]:
+            param_parts.append(f"{key}({value})")
+        elif key == "VOL":
+            param_parts.append(f"VOL-{value}")
+        else:
+            param_parts.append(f"{key}={value}")
+    
+    return f"{command} {','.join(param_parts)}"
+
 def format_default_command(command: str, params: Dict[str, str]) -> str:
     """Default command formatting"""
     param_parts = []
@@ -217,8 +237,8 @@ def execute_instruction(instruction: Dict[str, Union[str, Dict[str, str]]]) -> b
     command = instruction["command"]
     params = instruction["params"]
     
-    # Get command handler
-    handler = COMMAND_MAP.get(command)
+    # Get command handler (compiled instructions carry it pre-resolved)
+    handler = instruction.get("handler") or COMMAND_MAP.get(command)
     
     # Debug logging for OVRF command
     if command == "OVRF":
@@ -232,7 +252,7 @@ def execute_instruction(instruction: Dict[str, Union[str, Dict[str, str]]]) -> b
         return True  # Continue execution even for unknown commands
     
     # Format command line for ASP command handler
-    command_line = format_command_line(command, params)
+    command_line = instruction.get("command_line") or format_command_line(command, params)
     
     print(f"[EXEC] {command_line}")
     
@@ -255,13 +275,17 @@ def execute_instruction(instruction: Dict[str, Union[str, Dict[str, str]]]) -> b
         set_pgmec(999)
         return False
 
-def execute_cl_script(script: str, stop_on_error: bool = False) -> int:
+def execute_cl_script(script: str, stop_on_error: bool = False,
+                      max_workers: int = 1, dry_run: bool = False) -> int:
     """
     Execute a CL script
     
     Args:
         script: CL script content
         stop_on_error: Stop execution on first error
+        max_workers: Run independent instructions concurrently on up to
+                     this many workers (1 = strictly sequential)
+        dry_run: Print the computed execution schedule without executing
         
     Returns:
         Number of failed instructions
@@ -272,6 +296,24 @@ def execute_cl_script(script: str, stop_on_error: bool = False) -> int:
     # Parse script
     instructions = parse_cl_script(script)
     
+    return execute_cl_instructions(instructions, stop_on_error, max_workers, dry_run)
+
+def execute_cl_instructions(instructions: List[Dict[str, Union[str, Dict[str, str]]]],
+                            stop_on_error: bool = False, max_workers: int = 1,
+                            dry_run: bool = False) -> int:
+    """
+    Execute parsed or compiled CL instructions
+    
+    Args:
+        instructions: Output of parse_cl_script() or CompiledCL.instructions
+        stop_on_error: Stop execution on first error
+        max_workers: Run independent instructions concurrently on up to
+                     this many workers (1 = strictly sequential)
+        dry_run: Print the computed execution schedule without executing
+        
+    Returns:
+        Number of failed instructions
+    """
     if not instructions:
         print("[WARN] No instructions found in script")
         return 0
@@ -279,6 +321,25 @@ def execute_cl_script(script: str, stop_on_error: bool = False) -> int:
     print(f"[INFO] Found {len(instructions)} instructions")
     print()
     
+    if dry_run or max_workers > 1:
+        from cl_scheduler import build_cl_schedule, format_cl_schedule, execute_cl_schedule
+        
+        steps = build_cl_schedule(instructions)
+        
+        if dry_run:
+            print(format_cl_schedule(steps))
+            print("-" * 50)
+            print("[INFO] Dry run - no instructions executed")
+            return 0
+        
+        print(f"[INFO] Parallel execution with up to {max_workers} workers")
+        failed_count = execute_cl_schedule(steps, max_workers, stop_on_error)
+        
+        print("-" * 50)
+        print(f"[INFO] Execution complete. Failed: {failed_count}/{len(instructions)}")
+        
+        return failed_count
+    
     # Execute instructions
     failed_count = 0
     for i, instruction in enumerate(instructions):
@@ -299,13 +360,16 @@ def execute_cl_script(script: str, stop_on_error: bool = False) -> int:
     
     return failed_count
 
-def execute_cl_file(filename: str, stop_on_error: bool = False) -> int:
+def execute_cl_file(filename: str, stop_on_error: bool = False,
+                    max_workers: int = 1, dry_run: bool = False) -> int:
     """
     Execute a CL script from file
     
     Args:
         filename: Path to CL script file
         stop_on_error: Stop execution on first error
+        max_workers: Maximum concurrently running instructions
+        dry_run: Print the computed execution schedule without executing
         
     Returns:
         Number of failed instructions
@@ -313,12 +377,30 @@ def execute_cl_file(filename: str, stop_on_error: bool = False) -> int:
     print(f"[INFO] Loading CL script from: {filename}")
     
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            script = f.read()
-        return execute_cl_script(script, stop_on_error)
+        compiled = get_cl_compiler().load(filename)
     except Exception as e:
         print(f"[ERROR] Failed to load CL file: {e}")
         return 1
+    
+    print("[INFO] Starting CL script execution")
+    print("-" * 50)
+    
+    return execute_cl_instructions(compiled.instructions, stop_on_error, max_workers, dry_run)
+
+_cl_compiler = None
+
+def get_cl_compiler():
+    """
+    Get the shared CL compiler (compiled members are cached per process)
+    
+    Returns:
+        CLCompiler: Compiler bound to COMMAND_MAP and format_command_line
+    """
+    global _cl_compiler
+    if _cl_compiler is None:
+        from cl_compiler import CLCompiler
+        _cl_compiler = CLCompiler(COMMAND_MAP, format_command_line)
+    return _cl_compiler
 
 # Command line interface
 if __name__ == "__main__":
@@ -330,6 +412,10 @@ if __name__ == "__main__":
                        help="Treat argument as filename")
     parser.add_argument("-e", "--stop-on-error", action="store_true",
                        help="Stop execution on first error")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                       help="Run independent instructions on up to N workers")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                       help="Print the execution schedule without executing")
     
     args = parser.parse_args()
     
@@ -337,13 +423,13 @@ if __name__ == "__main__":
         # Interactive mode - read from stdin
         print("Enter CL commands (Ctrl+D to execute):")
         script = sys.stdin.read()
-        failed = execute_cl_script(script, args.stop_on_error)
+        failed = execute_cl_script(script, args.stop_on_error, args.jobs, args.dry_run)
     elif args.file or os.path.isfile(args.script):
         # Execute from file
-        failed = execute_cl_file(args.script, args.stop_on_error)
+        failed = execute_cl_file(args.script, args.stop_on_error, args.jobs, args.dry_run)
     else:
         # Execute as inline script
-        failed = execute_cl_script(args.script, args.stop_on_error)
+        failed = execute_cl_script(args.script, args.stop_on_error, args.jobs, args.dry_run)
     
     # Exit with error count
     sys.exit(min(failed, 255))
\ No newline at end of file
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CL (Control Language) Scheduler for OpenASP
+Dependency-aware parallel execution of parsed CL instructions
+
+Each instruction is analysed for the datasets it reads and writes:
+- OVRF FILE/TOFILE, DLTOVR FILE: bind/unbind a logical file name
+- CALL: uses every dataset currently bound by OVRF
+OVRF/DLTOVR set the process environment (DSIO_* and the override table) and
+CALL sets ASP_VOLUME/ASP_LIBRARY/ASP_PROGRAM/ASP_PARAM_n in it, so all three
+write the single ENV key: they run one at a time, in program order, and
+only file commands run alongside them.
+- CTTFILE INFILE/OUTFILE: reads INFILE, writes OUTFILE
+- CRTFILE/DLTFILE FILE: writes FILE, DSPFD FILE: reads FILE
+Any other command (CHGLIBL, CRTLIB, SAVLIB, ...) changes shared state and is
+treated as a barrier. Steps whose datasets do not conflict run concurrently
+on a bounded worker pool; @PGMEC and stop-on-error behave as in sequential
+execution.
+"""
+
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Union
+
+DEFAULT_MAX_WORKERS = 4
+
+# Commands whose dataset usage can be derived from their parameters
+DATASET_COMMANDS = {"OVRF", "DLTOVR", "CALL", "CTTFILE", "CRTFILE", "DLTFILE", "DSPFD"}
+
+# Default library used by the CL executor for unqualified FILE names
+DEFAULT_LIBRARY = "TESTLIB"
+
+# Dependency key of the process environment (written by OVRF, DLTOVR and CALL)
+PROCESS_ENV_KEY = "ENV"
+
+
+@dataclass
+class CLStep:
+    """A CL instruction with its dataset usage and dependencies"""
+    index: int
+    instruction: Dict[str, Union[str, Dict[str, str]]]
+    reads: Set[str] = field(default_factory=set)
+    writes: Set[str] = field(default_factory=set)
+    barrier: bool = False
+    depends_on: Set[int] = field(default_factory=set)
+    level: int = 0
+
+    @property
+    def command(self) -> str:
+        return self.instruction["command"]
+
+
+def _param_value(params: Dict[str, Optional[str]], key: str) -> Optional[str]:
+    """
+    Get a parameter in either KEY=value or KEY(value) form
+
+    The CL parser keeps KEY(value) tokens as positional parameters.
+    """
+    value = params.get(key)
+    if value:
+        return value
+    prefix = f"{key}("
+    for name in params:
+        if name.startswith(prefix) and name.endswith(")"):
+            return name[len(prefix):-1]
+    return None
+
+
+def _dataset_key(name: Optional[str]) -> Optional[str]:
+    """Normalise LIB/FILE and FILE.LIB dataset names to one key"""
+    if not name:
+        return None
+    name = name.strip().strip("'\"").upper()
+    if "/" in name:
+        library, dataset = name.split("/", 1)
+        return f"{dataset}.{library}"
+    if "." not in name:
+        return f"{name}.{DEFAULT_LIBRARY}"
+    return name
+
+
+def _analyze_step(step: CLStep, overrides: Dict[str, str]):
+    """Fill in reads/writes/barrier for a step, tracking active overrides"""
+    command = step.command
+    params = step.instruction["params"]
+
+    if command not in DATASET_COMMANDS:
+        step.barrier = True
+        return
+
+    if command == "OVRF":
+        logical = (_param_value(params, "FILE") or "").upper()
+        physical = _dataset_key(_param_value(params, "TOFILE"))
+        if not logical:
+            step.barrier = True
+            return
+        step.writes.add(PROCESS_ENV_KEY)
+        if physical:
+            step.reads.add(physical)
+            overrides[logical] = physical
+    elif command == "DLTOVR":
+        logical = (_param_value(params, "FILE") or "").upper()
+        if not logical or logical.startswith("*"):
+            # DLTOVR FILE(*ALL) or unspecified: drops every override
+            step.barrier = True
+            overrides.clear()
+            return
+        step.writes.add(PROCESS_ENV_KEY)
+        overrides.pop(logical, None)
+    elif command == "CALL":
+        # The program sees the whole override table; assume it may update the bound files
+        step.writes.add(PROCESS_ENV_KEY)
+        step.writes.update(overrides.values())
+    elif command == "CTTFILE":
+        infile = _dataset_key(_param_value(params, "INFILE"))
+        outfile = _dataset_key(_param_value(params, "OUTFILE"))
+        if not infile or not outfile:
+            step.barrier = True
+            return
+        step.reads.add(infile)
+        step.writes.add(outfile)
+    elif command in ("CRTFILE", "DLTFILE"):
+        dataset = _dataset_key(_param_value(params, "FILE"))
+        if not dataset:
+            step.barrier = True
+            return
+        step.writes.add(dataset)
+    elif command == "DSPFD":
+        dataset = _dataset_key(_param_value(params, "FILE"))
+        if dataset:
+            step.reads.add(dataset)
+
+
+def _conflicts(earlier: CLStep, later: CLStep) -> bool:
+    if earlier.barrier or later.barrier:
+        return True
+    return bool(earlier.writes & (later.reads | later.writes) or earlier.reads & later.writes)
+
+
+def build_cl_schedule(instructions: List[Dict[str, Union[str, Dict[str, str]]]]) -> List[CLStep]:
+    """
+    Build the dependency graph for a list of parsed CL instructions
+
+    Args:
+        instructions: Output of parse_cl_script()
+
+    Returns:
+        List of CLStep in program order, with depends_on and level filled in
+    """
+    steps = [CLStep(index=i, instruction=instr) for i, instr in enumerate(instructions)]
+    overrides: Dict[str, str] = {}
+    for step in steps:
+        _analyze_step(step, overrides)
+
+    for j, later in enumerate(steps):
+        for earlier in steps[:j]:
+            if _conflicts(earlier, later):
+                later.depends_on.add(earlier.index)
+        if later.depends_on:
+            later.level = 1 + max(steps[i].level for i in later.depends_on)
+
+    return steps
+
+
+def format_cl_schedule(steps: List[CLStep]) -> str:
+    """
+    Render a computed schedule as waves of steps that may run together
+
+    Args:
+        steps: Output of build_cl_schedule()
+
+    Returns:
+        Human readable schedule
+    """
+    lines = []
+    waves: Dict[int, List[CLStep]] = {}
+    for step in steps:
+        waves.setdefault(step.level, []).append(step)
+
+    for level in sorted(waves):
+        lines.append(f"Wave {level + 1}:")
+        for step in waves[level]:
+            params = step.instruction["params"]
+            param_text = ",".join(k if v is None else f"{k}={v}" for k, v in params.items())
+            deps = ",".join(str(i + 1) for i in sorted(step.depends_on)) or "-"
+            kind = " [barrier]" if step.barrier else ""
+            lines.append(f"  [{step.index + 1}] {step.command} {param_text}  (after: {deps}){kind}")
+
+    lines.append(f"Steps: {len(steps)}, waves: {len(waves)}")
+    return "\n".join(lines)
+
+
+class _ThreadOutputRouter(io.TextIOBase):
+    """
+    sys.stdout replacement that captures output per worker thread
+
+    Threads that are not running a step write straight through to the
+    original stream.
+    """
+
+    def __init__(self, fallback):
+        self._fallback = fallback
+        self._buffers = threading.local()
+
+    def capture(self) -> io.StringIO:
+        buffer = io.StringIO()
+        self._buffers.current = buffer
+        return buffer
+
+    def release(self):
+        self._buffers.current = None
+
+    def write(self, text):
+        buffer = getattr(self._buffers, 'current', None)
+        if buffer is not None:
+            return buffer.write(text)
+        return self._fallback.write(text)
+
+    def flush(self):
+        self._fallback.flush()
+
+
+def execute_cl_schedule(steps: List[CLStep], max_workers: int = DEFAULT_MAX_WORKERS,
+                        stop_on_error: bool = False) -> int:
+    """
+    Execute scheduled CL steps, running independent steps concurrently
+
+    Args:
+        steps: Output of build_cl_schedule()
+        max_workers: Maximum number of steps running at once
+        stop_on_error: Start no further steps after the first failure
+
+    Returns:
+        Number of failed instructions
+    """
+    from cl_executor import execute_instruction
+    from asp_commands import pgmec_scope, get_pgmec, set_pgmec
+
+    total = len(steps)
+    remaining_deps = {step.index: set(step.depends_on) for step in steps}
+    dependents: Dict[int, List[int]] = {step.index: [] for step in steps}
+    for step in steps:
+        for dep in step.depends_on:
+            dependents[dep].append(step.index)
+
+    original_stdout = sys.stdout
+    router = _ThreadOutputRouter(original_stdout)
+    print_lock = threading.Lock()
+    step_pgmec: Dict[int, int] = {}
+    failed_count = 0
+    stopped = False
+
+    def run_step(step: CLStep) -> bool:
+        buffer = router.capture()
+        try:
+            with pgmec_scope():
+                success = execute_instruction(step.instruction)
+                step_pgmec[step.index] = get_pgmec()
+        finally:
+            router.release()
+        with print_lock:
+            original_stdout.write(f"[{step.index + 1}/{total}] {buffer.getvalue()}\n")
+        return success
+
+    sys.stdout = router
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            running = {}
+            ready = [step.index for step in steps if not step.depends_on]
+
+            while ready or running:
+                while ready and not stopped:
+                    index = ready.pop(0)
+                    running[pool.submit(run_step, steps[index])] = index
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    try:
+                        success = future.result()
+                    except Exception as e:
+                        print(f"[ERROR] Step {index + 1} failed: {e}", file=original_stdout)
+                        success = False
+                    if not success:
+                        failed_count += 1
+                        if stop_on_error and not stopped:
+                            stopped = True
+                            print("[ERROR] Stopping execution due to error", file=original_stdout)
+                    for dependent in dependents[index]:
+                        remaining_deps[dependent].discard(index)
+                        if not remaining_deps[dependent]:
+                            ready.append(dependent)
+                ready.sort()
+    finally:
+        sys.stdout = original_stdout
+
+    # @PGMEC after the script is that of the last executed step in program order,
+    # exactly as if the steps had run sequentially
+    if step_pgmec:
+        set_pgmec(step_pgmec[max(step_pgmec)])
+
+    return failed_count
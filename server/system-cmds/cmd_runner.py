@@ -37,6 +37,7 @@ from process_comm import (
 
 # Import existing ASP command functions
 from functions.call import CALL
+from functions.process_supervisor import process_supervisor
 from cl_executor import execute_cl_file
 
 # Logging setup
@@ -245,8 +246,9 @@ class CmdRunner:
             child_pid = os.fork()
             
             if child_pid == 0:
-                # Child process
+                # Child process (leader of its own process group)
                 try:
+                    os.setpgid(0, 0)
                     logger.info(f"[CHILD] Child process started: PID={os.getpid()}, Parent={os.getppid()}")
                     
                     # Setup child dataset handlers
@@ -298,8 +300,17 @@ class CmdRunner:
                 # Parent process
                 logger.info(f"[PARENT] Forked child process: PID={child_pid}")
                 
-                # Track child process
+                # Track child process; set its process group here as well so
+                # cleanup never races the child's own setpgid()
+                try:
+                    os.setpgid(child_pid, child_pid)
+                except OSError:
+                    pass  # Child already did it (or has exited)
                 self.child_processes[child_pid] = None
+                process_supervisor.register(
+                    child_pid, command_req.command, source='cmd_runner',
+                    session_id=self.session_id, terminal_id=self.terminal_id, pgid=child_pid
+                )
                 
                 # Monitor child execution
                 result = self._monitor_child_execution(child_pid, comm, start_time)
@@ -307,6 +318,7 @@ class CmdRunner:
                 # Remove from tracking
                 if child_pid in self.child_processes:
                     del self.child_processes[child_pid]
+                process_supervisor.unregister(child_pid)
                 
                 return result
                 
@@ -522,18 +534,10 @@ class CmdRunner:
         logger.info(f"Shutting down cmdRunner {self.pid}")
         self.status = ProcessStatus.TERMINATING
         
-        # Terminate child processes
-        for child_pid in list(self.child_processes.keys()):
-            try:
-                os.kill(child_pid, signal.SIGTERM)
-                time.sleep(1)
-                # Force kill if still alive
-                try:
-                    os.kill(child_pid, signal.SIGKILL)
-                except OSError:
-                    pass  # Already terminated
-            except OSError:
-                pass  # Process doesn't exist
+        # Terminate the process groups this runner forked (and any programs they
+        # launched); other work filed under the session, such as SBMJOB jobs, is kept
+        for detail in process_supervisor.cleanup(pids=list(self.child_processes), timeout=1):
+            logger.info(f"Child process {detail['pid']} ({detail['program']}): {detail['status']}")
         
         # Cleanup allocated datasets
         cleaned_datasets = self.dataset_manager.cleanup_by_owner(self.pid)
@@ -13,6 +13,7 @@ import subprocess
 import re
 import logging
 import signal
+import threading
 import time
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional, Any
@@ -41,48 +42,30 @@ try:
 except ImportError:
     DSLOCK_JAVA_AVAILABLE = False
 
-# PID tracking for call.py spawned processes
-CALL_PID_DIR = os.environ.get('ASP_PID_DIR', '/tmp/asp_call_pids')
+# Process supervisor (process-group tracking for call.py spawned processes)
+from functions.process_supervisor import process_supervisor
 
-def _ensure_pid_dir():
-    """Ensure PID tracking directory exists"""
-    if not os.path.exists(CALL_PID_DIR):
-        os.makedirs(CALL_PID_DIR, exist_ok=True)
+# PID tracking for call.py spawned processes
+CALL_PID_DIR = process_supervisor.registry_dir
 
 def _register_process_pid(pid: int, program: str, library: str, volume: str):
-    """Register a process PID for cleanup tracking"""
-    _ensure_pid_dir()
-    pid_file = os.path.join(CALL_PID_DIR, f"{pid}.json")
-    
-    pid_data = {
-        'pid': pid,
-        'program': program,
-        'library': library,
-        'volume': volume,
-        'created': datetime.now().isoformat(),
-        'source': 'call.py'
-    }
-    
-    with open(pid_file, 'w') as f:
-        json.dump(pid_data, f)
-    
+    """Register a process PID (leader of its own process group) for cleanup tracking"""
+    process_supervisor.register(pid, program, library, volume, source='call.py', pgid=pid)
     print(f"[PID_TRACK] Registered process PID {pid} for {program}")
 
 def _unregister_process_pid(pid: int):
     """Remove process PID from tracking"""
-    pid_file = os.path.join(CALL_PID_DIR, f"{pid}.json")
-    if os.path.exists(pid_file):
-        os.remove(pid_file)
-        print(f"[PID_TRACK] Unregistered process PID {pid}")
+    process_supervisor.unregister(pid)
+    print(f"[PID_TRACK] Unregistered process PID {pid}")
 
 def _terminate_process_gracefully(process, timeout_seconds=5):
-    """Terminate process gracefully with fallback to force kill"""
+    """Terminate process group gracefully with fallback to force kill"""
     if not process or process.poll() is not None:
         return True
     
     try:
-        print(f"[TERM] Sending SIGTERM to PID {process.pid}")
-        process.terminate()
+        print(f"[TERM] Sending SIGTERM to process group {process.pid}")
+        os.killpg(process.pid, signal.SIGTERM)
         
         # Wait for graceful termination
         try:
@@ -91,7 +74,7 @@ def _terminate_process_gracefully(process, timeout_seconds=5):
             return True
         except subprocess.TimeoutExpired:
             print(f"[TERM] Process {process.pid} did not terminate gracefully, forcing kill")
-            process.kill()
+            os.killpg(process.pid, signal.SIGKILL)
             process.wait(timeout=2)
             print(f"[TERM] Process {process.pid} force killed")
             return True
@@ -391,7 +374,8 @@ def _call_java_program(volume: str, library: str, program: str,
                     text=True,
                     cwd=program_path,
                     env=env,
-                    encoding='utf-8'
+                    encoding='utf-8',
+                    start_new_session=True
                 )
                 
                 # Register PID for cleanup tracking
@@ -714,30 +698,28 @@ def _process_java_output(output: str, volume: str, library: str, program: str) -
     except Exception as e:
         print(f"[DEBUG] Output processing error: {e}")
 
+# WebSocket Hub connection shared by every send from this process
+HUB_SERVER_URL = 'http://localhost:8000'
+_fallback_hub_client = None
+_fallback_hub_lock = threading.Lock()
+
+def _get_hub_client():
+    """Pooled WebSocket Hub Client (connected and registered once per process)"""
+    server_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if server_dir not in sys.path:
+        sys.path.insert(0, server_dir)
+    from websocket_hub_client import get_hub_client
+    return get_hub_client(HUB_SERVER_URL)
+
 def _send_to_websocket_hub(terminal_id: str, map_file: str, fields: dict, program_name: str) -> bool:
     """Send SMED data directly to WebSocket Hub using Hub Client"""
     try:
-        # Import WebSocket Hub Client
-        import sys
-        import os
-        
-        # Add server directory to path to import hub client
-        server_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        sys.path.insert(0, server_dir)
-        
-        from websocket_hub_client import WebSocketHubClient
-        
-        print(f"[WEBSOCKET_HUB] Initializing Hub Client for direct SMED transmission")
-        
-        # Create Hub Client
-        hub_client = WebSocketHubClient('http://localhost:8000')
-        
-        # Connect to Hub
-        if not hub_client.connect():
+        hub_client = _get_hub_client()
+        if hub_client is None:
             print(f"[WEBSOCKET_HUB] Failed to connect to WebSocket Hub")
             return False
         
-        # Send SMED data via Hub
+        # Send SMED data via Hub (connection stays open for the next screen)
         success = hub_client.send_smed_data(
             terminal_id=terminal_id,
             map_file=map_file,
@@ -747,17 +729,10 @@ def _send_to_websocket_hub(terminal_id: str, map_file: str, fields: dict, progra
         )
         
         if success:
-            print(f"[WEBSOCKET_HUB] SMED data sent successfully via Hub Client")
-            print(f"[WEBSOCKET_HUB] - Terminal: {terminal_id}")
-            print(f"[WEBSOCKET_HUB] - Map: {map_file}")
-            print(f"[WEBSOCKET_HUB] - Fields: {len(fields)} fields")
-            print(f"[WEBSOCKET_HUB] - Program: {program_name}")
+            print(f"[WEBSOCKET_HUB] SMED data sent via Hub Client: terminal={terminal_id}, "
+                  f"map={map_file}, fields={len(fields)}, program={program_name}")
         else:
             print(f"[WEBSOCKET_HUB] Failed to send SMED data via Hub Client")
-        
-        # Disconnect from Hub
-        hub_client.disconnect()
-        
         return success
         
     except ImportError as ie:
@@ -767,26 +742,36 @@ def _send_to_websocket_hub(terminal_id: str, map_file: str, fields: dict, progra
         print(f"[WEBSOCKET_HUB] Hub Client error: {e}")
         return _fallback_hub_connection(terminal_id, map_file, fields, program_name)
 
-def _fallback_hub_connection(terminal_id: str, map_file: str, fields: dict, program_name: str) -> bool:
-    """Fallback WebSocket Hub connection using direct SocketIO"""
-    try:
-        import socketio
-        import time
-        
-        print(f"[WEBSOCKET_HUB] Using fallback direct SocketIO connection")
+def _get_fallback_hub_client():
+    """Plain SocketIO client kept open for fallback sends (connected and registered once)"""
+    global _fallback_hub_client
+    import socketio
+    
+    with _fallback_hub_lock:
+        if _fallback_hub_client is not None and _fallback_hub_client.connected:
+            return _fallback_hub_client
         
-        # Create basic SocketIO client
         hub_client = socketio.Client()
         
-        # Setup basic event handlers
-        @hub_client.on('connect')
-        def on_connect():
-            print(f"[WEBSOCKET_HUB] Fallback connection established")
-        
         @hub_client.on('smed_data_confirmation')
         def on_confirmation(data):
             print(f"[WEBSOCKET_HUB] Fallback confirmation: {data.get('message')}")
         
+        # connect() returns once the namespace is connected
+        hub_client.connect(HUB_SERVER_URL, wait_timeout=2)
+        hub_client.emit('register_client', {
+            'client_type': 'fallback_hub_client',
+            'client_id': f'fallback_client_{id(hub_client)}',
+            'capabilities': ['smed_data_transmission', 'employee_data_transmission'],
+            'timestamp': time.time()
+        })
+        print(f"[WEBSOCKET_HUB] Fallback connection established")
+        _fallback_hub_client = hub_client
+        return hub_client
+
+def _fallback_hub_connection(terminal_id: str, map_file: str, fields: dict, program_name: str) -> bool:
+    """Fallback WebSocket Hub connection using direct SocketIO"""
+    try:
         hub_data = {
             'terminal_id': terminal_id,
             'map_file': map_file,
@@ -795,29 +780,8 @@ def _fallback_hub_connection(terminal_id: str, map_file: str, fields: dict, prog
             'source_type': 'java_fallback'
         }
         
-        # Connect to WebSocket server with immediate registration
-        hub_client.connect('http://localhost:8000')
-        time.sleep(0.2)  # Brief wait for connection
-        
-        # Immediate registration for fallback
-        fallback_registration = {
-            'client_type': 'fallback_hub_client',
-            'client_id': f'fallback_client_{id(hub_client)}',
-            'capabilities': ['smed_data_transmission'],
-            'timestamp': time.time()
-        }
-        hub_client.emit('register_client', fallback_registration)
-        time.sleep(0.1)  # Brief wait for registration
-        
-        # Send SMED data
-        hub_client.emit('smed_data_direct', hub_data)
-        print(f"[WEBSOCKET_HUB] Fallback SMED data sent to hub with registration")
-        
-        time.sleep(0.3)  # Brief wait for confirmation
-        
-        # Disconnect
-        hub_client.disconnect()
-        
+        _get_fallback_hub_client().emit('smed_data_direct', hub_data)
+        print(f"[WEBSOCKET_HUB] Fallback SMED data sent to hub")
         return True
         
     except Exception as e:
@@ -898,24 +862,9 @@ def _call_cl_program(volume: str, library: str, program: str,
 def _send_employee_data_to_hub(terminal_id: str, employee_data: dict, program_name: str) -> bool:
     """Send simplified employee data directly to WebSocket Hub"""
     try:
-        import socketio
-        import time
-        
         print(f"[EMPLOYEE_HUB] Sending simplified employee data to WebSocket Hub")
         print(f"[EMPLOYEE_HUB] Employee count: {len(employee_data.get('data', []))}")
         
-        # Create SocketIO client for employee data
-        hub_client = socketio.Client()
-        
-        # Setup event handlers
-        @hub_client.on('connect')
-        def on_connect():
-            print(f"[EMPLOYEE_HUB] Connected to WebSocket Hub")
-        
-        @hub_client.on('smed_data_confirmation')
-        def on_confirmation(data):
-            print(f"[EMPLOYEE_HUB] Data confirmation: {data.get('message')}")
-        
         # Prepare employee hub data
         hub_data = {
             'terminal_id': terminal_id,
@@ -932,40 +881,27 @@ def _send_employee_data_to_hub(terminal_id: str, employee_data: dict, program_na
             'source_type': 'employee_data_simplified'
         }
         
-        # Connect to WebSocket Hub
-        hub_client.connect('http://localhost:8000')
-        time.sleep(0.2)  # Brief wait for connection
-        
-        # Register as employee data client
-        employee_registration = {
-            'client_type': 'employee_data_client',
-            'client_id': f'employee_client_{id(hub_client)}',
-            'capabilities': ['employee_data_transmission'],
-            'timestamp': time.time()
-        }
-        hub_client.emit('register_client', employee_registration)
-        time.sleep(0.1)  # Brief wait for registration
-        
-        # Send employee data via Hub
-        hub_client.emit('smed_data_direct', hub_data)
-        print(f"[EMPLOYEE_HUB] Employee data sent to hub successfully")
-        print(f"[EMPLOYEE_HUB] - Terminal: {terminal_id}")
-        print(f"[EMPLOYEE_HUB] - Employee Records: {len(hub_data['data'])}")
-        print(f"[EMPLOYEE_HUB] - Headers: {hub_data['headers']}")
-        
-        time.sleep(0.3)  # Brief wait for processing
-        
-        # Disconnect
-        hub_client.disconnect()
+        # Send over the pooled hub connection, falling back to the plain client
+        try:
+            hub_client = _get_hub_client()
+        except ImportError:
+            hub_client = None
+        if hub_client is not None:
+            success = hub_client.send_hub_data(hub_data)
+        else:
+            _get_fallback_hub_client().emit('smed_data_direct', hub_data)
+            success = True
         
-        return True
+        if success:
+            print(f"[EMPLOYEE_HUB] Employee data sent to hub: terminal={terminal_id}, "
+                  f"records={len(hub_data['data'])}, headers={hub_data['headers']}")
+        return success
         
     except Exception as e:
         print(f"[EMPLOYEE_HUB] Failed to send employee data to hub: {e}")
         print(f"[EMPLOYEE_HUB] Employee data will be displayed locally only")
         return False
 
-
 # For backwards compatibility and testing
 if __name__ == "__main__":
     import sys
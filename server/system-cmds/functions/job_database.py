@@ -11,22 +11,27 @@ from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from contextlib import contextmanager
 from .config_manager import config
+from .job_store import get_job_store
 
 # Database file location
 JOB_DATABASE_FILE = "/home/aspuser/app/database/openasp_jobs.db"
 
+# Shared store: per-thread cached connections in WAL mode
+job_store = get_job_store(JOB_DATABASE_FILE)
+
 @contextmanager
 def get_db_connection():
-    """Get database connection with automatic cleanup"""
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(JOB_DATABASE_FILE), exist_ok=True)
+    """Get this thread's cached database connection
     
-    conn = sqlite3.connect(JOB_DATABASE_FILE)
-    conn.row_factory = sqlite3.Row
+    Any transaction left open by the caller (e.g. after an exception before
+    commit) is rolled back so the reused connection starts clean next time.
+    """
+    conn = job_store.connection()
     try:
         yield conn
     finally:
-        conn.close()
+        if conn.in_transaction:
+            conn.rollback()
 
 def init_database():
     """Initialize the job database schema"""
@@ -61,6 +66,10 @@ def init_database():
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_submitted ON jobs(submitted_time)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_jobq ON jobs(jobq)')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_jobs_status_priority
+            ON jobs(status, priority, submitted_time)
+        ''')
         
         # Create job history table for audit trail
         cursor.execute('''
@@ -99,7 +108,7 @@ def add_job(job_info) -> bool:
         bool: True if successful
     """
     try:
-        with get_db_connection() as conn:
+        with job_store.transaction() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -130,7 +139,6 @@ def add_job(job_info) -> bool:
                 VALUES (?, ?, ?)
             ''', (job_info.job_id, 'SUBMITTED', 'Job submitted to queue'))
             
-            conn.commit()
             return True
             
     except Exception as e:
@@ -144,49 +152,76 @@ def update_job_status(job_id: str, status: str, **kwargs) -> bool:
     Args:
         job_id (str): Job ID
         status (str): New status
-        **kwargs: Additional fields to update
+        **kwargs: Additional fields to update (start_time, end_time, pid, message)
         
     Returns:
         bool: True if successful
     """
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Build update query dynamically
-            update_fields = ['status = ?', 'updated_at = CURRENT_TIMESTAMP']
-            update_values = [status]
-            
-            # Handle special fields
-            if 'start_time' in kwargs:
-                update_fields.append('start_time = ?')
-                update_values.append(kwargs['start_time'])
-            if 'end_time' in kwargs:
-                update_fields.append('end_time = ?')
-                update_values.append(kwargs['end_time'])
-            if 'pid' in kwargs:
-                update_fields.append('pid = ?')
-                update_values.append(kwargs['pid'])
-                
-            update_values.append(job_id)
-            
-            query = f"UPDATE jobs SET {', '.join(update_fields)} WHERE job_id = ?"
-            cursor.execute(query, update_values)
-            
-            # Add to history
-            message = kwargs.get('message', f'Status changed to {status}')
-            cursor.execute('''
-                INSERT INTO job_history (job_id, status, message)
-                VALUES (?, ?, ?)
-            ''', (job_id, status, message))
-            
-            conn.commit()
-            return cursor.rowcount > 0
+        return job_store.update_statuses([(job_id, status, kwargs)]) > 0
             
     except Exception as e:
         print(f"Database error updating job: {e}")
         return False
 
+def update_job_statuses(updates: List[Tuple[str, str, Dict]]) -> int:
+    """
+    Update several job statuses in a single transaction
+    
+    Args:
+        updates: (job_id, status, fields) tuples, fields as for update_job_status
+        
+    Returns:
+        int: Number of jobs updated
+    """
+    try:
+        return job_store.update_statuses(updates)
+            
+    except Exception as e:
+        print(f"Database error updating jobs: {e}")
+        return 0
+
+def _row_to_job_info(row):
+    """Build a JobInfo object from a jobs table row"""
+    from functions.sbmjob import JobInfo
+    
+    job_info = JobInfo(
+        job_id=row['job_id'],
+        job_name=row['job_name'],
+        program=row['program'],
+        library=row['library'],
+        volume=row['volume'],
+        parameters=row['parameters'],
+        priority=row['priority'],
+        jobq=row['jobq'],
+        jobk=row['jobk'],
+        hold=bool(row['hold'])
+    )
+    
+    # Set additional attributes
+    job_info.status = row['status']
+    job_info.submitted_time = datetime.fromisoformat(row['submitted_time']) if row['submitted_time'] else None
+    job_info.start_time = datetime.fromisoformat(row['start_time']) if row['start_time'] else None
+    job_info.end_time = datetime.fromisoformat(row['end_time']) if row['end_time'] else None
+    job_info.pid = row['pid']
+    job_info.log_file = row['log_file']
+    return job_info
+
+def get_next_runnable_job():
+    """
+    Get the next PENDING job in dispatch order (priority, then submission time)
+    
+    Returns:
+        JobInfo or None: Next job to run
+    """
+    try:
+        rows = job_store.runnable_jobs(limit=1)
+        return _row_to_job_info(rows[0]) if rows else None
+        
+    except Exception as e:
+        print(f"[ERROR] Database error getting runnable job: {e}")
+        return None
+
 def get_active_jobs() -> Dict:
     """
     Get all active jobs from database
@@ -195,61 +230,26 @@ def get_active_jobs() -> Dict:
         Dict: Dictionary of active jobs
     """
     try:
-        from functions.sbmjob import JobInfo
         active_jobs = {}
         
         if config.is_debug_enabled():
             print("[DEBUG] Connecting to database to get active jobs...")
         
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Get active jobs (including recently completed ones)
-            query = '''
-                SELECT * FROM jobs 
-                WHERE status IN ('PENDING', 'RUNNING', 'HELD')
-                   OR (status IN ('COMPLETED', 'ERROR', 'CANCELLED') 
-                       AND datetime(end_time) > datetime('now', '-1 hour'))
-                ORDER BY submitted_time DESC
-            '''
+        # Get active jobs (including recently completed ones)
+        rows = job_store.active_jobs()
+        if config.is_debug_enabled():
+            print(f"[DEBUG] Found {len(rows)} jobs in database")
+        
+        for row in rows:
             if config.is_debug_enabled():
-                print(f"[DEBUG] Executing query: {query}")
-            cursor.execute(query)
+                print(f"[DEBUG] Processing job {row['job_id']}: {row['job_name']} (status: {row['status']})")
+            
+            job_info = _row_to_job_info(row)
             
-            rows = cursor.fetchall()
+            active_jobs[row['job_id']] = job_info
             if config.is_debug_enabled():
-                print(f"[DEBUG] Found {len(rows)} jobs in database")
+                print(f"[DEBUG] Added job {row['job_id']} to active_jobs (status: {job_info.status})")
             
-            for row in rows:
-                if config.is_debug_enabled():
-                    print(f"[DEBUG] Processing job {row['job_id']}: {row['job_name']} (status: {row['status']})")
-                
-                # Create JobInfo object
-                job_info = JobInfo(
-                    job_id=row['job_id'],
-                    job_name=row['job_name'],
-                    program=row['program'],
-                    library=row['library'],
-                    volume=row['volume'],
-                    parameters=row['parameters'],
-                    priority=row['priority'],
-                    jobq=row['jobq'],
-                    jobk=row['jobk'],
-                    hold=bool(row['hold'])
-                )
-                
-                # Set additional attributes
-                job_info.status = row['status']
-                job_info.submitted_time = datetime.fromisoformat(row['submitted_time']) if row['submitted_time'] else None
-                job_info.start_time = datetime.fromisoformat(row['start_time']) if row['start_time'] else None
-                job_info.end_time = datetime.fromisoformat(row['end_time']) if row['end_time'] else None
-                job_info.pid = row['pid']
-                job_info.log_file = row['log_file']
-                
-                active_jobs[row['job_id']] = job_info
-                if config.is_debug_enabled():
-                    print(f"[DEBUG] Added job {row['job_id']} to active_jobs (status: {job_info.status})")
-                
         if config.is_debug_enabled():
             print(f"[DEBUG] Returning {len(active_jobs)} active jobs")
         return active_jobs
@@ -425,9 +425,8 @@ def delete_job(job_id: str) -> bool:
         return False
 
 def close_database():
-    """Close database connections (for cleanup)"""
-    # SQLite handles connections per-thread, so nothing specific to close
-    pass
+    """Close this thread's cached database connection (for cleanup)"""
+    job_store.close()
 
 # Initialize database on module load
 init_database()
\ No newline at end of file
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+Job Event Bus for SBMJOB/REFJOB
+
+Provides event-driven job monitoring:
+- JobEventBus: in-process publish/subscribe for job status changes and log lines
+- ProcessReaper: collects child process exits through pidfd (Linux) instead of
+  blocking the job worker in Popen.communicate()
+- HubEventForwarder: relays job events to the API server Socket.IO hub so the
+  web UI can tail running jobs without polling the job table or log files
+
+The hub only relays events from connections that present the publisher token
+(ASP_JOB_EVENTS_TOKEN, or the token file the API server creates at startup).
+"""
+
+import hmac
+import os
+import queue
+import select
+import threading
+import itertools
+import secrets
+from collections import deque, OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from .config_manager import config
+
+# Event types
+JOB_STATUS_EVENT = "job_status"
+JOB_LOG_EVENT = "job_log"
+
+# Backlog limits (per job lines kept for late subscribers, number of jobs tracked)
+DEFAULT_BACKLOG_SIZE = 200
+DEFAULT_MAX_TRACKED_JOBS = 100
+
+# Shared secret authenticating job processors to the API server hub
+DEFAULT_TOKEN_FILE = "/home/aspuser/app/cache/job_events.token"
+
+
+def _token_file() -> str:
+    return config.get('job.events.token_file', DEFAULT_TOKEN_FILE)
+
+
+def publisher_token():
+    """Token a job processor presents to the hub, or None if none is configured"""
+    token = os.environ.get('ASP_JOB_EVENTS_TOKEN')
+    if token:
+        return token
+    try:
+        with open(_token_file(), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def ensure_publisher_token() -> str:
+    """Return the publisher token, creating an owner-only token file if needed (API server)"""
+    token = publisher_token()
+    if token:
+        return token
+    path = _token_file()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    token = secrets.token_hex(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+    return token
+
+
+def is_publisher_auth(auth: Any, token: str) -> bool:
+    """Check Socket.IO connect auth data against the publisher token"""
+    if not token or not isinstance(auth, dict) or not isinstance(auth.get('token'), str):
+        return False
+    return hmac.compare_digest(auth['token'].encode('utf-8'), token.encode('utf-8'))
+
+
+class JobEventBus:
+    """Thread-safe publish/subscribe bus for job events"""
+
+    def __init__(self, backlog_size: int = DEFAULT_BACKLOG_SIZE,
+                 max_tracked_jobs: int = DEFAULT_MAX_TRACKED_JOBS):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, tuple] = {}  # token -> (callback, job_id filter)
+        self._backlog: "OrderedDict[str, deque]" = OrderedDict()  # job_id -> recent events
+        self._backlog_size = backlog_size
+        self._max_tracked_jobs = max_tracked_jobs
+        self._tokens = itertools.count(1)
+        self._sequence = itertools.count(1)
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None], job_id: str = None) -> int:
+        """
+        Register a subscriber
+
+        Args:
+            callback: Called with each event dict
+            job_id: Only deliver events for this job (None = all jobs)
+
+        Returns:
+            int: Subscription token for unsubscribe()
+        """
+        with self._lock:
+            token = next(self._tokens)
+            self._subscribers[token] = (callback, job_id)
+            return token
+
+    def unsubscribe(self, token: int) -> bool:
+        """Remove a subscriber by token"""
+        with self._lock:
+            return self._subscribers.pop(token, None) is not None
+
+    def publish(self, event_type: str, job_id: str, data: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Publish an event to all matching subscribers
+
+        Args:
+            event_type: JOB_STATUS_EVENT or JOB_LOG_EVENT
+            job_id: Job ID the event belongs to
+            data: Event payload
+
+        Returns:
+            Dict: The published event (with sequence number and timestamp)
+        """
+        event = {
+            'type': event_type,
+            'job_id': job_id,
+            'seq': next(self._sequence),
+            'timestamp': datetime.now().isoformat(),
+            'data': data or {}
+        }
+        return self.dispatch(event)
+
+    def dispatch(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Record an already-built event in the backlog and deliver it"""
+        job_id = event.get('job_id')
+        with self._lock:
+            backlog = self._backlog.get(job_id)
+            if backlog is None:
+                backlog = deque(maxlen=self._backlog_size)
+                self._backlog[job_id] = backlog
+                while len(self._backlog) > self._max_tracked_jobs:
+                    self._backlog.popitem(last=False)
+            else:
+                self._backlog.move_to_end(job_id)
+            backlog.append(event)
+            subscribers = [cb for cb, job_filter in self._subscribers.values()
+                           if job_filter is None or job_filter == job_id]
+
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"[ERROR] Job event subscriber failed: {e}")
+        return event
+
+    def recent_events(self, job_id: str, since_seq: int = 0) -> List[Dict[str, Any]]:
+        """
+        Get buffered events for a job (used to catch up late subscribers)
+
+        Args:
+            job_id: Job ID
+            since_seq: Only return events with a higher sequence number
+
+        Returns:
+            List[Dict]: Buffered events in publish order
+        """
+        with self._lock:
+            backlog = self._backlog.get(job_id)
+            if not backlog:
+                return []
+            return [event for event in backlog if event['seq'] > since_seq]
+
+
+class ProcessReaper:
+    """
+    Collects child process exits without blocking a thread per process
+
+    Uses pidfd_open() and a single poll loop on Linux; falls back to a
+    waiter thread per process where pidfds are not available.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watched: Dict[int, tuple] = {}  # pidfd -> (process, callback)
+        self._poller = select.poll() if hasattr(select, 'poll') else None
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        self._thread = None
+        if self._poller is not None:
+            self._poller.register(self._wakeup_r, select.POLLIN)
+
+    def watch(self, process, callback: Callable[[int, int], None]) -> None:
+        """
+        Watch a subprocess.Popen and call callback(pid, return_code) once it exits
+
+        Args:
+            process: subprocess.Popen instance
+            callback: Called from the reaper thread after the process is reaped
+        """
+        pidfd = None
+        if self._poller is not None and hasattr(os, 'pidfd_open'):
+            try:
+                pidfd = os.pidfd_open(process.pid)
+            except OSError:
+                pidfd = None
+
+        if pidfd is None:
+            threading.Thread(target=self._wait_fallback, args=(process, callback),
+                             daemon=True).start()
+            return
+
+        with self._lock:
+            self._watched[pidfd] = (process, callback)
+            self._poller.register(pidfd, select.POLLIN)
+            self._ensure_thread_running()
+        os.write(self._wakeup_w, b'\0')
+
+    def watched_count(self) -> int:
+        """Number of processes currently watched via pidfd"""
+        with self._lock:
+            return len(self._watched)
+
+    def _ensure_thread_running(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._reaper_loop, daemon=True)
+            self._thread.start()
+
+    def _reaper_loop(self):
+        while True:
+            try:
+                ready = self._poller.poll()
+            except InterruptedError:
+                continue
+
+            for fd, _ in ready:
+                if fd == self._wakeup_r:
+                    os.read(self._wakeup_r, 4096)
+                    continue
+                with self._lock:
+                    entry = self._watched.pop(fd, None)
+                    if entry is not None:
+                        self._poller.unregister(fd)
+                if entry is None:
+                    continue
+                os.close(fd)
+                process, callback = entry
+                self._deliver(process, callback, process.wait())
+
+    def _wait_fallback(self, process, callback):
+        self._deliver(process, callback, process.wait())
+
+    @staticmethod
+    def _deliver(process, callback, return_code):
+        try:
+            callback(process.pid, return_code)
+        except Exception as e:
+            print(f"[ERROR] Process exit callback failed for PID {process.pid}: {e}")
+
+
+class HubEventForwarder:
+    """
+    Forwards job events to the API server Socket.IO hub
+
+    Jobs run inside aspcli/cmd_runner processes, so events are relayed over a
+    single persistent Socket.IO client connection as 'job_event' messages.
+    """
+
+    def __init__(self, server_url: str, max_pending: int = 1000):
+        self.server_url = server_url
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._client = None
+
+    def __call__(self, event: Dict[str, Any]) -> None:
+        """Bus subscriber callback - never blocks the publishing thread"""
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            pass
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._forward_loop, daemon=True)
+            self._thread.start()
+
+    def _connect(self) -> bool:
+        try:
+            import socketio
+        except ImportError:
+            return False
+        try:
+            if self._client is None:
+                self._client = socketio.Client(reconnection=True)
+            if not self._client.connected:
+                self._client.connect(self.server_url, auth={'token': publisher_token() or ''})
+            return True
+        except Exception as e:
+            if config.is_debug_enabled():
+                print(f"[DEBUG] Job event hub connection failed: {e}")
+            return False
+
+    def _forward_loop(self):
+        while True:
+            event = self._queue.get()
+            if not self._connect():
+                # Hub unavailable: drop the event, job log file remains authoritative
+                continue
+            try:
+                self._client.emit('job_event', event)
+            except Exception as e:
+                if config.is_debug_enabled():
+                    print(f"[DEBUG] Failed to forward job event: {e}")
+
+
+# Global instances
+job_event_bus = JobEventBus()
+process_reaper = ProcessReaper()
+_hub_forwarder_token = None
+
+
+def enable_hub_forwarding(server_url: str = None) -> None:
+    """Relay job events from this process to the API server hub (idempotent)"""
+    global _hub_forwarder_token
+    if _hub_forwarder_token is not None:
+        return
+    server_url = server_url or config.get('job.events.hub_url', 'http://localhost:8000')
+    if not server_url:
+        return
+    _hub_forwarder_token = job_event_bus.subscribe(HubEventForwarder(server_url))
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Job Store Module for SMBJOB/REFJOB
+SQLite access layer tuned for concurrent job submission
+
+- One cached connection per thread (and per process, so forked cmdRunners
+  never share a connection with their parent)
+- WAL journal with synchronous=NORMAL so readers (REFJOB, status polls)
+  never block writers (SBMJOB from other terminals)
+- Write transactions start with BEGIN IMMEDIATE to avoid lock upgrade
+  deadlocks that surface as "database is locked"
+- Fixed SQL text so sqlite3's per-connection statement cache reuses the
+  prepared statements
+- Batched status updates in a single transaction; consecutive updates that
+  set the same fields share one executemany() call
+"""
+
+import itertools
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Connection settings
+BUSY_TIMEOUT_SECONDS = 10
+STATEMENT_CACHE_SIZE = 128
+
+SELECT_RUNNABLE_JOBS_SQL = '''
+    SELECT * FROM jobs
+    WHERE status = 'PENDING'
+    ORDER BY priority ASC, submitted_time ASC
+    LIMIT ?
+'''
+
+SELECT_ACTIVE_JOBS_SQL = '''
+    SELECT * FROM jobs
+    WHERE status IN ('PENDING', 'RUNNING', 'HELD')
+    UNION ALL
+    SELECT * FROM jobs
+    WHERE status IN ('COMPLETED', 'ERROR', 'CANCELLED')
+      AND datetime(end_time) > datetime('now', '-1 hour')
+    ORDER BY submitted_time DESC
+'''
+
+# Columns a status update may set; a field passed as None clears the column
+# (e.g. start_time/end_time/pid on requeue), a field not passed keeps it
+STATUS_UPDATE_FIELDS = ('start_time', 'end_time', 'pid')
+
+
+def _update_status_sql(fields: Tuple[str, ...]) -> str:
+    """UPDATE text setting status plus exactly the given fields"""
+    assignments = ''.join(f'{field} = ?, ' for field in fields)
+    return f'UPDATE jobs SET status = ?, {assignments}updated_at = CURRENT_TIMESTAMP WHERE job_id = ?'
+
+
+# One fixed statement per field combination, so the statement cache reuses them
+UPDATE_STATUS_SQL = {
+    fields: _update_status_sql(fields)
+    for count in range(len(STATUS_UPDATE_FIELDS) + 1)
+    for fields in itertools.combinations(STATUS_UPDATE_FIELDS, count)
+}
+
+INSERT_HISTORY_SQL = '''
+    INSERT INTO job_history (job_id, status, message)
+    VALUES (?, ?, ?)
+'''
+
+
+class JobStore:
+    """SQLite job store with per-thread connection reuse"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Get this thread's cached connection, opening it on first use
+
+        Returns:
+            sqlite3.Connection: Connection configured for WAL and Row access
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and getattr(self._local, 'pid', None) == os.getpid():
+            return conn
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row
+        self._configure(conn)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _configure(conn: sqlite3.Connection):
+        """Apply WAL/synchronous pragmas (journal mode persists in the file)"""
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_SECONDS * 1000}')
+
+    def close(self):
+        """Close this thread's cached connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run a write transaction that takes the write lock up front
+
+        Yields:
+            sqlite3.Connection: The thread's connection inside BEGIN IMMEDIATE
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def runnable_jobs(self, limit: int = 1) -> List[sqlite3.Row]:
+        """
+        Get PENDING jobs in dispatch order (priority, then submission time)
+
+        Args:
+            limit: Maximum number of rows
+
+        Returns:
+            List[sqlite3.Row]: Runnable job rows
+        """
+        return self.connection().execute(SELECT_RUNNABLE_JOBS_SQL, (limit,)).fetchall()
+
+    def active_jobs(self) -> List[sqlite3.Row]:
+        """Get live jobs plus jobs finished within the last hour"""
+        return self.connection().execute(SELECT_ACTIVE_JOBS_SQL).fetchall()
+
+    def update_statuses(self, updates: Iterable[Tuple[str, str, Dict[str, Any]]]) -> int:
+        """
+        Apply several status updates in one transaction
+
+        Args:
+            updates: (job_id, status, fields) tuples; fields may contain
+                     start_time, end_time, pid and message. A field set to
+                     None is cleared, one left out keeps its stored value
+
+        Returns:
+            int: Number of job rows changed
+        """
+        job_rows = []
+        history_rows = []
+        for job_id, status, fields in updates:
+            columns = tuple(field for field in STATUS_UPDATE_FIELDS if field in fields)
+            job_rows.append((columns, (status, *(fields[field] for field in columns), job_id)))
+            history_rows.append((job_id, status, fields.get('message', f'Status changed to {status}')))
+
+        if not job_rows:
+            return 0
+
+        with self.transaction() as conn:
+            changed = 0
+            for columns, rows in itertools.groupby(job_rows, key=lambda row: row[0]):
+                changed += conn.executemany(UPDATE_STATUS_SQL[columns], [params for _, params in rows]).rowcount
+            conn.executemany(INSERT_HISTORY_SQL, history_rows)
+        return changed
+
+    @contextmanager
+    def batch(self):
+        """
+        Collect status updates and write them in a single transaction on exit
+
+        Example:
+            with job_store.batch() as batch:
+                batch.update_status(job_id, 'CANCELLED', end_time=now)
+        """
+        batch = StatusUpdateBatch()
+        yield batch
+        self.update_statuses(batch.updates)
+
+
+class StatusUpdateBatch:
+    """Pending status updates collected by JobStore.batch()"""
+
+    def __init__(self):
+        self.updates: List[Tuple[str, str, Dict[str, Any]]] = []
+
+    def update_status(self, job_id: str, status: str, **kwargs):
+        """Queue a status update (same keyword fields as update_job_status)"""
+        self.updates.append((job_id, status, kwargs))
+
+    def __len__(self):
+        return len(self.updates)
+
+
+_stores: Dict[str, JobStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_job_store(db_path: str) -> JobStore:
+    """Get the shared JobStore for a database file"""
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = JobStore(db_path)
+            _stores[db_path] = store
+        return store
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+Process Supervisor for CALL/SBMJOB/cmdRunner
+
+Tracks every program process launched by OpenASP in its own process group:
+- Children are started with start_new_session=True so the whole tree below a
+  program (JVM, shell pipelines, forked helpers) can be signalled at once
+- Each child is registered in the PID registry (ASP_PID_DIR) together with its
+  process group and the session, terminal and job it belongs to
+- Cleanup, status and resource accounting read only the registry and /proc
+  entries of registered processes (O(children), no host-wide process scan)
+- PID reuse is detected through the process start time recorded at launch,
+  so a stale registry entry never signals an unrelated process
+"""
+
+import os
+import json
+import time
+import signal
+import subprocess
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+# PID registry shared with the API server cleanup endpoints
+PROCESS_REGISTRY_DIR = os.environ.get('ASP_PID_DIR', '/tmp/asp_call_pids')
+
+# Seconds to wait after SIGTERM before SIGKILL, and after SIGKILL
+DEFAULT_TERMINATE_TIMEOUT = 5.0
+KILL_TIMEOUT = 2.0
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+@dataclass
+class ProcessRecord:
+    """Registry entry for a supervised process"""
+    pid: int
+    program: str = 'UNKNOWN'
+    library: str = ''
+    volume: str = ''
+    pgid: Optional[int] = None
+    session_id: Optional[str] = None
+    terminal_id: Optional[str] = None
+    job_id: Optional[str] = None
+    source: str = ''
+    created: str = ''
+    start_ticks: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ProcessRecord':
+        fields = cls.__dataclass_fields__
+        return cls(**{key: value for key, value in data.items() if key in fields})
+
+    def matches(self, session_id: Optional[str] = None, terminal_id: Optional[str] = None,
+                job_id: Optional[str] = None) -> bool:
+        """True if the record belongs to every given session/terminal/job"""
+        return ((session_id is None or self.session_id == session_id) and
+                (terminal_id is None or self.terminal_id == terminal_id) and
+                (job_id is None or self.job_id == job_id))
+
+
+def _read_proc_stat(pid: int) -> Optional[List[str]]:
+    """Fields of /proc/<pid>/stat after the command name (state is index 0)"""
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            data = f.read()
+    except OSError:
+        return None
+    return data[data.rfind(')') + 2:].split()
+
+
+def _process_start_ticks(pid: int) -> Optional[int]:
+    fields = _read_proc_stat(pid)
+    return int(fields[19]) if fields else None
+
+
+def _process_children(pid: int) -> List[int]:
+    """Direct children of a process from /proc/<pid>/task/*/children"""
+    children = []
+    try:
+        tasks = os.listdir(f'/proc/{pid}/task')
+    except OSError:
+        return children
+    for tid in tasks:
+        try:
+            with open(f'/proc/{pid}/task/{tid}/children', 'r') as f:
+                children.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return children
+
+
+def _group_running(pgid: int) -> bool:
+    """True if any non-zombie process belongs to the process group"""
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        fields = _read_proc_stat(int(entry))
+        if fields is not None and fields[0] not in ('Z', 'X') and int(fields[2]) == pgid:
+            return True
+    return False
+
+
+class ProcessSupervisor:
+    """Launches, indexes and terminates program process groups"""
+
+    def __init__(self, registry_dir: Optional[str] = None):
+        self.registry_dir = registry_dir or PROCESS_REGISTRY_DIR
+
+    def spawn(self, cmd, program: str, library: str = '', volume: str = '',
+              source: str = '', session_id: Optional[str] = None,
+              terminal_id: Optional[str] = None, job_id: Optional[str] = None,
+              **popen_kwargs) -> subprocess.Popen:
+        """
+        Start a program in its own process group and register it
+
+        Args:
+            cmd: Command passed to subprocess.Popen
+            program, library, volume: Program identification for the registry
+            source: Launching component (call.py, sbmjob, ...)
+            session_id, terminal_id, job_id: Index keys (default: ASP_* environment)
+            **popen_kwargs: Passed to subprocess.Popen
+
+        Returns:
+            subprocess.Popen: The started process
+        """
+        popen_kwargs.setdefault('start_new_session', True)
+        process = subprocess.Popen(cmd, **popen_kwargs)
+        self.register(process.pid, program, library, volume, source=source,
+                      session_id=session_id, terminal_id=terminal_id, job_id=job_id,
+                      pgid=process.pid if popen_kwargs['start_new_session'] else None)
+        return process
+
+    def register(self, pid: int, program: str, library: str = '', volume: str = '',
+                 source: str = '', session_id: Optional[str] = None,
+                 terminal_id: Optional[str] = None, job_id: Optional[str] = None,
+                 pgid: Optional[int] = None) -> ProcessRecord:
+        """
+        Register an already running process
+
+        Args:
+            pid: Process ID
+            pgid: Process group to signal on cleanup (None = signal pid only)
+            Other arguments as for spawn()
+
+        Returns:
+            ProcessRecord: The stored registry entry
+        """
+        env = os.environ
+        record = ProcessRecord(
+            pid=pid,
+            program=program,
+            library=library,
+            volume=volume,
+            pgid=pgid,
+            session_id=session_id or env.get('ASP_SESSION_ID'),
+            terminal_id=terminal_id or env.get('ASP_TERMINAL_ID'),
+            job_id=job_id or env.get('ASP_JOB_ID'),
+            source=source,
+            created=datetime.now().isoformat(),
+            start_ticks=_process_start_ticks(pid)
+        )
+
+        os.makedirs(self.registry_dir, exist_ok=True)
+        record_file = self._record_file(pid)
+        temp_file = f"{record_file}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(asdict(record), f)
+        os.replace(temp_file, record_file)
+        return record
+
+    def unregister(self, pid: int):
+        """Remove a process from the registry"""
+        try:
+            os.remove(self._record_file(pid))
+        except OSError:
+            pass
+
+    def records(self, session_id: Optional[str] = None, terminal_id: Optional[str] = None,
+                job_id: Optional[str] = None, prune: bool = True) -> List[ProcessRecord]:
+        """
+        Get registered processes, optionally filtered by session/terminal/job
+
+        Args:
+            session_id, terminal_id, job_id: Filters (None = any)
+            prune: Drop entries whose process group has exited
+
+        Returns:
+            List[ProcessRecord]: Matching live entries
+        """
+        try:
+            names = os.listdir(self.registry_dir)
+        except OSError:
+            return []
+
+        records = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.registry_dir, name), 'r') as f:
+                    record = ProcessRecord.from_dict(json.load(f))
+            except (OSError, ValueError, TypeError):
+                continue
+            if prune and not self.is_alive(record):
+                self.unregister(record.pid)
+                continue
+            if record.matches(session_id, terminal_id, job_id):
+                records.append(record)
+
+        records.sort(key=lambda record: record.created)
+        return records
+
+    def is_alive(self, record: ProcessRecord) -> bool:
+        """
+        True if the registered process (or its process group) is still running
+
+        A PID that now belongs to a different process (start time changed) is
+        reported as not alive.
+        """
+        fields = _read_proc_stat(record.pid)
+        if fields is not None:
+            if record.start_ticks is not None and int(fields[19]) != record.start_ticks:
+                return False
+            if fields[0] not in ('Z', 'X'):
+                return True
+        elif not record.pgid:
+            return False
+
+        # Leader exited (or is an unreaped zombie): members of its process
+        # group may still be running
+        if record.pgid and record.pgid != os.getpgid(0):
+            return _group_running(record.pgid)
+        return False
+
+    def terminate(self, record: ProcessRecord, timeout: float = DEFAULT_TERMINATE_TIMEOUT) -> str:
+        """
+        Terminate a registered process group (SIGTERM, then SIGKILL)
+
+        Returns:
+            str: 'terminated', 'killed' or 'already_terminated'
+        """
+        status = 'already_terminated'
+        if self.is_alive(record):
+            self._signal(record, signal.SIGTERM)
+            if self._wait_exit(record, timeout):
+                status = 'terminated'
+            else:
+                self._signal(record, signal.SIGKILL)
+                self._wait_exit(record, KILL_TIMEOUT)
+                status = 'killed'
+        self.unregister(record.pid)
+        return status
+
+    def terminate_pid(self, pid: int, timeout: float = DEFAULT_TERMINATE_TIMEOUT) -> str:
+        """Terminate a registered process group by leader PID (see terminate())"""
+        try:
+            with open(self._record_file(pid), 'r') as f:
+                record = ProcessRecord.from_dict(json.load(f))
+        except (OSError, ValueError, TypeError):
+            record = ProcessRecord(pid=pid)
+        return self.terminate(record, timeout)
+
+    def cleanup(self, session_id: Optional[str] = None, terminal_id: Optional[str] = None,
+                job_id: Optional[str] = None, pids: Optional[Iterable[int]] = None,
+                include_jobs: bool = True,
+                timeout: float = DEFAULT_TERMINATE_TIMEOUT) -> List[Dict[str, Any]]:
+        """
+        Terminate every registered process matching the filters
+
+        All matching groups receive SIGTERM first and share one grace period.
+
+        Args:
+            session_id, terminal_id, job_id: Filters (None = any)
+            pids: Only these leader PIDs (None = any)
+            include_jobs: Also terminate batch work (records with a job_id)
+
+        Returns:
+            List of {'pid', 'program', 'pgid', 'session_id', 'terminal_id', 'job_id', 'status'}
+        """
+        records = self.records(session_id, terminal_id, job_id, prune=False)
+        if pids is not None:
+            pids = set(pids)
+            records = [record for record in records if record.pid in pids]
+        if not include_jobs:
+            records = [record for record in records if not record.job_id]
+        pending = []
+        details = []
+
+        for record in records:
+            if self.is_alive(record):
+                self._signal(record, signal.SIGTERM)
+                pending.append(record)
+            else:
+                details.append(self._cleanup_detail(record, 'already_terminated'))
+                self.unregister(record.pid)
+
+        deadline = time.monotonic() + timeout
+        for record in pending:
+            if self._wait_exit(record, max(0.0, deadline - time.monotonic())):
+                status = 'terminated'
+            else:
+                self._signal(record, signal.SIGKILL)
+                self._wait_exit(record, KILL_TIMEOUT)
+                status = 'killed'
+            details.append(self._cleanup_detail(record, status))
+            self.unregister(record.pid)
+
+        return details
+
+    def usage(self, record: ProcessRecord) -> Dict[str, Any]:
+        """
+        CPU and memory used by a registered process and its descendants
+
+        Returns:
+            Dict with 'processes', 'cpu_seconds' and 'rss_bytes'
+        """
+        usage = {'processes': 0, 'cpu_seconds': 0.0, 'rss_bytes': 0}
+        if record.start_ticks is not None and _process_start_ticks(record.pid) != record.start_ticks:
+            return usage
+
+        pending = [record.pid]
+        seen = set()
+        while pending:
+            pid = pending.pop()
+            if pid in seen:
+                continue
+            seen.add(pid)
+            fields = _read_proc_stat(pid)
+            if fields is None:
+                continue
+            usage['processes'] += 1
+            usage['cpu_seconds'] += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+            try:
+                with open(f'/proc/{pid}/statm', 'r') as f:
+                    usage['rss_bytes'] += int(f.read().split()[1]) * PAGE_SIZE
+            except (OSError, IndexError, ValueError):
+                pass
+            pending.extend(_process_children(pid))
+
+        usage['cpu_seconds'] = round(usage['cpu_seconds'], 2)
+        return usage
+
+    def status(self, session_id: Optional[str] = None, terminal_id: Optional[str] = None,
+               job_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Registered live processes with their resource usage"""
+        result = []
+        for record in self.records(session_id, terminal_id, job_id):
+            entry = asdict(record)
+            entry.update(self.usage(record))
+            result.append(entry)
+        return result
+
+    def _record_file(self, pid: int) -> str:
+        return os.path.join(self.registry_dir, f"{pid}.json")
+
+    def _signal(self, record: ProcessRecord, signum: int):
+        try:
+            if record.pgid and record.pgid != os.getpgid(0):
+                os.killpg(record.pgid, signum)
+            else:
+                os.kill(record.pid, signum)
+        except OSError:
+            pass
+
+    def _wait_exit(self, record: ProcessRecord, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while self.is_alive(record):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    @staticmethod
+    def _cleanup_detail(record: ProcessRecord, status: str) -> Dict[str, Any]:
+        return {
+            'pid': record.pid,
+            'pgid': record.pgid,
+            'program': record.program,
+            'session_id': record.session_id,
+            'terminal_id': record.terminal_id,
+            'job_id': record.job_id,
+            'method': 'process_group' if record.pgid else 'pid_tracking',
+            'status': status
+        }
+
+
+# Global supervisor instance
+process_supervisor = ProcessSupervisor()
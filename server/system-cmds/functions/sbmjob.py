@@ -33,12 +33,27 @@ os.makedirs(JOB_LOG_DIR, exist_ok=True)
 # Import database module
 from .job_database import (
     init_database, add_job as db_add_job, update_job_status as db_update_job_status,
-    get_active_jobs, db_update_job_pid
+    get_active_jobs, get_next_runnable_job, db_update_job_pid
 )
 
 # Import PostgreSQL JOBINFO database module
 from .jobinfo_db import insert_jobinfo, update_jobinfo_status
 
+# Import job event bus (status/log streaming and process exit collection)
+from .job_events import (
+    job_event_bus, process_reaper, enable_hub_forwarding,
+    JOB_STATUS_EVENT, JOB_LOG_EVENT
+)
+
+# Import process supervisor (process-group tracking for job programs)
+from .process_supervisor import process_supervisor
+
+# Wakes the job processor when a job is submitted or released
+_job_wakeup = threading.Event()
+
+# Maximum job execution time in seconds
+JOB_TIMEOUT_SECONDS = 300
+
 class JobInfo:
     """Job information class for SBMJOB"""
     
@@ -231,6 +246,9 @@ def SBMJOB(command: str) -> bool:
             
             # Start job processor if not running
             _ensure_job_processor_running()
+            _job_wakeup.set()
+        
+        _publish_job_status(job_info)
         
         # Write job submission log
         _write_job_log(job_info, "JOB_SUBMITTED", f"Job {job_name} submitted successfully")
@@ -266,6 +284,11 @@ def _ensure_job_processor_running():
             target=_job_processor_worker, daemon=True)
         _ensure_job_processor_running._job_processor_thread.start()
         print("[INFO] Job processor thread started")
+        # Relay job status/log events to the API server hub for live tail (once per process)
+        try:
+            enable_hub_forwarding()
+        except Exception as e:
+            print(f"[WARNING] Job event hub forwarding unavailable: {e}")
 
 def _job_processor_worker():
     """Background job processor worker thread"""
@@ -273,20 +296,16 @@ def _job_processor_worker():
     
     while True:
         try:
-            # Check for pending jobs in database
+            # Clear before checking, so a submission that lands after the check
+            # leaves the event set and the wait below returns immediately
+            _job_wakeup.clear()
+            # Check for the next runnable job in database (indexed lookup)
             if config.is_debug_enabled():
                 print("[DEBUG] Checking for pending jobs in database...")
-            db_jobs = get_active_jobs()
-            if config.is_debug_enabled():
-                print(f"[DEBUG] Total jobs in database: {len(db_jobs)}")
-            
-            pending_jobs = [job for job in db_jobs.values() if job.status == "PENDING"]
-            if config.is_debug_enabled():
-                print(f"[DEBUG] Found {len(pending_jobs)} pending jobs")
+            job_info = get_next_runnable_job()
             
-            if pending_jobs:
-                # Process the oldest pending job
-                job_info = min(pending_jobs, key=lambda j: j.submitted_time)
+            if job_info:
+                # Process the highest-priority, oldest pending job
                 print(f"[INFO] Processing pending job {job_info.job_id} ({job_info.job_name})")
                 if config.is_debug_enabled():
                     print(f"[DEBUG] Job details - Status: {job_info.status}, Program: {job_info.program}, Library: {job_info.library}")
@@ -305,12 +324,14 @@ def _job_processor_worker():
                     job_info.status = "ERROR"
                     job_info.end_time = datetime.now()
                     db_update_job_status(job_info.job_id, "ERROR", end_time=job_info.end_time)
+                    _publish_job_status(job_info)
                     _write_job_log(job_info, "JOB_ERROR", f"Critical job execution error: {e}")
             else:
-                # No pending jobs, wait before checking again
+                # No pending jobs, sleep until a submission wakes us (or 5 seconds
+                # pass, to pick up jobs submitted by other processes)
                 if config.is_debug_enabled():
-                    print("[DEBUG] No pending jobs found, waiting 5 seconds...")
-                time.sleep(5)
+                    print("[DEBUG] No pending jobs found, waiting for submission...")
+                _job_wakeup.wait(5)
             
         except Exception as e:
             print(f"[ERROR] Job processor error: {e}")
@@ -337,6 +358,7 @@ def _execute_job(job_info: JobInfo):
         
         # Update PostgreSQL JOBINFO table
         update_jobinfo_status(job_info.job_id, "RUNNING")
+        _publish_job_status(job_info)
         
         _write_job_log(job_info, "JOB_STARTED", f"Job {job_info.job_name} started execution")
         
@@ -399,6 +421,7 @@ def _execute_job(job_info: JobInfo):
             db_update_job_status(job_info.job_id, "COMPLETED", end_time=job_info.end_time)
             # Update PostgreSQL JOBINFO table
             update_jobinfo_status(job_info.job_id, "COMPLETED")
+            _publish_job_status(job_info)
             _write_job_log(job_info, "JOB_COMPLETED", f"Job {job_info.job_name} completed successfully")
         else:
             job_info.status = "ERROR"
@@ -407,6 +430,7 @@ def _execute_job(job_info: JobInfo):
             db_update_job_status(job_info.job_id, "ERROR", end_time=job_info.end_time)
             # Update PostgreSQL JOBINFO table
             update_jobinfo_status(job_info.job_id, "ERROR")
+            _publish_job_status(job_info)
             _write_job_log(job_info, "JOB_ERROR", f"Job {job_info.job_name} failed")
         
         duration = (job_info.end_time - job_info.start_time).total_seconds()
@@ -422,6 +446,7 @@ def _execute_job(job_info: JobInfo):
         db_update_job_status(job_info.job_id, "ERROR", end_time=job_info.end_time)
         # Update PostgreSQL JOBINFO table
         update_jobinfo_status(job_info.job_id, "ERROR")
+        _publish_job_status(job_info)
         _write_job_log(job_info, "JOB_ERROR", f"Job execution error: {e}")
         print(f"[ERROR] Job {job_info.job_id} execution failed: {e}")
 
@@ -522,7 +547,7 @@ def _execute_cl_job(job_info: JobInfo, program_info: Dict[str, Any]) -> bool:
     try:
         # Import CL executor
         sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        from cl_executor import execute_cl_script
+        from cl_executor import execute_cl_file
         
         # Debug: Log all input parameters
         _write_job_log(job_info, "JOB_DEBUG", f"_execute_cl_job called with:")
@@ -591,10 +616,6 @@ def _execute_cl_job(job_info: JobInfo, program_info: Dict[str, Any]) -> bool:
         os.environ.update(env)
         
         try:
-            # Read CL file
-            with open(cl_path, 'r', encoding='utf-8') as f:
-                cl_content = f.read()
-            
             # Execute CL commands with proper output redirection
             original_stdout = sys.stdout
             original_stderr = sys.stderr
@@ -608,8 +629,8 @@ def _execute_cl_job(job_info: JobInfo, program_info: Dict[str, Any]) -> bool:
             sys.stderr = stderr_buffer
             
             try:
-                # Execute CL script (returns number of failed instructions)
-                failed_count = execute_cl_script(cl_content, stop_on_error=False)
+                # Execute compiled CL program (returns number of failed instructions)
+                failed_count = execute_cl_file(cl_path, stop_on_error=False)
                 success = (failed_count == 0)
                 
                 # Get captured output
@@ -644,7 +665,11 @@ def _execute_cl_job(job_info: JobInfo, program_info: Dict[str, Any]) -> bool:
         return False
 
 def _run_job_command(job_info: JobInfo, cmd: List[str], cwd: str) -> bool:
-    """Run job command with proper logging and error handling"""
+    """Run job command with proper logging and error handling
+    
+    Output is streamed to the job log (and job event subscribers) line by line
+    while the process runs; completion is signalled by the process reaper.
+    """
     try:
         _write_job_log(job_info, "JOB_EXEC", f"Executing: {' '.join(cmd)}")
         
@@ -656,12 +681,18 @@ def _run_job_command(job_info: JobInfo, cmd: List[str], cwd: str) -> bool:
         env['ASP_LIBRARY'] = job_info.library
         env['ASP_PROGRAM'] = job_info.program
         
-        # Execute command with Popen to get PID
-        process = subprocess.Popen(
+        # Execute command in its own process group, registered with the supervisor
+        process = process_supervisor.spawn(
             cmd,
+            program=job_info.program,
+            library=job_info.library,
+            volume=job_info.volume,
+            source='sbmjob',
+            job_id=job_info.job_id,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
+            bufsize=1,
             cwd=cwd,
             env=env
         )
@@ -671,36 +702,58 @@ def _run_job_command(job_info: JobInfo, cmd: List[str], cwd: str) -> bool:
         db_update_job_pid(job_info.job_id, process.pid)
         _write_job_log(job_info, "JOB_INFO", f"Process started with PID: {process.pid}")
         
-        # Wait for process to complete with timeout
-        try:
-            stdout, stderr = process.communicate(timeout=300)  # 5 minute timeout
-            return_code = process.returncode
-        except subprocess.TimeoutExpired:
+        # Stream stdout/stderr into the job log as lines arrive
+        readers = [
+            threading.Thread(target=_stream_job_output,
+                             args=(job_info, process.stdout, "JOB_OUTPUT"), daemon=True),
+            threading.Thread(target=_stream_job_output,
+                             args=(job_info, process.stderr, "JOB_ERROR"), daemon=True)
+        ]
+        for reader in readers:
+            reader.start()
+        
+        # Wait for the reaper to report process exit
+        exited = threading.Event()
+        exit_status = {}
+        
+        def _on_exit(pid: int, return_code: int):
+            exit_status['return_code'] = return_code
+            exited.set()
+        
+        process_reaper.watch(process, _on_exit)
+        
+        if not exited.wait(JOB_TIMEOUT_SECONDS):
             _write_job_log(job_info, "JOB_ERROR", "Job timed out after 5 minutes")
-            process.kill()
-            stdout, stderr = process.communicate()
+            process_supervisor.terminate_pid(process.pid)
+            exited.wait()
             return_code = -1
+        else:
+            return_code = exit_status['return_code']
+        process_supervisor.unregister(process.pid)
         
-        job_info.return_code = return_code
-        
-        # Log output
-        if stdout:
-            _write_job_log(job_info, "JOB_OUTPUT", stdout)
+        for reader in readers:
+            reader.join()
         
-        if stderr:
-            _write_job_log(job_info, "JOB_ERROR", stderr)
+        job_info.return_code = return_code
         
         _write_job_log(job_info, "JOB_INFO", f"Return code: {return_code}")
         
         return return_code == 0
         
-    except subprocess.TimeoutExpired:
-        _write_job_log(job_info, "JOB_ERROR", "Job execution timed out")
-        return False
     except Exception as e:
         _write_job_log(job_info, "JOB_ERROR", f"Command execution error: {e}")
         return False
 
+def _stream_job_output(job_info: JobInfo, stream, level: str):
+    """Copy a process output stream into the job log line by line"""
+    try:
+        for line in iter(stream.readline, ''):
+            _write_job_log(job_info, level, line.rstrip('\n'))
+    except Exception as e:
+        print(f"[ERROR] Failed to read job output: {e}")
+    finally:
+        stream.close()
+
 def _write_job_log(job_info: JobInfo, level: str, message: str):
     """Write job log entry"""
     try:
@@ -712,6 +765,25 @@ def _write_job_log(job_info: JobInfo, level: str, message: str):
             
     except Exception as e:
         print(f"[ERROR] Failed to write job log: {e}")
+    
+    job_event_bus.publish(JOB_LOG_EVENT, job_info.job_id, {
+        'level': level,
+        'message': message
+    })
+
+def _publish_job_status(job_info: JobInfo):
+    """Publish the current job status to job event subscribers"""
+    job_event_bus.publish(JOB_STATUS_EVENT, job_info.job_id, {
+        'job_name': job_info.job_name,
+        'program': job_info.program,
+        'library': job_info.library,
+        'volume': job_info.volume,
+        'status': job_info.status,
+        'start_time': job_info.start_time.isoformat() if job_info.start_time else None,
+        'end_time': job_info.end_time.isoformat() if job_info.end_time else None,
+        'return_code': job_info.return_code,
+        'pid': getattr(job_info, 'pid', None)
+    })
 
 def list_jobs() -> List[Dict[str, Any]]:
     """List all active jobs (for monitoring)"""
@@ -741,6 +813,8 @@ def release_job(job_id: str) -> bool:
             job_info.status = "PENDING"
             JOB_QUEUE.put((job_info.priority, job_id))
             _ensure_job_processor_running()
+            _job_wakeup.set()
+            _publish_job_status(job_info)
             _write_job_log(job_info, "JOB_RELEASED", f"Job {job_info.job_name} released")
             return True
     return False
@@ -752,6 +826,7 @@ def cancel_job(job_id: str) -> bool:
         if job_info.status in ["PENDING", "HELD"]:
             job_info.status = "CANCELLED"
             job_info.end_time = datetime.now()
+            _publish_job_status(job_info)
             _write_job_log(job_info, "JOB_CANCELLED", f"Job {job_info.job_name} cancelled")
             return True
     return False
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite for CL compilation and the compiled CL cache
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to the path to import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cl_compiler
+from cl_compiler import CLCompiler, check_cl_syntax
+
+SCRIPT = """
+* Nightly batch
+CRTFILE FILE(TESTLIB/SALES) RECSIZE(80)
+OVRF FILE(EMP-FILE) TOFILE(EMPLOYEE.FB.TESTLIB) TYPE(*DATA)
+CALL PGM=EMPUPD
+"""
+
+
+def fake_handler(command_line):
+    return True
+
+
+class TestCLSyntax(unittest.TestCase):
+
+    def test_valid_script_has_no_errors(self):
+        errors, warnings = check_cl_syntax(SCRIPT, {"CRTFILE", "OVRF", "CALL"})
+        self.assertEqual(errors, [])
+        self.assertEqual(warnings, [])
+
+    def test_syntax_errors_report_line_numbers(self):
+        """Unbalanced parentheses, quotes and dangling continuations are errors"""
+        script = "CRTFILE FILE(TESTLIB/A\nSNDMSG MSG='hello\nCALL PGM=X +"
+        errors, _ = check_cl_syntax(script)
+        self.assertEqual(errors, [
+            "Line 1: Unbalanced parentheses",
+            "Line 2: Unterminated quoted string",
+            "Line 3: Continuation '+' at end of member",
+        ])
+
+    def test_unknown_command_is_warning(self):
+        errors, warnings = check_cl_syntax("FOO BAR=1", {"CALL"})
+        self.assertEqual(errors, [])
+        self.assertEqual(warnings, ["Line 1: Unknown command 'FOO' will be skipped"])
+
+
+class TestCLCompiler(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.temp_dir, "NIGHTLY.cl")
+        with open(self.source, 'w', encoding='utf-8') as f:
+            f.write(SCRIPT)
+        self.command_map = {"CRTFILE": fake_handler, "CALL": fake_handler}
+        self.compiler = self._new_compiler()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _new_compiler(self):
+        return CLCompiler(self.command_map, lambda command, params: f"{command} {sorted(params)}",
+                          cache_dir=os.path.join(self.temp_dir, "cache"))
+
+    def test_compiled_form_has_command_lines_and_handlers(self):
+        compiled = self.compiler.load(self.source)
+        self.assertEqual(len(compiled.instructions), 3)
+        self.assertEqual(compiled.instructions[2]["command_line"], "CALL ['PGM']")
+        self.assertIs(compiled.instructions[0]["handler"], fake_handler)
+        self.assertIsNone(compiled.instructions[1]["handler"])
+        self.assertEqual(compiled.warnings, ["Line 4: Unknown command 'OVRF' will be skipped"])
+
+    def test_unchanged_member_is_not_reparsed(self):
+        first = self.compiler.load(self.source)
+        with patch.object(cl_compiler, 'parse_cl_script') as parse:
+            self.assertIs(self.compiler.load(self.source), first)
+            # A fresh process reuses the on-disk compiled form
+            reloaded = self._new_compiler().load(self.source)
+            parse.assert_not_called()
+        self.assertEqual(reloaded.instructions[2]["command_line"], "CALL ['PGM']")
+        self.assertIs(reloaded.instructions[0]["handler"], fake_handler)
+
+    def test_touched_member_is_revalidated_by_hash(self):
+        """A newer mtime with identical content keeps the compiled form"""
+        self.compiler.load(self.source)
+        future = time.time() + 10
+        os.utime(self.source, (future, future))
+        with patch.object(cl_compiler, 'parse_cl_script') as parse:
+            compiled = self.compiler.load(self.source)
+            parse.assert_not_called()
+        self.assertEqual(compiled.mtime_ns, os.stat(self.source).st_mtime_ns)
+
+    def test_modified_member_is_recompiled(self):
+        self.compiler.load(self.source)
+        with open(self.source, 'a', encoding='utf-8') as f:
+            f.write("CALL PGM=REPORT1\n")
+        compiled = self.compiler.load(self.source)
+        self.assertEqual(len(compiled.instructions), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite for dependency-aware CL scheduling
+"""
+
+import os
+import sys
+import time
+import types
+import threading
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to the path to import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cl_parser import parse_cl_script
+from cl_scheduler import build_cl_schedule, format_cl_schedule, execute_cl_schedule
+
+NIGHTLY_SCRIPT = """
+CALL PGM=REPORT1
+CALL PGM=REPORT2
+CTTFILE INFILE=TESTLIB/SALES,OUTFILE=TESTLIB/SALES.BAK,VOL=DISK01
+CTTFILE INFILE=TESTLIB/SALES.BAK,OUTFILE=TESTLIB/SALES.CSV,VOL=DISK01
+OVRF FILE(EMP-FILE) TOFILE(EMPLOYEE.FB.TESTLIB) TYPE(*DATA)
+CALL PGM=EMPUPD
+DLTOVR FILE(EMP-FILE)
+CHGLIBL LIBL=PRODLIB
+CALL PGM=REPORT3
+"""
+
+class TestCLSchedule(unittest.TestCase):
+
+    def setUp(self):
+        self.steps = build_cl_schedule(parse_cl_script(NIGHTLY_SCRIPT))
+
+    def test_independent_steps_share_first_wave(self):
+        """A CTTFILE unrelated to the first CALL has no dependencies"""
+        self.assertEqual(self.steps[0].depends_on, set())
+        self.assertEqual(self.steps[2].depends_on, set())
+        self.assertEqual(self.steps[0].level, 0)
+        self.assertEqual(self.steps[2].level, 0)
+
+    def test_calls_run_one_at_a_time(self):
+        """CALLs set ASP_* in the shared process environment, so they never overlap"""
+        self.assertEqual(self.steps[1].depends_on, {0})
+        self.assertEqual(self.steps[1].level, 1)
+        self.assertIn(1, self.steps[4].depends_on)  # OVRF after the CALLs before it
+
+    def test_dataset_flow_creates_dependency(self):
+        """OUTFILE of one CTTFILE feeding INFILE of the next is ordered"""
+        self.assertIn(2, self.steps[3].depends_on)
+        self.assertEqual(self.steps[3].level, 1)
+
+    def test_override_orders_call(self):
+        """CALL after OVRF waits for it, DLTOVR waits for the CALL"""
+        self.assertIn(4, self.steps[5].depends_on)
+        self.assertIn(5, self.steps[6].depends_on)
+        self.assertNotIn(3, self.steps[5].depends_on)  # unrelated CTTFILE
+
+    def test_override_changes_never_overlap_calls(self):
+        """OVRF/DLTOVR of any file waits for earlier CALLs, and later CALLs wait for them"""
+        steps = build_cl_schedule(parse_cl_script("""
+CALL PGM=NOOVR
+OVRF FILE(A-FILE) TOFILE(A.TESTLIB)
+CALL PGM=USESA
+OVRF FILE(B-FILE) TOFILE(B.TESTLIB)
+DLTOVR FILE(A-FILE)
+CALL PGM=LAST
+"""))
+        self.assertIn(0, steps[1].depends_on)  # OVRF after a CALL with no overrides
+        self.assertIn(2, steps[3].depends_on)  # OVRF of another name after a CALL
+        self.assertIn(3, steps[5].depends_on)
+        self.assertIn(4, steps[5].depends_on)
+        self.assertEqual([step.level for step in steps], [0, 1, 2, 3, 4, 5])
+
+    def test_barrier_commands(self):
+        """CHGLIBL waits for everything before it and blocks everything after it"""
+        chglibl = self.steps[7]
+        self.assertTrue(chglibl.barrier)
+        self.assertEqual(chglibl.depends_on, set(range(7)))
+        self.assertIn(7, self.steps[8].depends_on)
+
+    def test_dry_run_format(self):
+        """Schedule rendering lists waves and dependencies"""
+        text = format_cl_schedule(self.steps)
+        self.assertIn("Wave 1:", text)
+        self.assertIn("[4] CTTFILE", text)
+        self.assertIn("Steps: 9", text)
+
+
+class TestCLScheduleExecution(unittest.TestCase):
+
+    def setUp(self):
+        self.pgmec = {'value': 0}
+        self.local = threading.local()
+        self.running = 0
+        self.max_running = 0
+        self.order = []
+        self.lock = threading.Lock()
+
+        executor = types.ModuleType('cl_executor')
+        executor.execute_instruction = self._fake_execute
+        commands = types.ModuleType('asp_commands')
+        commands.pgmec_scope = self._fake_scope
+        commands.get_pgmec = lambda: getattr(self.local, 'value', self.pgmec['value'])
+        commands.set_pgmec = lambda value: self.pgmec.__setitem__('value', value)
+        self.modules = patch.dict(sys.modules, {'cl_executor': executor, 'asp_commands': commands})
+        self.modules.start()
+
+    def tearDown(self):
+        self.modules.stop()
+
+    def _fake_scope(self):
+        test = self
+
+        class Scope:
+            def __enter__(self):
+                test.local.value = 0
+
+            def __exit__(self, *exc):
+                del test.local.value
+        return Scope()
+
+    def _fake_execute(self, instruction):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05)
+        program = instruction['params'].get('PGM') or instruction['params'].get('FILE', '')
+        self.local.value = 7 if program.startswith('FAIL') else 0
+        with self.lock:
+            self.running -= 1
+            self.order.append(program)
+        return not program.startswith('FAIL')
+
+    def test_parallel_execution_is_bounded(self):
+        """Independent steps overlap, but never beyond max_workers"""
+        script = "\n".join(f"CRTFILE FILE=TESTLIB/F{i}" for i in range(6))
+        failed = execute_cl_schedule(build_cl_schedule(parse_cl_script(script)), max_workers=3)
+        self.assertEqual(failed, 0)
+        self.assertEqual(self.max_running, 3)
+
+    def test_pgmec_follows_program_order(self):
+        """@PGMEC after the run is that of the last step in program order"""
+        script = "CALL PGM=FAIL1\nCALL PGM=OK2"
+        failed = execute_cl_schedule(build_cl_schedule(parse_cl_script(script)), max_workers=2)
+        self.assertEqual(failed, 1)
+        self.assertEqual(self.pgmec['value'], 0)
+
+    def test_stop_on_error_starts_no_further_steps(self):
+        """After a failure no new steps are started"""
+        script = "CALL PGM=FAIL1\nCHGLIBL LIBL=X\nCALL PGM=P3"
+        failed = execute_cl_schedule(build_cl_schedule(parse_cl_script(script)),
+                                     max_workers=2, stop_on_error=True)
+        self.assertEqual(failed, 1)
+        self.assertEqual(self.order, ['FAIL1'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite for the SBMJOB job event bus and process reaper
+"""
+
+import os
+import sys
+import subprocess
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+# Add the parent directory to the path to import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from functions import job_events
+from functions.job_events import (
+    JobEventBus, ProcessReaper, HubEventForwarder, JOB_STATUS_EVENT, JOB_LOG_EVENT
+)
+
+class TestJobEventBus(unittest.TestCase):
+
+    def test_publish_delivers_to_matching_subscribers(self):
+        """Subscribers with a job filter only see their job"""
+        bus = JobEventBus()
+        all_events, job_events = [], []
+        bus.subscribe(all_events.append)
+        bus.subscribe(job_events.append, job_id="J1")
+
+        bus.publish(JOB_STATUS_EVENT, "J1", {'status': 'RUNNING'})
+        bus.publish(JOB_LOG_EVENT, "J2", {'message': 'hello'})
+
+        self.assertEqual(len(all_events), 2)
+        self.assertEqual([e['job_id'] for e in job_events], ["J1"])
+        self.assertEqual(job_events[0]['data']['status'], 'RUNNING')
+
+    def test_unsubscribe(self):
+        """Unsubscribed callbacks receive nothing"""
+        bus = JobEventBus()
+        events = []
+        token = bus.subscribe(events.append)
+        self.assertTrue(bus.unsubscribe(token))
+        bus.publish(JOB_LOG_EVENT, "J1", {'message': 'x'})
+        self.assertEqual(events, [])
+
+    def test_backlog_is_bounded_and_replayable(self):
+        """Late subscribers can catch up from the bounded per-job backlog"""
+        bus = JobEventBus(backlog_size=3, max_tracked_jobs=2)
+        for i in range(5):
+            bus.publish(JOB_LOG_EVENT, "J1", {'message': str(i)})
+
+        backlog = bus.recent_events("J1")
+        self.assertEqual([e['data']['message'] for e in backlog], ['2', '3', '4'])
+        self.assertEqual(len(bus.recent_events("J1", since_seq=backlog[1]['seq'])), 1)
+
+        bus.publish(JOB_LOG_EVENT, "J2", {})
+        bus.publish(JOB_LOG_EVENT, "J3", {})
+        self.assertEqual(bus.recent_events("J1"), [])
+
+    def test_failing_subscriber_does_not_break_publish(self):
+        """A subscriber exception is contained"""
+        bus = JobEventBus()
+        events = []
+
+        def broken(event):
+            raise RuntimeError("boom")
+
+        bus.subscribe(broken)
+        bus.subscribe(events.append)
+        bus.publish(JOB_STATUS_EVENT, "J1", {})
+        self.assertEqual(len(events), 1)
+
+
+class TestHubForwarding(unittest.TestCase):
+
+    def setUp(self):
+        self._saved_token = job_events._hub_forwarder_token
+        job_events._hub_forwarder_token = None
+
+    def tearDown(self):
+        if job_events._hub_forwarder_token is not None:
+            job_events.job_event_bus.unsubscribe(job_events._hub_forwarder_token)
+        job_events._hub_forwarder_token = self._saved_token
+
+    def _forwarders(self):
+        return [callback for callback, _job_id in job_events.job_event_bus._subscribers.values()
+                if isinstance(callback, HubEventForwarder)]
+
+    def test_enable_hub_forwarding_subscribes_once(self):
+        """Repeated calls keep a single forwarder on the bus"""
+        job_events.enable_hub_forwarding('http://localhost:8000')
+        job_events.enable_hub_forwarding('http://localhost:8000')
+        self.assertEqual(len(self._forwarders()), 1)
+
+    def test_publisher_token_file_and_auth(self):
+        """The hub creates an owner-only token that forwarders present on connect"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'job_events.token')
+            with mock.patch.object(job_events, '_token_file', lambda: path), \
+                    mock.patch.dict(os.environ, {}, clear=False):
+                os.environ.pop('ASP_JOB_EVENTS_TOKEN', None)
+                self.assertIsNone(job_events.publisher_token())
+                token = job_events.ensure_publisher_token()
+                self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+                self.assertEqual(job_events.publisher_token(), token)
+                self.assertEqual(job_events.ensure_publisher_token(), token)
+
+        self.assertTrue(job_events.is_publisher_auth({'token': token}, token))
+        self.assertFalse(job_events.is_publisher_auth({'token': 'guess'}, token))
+        self.assertFalse(job_events.is_publisher_auth(None, token))
+        self.assertFalse(job_events.is_publisher_auth({'token': ''}, ''))
+
+    def test_job_processor_start_enables_forwarding(self):
+        """Starting the SBMJOB job processor subscribes the hub forwarder"""
+        try:
+            from functions import sbmjob
+        except ImportError as e:
+            self.skipTest(f"sbmjob dependencies not installed: {e}")
+        with mock.patch.object(sbmjob, '_job_processor_worker', lambda: None):
+            sbmjob._ensure_job_processor_running()
+        self.assertEqual(len(self._forwarders()), 1)
+
+
+class TestProcessReaper(unittest.TestCase):
+
+    def test_reaper_reports_exit_codes(self):
+        """Exit codes of several children are collected by the reaper"""
+        reaper = ProcessReaper()
+        results = {}
+        done = threading.Event()
+
+        def on_exit(pid, return_code):
+            results[pid] = return_code
+            if len(results) == 2:
+                done.set()
+
+        ok = subprocess.Popen([sys.executable, '-c', 'pass'])
+        failed = subprocess.Popen([sys.executable, '-c', 'import sys; sys.exit(3)'])
+        reaper.watch(ok, on_exit)
+        reaper.watch(failed, on_exit)
+
+        self.assertTrue(done.wait(10))
+        self.assertEqual(results[ok.pid], 0)
+        self.assertEqual(results[failed.pid], 3)
+        self.assertEqual(reaper.watched_count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite for the SQLite job store (connection reuse, WAL, batching)
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+
+# Add the parent directory to the path to import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from functions.job_store import JobStore
+
+SCHEMA = '''
+    CREATE TABLE jobs (
+        job_id TEXT PRIMARY KEY,
+        job_name TEXT NOT NULL,
+        status TEXT NOT NULL,
+        priority INTEGER DEFAULT 5,
+        submitted_time TIMESTAMP NOT NULL,
+        start_time TIMESTAMP,
+        end_time TIMESTAMP,
+        pid INTEGER,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE job_history (
+        history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id TEXT NOT NULL,
+        status TEXT NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        message TEXT
+    );
+    CREATE INDEX idx_jobs_status_priority ON jobs(status, priority, submitted_time);
+'''
+
+class TestJobStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = JobStore(os.path.join(self.temp_dir, 'jobs.db'))
+        self.store.connection().executescript(SCHEMA)
+        with self.store.transaction() as conn:
+            conn.executemany(
+                'INSERT INTO jobs (job_id, job_name, status, priority, submitted_time) VALUES (?, ?, ?, ?, ?)',
+                [
+                    ('J1', 'LOWPRI', 'PENDING', 9, '2025-01-01 10:00:00'),
+                    ('J2', 'HIGHPRI', 'PENDING', 1, '2025-01-01 10:05:00'),
+                    ('J3', 'OLDHIGH', 'PENDING', 1, '2025-01-01 09:00:00'),
+                    ('J4', 'RUNNING', 'RUNNING', 1, '2025-01-01 08:00:00'),
+                ])
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_connection_is_reused_per_thread(self):
+        """Same thread gets the same connection, other threads get their own"""
+        conn = self.store.connection()
+        self.assertIs(conn, self.store.connection())
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.store.connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(conn, other[0])
+
+    def test_wal_mode_enabled(self):
+        """Connections run in WAL mode with synchronous=NORMAL"""
+        conn = self.store.connection()
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)
+
+    def test_runnable_jobs_in_dispatch_order(self):
+        """Only PENDING jobs, by priority then submission time"""
+        rows = self.store.runnable_jobs(limit=10)
+        self.assertEqual([row['job_id'] for row in rows], ['J3', 'J2', 'J1'])
+        self.assertEqual(self.store.runnable_jobs()[0]['job_id'], 'J3')
+
+    def test_batched_status_updates(self):
+        """Batch writes all updates and history rows in one transaction"""
+        with self.store.batch() as batch:
+            batch.update_status('J1', 'CANCELLED', end_time='2025-01-01 11:00:00')
+            batch.update_status('J2', 'RUNNING', pid=1234)
+            self.assertEqual(len(batch), 2)
+
+        conn = self.store.connection()
+        statuses = dict(conn.execute('SELECT job_id, status FROM jobs').fetchall())
+        self.assertEqual(statuses['J1'], 'CANCELLED')
+        self.assertEqual(statuses['J2'], 'RUNNING')
+        self.assertEqual(conn.execute('SELECT pid FROM jobs WHERE job_id = ?', ('J2',)).fetchone()[0], 1234)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM job_history').fetchone()[0], 2)
+        self.assertEqual([row['job_id'] for row in self.store.runnable_jobs(limit=10)], ['J3'])
+
+    def test_update_keeps_unspecified_fields(self):
+        """Fields not passed to an update keep their stored values"""
+        self.store.update_statuses([('J4', 'RUNNING', {'pid': 42})])
+        self.store.update_statuses([('J4', 'COMPLETED', {'end_time': '2025-01-01 12:00:00'})])
+        row = self.store.connection().execute('SELECT * FROM jobs WHERE job_id = ?', ('J4',)).fetchone()
+        self.assertEqual(row['pid'], 42)
+        self.assertEqual(row['status'], 'COMPLETED')
+
+    def test_update_clears_fields_passed_as_none(self):
+        """Requeueing a job resets its start/end time and pid"""
+        with self.store.batch() as batch:
+            batch.update_status('J4', 'RUNNING', start_time='2025-01-01 11:00:00', pid=42)
+            batch.update_status('J4', 'ERROR', end_time='2025-01-01 11:05:00')
+            batch.update_status('J4', 'PENDING', start_time=None, end_time=None, pid=None)
+        row = self.store.connection().execute('SELECT * FROM jobs WHERE job_id = ?', ('J4',)).fetchone()
+        self.assertEqual(row['status'], 'PENDING')
+        self.assertIsNone(row['start_time'])
+        self.assertIsNone(row['end_time'])
+        self.assertIsNone(row['pid'])
+
+    def test_failed_transaction_rolls_back(self):
+        """An exception inside a transaction leaves no partial writes"""
+        with self.assertRaises(RuntimeError):
+            with self.store.transaction() as conn:
+                conn.execute("UPDATE jobs SET status = 'ERROR'")
+                raise RuntimeError("fail")
+        self.assertEqual(len(self.store.runnable_jobs(limit=10)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
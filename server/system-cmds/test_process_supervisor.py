@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite for the process-group supervisor
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to the path to import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from functions.process_supervisor import ProcessSupervisor, ProcessRecord, _process_children, _read_proc_stat
+
+# Shell that forks two grandchildren, like a JVM launcher script would
+TREE_COMMAND = ['/bin/sh', '-c', 'sleep 30 & sleep 30 & wait']
+
+
+class TestProcessSupervisor(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.supervisor = ProcessSupervisor(self.temp_dir)
+        self.processes = []
+
+    def tearDown(self):
+        for process in self.processes:
+            try:
+                os.killpg(process.pid, 9)
+            except OSError:
+                pass
+            process.wait()
+        shutil.rmtree(self.temp_dir)
+
+    def _spawn(self, **keys):
+        process = self.supervisor.spawn(TREE_COMMAND, program='PGM1', source='test', **keys)
+        self.processes.append(process)
+        return process
+
+    def test_records_are_indexed_by_terminal_and_job(self):
+        first = self._spawn(session_id='S1', terminal_id='T1')
+        second = self._spawn(session_id='S1', terminal_id='T2', job_id='J1')
+
+        self.assertEqual([r.pid for r in self.supervisor.records(terminal_id='T1')], [first.pid])
+        self.assertEqual([r.pid for r in self.supervisor.records(job_id='J1')], [second.pid])
+        self.assertEqual(len(self.supervisor.records(session_id='S1')), 2)
+        self.assertEqual(self.supervisor.records(session_id='OTHER'), [])
+
+    def test_usage_covers_process_tree(self):
+        process = self._spawn(terminal_id='T1')
+        time.sleep(0.2)
+        entry = self.supervisor.status(terminal_id='T1')[0]
+        self.assertEqual(entry['pid'], process.pid)
+        self.assertGreaterEqual(entry['processes'], 3)
+        self.assertGreater(entry['rss_bytes'], 0)
+
+    def test_cleanup_terminates_whole_group(self):
+        process = self._spawn(terminal_id='T1')
+        other = self._spawn(terminal_id='T2')
+        time.sleep(0.2)
+        grandchildren = _process_children(process.pid)
+        self.assertEqual(len(grandchildren), 2)
+
+        details = self.supervisor.cleanup(terminal_id='T1', timeout=2)
+
+        self.assertEqual([(d['pid'], d['status']) for d in details], [(process.pid, 'terminated')])
+        process.wait(timeout=2)
+        for pid in grandchildren:
+            fields = _read_proc_stat(pid)
+            self.assertTrue(fields is None or fields[0] in ('Z', 'X'))
+        self.assertIsNone(other.poll())
+        self.assertEqual([r.pid for r in self.supervisor.records()], [other.pid])
+
+    def test_cleanup_by_pid_and_without_jobs(self):
+        child = self._spawn(session_id='S1')
+        sibling = self._spawn(session_id='S1')
+        job = self._spawn(session_id='S1', job_id='J1')
+
+        details = self.supervisor.cleanup(pids=[child.pid], timeout=2)
+        self.assertEqual([d['pid'] for d in details], [child.pid])
+        self.assertIsNone(sibling.poll())
+
+        details = self.supervisor.cleanup(session_id='S1', include_jobs=False, timeout=2)
+        self.assertEqual([d['pid'] for d in details], [sibling.pid])
+        self.assertIsNone(job.poll())
+        self.assertEqual([r.pid for r in self.supervisor.records()], [job.pid])
+
+    def test_reused_pid_is_never_signalled(self):
+        """A record whose start time does not match the running PID is stale"""
+        stale = ProcessRecord(pid=os.getpid(), pgid=os.getpid(), start_ticks=1)
+        self.assertFalse(self.supervisor.is_alive(stale))
+        self.assertEqual(self.supervisor.terminate(stale), 'already_terminated')
+
+
+if __name__ == "__main__":
+    unittest.main()
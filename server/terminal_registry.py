@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Terminal Registry for the WebSocket Hub
+Indexed, thread-safe store of connected terminals and their outgoing queues
+
+TerminalRegistry holds the hub's routing state. Every entry is keyed by the
+Socket.IO (or workstation) session id and indexed by terminal id, user and
+workstation, so routing a message or finding a workstation's sessions is a
+dictionary lookup instead of a scan. With a shared state store (multi-worker
+mode) terminal routes are also published to the store, so a worker can route
+to terminals connected to another worker; the emit itself crosses workers
+through the Socket.IO message queue.
+
+TerminalOutbox gives every terminal a bounded FIFO of pending emits. Senders
+enqueue in O(1) and return; dispatcher threads drain the queues after a
+few-millisecond flush window, sending everything pending for a room as one
+'hub_batch' event. An update that supersedes the last pending one for the same
+key (e.g. the same terminal screen or broadcast map) replaces or merges into
+it instead of queueing. When a slow client lets its queue fill up, the oldest
+messages are dropped - SMED updates are versioned, so the client sees the gap
+and asks for a resync.
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_MAX_PENDING = 64
+DEFAULT_FLUSH_WINDOW = 0.005
+
+# Queue key for emits to every connected client, and the batched event name
+BROADCAST = '*'
+HUB_BATCH_EVENT = 'hub_batch'
+
+# Shared store namespace: terminal_id -> {'session_id', 'room'}
+TERMINAL_ROUTES_NAMESPACE = 'terminal_routes'
+
+
+class TerminalRegistry:
+    """Thread-safe terminal registry with terminal, user and workstation indexes"""
+
+    def __init__(self, store=None):
+        """
+        Args:
+            store: Shared StateStore for cross-worker routes (None: local only)
+        """
+        self.store = store
+        self._published: Dict[str, Dict[str, Any]] = {}  # routes this worker wrote
+        self._lock = threading.RLock()
+        self._sessions: Dict[str, Dict[str, Any]] = {}  # session_id -> terminal info
+        self._terminals: Dict[str, str] = {}  # terminal_id -> session_id
+        self._by_user: Dict[str, set] = {}
+        self._by_workstation: Dict[str, set] = {}
+
+    def register(self, session_id: str, info: Dict[str, Any], map_terminal: bool = True,
+                 replace_existing: bool = False) -> Optional[str]:
+        """
+        Add or replace the entry of a session
+
+        Args:
+            session_id: Socket.IO sid or workstation session id
+            info: Terminal info ('terminal_id', 'user', 'workstation', 'room', ...)
+            map_terminal: Route info['terminal_id'] to this session
+            replace_existing: Drop the entry of a session the terminal was mapped to
+
+        Returns:
+            str: Session the terminal id was mapped to before, if different
+        """
+        terminal_id = info.get('terminal_id')
+        with self._lock:
+            self._remove_entry(session_id)
+            self._sessions[session_id] = info
+            self._index(session_id, info)
+
+            previous = None
+            if map_terminal and terminal_id:
+                previous = self._terminals.get(terminal_id)
+                if previous is None and self.store is not None:
+                    previous = (self._remote_route(terminal_id) or {}).get('session_id')
+                if previous == session_id:
+                    previous = None
+                if previous and replace_existing:
+                    self._remove_entry(previous)
+                self._terminals[terminal_id] = session_id
+                self._publish(terminal_id, session_id, info.get('room'))
+            return previous
+
+    def unregister(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Remove a session and its terminal mapping
+
+        The terminal mapping is only removed while it still points to this
+        session, so a disconnect never unroutes a terminal that re-registered.
+
+        Returns:
+            dict: Removed terminal info or None
+        """
+        with self._lock:
+            info = self._remove_entry(session_id)
+            if info is None:
+                return None
+            terminal_id = info.get('terminal_id')
+            if terminal_id and self._terminals.get(terminal_id) == session_id:
+                del self._terminals[terminal_id]
+                self._unpublish(terminal_id)
+            return info
+
+    def update(self, session_id: str, **fields) -> bool:
+        """Update fields of a registered session (indexes follow user/workstation changes)"""
+        with self._lock:
+            info = self._sessions.get(session_id)
+            if info is None:
+                return False
+            self._unindex(session_id, info)
+            info.update(fields)
+            self._index(session_id, info)
+            return True
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Terminal info of a session"""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def session_for_terminal(self, terminal_id: str) -> Optional[str]:
+        """Session a terminal id is routed to (on this or another worker)"""
+        with self._lock:
+            session_id = self._terminals.get(terminal_id)
+        if session_id is None and self.store is not None:
+            session_id = (self._remote_route(terminal_id) or {}).get('session_id')
+        return session_id
+
+    def lookup_terminal(self, terminal_id: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Session id and terminal info for a terminal id
+
+        A terminal connected to another worker is returned with its published
+        route as info ({'terminal_id', 'room', 'remote': True}).
+        """
+        with self._lock:
+            session_id = self._terminals.get(terminal_id)
+            if session_id:
+                return session_id, self._sessions.get(session_id)
+        route = self._remote_route(terminal_id) if self.store is not None else None
+        if not route:
+            return None, None
+        return route['session_id'], {'terminal_id': terminal_id, 'room': route.get('room'), 'remote': True}
+
+    def sessions_for_user(self, user: str) -> List[str]:
+        """Sessions registered by a user"""
+        with self._lock:
+            return list(self._by_user.get(user, ()))
+
+    def sessions_for_workstation(self, workstation: str) -> List[str]:
+        """Sessions registered for a workstation"""
+        with self._lock:
+            return list(self._by_workstation.get(workstation, ()))
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Snapshot of (session_id, terminal info) pairs"""
+        with self._lock:
+            return list(self._sessions.items())
+
+    def session_ids(self) -> List[str]:
+        """Snapshot of registered session ids"""
+        with self._lock:
+            return list(self._sessions)
+
+    def terminal_mappings(self) -> Dict[str, str]:
+        """Snapshot of terminal_id -> session_id"""
+        with self._lock:
+            return dict(self._terminals)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, int]:
+        """Registry sizes"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'terminals': len(self._terminals),
+                'users': len(self._by_user),
+                'workstations': len(self._by_workstation)
+            }
+
+    def _remote_route(self, terminal_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.store.get(TERMINAL_ROUTES_NAMESPACE, terminal_id)
+        except Exception as e:
+            print(f"[WARN] Terminal route lookup failed for {terminal_id}: {e}")
+            return None
+
+    def _publish(self, terminal_id: str, session_id: str, room: Optional[str]):
+        if self.store is None:
+            return
+        route = {'session_id': session_id, 'room': room}
+        try:
+            self.store.set(TERMINAL_ROUTES_NAMESPACE, terminal_id, route)
+            self._published[terminal_id] = route
+        except Exception as e:
+            print(f"[WARN] Terminal route publish failed for {terminal_id}: {e}")
+
+    def _unpublish(self, terminal_id: str):
+        route = self._published.pop(terminal_id, None)
+        if self.store is None or route is None:
+            return
+        try:
+            # Another worker may own the route by now; only remove our own
+            self.store.delete_if(TERMINAL_ROUTES_NAMESPACE, terminal_id, route)
+        except Exception as e:
+            print(f"[WARN] Terminal route removal failed for {terminal_id}: {e}")
+
+    def _remove_entry(self, session_id: str) -> Optional[Dict[str, Any]]:
+        info = self._sessions.pop(session_id, None)
+        if info is not None:
+            self._unindex(session_id, info)
+        return info
+
+    def _index(self, session_id: str, info: Dict[str, Any]):
+        for index, key in ((self._by_user, info.get('user')),
+                           (self._by_workstation, info.get('workstation'))):
+            if key:
+                index.setdefault(key, set()).add(session_id)
+
+    def _unindex(self, session_id: str, info: Dict[str, Any]):
+        for index, key in ((self._by_user, info.get('user')),
+                           (self._by_workstation, info.get('workstation'))):
+            sessions = index.get(key)
+            if sessions is not None:
+                sessions.discard(session_id)
+                if not sessions:
+                    del index[key]
+
+
+class TerminalOutbox:
+    """Per-terminal bounded send queues with micro-batching, drained by dispatcher threads"""
+
+    def __init__(self, max_pending: int = DEFAULT_MAX_PENDING,
+                 flush_window: float = DEFAULT_FLUSH_WINDOW):
+        """
+        Args:
+            max_pending: Pending messages per terminal before the oldest is dropped
+            flush_window: Seconds a terminal's first pending message waits for
+                          more to batch with
+        """
+        self.max_pending = max_pending
+        self.flush_window = flush_window
+        self._queues: Dict[str, deque] = {}
+        self._ready: deque = deque()  # (due, terminal_id), each terminal at most once
+        self._scheduled: set = set()
+        self._cond = threading.Condition()
+        self._sent = 0
+        self._batches = 0
+        self._coalesced = 0
+        self._dropped = 0
+        self._errors = 0
+
+    def enqueue(self, terminal_id: str, room: Optional[str], event: str, payload: Any,
+                coalesce_key: Optional[str] = None,
+                merge: Optional[Callable[[Any, Any], Any]] = None) -> bool:
+        """
+        Queue an emit to a terminal's room
+
+        Args:
+            terminal_id: Queue key (BROADCAST for emits to every client)
+            room: Socket.IO room (None broadcasts)
+            event: Event name
+            payload: Event data
+            coalesce_key: Messages with the same event, room and key supersede
+                          the last pending one instead of queueing behind it
+            merge: merge(pending, new) -> combined payload, or None when the
+                   two cannot be combined; without merge the new one wins
+
+        Returns:
+            bool: False if an older pending message had to be dropped
+        """
+        with self._cond:
+            queue = self._queues.get(terminal_id)
+            if queue is None:
+                queue = self._queues[terminal_id] = deque()
+
+            if coalesce_key is not None and queue:
+                last_room, last_event, last_payload, last_key = queue[-1]
+                if (last_room, last_event, last_key) == (room, event, coalesce_key):
+                    combined = merge(last_payload, payload) if merge else payload
+                    if combined is not None:
+                        queue[-1] = (room, event, combined, coalesce_key)
+                        self._coalesced += 1
+                        return True
+
+            overflow = len(queue) >= self.max_pending
+            if overflow:
+                queue.popleft()
+                self._dropped += 1
+            queue.append((room, event, payload, coalesce_key))
+            if terminal_id not in self._scheduled:
+                self._scheduled.add(terminal_id)
+                self._ready.append((time.monotonic() + self.flush_window, terminal_id))
+                self._cond.notify()
+            return not overflow
+
+    def discard(self, terminal_id: str):
+        """Drop pending messages of a terminal (disconnect)"""
+        with self._cond:
+            queue = self._queues.get(terminal_id)
+            if queue is not None:
+                self._dropped += len(queue)
+                queue.clear()
+
+    def drain_once(self, send: Callable[[str, Optional[str], Any], None],
+                   timeout: Optional[float] = None) -> int:
+        """
+        Send all pending messages of the next ready terminal
+
+        Consecutive messages to the same room go out as one 'hub_batch'
+        event ({'messages': [{'event', 'data'}, ...]}); a single message is
+        sent as its own event.
+
+        Args:
+            send: send(event, room, payload)
+            timeout: Seconds to wait for a ready terminal (None waits forever)
+
+        Returns:
+            int: Number of messages sent
+        """
+        with self._cond:
+            if not self._ready and not self._cond.wait_for(lambda: self._ready, timeout):
+                return 0
+            due, terminal_id = self._ready[0]
+        # Let the flush window collect more messages (FIFO: due times only grow)
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        with self._cond:
+            if not self._ready or self._ready[0][1] != terminal_id:
+                return 0  # taken by another dispatcher
+            self._ready.popleft()
+            queue = self._queues.get(terminal_id)
+            batch = list(queue) if queue else []
+            if queue is not None:
+                queue.clear()
+
+        sent = 0
+        emits = 0
+        for room, messages in _group_by_room(batch):
+            try:
+                if len(messages) == 1:
+                    send(messages[0][0], room, messages[0][1])
+                else:
+                    send(HUB_BATCH_EVENT, room, {
+                        'messages': [{'event': event, 'data': payload} for event, payload in messages]
+                    })
+                sent += len(messages)
+                emits += 1
+            except Exception as e:
+                self._errors += 1
+                print(f"[ERROR] Terminal outbox send to {terminal_id} failed: {e}")
+
+        with self._cond:
+            self._sent += sent
+            self._batches += emits
+            queue = self._queues.get(terminal_id)
+            if queue:
+                # More arrived while sending: stay scheduled, keep FIFO order
+                self._ready.append((time.monotonic() + self.flush_window, terminal_id))
+                self._cond.notify()
+            else:
+                self._scheduled.discard(terminal_id)
+                self._queues.pop(terminal_id, None)
+        return sent
+
+    def run(self, send: Callable[[str, Optional[str], Any], None]):
+        """Dispatcher loop (run in a background task)"""
+        while True:
+            self.drain_once(send)
+
+    def stats(self) -> Dict[str, int]:
+        """Queue depth and send/coalesce/drop counters"""
+        with self._cond:
+            return {
+                'pending': sum(len(queue) for queue in self._queues.values()),
+                'ready_terminals': len(self._ready),
+                'sent': self._sent,
+                'emits': self._batches,
+                'coalesced': self._coalesced,
+                'dropped': self._dropped,
+                'errors': self._errors,
+                'max_pending': self.max_pending,
+                'flush_window': self.flush_window
+            }
+
+
+def _group_by_room(batch: List[tuple]) -> List[Tuple[Optional[str], List[Tuple[str, Any]]]]:
+    """Split queued (room, event, payload, key) entries into runs per room"""
+    groups = []
+    for room, event, payload, _ in batch:
+        if groups and groups[-1][0] == room:
+            groups[-1][1].append((event, payload))
+        else:
+            groups.append((room, [(event, payload)]))
+    return groups
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the indexed execution log store, its disk segments and file tailing
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from log_store import ExecutionLogStore, read_from_offset, tail_file
+
+
+def test_ring_evicts_oldest_and_keeps_indexes_consistent():
+    store = ExecutionLogStore(capacity=4)
+    for i in range(6):
+        store.append('ERROR' if i % 2 else 'info', f'SRC{i % 3}', f'message {i}', {'terminal_id': f'T{i % 2}'})
+
+    assert [r['message'] for r in store.query()] == ['message 2', 'message 3', 'message 4', 'message 5']
+    assert [r['message'] for r in store.query(level='error')] == ['message 3', 'message 5']
+    assert [r['message'] for r in store.query(terminal_id='T0', source='SRC1')] == ['message 4']
+    assert [r['message'] for r in store.query(search='MESSAGE', limit=2)] == ['message 4', 'message 5']
+    stats = store.stats()
+    assert stats['records'] == 4 and stats['levels'] == {'INFO': 2, 'ERROR': 2}
+
+
+def test_time_range_reads_segments_beyond_the_ring():
+    with tempfile.TemporaryDirectory() as logs_dir:
+        store = ExecutionLogStore(capacity=2, segment_dir=logs_dir, segment_max_bytes=200)
+        start = time.time() - 100
+        for i in range(5):
+            store.append('INFO', 'CALL', f'step {i}', timestamp=start + i * 10)
+            store.flush()
+        assert len(store.segments()) > 1  # rotated by size
+
+        assert [r['message'] for r in store.query(since=start + 5)] == ['step 1', 'step 2', 'step 3', 'step 4']
+        assert [r['message'] for r in store.query(since=start, until=start + 25)] == ['step 0', 'step 1', 'step 2']
+        assert [r['message'] for r in store.query(since=start, limit=2)] == ['step 3', 'step 4']
+
+
+def test_until_bounds_segment_reads_and_is_inclusive():
+    with tempfile.TemporaryDirectory() as logs_dir:
+        store = ExecutionLogStore(capacity=5, segment_dir=logs_dir)
+        for i in range(20):
+            store.append('INFO', 'CALL', f'm{i}', timestamp=1000 + i)
+            store.flush()
+
+        # The ring holds m15..m19; the range ends well before it
+        assert [r['message'] for r in store.query(since=1000, until=1005, limit=0)] == \
+            [f'm{i}' for i in range(6)]
+        # Disk and ring agree on the inclusive end
+        assert [r['message'] for r in store.query(since=1013, until=1016, limit=0)] == \
+            ['m13', 'm14', 'm15', 'm16']
+        assert [r['message'] for r in store.query(since=1000, limit=0)] == [f'm{i}' for i in range(20)]
+
+
+def test_segment_count_is_bounded():
+    with tempfile.TemporaryDirectory() as logs_dir:
+        store = ExecutionLogStore(capacity=10, segment_dir=logs_dir, segment_max_bytes=1, max_segments=3)
+        for i in range(6):
+            store.append('INFO', 'CALL', f'step {i}')
+            store.flush()
+        assert len(store.segments()) == 3
+
+
+def test_tail_and_follow_without_reading_whole_file():
+    with tempfile.TemporaryDirectory() as logs_dir:
+        path = os.path.join(logs_dir, 'api_server.log')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(f'line {i}\n' for i in range(1000))
+
+        lines, size = tail_file(path, 3, block_size=16)
+        assert lines == ['line 997\n', 'line 998\n', 'line 999\n']
+        assert len(tail_file(path, 0)[0]) == 1000
+
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('line 1000\n')
+        content, next_offset = read_from_offset(path, size)
+        assert content == 'line 1000\n' and next_offset == size + len('line 1000\n')
+
+
+if __name__ == "__main__":
+    test_ring_evicts_oldest_and_keeps_indexes_consistent()
+    test_time_range_reads_segments_beyond_the_ring()
+    test_until_bounds_segment_reads_and_is_inclusive()
+    test_segment_count_is_bounded()
+    test_tail_and_follow_without_reading_whole_file()
+    print("All log store tests passed")
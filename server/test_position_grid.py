@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test the buffered, full-width aware position grid renderer
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from position_grid import (PositionGridRenderer, PositionGridRendererPool, display_width,
+                           fit_to_width)
+from bench_position_grid import legacy_render, screen_200_fields
+
+
+def test_ascii_render_matches_legacy_renderer():
+    position_map, ascii_data, _ = screen_200_fields()
+    assert PositionGridRenderer().render(position_map, ascii_data) == legacy_render(position_map, ascii_data)
+
+
+def test_full_width_values_take_two_columns():
+    assert display_width('社員A') == 5
+    assert fit_to_width('社員', 5) == ['社', '', '員', '', ' ']
+    # A full-width character that does not fit is replaced by padding
+    assert fit_to_width('社員', 3) == ['社', '', ' ']
+    assert fit_to_width('ｱｲｳ', 2) == ['ｱ', 'ｲ']  # half-width katakana
+
+    rendered = PositionGridRenderer().render([{'row': 1, 'col': 10, 'length': 6}], ['名前ABC'])
+    line = rendered['grid'][1]
+    assert sum(display_width(char) for char in line) == 80
+    assert line[10:14] == '名前AB'
+    assert rendered['fields'][0]['rendered_value'] == '名前AB'
+
+
+def test_overwriting_half_of_wide_character():
+    renderer = PositionGridRenderer()
+    position_map = [{'row': 0, 'col': 0, 'length': 4}, {'row': 0, 'col': 1, 'length': 2}]
+    line = renderer.render(position_map, ['漢字', 'XY'])['grid'][0]
+    # 漢 lost its right half and 字 its left half
+    assert line[:4] == ' XY '
+    assert sum(display_width(char) for char in line) == 80
+
+
+def test_buffers_are_reused_and_reset():
+    pool = PositionGridRendererPool(max_renderers=2)
+    renderer = pool.get('T1')
+    first = pool.render('T1', [{'row': 0, 'col': 0, 'length': 5}], ['HELLO'])
+    second = pool.render('T1', [{'row': 2, 'col': 0, 'length': 2}], ['OK'])
+    assert pool.get('T1') is renderer
+    assert first['grid'][0].startswith('HELLO')
+    assert second['grid'][0] == ' ' * 80 and second['grid'][2].startswith('OK')
+
+    pool.get('T2')
+    pool.get('T3')
+    assert pool.stats()['renderers'] == 2
+    assert pool.get('T1') is not renderer  # least recently used was evicted
+
+
+if __name__ == "__main__":
+    test_ascii_render_matches_legacy_renderer()
+    test_full_width_values_take_two_columns()
+    test_overwriting_half_of_wide_character()
+    test_buffers_are_reused_and_reset()
+    print("All position grid tests passed")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test compact wire formats for position-based SMED payloads
+"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from position_wire_format import (MSGPACK_AVAILABLE, WIRE_FORMAT_JSON, WIRE_FORMAT_PACKED,
+                                  encode_position_payload, map_definition, map_definition_id,
+                                  negotiate_wire_format, supported_wire_formats, unpack_records)
+
+POSITION_MAP = [{'row': r, 'col': c * 10, 'length': 8} for r in range(20) for c in range(8)]
+
+
+def _rendered(values):
+    fields = [dict(item, index=i, value=value, rendered_value=value.ljust(item['length'])[:item['length']])
+              for i, (item, value) in enumerate(zip(POSITION_MAP, values))]
+    return {'grid': [' ' * 80] * 24, 'fields': fields, 'rows': 24, 'cols': 80}
+
+
+def test_negotiation_falls_back_to_json():
+    enabled = ['packed', 'msgpack']
+    assert negotiate_wire_format(None, enabled) == WIRE_FORMAT_JSON
+    assert negotiate_wire_format(['cbor', 'packed'], enabled) == WIRE_FORMAT_PACKED
+    assert negotiate_wire_format('cbor', enabled) == WIRE_FORMAT_JSON
+    expected = 'msgpack' if MSGPACK_AVAILABLE else WIRE_FORMAT_PACKED
+    assert negotiate_wire_format(['msgpack', 'packed'], enabled) == expected
+
+
+def test_compact_formats_are_off_unless_enabled():
+    """Clients decode JSON only, so nothing else is negotiated by default"""
+    assert supported_wire_formats([]) == [WIRE_FORMAT_JSON]
+    assert negotiate_wire_format(['packed', 'json'], []) == WIRE_FORMAT_JSON
+
+
+def test_map_definition_round_trip():
+    definition = map_definition('GRID', POSITION_MAP)
+    assert definition['map_id'] == map_definition_id(list(POSITION_MAP))
+    assert definition['columns'] == ['row', 'col', 'length']
+    assert unpack_records(definition) == POSITION_MAP
+
+
+def test_packed_render_drops_grid_and_repeated_keys():
+    values = [f'V{i:03d}' for i in range(len(POSITION_MAP))]
+    payload = {'type': 'position_render_update', 'map_name': 'GRID', **_rendered(values)}
+    map_id = map_definition_id(POSITION_MAP)
+
+    assert encode_position_payload(payload, WIRE_FORMAT_JSON) is payload
+    packed = encode_position_payload(payload, WIRE_FORMAT_PACKED, map_id)
+    assert packed['map_id'] == map_id
+    assert packed['values'] == [field['rendered_value'] for field in payload['fields']]
+    assert 'grid' not in packed and 'fields' not in packed
+    assert 'grid' in payload  # the JSON payload is not modified
+
+    json_size = len(json.dumps(payload))
+    packed_size = len(json.dumps(packed))
+    assert packed_size * 4 < json_size, (packed_size, json_size)
+
+
+def test_packed_updates_and_display():
+    updates = [{'row': 1, 'col': 2, 'length': 3, 'value': 'ABC'}]
+    packed = encode_position_payload({'event_type': 'position_smed_update', 'updates': updates},
+                                     WIRE_FORMAT_PACKED)
+    assert packed['updates'] == [[1, 2, 3, 'ABC']]
+
+    display = {'event_type': 'position_smed_display', 'map_data': POSITION_MAP, 'field_data': ['A']}
+    packed = encode_position_payload(display, WIRE_FORMAT_PACKED, 'abc123')
+    assert packed['map_id'] == 'abc123' and 'map_data' not in packed
+    assert packed['field_data'] == ['A']
+
+
+if __name__ == "__main__":
+    test_negotiation_falls_back_to_json()
+    test_compact_formats_are_off_unless_enabled()
+    test_map_definition_round_trip()
+    test_packed_render_drops_grid_and_repeated_keys()
+    test_packed_updates_and_display()
+    print("All position wire format tests passed")
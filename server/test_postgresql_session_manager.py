@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test pooling, prepared statements, bulk logout and the read cache of the
+PostgreSQL session manager against an in-memory fake database
+"""
+
+import os
+import re
+import sys
+import threading
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+pytest.importorskip('psycopg2')
+
+import postgresql_session_manager as psm
+from postgresql_session_manager import PREPARED_STATEMENTS, PostgreSQLSessionManager
+
+COLUMNS = ('wsname', 'username', 'conn_time', 'status', 'terminal_id', 'session_id', 'display_mode', 'encoding')
+
+
+class FakeDatabase:
+    """asp_terminal rows by wsname plus counters"""
+
+    def __init__(self):
+        self.rows = {}
+        self.reads_by_ws = 0
+
+
+class FakeCursor:
+    def __init__(self, conn, dict_rows):
+        self.conn = conn
+        self.db = conn.db
+        self.dict_rows = dict_rows
+        self.result = []
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _rows(self, rows):
+        self.result = [dict(row) if self.dict_rows else tuple(row.values()) for row in rows]
+        self.rowcount = len(rows)
+
+    def execute(self, sql, params=()):
+        sql = ' '.join(sql.split())
+        prepare = re.match(r'PREPARE (\w+) AS', sql)
+        if prepare:
+            if prepare.group(1) in self.conn.prepared:
+                raise RuntimeError(f'prepared statement "{prepare.group(1)}" already exists')
+            self.conn.prepared.add(prepare.group(1))
+            return
+        if sql.startswith('SELECT EXISTS'):
+            self.result = [(True,)]
+            return
+        if sql.startswith('SET '):
+            return
+        name = re.match(r'EXECUTE (\w+)', sql).group(1)
+        assert name in self.conn.prepared, f'{name} not prepared on this connection'
+        rows = self.db.rows
+        if name == 'asp_upsert_session':
+            wsname, username, conn_time, terminal_id, session_id, display_mode, encoding = params
+            rows[wsname] = dict(zip(COLUMNS, (wsname, username, conn_time, '1', terminal_id, session_id,
+                                              display_mode, encoding)))
+            self.rowcount = 1
+        elif name == 'asp_session_by_ws':
+            self.db.reads_by_ws += 1
+            self._rows([rows[params[0]]] if params[0] in rows else [])
+        elif name == 'asp_sessions_by_ws_list':
+            self._rows([rows[ws] for ws in sorted(params[0]) if ws in rows])
+        elif name == 'asp_wsnames_in_list':
+            self._rows([{'wsname': ws} for ws in params[0] if ws in rows])
+        elif name == 'asp_set_status_by_ws':
+            found = [rows[params[0]]] if params[0] in rows else []
+            for row in found:
+                row['status'] = params[1]
+            self.rowcount = len(found)
+        elif name == 'asp_bulk_logout':
+            found = [rows[ws] for ws in params[0] if ws in rows and rows[ws]['status'] != '0']
+            for row in found:
+                row['status'] = '0'
+            self.result = [(row['wsname'],) for row in found]
+        else:
+            raise AssertionError(f'unexpected statement {sql}')
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return list(self.result)
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+        self.prepared = set()
+        self.closed = 0
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self, cursor_factory is not None)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class FakePool:
+    """ThreadedConnectionPool stand-in that fails like the real one past maxconn"""
+
+    instances = []
+
+    def __init__(self, minconn, maxconn, **db_config):
+        self.minconn, self.maxconn = minconn, maxconn
+        self.closed = False
+        self.db = FakeDatabase()
+        self._pool, self._used = [], {}
+        self.connections = []
+        self.lock = threading.Lock()
+        FakePool.instances.append(self)
+
+    def getconn(self):
+        with self.lock:
+            if self._pool:
+                conn = self._pool.pop()
+            elif len(self._used) >= self.maxconn:
+                raise psm.psycopg2.pool.PoolError('connection pool exhausted')
+            else:
+                conn = FakeConnection(self.db)
+                self.connections.append(conn)
+            self._used[id(conn)] = conn
+            return conn
+
+    def putconn(self, conn, close=False):
+        with self.lock:
+            del self._used[id(conn)]
+            if not close:
+                self._pool.append(conn)
+
+
+@pytest.fixture
+def fake_pool():
+    with mock.patch.object(psm.psycopg2.pool, 'ThreadedConnectionPool', FakePool), \
+            mock.patch.dict(psm._shared_pools, clear=True):
+        FakePool.instances = []
+        yield
+
+
+def make_manager(**kwargs):
+    return PostgreSQLSessionManager(db_config={'host': 'fake', 'database': 'ofasp'}, **kwargs)
+
+
+def test_managers_share_one_pool_and_prepare_each_connection_once(fake_pool):
+    first = make_manager(pool_max=2)
+    second = make_manager(pool_max=2)
+    assert first.pool is second.pool and len(FakePool.instances) == 1
+    connections = FakePool.instances[0].connections
+
+    first.create_session('WS01', 'alice')
+    assert second.get_session_by_workstation('WS01', use_cache=False)['username'] == 'alice'
+    # The connection the first manager prepared is reused without a second PREPARE
+    assert len(connections) == 1
+    assert connections[0].prepared == set(PREPARED_STATEMENTS)
+    assert first.get_pool_status()['pool_in_use'] == 0
+
+
+def test_checkouts_queue_at_maxconn_across_managers(fake_pool):
+    first = make_manager(pool_max=1, pool_timeout=0.05)
+    second = make_manager(pool_max=1, pool_timeout=0.05)
+    with first._get_connection():
+        assert second.get_pool_status()['pool_available'] == 0
+        # Waits on the shared semaphore and times out instead of going past maxconn
+        with pytest.raises(psm.psycopg2.pool.PoolError, match='within'):
+            with second._get_connection():
+                pass
+    with second._get_connection():
+        pass
+    assert len(FakePool.instances[0].connections) == 1
+
+
+def test_bulk_logout_classifies_workstations(fake_pool):
+    manager = make_manager()
+    for wsname in ('WS01', 'WS02', 'WS03'):
+        manager.create_session(wsname, 'bob')
+    manager.update_session_status('WS03', '0')
+
+    results = manager.bulk_logout_sessions(['WS01', 'WS02', 'WS03', 'NOPE'])
+    assert results['success'] == ['WS01', 'WS02']
+    assert results['failed'] == [{'wsname': 'WS03', 'error': 'Session already inactive'},
+                                 {'wsname': 'NOPE', 'error': 'Session not found'}]
+    assert manager.bulk_logout_sessions([])['total_processed'] == 0
+
+
+def test_read_cache_is_invalidated_by_writes(fake_pool):
+    manager = make_manager(cache_ttl=60)
+    db = FakePool.instances[0].db
+    manager.create_session('WS01', 'carol')
+    assert manager.get_session_by_workstation('WS01')['status'] == '1'
+    assert manager.get_session_by_workstation('WS01')['status'] == '1'
+    assert db.reads_by_ws == 1  # second read served from the cache
+
+    manager.logout_session(wsname='WS01')
+    assert manager.get_session_by_workstation('WS01')['status'] == '0'
+    manager.bulk_logout_sessions(['WS01'])
+    manager.create_session('WS01', 'dave')
+    assert manager.get_session_by_workstation('WS01')['username'] == 'dave'
+    assert db.reads_by_ws == 3
+    assert manager.get_pool_status()['cached_sessions'] == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test write-behind session persistence and crash recovery
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from session_store import WriteBehindSessionStore
+
+
+class _Tables:
+    """Minimal stand-in for the session manager's in-memory tables"""
+
+    def __init__(self, session_file):
+        self.lock = threading.RLock()
+        self.sessions = {}
+        self.workstation_sessions = {}
+        self.user_sessions = {}
+        self.store = WriteBehindSessionStore(session_file, self.lock, self.tables, flush_interval=60)
+        data = self.store.load()
+        self.sessions = data['sessions']
+        self.workstation_sessions = data['workstation_sessions']
+        self.user_sessions = data['user_sessions']
+
+    def tables(self):
+        return {
+            'sessions': self.sessions,
+            'workstation_sessions': self.workstation_sessions,
+            'user_sessions': self.user_sessions
+        }
+
+    def login(self, session_id, wsname):
+        with self.lock:
+            self.sessions[session_id] = {'wsname': wsname, 'status': 'ON', 'last_activity': 't0'}
+            self.workstation_sessions[wsname] = session_id
+            self.store.log_set('sessions', session_id, self.sessions[session_id])
+            self.store.log_set('workstation_sessions', wsname, session_id)
+
+
+def _session_file():
+    directory = tempfile.mkdtemp()
+    return directory, os.path.join(directory, 'workstation_sessions.json')
+
+
+def test_activity_touch_does_no_io():
+    directory, path = _session_file()
+    try:
+        tables = _Tables(path)
+        tables.login('S1', 'WS01')
+        log_size = os.path.getsize(tables.store.log_file)
+        for i in range(100):
+            tables.sessions['S1']['last_activity'] = f't{i}'
+            tables.store.mark_dirty()
+        assert os.path.getsize(tables.store.log_file) == log_size
+        assert not os.path.exists(path)
+
+        assert tables.store.flush() is True
+        assert tables.store.flush() is False  # nothing changed since
+        with open(path, encoding='utf-8') as f:
+            assert json.load(f)['sessions']['S1']['last_activity'] == 't99'
+        assert os.path.getsize(tables.store.log_file) == 0
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_structural_changes_survive_crash():
+    directory, path = _session_file()
+    try:
+        tables = _Tables(path)
+        tables.login('S1', 'WS01')
+        tables.store.flush()
+        tables.login('S2', 'WS02')
+        with tables.lock:
+            del tables.sessions['S1']
+            tables.store.log_delete('sessions', 'S1')
+        # Crash: no flush, and a torn half-written entry at the end of the log
+        tables.store._log.write('{"op": "set", "tab')
+        tables.store._log.flush()
+
+        recovered = _Tables(path)
+        assert set(recovered.sessions) == {'S2'}
+        assert recovered.workstation_sessions == {'WS01': 'S1', 'WS02': 'S2'}
+        assert recovered.store.stats()['dirty'] is True
+
+        # New entries continue after the replayed sequence
+        recovered.login('S3', 'WS03')
+        recovered.store.flush()
+        assert set(_Tables(path).sessions) == {'S2', 'S3'}
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_stop_writes_final_snapshot():
+    directory, path = _session_file()
+    try:
+        tables = _Tables(path)
+        tables.store.start()
+        tables.login('S1', 'WS01')
+        tables.store.stop()
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        assert data['workstation_sessions'] == {'WS01': 'S1'}
+        assert data['log_seq'] == 2
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    test_activity_touch_does_no_io()
+    test_structural_changes_survive_crash()
+    test_stop_writes_final_snapshot()
+    print("All session store tests passed")
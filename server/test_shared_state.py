@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test shared state stores and cross-worker terminal routing
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from shared_state import (LocalStateStore, SharedMap, StateStore, create_state_store,
+                          start_state_broker)
+from terminal_registry import TerminalRegistry
+
+
+def test_shared_map_dict_semantics():
+    maps = SharedMap(LocalStateStore(), 'position_maps')
+    maps['MENU'] = {'map': [{'row': 1, 'col': 1, 'length': 4}]}
+    assert 'MENU' in maps and len(maps) == 1
+    assert maps['MENU']['map'][0]['length'] == 4
+    assert [name for name, _ in maps.items()] == ['MENU']
+    del maps['MENU']
+    assert 'MENU' not in maps
+    try:
+        maps['MENU']
+        assert False, 'KeyError expected'
+    except KeyError:
+        pass
+
+
+def test_state_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        StateStore()
+
+
+def test_broker_store_is_shared_between_clients():
+    """Two workers connected to a broker process see each other's writes"""
+    broker = start_state_broker()
+    try:
+        host, port = broker.address
+        worker_a = create_state_store(f'broker://{host}:{port}')
+        worker_b = create_state_store(f'broker://{host}:{port}')
+        assert worker_a.shared
+
+        SharedMap(worker_a, 'position_maps')['MENU'] = {'map': []}
+        assert SharedMap(worker_b, 'position_maps')['MENU'] == {'map': []}
+
+        assert not worker_b.delete_if('position_maps', 'MENU', {'map': [1]})
+        assert worker_b.delete_if('position_maps', 'MENU', {'map': []})
+        assert worker_a.count('position_maps') == 0
+
+        assert worker_a.set_if('versions', 'T1', 1)
+        assert not worker_b.set_if('versions', 'T1', 1)  # no longer absent
+        assert worker_b.set_if('versions', 'T1', 2, 1)
+        assert not worker_a.set_if('versions', 'T1', 3, 1)
+        assert worker_a.get('versions', 'T1') == 2
+    finally:
+        broker.shutdown()
+
+
+def test_terminal_routes_cross_workers():
+    store = LocalStateStore()
+    worker_a = TerminalRegistry(store=store)
+    worker_b = TerminalRegistry(store=store)
+
+    worker_a.register('sid1', {'terminal_id': 'T1', 'room': 'terminal_T1'})
+    assert worker_b.session_for_terminal('T1') == 'sid1'
+    session_id, info = worker_b.lookup_terminal('T1')
+    assert (session_id, info['room'], info['remote']) == ('sid1', 'terminal_T1', True)
+
+    # Terminal reconnects to worker B; A's late disconnect keeps B's route
+    assert worker_b.register('sid2', {'terminal_id': 'T1', 'room': 'terminal_T1'}) == 'sid1'
+    worker_a.unregister('sid1')
+    assert worker_a.session_for_terminal('T1') == 'sid2'
+
+    worker_b.unregister('sid2')
+    assert worker_a.session_for_terminal('T1') is None
+
+
+if __name__ == "__main__":
+    test_shared_map_dict_semantics()
+    test_state_store_interface_is_abstract()
+    test_broker_store_is_shared_between_clients()
+    test_terminal_routes_cross_workers()
+    print("All shared state tests passed")
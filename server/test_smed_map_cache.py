@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test SMED map cache hit/invalidation behaviour
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from smed_map_cache import SmedMapCache, text_body
+
+MAP_CONTENT = 'MAPNAME MAINMENU\nITEM TITLE POS=(1,10) PROMPT="メインメニュー"\n'
+
+
+def _write_map(content):
+    fd, path = tempfile.mkstemp(suffix='.smed')
+    with os.fdopen(fd, 'w', encoding='shift_jis') as f:
+        f.write(content)
+    return path
+
+
+def _counting_loader(calls):
+    def loader(path):
+        calls.append(path)
+        with open(path, 'r', encoding='shift_jis') as f:
+            return {'content': f.read()}
+    return loader
+
+
+def test_cached_map_is_not_reloaded():
+    """Repeated requests within the stat interval reuse the parsed map"""
+    path = _write_map(MAP_CONTENT)
+    calls = []
+    cache = SmedMapCache(stat_interval=60)
+    try:
+        first = cache.get(path, 'parsed', _counting_loader(calls))
+        second = cache.get(path, 'parsed', _counting_loader(calls))
+        assert first is second
+        assert len(calls) == 1
+        assert json.loads(first.body.decode('utf-8'))['content'] == MAP_CONTENT
+        assert cache.stats()['hits'] == 1
+    finally:
+        os.remove(path)
+
+
+def test_changed_map_is_reloaded_after_stat():
+    """A modified file is detected by mtime/size once the entry is re-stat'ed"""
+    path = _write_map(MAP_CONTENT)
+    calls = []
+    cache = SmedMapCache(stat_interval=0)
+    try:
+        cache.get(path, 'parsed', _counting_loader(calls))
+        cache.get(path, 'parsed', _counting_loader(calls))
+        assert len(calls) == 1
+
+        with open(path, 'a', encoding='shift_jis') as f:
+            f.write('ITEM USERID POS=(5,20) LEN=8\n')
+        entry = cache.get(path, 'parsed', _counting_loader(calls))
+        assert len(calls) == 2
+        assert 'USERID' in entry.value['content']
+    finally:
+        os.remove(path)
+
+
+def test_invalidate_evicts_all_kinds():
+    """Explicit eviction (as done by /api/smed/save) drops every representation"""
+    path = _write_map(MAP_CONTENT)
+    calls = []
+    cache = SmedMapCache(stat_interval=60)
+    try:
+        cache.get(path, 'parsed', _counting_loader(calls))
+        cache.get(path, 'content', lambda p: MAP_CONTENT, text_body)
+        assert cache.invalidate(path) == 2
+        cache.get(path, 'parsed', _counting_loader(calls))
+        assert len(calls) == 2
+    finally:
+        os.remove(path)
+
+
+def test_lru_bound_and_failed_loads():
+    """Failed loads are not cached and the cache never exceeds max_entries"""
+    path = _write_map(MAP_CONTENT)
+    cache = SmedMapCache(max_entries=2, stat_interval=60)
+    try:
+        assert cache.get(path, 'parsed', lambda p: None) is None
+        assert cache.stats()['entries'] == 0
+        for kind in ('a', 'b', 'c'):
+            cache.get(path, kind, lambda p: {'kind': kind})
+        assert cache.stats()['entries'] == 2
+        assert cache.get('/nonexistent/map.smed', 'parsed', lambda p: {}) is None
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    test_cached_map_is_not_reloaded()
+    test_changed_map_is_reloaded_after_stat()
+    test_invalidate_evicts_all_kinds()
+    test_lru_bound_and_failed_loads()
+    print("All SMED map cache tests passed")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test delta encoding of SMED screen updates
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from shared_state import LocalStateStore
+from smed_screen_state import ScreenStateTracker, merge_screen_messages, position_update_key
+
+MENU_FIELDS = {'TITLE': 'MAIN MENU', 'USERID': '', 'MSG': ''}
+
+
+def test_first_display_is_full_snapshot():
+    tracker = ScreenStateTracker()
+    update = tracker.update('T1', 'MAINMENU', MENU_FIELDS)
+    message = update.to_message()
+    assert message['update_mode'] == 'full'
+    assert message['version'] == 1
+    assert message['fields'] == MENU_FIELDS
+    assert 'base_version' not in message
+
+
+def test_refresh_sends_only_changed_fields():
+    tracker = ScreenStateTracker()
+    tracker.update('T1', 'MAINMENU', MENU_FIELDS)
+    update = tracker.update('T1', 'MAINMENU', dict(MENU_FIELDS, MSG='INVALID USER'))
+    message = update.to_message()
+    assert message['update_mode'] == 'delta'
+    assert message['fields'] == {'MSG': 'INVALID USER'}
+    assert message['base_version'] == 1
+    assert message['version'] == 2
+    assert message['removed_fields'] == []
+
+    fields = {'TITLE': 'MAIN MENU', 'MSG': 'INVALID USER'}
+    update = tracker.update('T1', 'MAINMENU', fields)
+    assert update.fields == {}
+    assert update.removed_fields == ['USERID']
+
+
+def test_map_change_reset_and_resync():
+    tracker = ScreenStateTracker()
+    tracker.update('T1', 'MAINMENU', MENU_FIELDS)
+    assert tracker.update('T1', 'BROWSE', {'ROW1': 'A'}).mode == 'full'
+
+    # Snapshot for a client that missed a version: current state, same version
+    snapshot = tracker.snapshot('T1')
+    assert snapshot.mode == 'full'
+    assert snapshot.version == 2
+    assert snapshot.fields == {'ROW1': 'A'}
+    assert tracker.update('T1', 'BROWSE', {'ROW1': 'B'}).base_version == 2
+
+    tracker.reset('T1')
+    assert tracker.snapshot('T1') is None
+    assert tracker.update('T1', 'BROWSE', {'ROW1': 'B'}).mode == 'full'
+
+
+def test_terminals_are_independent():
+    tracker = ScreenStateTracker(max_screens=2)
+    tracker.update('T1', 'MAINMENU', MENU_FIELDS)
+    tracker.update('T2', 'MAINMENU', MENU_FIELDS)
+    assert tracker.update('T1', 'MAINMENU', MENU_FIELDS).mode == 'delta'
+    tracker.update('T3', 'MAINMENU', MENU_FIELDS)
+    # T2 was least recently used and has been evicted
+    assert tracker.update('T2', 'MAINMENU', MENU_FIELDS).mode == 'full'
+
+
+def test_workers_share_screen_state_through_the_store():
+    store = LocalStateStore()
+    worker_a = ScreenStateTracker(store=store, namespace='smed_screens')
+    worker_b = ScreenStateTracker(store=store, namespace='smed_screens')
+    worker_a.update('T1', 'MAINMENU', MENU_FIELDS)
+    delta = worker_a.update('T1', 'MAINMENU', dict(MENU_FIELDS, MSG='OK'))
+    assert delta.mode == 'delta'
+
+    # Worker B answers the resync for the delta worker A sent
+    snapshot = worker_b.snapshot('T1')
+    assert snapshot.version == delta.version and snapshot.fields['MSG'] == 'OK'
+    assert worker_b.update('T1', 'MAINMENU', dict(MENU_FIELDS, MSG='')).base_version == delta.version
+
+    worker_b.reset('T1')
+    assert worker_a.snapshot('T1') is None and store.count('smed_screens') == 0
+
+
+def test_shared_screens_are_bounded():
+    store = LocalStateStore()
+    tracker = ScreenStateTracker(max_screens=2, store=store, namespace='smed_screens')
+    for terminal_id in ('T1', 'T2', 'T3'):
+        tracker.update(terminal_id, 'MAINMENU', MENU_FIELDS)
+    assert store.count('smed_screens') == 2
+    assert tracker.snapshot('T1') is None and tracker.snapshot('T3') is not None
+
+
+def test_concurrent_workers_never_reuse_a_version():
+    """A worker whose read raced another worker's write recomputes its update"""
+    class RacingStore(LocalStateStore):
+        race = None
+
+        def get(self, namespace, key, default=None):
+            value = super().get(namespace, key, default)
+            if self.race:
+                race, self.race = self.race, None
+                race()
+            return value
+
+    store = RacingStore()
+    worker_a = ScreenStateTracker(store=store, namespace='smed_screens')
+    worker_b = ScreenStateTracker(store=store, namespace='smed_screens')
+    worker_a.update('T1', 'MAINMENU', MENU_FIELDS)
+
+    store.race = lambda: worker_b.update('T1', 'MAINMENU', dict(MENU_FIELDS, MSG='FROM B'))
+    update = worker_a.update('T1', 'MAINMENU', dict(MENU_FIELDS, MSG='FROM A'))
+    assert (update.base_version, update.version) == (2, 3)
+    assert update.fields == {'MSG': 'FROM A'}
+    assert worker_b.snapshot('T1').version == 3
+
+
+def test_position_updates_drop_unchanged_cells():
+    tracker = ScreenStateTracker()
+    first = [{'row': 1, 'col': 1, 'length': 5, 'value': 'HELLO'},
+             {'row': 2, 'col': 1, 'length': 5, 'value': 'WORLD'}]
+    tracker.merge('room', 'MAP', {position_update_key(u): u for u in first})
+
+    second = [{'row': 1, 'col': 1, 'length': 5, 'value': 'HELLO'},
+              {'row': 2, 'col': 1, 'length': 5, 'value': 'THERE'}]
+    update = tracker.merge('room', 'MAP', {position_update_key(u): u for u in second})
+    assert list(update.fields.values()) == [second[1]]
+    assert (update.base_version, update.version) == (1, 2)
+
+    unchanged = tracker.merge('room', 'MAP', {position_update_key(u): u for u in second})
+    assert unchanged.fields == {}
+    assert unchanged.version == 2
+    assert len(tracker.snapshot('room').fields) == 2
+
+
+def test_consecutive_deltas_merge_into_one():
+    tracker = ScreenStateTracker()
+    tracker.update('T1', 'MAINMENU', MENU_FIELDS)
+    first = tracker.update('T1', 'MAINMENU', dict(MENU_FIELDS, MSG='INVALID USER')).to_message()
+    second = tracker.update('T1', 'MAINMENU', {'TITLE': 'MAIN MENU', 'MSG': 'RETRY'}).to_message()
+
+    merged = merge_screen_messages(first, second)
+    assert merged['update_mode'] == 'delta'
+    assert (merged['base_version'], merged['version']) == (1, 3)
+    assert merged['fields'] == {'MSG': 'RETRY'}
+    assert merged['removed_fields'] == ['USERID']
+
+    # A delta that does not apply on top of the pending one stays separate
+    assert merge_screen_messages(second, first) is None
+    full = tracker.update('T1', 'MAINMENU', MENU_FIELDS, force_full=True).to_message()
+    assert merge_screen_messages(merged, full) is full
+
+
+if __name__ == "__main__":
+    test_first_display_is_full_snapshot()
+    test_refresh_sends_only_changed_fields()
+    test_map_change_reset_and_resync()
+    test_terminals_are_independent()
+    test_workers_share_screen_state_through_the_store()
+    test_shared_screens_are_bounded()
+    test_concurrent_workers_never_reuse_a_version()
+    test_position_updates_drop_unchanged_cells()
+    test_consecutive_deltas_merge_into_one()
+    print("All SMED screen state tests passed")
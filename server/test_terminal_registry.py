@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test terminal registry indexes and per-terminal send queues
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from terminal_registry import BROADCAST, HUB_BATCH_EVENT, TerminalRegistry, TerminalOutbox
+from smed_screen_state import merge_screen_messages
+
+
+def _unbatch(sent):
+    """Flatten sent (event, room, payload) emits, expanding hub_batch events"""
+    messages = []
+    for event, room, payload in sent:
+        if event == HUB_BATCH_EVENT:
+            messages.extend((m['event'], room, m['data']) for m in payload['messages'])
+        else:
+            messages.append((event, room, payload))
+    return messages
+
+
+def _info(terminal_id, user='admin', workstation='WSNAME00'):
+    return {'terminal_id': terminal_id, 'user': user, 'workstation': workstation,
+            'room': f'terminal_{terminal_id}'}
+
+
+def test_lookups_and_reverse_indexes():
+    registry = TerminalRegistry()
+    registry.register('sid1', _info('T1'))
+    registry.register('sid2', _info('T2', user='demo', workstation='WS02'))
+
+    assert registry.lookup_terminal('T1') == ('sid1', _info('T1'))
+    assert registry.sessions_for_user('demo') == ['sid2']
+    assert registry.sessions_for_workstation('WSNAME00') == ['sid1']
+
+    registry.update('sid1', user='demo')
+    assert sorted(registry.sessions_for_user('demo')) == ['sid1', 'sid2']
+    assert registry.sessions_for_user('admin') == []
+
+
+def test_reregistration_keeps_new_route():
+    registry = TerminalRegistry()
+    registry.register('old', _info('T1'))
+    assert registry.register('new', _info('T1'), replace_existing=True) == 'old'
+    assert 'old' not in registry
+
+    # A late disconnect of some other session must not unroute T1
+    registry.register('stale', _info('T1'), map_terminal=False)
+    registry.unregister('stale')
+    assert registry.session_for_terminal('T1') == 'new'
+
+    assert registry.unregister('new')['terminal_id'] == 'T1'
+    assert registry.session_for_terminal('T1') is None
+    assert registry.stats() == {'sessions': 0, 'terminals': 0, 'users': 0, 'workstations': 0}
+
+
+def test_outbox_preserves_order_per_terminal():
+    outbox = TerminalOutbox(flush_window=0)
+    sent = []
+    for i in range(3):
+        outbox.enqueue('T1', 'terminal_T1', 'smed_display', i)
+        outbox.enqueue('T2', 'terminal_T2', 'smed_display', i)
+
+    assert outbox.drain_once(lambda *args: sent.append(args), timeout=0) == 3
+    assert outbox.drain_once(lambda *args: sent.append(args), timeout=0) == 3
+    assert outbox.drain_once(lambda *args: sent.append(args), timeout=0) == 0
+    assert [payload for _, room, payload in _unbatch(sent) if room == 'terminal_T1'] == [0, 1, 2]
+    # Each terminal's pending messages went out as one batched emit
+    assert [event for event, _, _ in sent] == [HUB_BATCH_EVENT, HUB_BATCH_EVENT]
+    assert outbox.stats()['sent'] == 6 and outbox.stats()['emits'] == 2
+
+
+def test_outbox_backpressure_drops_oldest():
+    outbox = TerminalOutbox(max_pending=2, flush_window=0)
+    assert outbox.enqueue('T1', 'terminal_T1', 'smed_display', 1)
+    assert outbox.enqueue('T1', 'terminal_T1', 'smed_display', 2)
+    assert not outbox.enqueue('T1', 'terminal_T1', 'smed_display', 3)
+
+    sent = []
+    outbox.drain_once(lambda *args: sent.append(args), timeout=0)
+    assert [payload for _, _, payload in _unbatch(sent)] == [2, 3]
+    assert outbox.stats()['dropped'] == 1
+
+
+def test_outbox_coalesces_superseded_updates():
+    outbox = TerminalOutbox(flush_window=0)
+    outbox.enqueue(BROADCAST, None, 'smed_data_received', {'map_name': 'MENU', 'n': 1}, coalesce_key='MENU')
+    outbox.enqueue(BROADCAST, None, 'smed_data_received', {'map_name': 'MENU', 'n': 2}, coalesce_key='MENU')
+    outbox.enqueue(BROADCAST, None, 'smed_data_received', {'map_name': 'SUB', 'n': 3}, coalesce_key='SUB')
+    # An interleaved key breaks the run: MENU is not reordered past SUB
+    outbox.enqueue(BROADCAST, None, 'smed_data_received', {'map_name': 'MENU', 'n': 4}, coalesce_key='MENU')
+
+    sent = []
+    assert outbox.drain_once(lambda *args: sent.append(args), timeout=0) == 3
+    assert [payload['n'] for _, room, payload in _unbatch(sent)] == [2, 3, 4]
+    assert outbox.stats()['coalesced'] == 1
+
+
+def test_outbox_merges_screen_deltas():
+    outbox = TerminalOutbox(flush_window=0)
+    full = {'map_file': 'MENU', 'update_mode': 'full', 'version': 1, 'fields': {'A': '1', 'B': '2'}}
+    delta = {'map_file': 'MENU', 'update_mode': 'delta', 'version': 2, 'base_version': 1,
+             'fields': {'A': 'x'}, 'removed_fields': ['B']}
+    stale = {'map_file': 'MENU', 'update_mode': 'delta', 'version': 9, 'base_version': 7,
+             'fields': {'C': '3'}, 'removed_fields': []}
+    for message in (full, delta, stale):
+        outbox.enqueue('T1', 'terminal_T1', 'smed_display', message,
+                       coalesce_key='screen', merge=merge_screen_messages)
+
+    sent = []
+    outbox.drain_once(lambda *args: sent.append(args), timeout=0)
+    merged, unmergeable = [payload for _, _, payload in _unbatch(sent)]
+    assert merged == {'map_file': 'MENU', 'update_mode': 'full', 'version': 2, 'fields': {'A': 'x'}}
+    assert unmergeable is stale
+
+
+if __name__ == "__main__":
+    test_lookups_and_reverse_indexes()
+    test_reregistration_keeps_new_route()
+    test_outbox_preserves_order_per_terminal()
+    test_outbox_backpressure_drops_oldest()
+    test_outbox_coalesces_superseded_updates()
+    test_outbox_merges_screen_deltas()
+    print("All terminal registry tests passed")
@@ -8,6 +8,10 @@ directly to the WebSocket Hub, bypassing the HTTP API completely.
 
 This is part of Phase 1: WebSocket Hub Integration to eliminate the complex
 4-stage data flow and provide a single WebSocket channel for all communications.
+
+Processes that send repeatedly should use get_hub_client(): it returns one
+connected, registered client per server URL that is reused for every send
+(and reconnected if the hub went away) instead of a connection per message.
 """
 
 import socketio
@@ -16,7 +20,9 @@ import sys
 import os
 from datetime import datetime
 import argparse
+import atexit
 import logging
+import threading
 
 # Configure logging
 logging.basicConfig(
@@ -26,6 +32,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Pooled clients: server_url -> WebSocketHubClient
+_hub_clients = {}
+_hub_clients_lock = threading.Lock()
+
 class WebSocketHubClient:
     """Client for sending SMED data directly to WebSocket Hub"""
     
@@ -131,6 +141,20 @@ class WebSocketHubClient:
         except Exception as e:
             logger.error(f"[HUB_CLIENT] Error during disconnect: {e}")
     
+    def send_hub_data(self, hub_data):
+        """Send a prepared smed_data_direct payload (e.g. employee data) to the hub"""
+        if not self.connected:
+            logger.error("[HUB_CLIENT] Not connected to WebSocket Hub")
+            return False
+        
+        try:
+            self.client.emit('smed_data_direct', hub_data)
+            logger.debug(f"[HUB_CLIENT] Hub data sent: terminal={hub_data.get('terminal_id')}")
+            return True
+        except Exception as e:
+            logger.error(f"[HUB_CLIENT] Failed to send hub data: {e}")
+            return False
+    
     def send_smed_data(self, terminal_id, map_file, fields, program_name='unknown', source_type='direct'):
         """Send SMED data directly to WebSocket Hub"""
         if not self.connected:
@@ -147,22 +171,9 @@ class WebSocketHubClient:
             'client_version': '1.0'
         }
         
-        try:
-            logger.info(f"[HUB_CLIENT] Sending SMED data to hub:")
-            logger.info(f"[HUB_CLIENT] - Terminal: {terminal_id}")
-            logger.info(f"[HUB_CLIENT] - Map: {map_file}")
-            logger.info(f"[HUB_CLIENT] - Fields: {len(fields)} fields")
-            logger.info(f"[HUB_CLIENT] - Program: {program_name}")
-            
-            # Send data via WebSocket Hub
-            self.client.emit('smed_data_direct', hub_data)
-            
-            logger.info(f"[HUB_CLIENT] SMED data sent to WebSocket Hub successfully")
-            return True
-            
-        except Exception as e:
-            logger.error(f"[HUB_CLIENT] Failed to send SMED data: {e}")
-            return False
+        logger.debug(f"[HUB_CLIENT] Sending SMED data to hub: terminal={terminal_id}, "
+                     f"map={map_file}, fields={len(fields)}, program={program_name}")
+        return self.send_hub_data(hub_data)
     
     def send_smed_json(self, json_data):
         """Send SMED data from JSON string or file"""
@@ -195,6 +206,41 @@ class WebSocketHubClient:
             logger.error(f"[HUB_CLIENT] Failed to process JSON data: {e}")
             return False
 
+def get_hub_client(server_url='http://localhost:8000'):
+    """
+    Get the shared, connected hub client for server_url
+    
+    The first call connects and registers; later calls reuse the connection,
+    reconnecting only if it was lost.
+    
+    Returns:
+        WebSocketHubClient, or None if the hub cannot be reached
+    """
+    with _hub_clients_lock:
+        client = _hub_clients.get(server_url)
+        if client is not None and client.connected:
+            return client
+        if client is not None:
+            try:
+                client.client.disconnect()
+            except Exception:
+                pass
+        client = WebSocketHubClient(server_url)
+        if not client.connect():
+            _hub_clients.pop(server_url, None)
+            return None
+        _hub_clients[server_url] = client
+        return client
+
+def close_hub_clients():
+    """Disconnect pooled hub clients (flushes pending emits at exit)"""
+    with _hub_clients_lock:
+        for client in _hub_clients.values():
+            client.disconnect()
+        _hub_clients.clear()
+
+atexit.register(close_hub_clients)
+
 def main():
     """Command-line interface for WebSocket Hub Client"""
     parser = argparse.ArgumentParser(description='WebSocket Hub Client for Direct SMED Data Transmission')